@@ -35,7 +35,7 @@ POSSIBILITY OF SUCH DAMAGE.
 __version__ = '16.0.0'
 
 # Bump this version everytime the schema is modified
-db_schema_version = 87
+db_schema_version = 97
 
 # Bump this version everytime the reports change in an incompatible way
 report_schema_version = 8
@@ -160,6 +160,13 @@ def log_api_perf_start() -> None:
     g.request_start_time = time.time()
 
 
+@app.before_request
+def reset_data_versions() -> None:
+    """Makes sure the data version and GSMA TAC dictionary version are checked again for every request."""
+    g.pop('data_version', None)
+    g.pop('gsma_tac_records', None)
+
+
 @app.after_request
 def add_no_cache(response: callable) -> callable:
     """
@@ -31,6 +31,107 @@ BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
 POSSIBILITY OF SUCH DAMAGE.
 """
 
+import hashlib
+import logging
+from typing import Callable, Iterable
+
+from flask import g
 from flask_caching import Cache
+from flask_caching.backends import NullCache
+
+from dirbs.api.common.db import get_db_connection
 
 cache = Cache()
+
+# Commands whose successful runs change the data returned by the cached APIs
+_DATA_VERSION_COMMANDS = ('dirbs-classify', 'dirbs-import', 'dirbs-prune')
+
+
+def cache_disabled() -> bool:
+    """
+    Returns whether no cache backend is configured, in which case nothing can be cached.
+
+    It is also used as the unless argument of cache.memoize, so that memoized routes skip computing the data version.
+
+    Returns:
+        True if the cache type is null
+    """
+    return isinstance(cache.cache, NullCache)
+
+
+def data_version() -> str:
+    """
+    Returns a token identifying the version of the data served by the API.
+
+    The version is derived from the most recent successful classification, import and prune runs, so it changes
+    (invalidating every cached result keyed on it) whenever one of these jobs completes. It is computed at most once
+    per request.
+
+    Returns:
+        data version token
+    """
+    if 'data_version' not in g:
+        with get_db_connection().cursor() as cursor:
+            cursor.execute("""SELECT command, MAX(run_id) AS run_id, MAX(end_time) AS end_time
+                                FROM job_metadata
+                               WHERE command IN %s
+                                 AND status = 'success'
+                            GROUP BY command
+                            ORDER BY command""", [_DATA_VERSION_COMMANDS])
+            latest_runs = ','.join('{0}={1}@{2}'.format(rec.command, rec.run_id, rec.end_time.isoformat())
+                                   for rec in cursor)
+        g.data_version = hashlib.md5(latest_runs.encode('utf-8')).hexdigest()
+    return g.data_version
+
+
+def versioned_name(fname: str) -> str:
+    """
+    Function to be used as make_name for cache.memoize so that memoized results are keyed on the data version.
+
+    Arguments:
+        fname: name of the memoized function
+    Returns:
+        function name qualified with the current data version
+    """
+    return '{0}:{1}'.format(fname, data_version())
+
+
+def cached_results(namespace: str, keys: Iterable[str], compute: Callable[[list], dict]) -> dict:
+    """
+    Function to fetch per-key results (for example per IMEI or per TAC) from the cache for the current data version.
+
+    Results missing from the cache are computed in a single call to compute and then stored, so single and batch
+    endpoints using the same namespace share cached entries. When no cache backend is configured, every result is
+    computed without looking up the data version.
+
+    Arguments:
+        namespace: namespace of the results, which must identify everything other than the key they depend on
+        keys: keys to fetch results for
+        compute: function computing a dict of key -> result for a list of keys
+    Returns:
+        dict of key -> result
+    """
+    keys = list(dict.fromkeys(keys))
+    if cache_disabled():
+        return compute(keys)
+
+    version = data_version()
+    cache_keys = {key: '{0}:{1}:{2}'.format(namespace, version, key) for key in keys}
+    logger = logging.getLogger('dirbs.flask')
+
+    try:
+        cached_values = cache.get_many(*cache_keys.values())
+    except Exception:
+        logger.exception('Failed to read results from the API cache')
+        cached_values = [None] * len(keys)
+
+    results = {key: value for key, value in zip(keys, cached_values) if value is not None}
+    missing_keys = [key for key in keys if key not in results]
+    if len(missing_keys) > 0:
+        computed_results = compute(missing_keys)
+        results.update(computed_results)
+        try:
+            cache.set_many({cache_keys[key]: value for key, value in computed_results.items()})
+        except Exception:
+            logger.exception('Failed to store results in the API cache')
+    return results
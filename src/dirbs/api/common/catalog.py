@@ -50,7 +50,7 @@ def _build_sql_query_filters(**kwargs: dict) -> Tuple[list, list]:
     filter_params = []
 
     for param, param_value in kwargs.items():
-        if param not in ['order', 'offset', 'limit']:
+        if param not in ['order', 'offset', 'limit', 'cursor', 'include_count']:
             if param in ['modified_time', 'last_seen']:
                 operator = '>='
             else:
@@ -0,0 +1,213 @@
+"""
+DIRBS REST-ful API pagination common module.
+
+Copyright (c) 2018-2021 Qualcomm Technologies, Inc.
+
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification, are permitted (subject to the
+limitations in the disclaimer below) provided that the following conditions are met:
+
+- Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+  disclaimer.
+- Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the following
+  disclaimer in the documentation and/or other materials provided with the distribution.
+- Neither the name of Qualcomm Technologies, Inc. nor the names of its contributors may be used to endorse or promote
+  products derived from this software without specific prior written permission.
+- The origin of this software must not be misrepresented; you must not claim that you wrote the original software.
+  If you use this software in a product, an acknowledgment is required by displaying the trademark/logo as per the
+  details provided here: https://www.qualcomm.com/documents/dirbs-logo-and-brand-guidelines
+- Altered source versions must be plainly marked as such, and must not be misrepresented as being the original
+  software.
+- This notice may not be removed or altered from any source distribution.
+
+NO EXPRESS OR IMPLIED LICENSES TO ANY PARTY'S PATENT RIGHTS ARE GRANTED BY THIS LICENSE. THIS SOFTWARE IS PROVIDED BY
+THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR
+BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+POSSIBILITY OF SUCH DAMAGE.
+"""
+
+import json
+import base64
+import binascii
+from typing import List, Tuple
+
+from flask import abort
+from psycopg2 import sql
+
+# Maximum number of rows counted for the result_size of a paginated response. Counting stops here so that the cost
+# of a page does not grow with the total size of the result set
+RESULT_SIZE_CAP = 10000
+
+
+def encode_cursor(key_values: list) -> str:
+    """
+    Function to encode the sort key values of the last row on a page into an opaque pagination cursor.
+
+    Arguments:
+        key_values: list of JSON-serializable sort key values (dates and datetimes are converted to ISO strings)
+    Returns:
+        URL-safe cursor string
+    """
+    key_values = [v.isoformat() if hasattr(v, 'isoformat') else v for v in key_values]
+    return base64.urlsafe_b64encode(json.dumps(key_values).encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor: str, num_keys: int) -> list:
+    """
+    Function to decode a pagination cursor produced by encode_cursor.
+
+    Arguments:
+        cursor: cursor string from the '_keys' of a previous page
+        num_keys: number of sort key values the cursor is expected to contain
+    Returns:
+        list of sort key values
+    """
+    try:
+        key_values = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8'))
+    except (ValueError, UnicodeError, binascii.Error):
+        key_values = None
+
+    if not isinstance(key_values, list) or len(key_values) != num_keys or \
+            not all(isinstance(v, (str, int, float)) for v in key_values):
+        abort(400, "Bad 'cursor':'{0}' argument format.".format(cursor))
+    return key_values
+
+
+def keyset_filter(cursor, sort_keys: List[Tuple[sql.Composable, str]], key_values: list) -> sql.Composable:
+    """
+    Function to build a SQL filter selecting the rows that sort after the supplied key values.
+
+    The sort keys must uniquely identify a row and may mix ascending and descending orders.
+
+    Arguments:
+        cursor: PostgreSQL database cursor, used to bind the key values into the filter
+        sort_keys: list of (SQL expression, 'ASC' or 'DESC') tuples, in ORDER BY order
+        key_values: values of the sort keys for the last row on the previous page
+    Returns:
+        SQL filter expression
+    """
+    disjuncts = []
+    filter_params = []
+    for i, (key_sql, key_order) in enumerate(sort_keys):
+        conjuncts = [sql.SQL('{0} = %s').format(prev_key_sql) for prev_key_sql, _ in sort_keys[:i]]
+        filter_params.extend(key_values[:i])
+        conjuncts.append(sql.SQL('{0} {1} %s').format(key_sql, sql.SQL('>' if key_order == 'ASC' else '<')))
+        filter_params.append(key_values[i])
+        disjuncts.append(sql.SQL('({0})').format(sql.SQL(' AND ').join(conjuncts)))
+    filter_sql = sql.SQL('({0})').format(sql.SQL(' OR ').join(disjuncts))
+    # The bound filter is embedded in a query that is itself executed with parameters, so escape any % it contains
+    mogrified_sql = str(cursor.mogrify(filter_sql, filter_params), cursor.connection.encoding)
+    return sql.SQL(mogrified_sql.replace('%', '%%'))
+
+
+def order_by_sql(sort_keys: List[Tuple[sql.Composable, str]]) -> sql.Composable:
+    """
+    Function to build the ORDER BY list for a set of sort keys.
+
+    Arguments:
+        sort_keys: list of (SQL expression, 'ASC' or 'DESC') tuples
+    Returns:
+        SQL ORDER BY list
+    """
+    return sql.SQL(', ').join([sql.SQL('{0} {1}').format(key_sql, sql.SQL(key_order))
+                               for key_sql, key_order in sort_keys])
+
+
+def capped_count(cursor, query: sql.Composable, params=None, cap: int = RESULT_SIZE_CAP) -> Tuple[int, bool]:
+    """
+    Function to count the rows returned by a query, stopping once the cap has been exceeded.
+
+    Arguments:
+        cursor: PostgreSQL database cursor
+        query: SQL query whose rows should be counted
+        params: parameters for the query (default None)
+        cap: maximum number of rows to count (default RESULT_SIZE_CAP)
+    Returns:
+        result_size: number of rows, at most cap
+        is_capped: whether the query returned more than cap rows
+    """
+    cursor.execute(sql.SQL('SELECT COUNT(*) FROM ({0} LIMIT {1}) counted').format(query, sql.Literal(cap + 1)),
+                   params)
+    result_size = cursor.fetchone()[0]
+    return min(result_size, cap), result_size > cap
+
+
+def offset_keys(*, offset: int, limit: int, page_cursor: str = None, has_rows: bool, no_next_key='') -> dict:
+    """
+    Function to build the offset-based current_key and next_key keys of a paginated response.
+
+    These keys are left empty when the page was located by a cursor, as its offset is not known.
+
+    Arguments:
+        offset: offset of the page
+        limit: maximum number of results on the page
+        page_cursor: cursor the page was located by (default None)
+        has_rows: whether the page contains any results
+        no_next_key: next_key value to use when the page contains no results (default '')
+    Returns:
+        current_key and next_key keys for the response
+    """
+    if page_cursor:
+        return {'current_key': '', 'next_key': ''}
+    return {'current_key': offset, 'next_key': offset + limit if has_rows else no_next_key}
+
+
+def paginate(cursor, query: sql.Composable, params, sort_keys: List[Tuple[str, str]], *, offset: int, limit: int,
+             page_cursor: str = None, include_count: bool = True) -> Tuple[list, dict]:
+    """
+    Function to fetch a single page of the results of a query.
+
+    When a page_cursor is supplied, the page is located by key so that its cost does not depend on how deep into the
+    results it is. Otherwise the page is located by offset.
+
+    Arguments:
+        cursor: PostgreSQL database cursor
+        query: SQL query returning the full, unordered result set, including the sort key columns
+        params: parameters for the query
+        sort_keys: list of (column name, 'ASC' or 'DESC') tuples that together uniquely identify a row
+        offset: offset of the page, ignored if page_cursor is supplied
+        limit: maximum number of results on the page
+        page_cursor: cursor from the next_cursor key of the previous page (default None)
+        include_count: whether to count the total number of results (default True)
+    Returns:
+        rows: rows on the page
+        keys: next_cursor, result_size and result_size_capped keys for the response
+    """
+    if params is None:
+        params = []
+
+    result_size, result_size_capped = None, None
+    if include_count:
+        result_size, result_size_capped = capped_count(cursor, query, params)
+
+    sort_keys_sql = [(sql.Identifier(col), order) for col, order in sort_keys]
+    if page_cursor:
+        where_sql = sql.SQL('WHERE {0}').format(keyset_filter(cursor, sort_keys_sql,
+                                                              decode_cursor(page_cursor, len(sort_keys))))
+        offset_sql = sql.SQL('')
+    else:
+        where_sql = sql.SQL('')
+        offset_sql = sql.SQL('OFFSET {0}').format(sql.Literal(offset))
+
+    cursor.execute(sql.SQL("""SELECT *
+                                FROM ({query}) results
+                                     {where_sql}
+                            ORDER BY {order_by}
+                                     {offset_sql}
+                               LIMIT {limit}""").format(query=query,
+                                                        where_sql=where_sql,
+                                                        order_by=order_by_sql(sort_keys_sql),
+                                                        offset_sql=offset_sql,
+                                                        limit=sql.Literal(limit)),
+                   params)
+    rows = cursor.fetchall()
+
+    next_cursor = ''
+    if len(rows) == limit:
+        next_cursor = encode_cursor([getattr(rows[-1], col) for col, _ in sort_keys])
+    return rows, {'next_cursor': next_cursor, 'result_size': result_size, 'result_size_capped': result_size_capped}
@@ -31,7 +31,10 @@ BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
 POSSIBILITY OF SUCH DAMAGE.
 """
 
-from flask import abort
+import threading
+from typing import Iterable
+
+from flask import abort, g
 
 
 def validate_tac(val: str) -> abort:
@@ -48,3 +51,74 @@ def validate_tac(val: str) -> abort:
         int(val)
     except ValueError:
         abort(400, 'Bad Tac format')
+
+
+class GSMATacDictionary:
+    """In-process copy of gsma_data keyed by TAC, shared by the API requests served by a worker.
+
+    The copy is loaded lazily and is versioned by the most recent successful gsma_tac import run recorded in
+    job_metadata, so that it is reloaded once a newer import has completed. The version is checked at most once per
+    request, after which all TAC lookups for that request are served from memory.
+    """
+
+    def __init__(self):
+        """Constructor."""
+        self._lock = threading.Lock()
+        self._version = None
+        self._records = None
+
+    @staticmethod
+    def _latest_import(cursor):
+        """Returns the most recent gsma_tac import run that has either completed successfully or is in progress."""
+        cursor.execute("""SELECT run_id, status, end_time
+                            FROM job_metadata
+                           WHERE command = 'dirbs-import'
+                             AND subcommand = 'gsma_tac'
+                             AND status IN ('success', 'running')
+                        ORDER BY run_id DESC
+                           LIMIT 1""")
+        return cursor.fetchone()
+
+    def _current_records(self, cursor):
+        """Returns the dictionary of GSMA records, reloading it first if a newer import has completed.
+
+        None is returned while a gsma_tac import is in progress, as the data it commits is not reflected in the
+        version until the import has been marked as successful.
+        """
+        latest_import = self._latest_import(cursor)
+        if latest_import is not None and latest_import.status == 'running':
+            return None
+
+        version = (latest_import.run_id, latest_import.end_time) if latest_import is not None else None
+        with self._lock:
+            if self._records is None or version != self._version:
+                cursor.execute('SELECT * FROM gsma_data')
+                self._records = {rec.tac: rec for rec in cursor}
+                self._version = version
+            return self._records
+
+    def lookup(self, cursor, tacs: Iterable[str]) -> dict:
+        """
+        Method to look up the GSMA records for a list of TACs.
+
+        Arguments:
+            cursor: PostgreSQL database cursor
+            tacs: TACs to look up
+        Returns:
+            dict mapping each TAC found in the GSMA data to its gsma_data record
+        """
+        tacs = set(tacs)
+        if 'gsma_tac_records' not in g:
+            g.gsma_tac_records = self._current_records(cursor)
+
+        records = g.gsma_tac_records
+        if records is not None:
+            return {tac: records[tac] for tac in tacs if tac in records}
+
+        if len(tacs) == 0:
+            return {}
+        cursor.execute('SELECT * FROM gsma_data WHERE tac IN %s', [tuple(tacs)])
+        return {rec.tac: rec for rec in cursor}
+
+
+gsma_tac_dictionary = GSMATacDictionary()
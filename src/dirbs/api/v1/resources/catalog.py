@@ -69,10 +69,10 @@ def catalog_api(max_results: int = None, **kwargs: dict) -> jsonify:
                                       {filters}
                              ORDER BY last_seen DESC, file_id DESC
                                 LIMIT %s) dc
-                    LEFT JOIN (SELECT run_id, status, extra_metadata
+                    LEFT JOIN (SELECT run_id, status, input_file_md5
                                  FROM job_metadata
-                                WHERE command = 'dirbs-import') jm
-                               ON md5 = (extra_metadata->>'input_file_md5')::uuid
+                                WHERE input_file_md5 IS NOT NULL) jm
+                               ON md5 = input_file_md5
                      GROUP BY file_id,
                               filename,
                               file_type,
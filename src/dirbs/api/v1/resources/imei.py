@@ -36,6 +36,7 @@ from flask import jsonify
 
 from dirbs.api.v1.schemas.imei import IMEI
 from dirbs.api.common.db import get_db_connection
+from dirbs.api.common.tac import gsma_tac_dictionary
 from dirbs.api.common.imei import validate_imei, get_conditions, ever_observed_on_network, is_in_registration_list, \
     get_subscribers, is_paired
 
@@ -55,8 +56,7 @@ def imei_api(imei: str, include_seen_with: bool = False, include_paired_with: bo
 
     tac = imei_norm[:8]
     with get_db_connection() as db_conn, db_conn.cursor() as cursor:
-        cursor.execute('SELECT NOT EXISTS (SELECT * FROM gsma_data WHERE tac = %s) AS not_in_gsma', [tac])
-        rt_gsma_not_found = cursor.fetchone()[0]
+        rt_gsma_not_found = tac not in gsma_tac_dictionary.lookup(cursor, [tac])
 
         condition_results = get_conditions(cursor, imei_norm)
 
@@ -58,11 +58,18 @@ def msisdn_api(msisdn: str) -> Union[abort, jsonify]:
         abort(400, 'Bad MSISDN format (can only contain digit characters)')
 
     with get_db_connection() as db_conn, db_conn.cursor() as cursor:
-        cursor.execute("""SELECT imei_norm, imsi, manufacturer AS gsma_manufacturer, model_name AS gsma_model_name
-                            FROM gsma_data
-                      RIGHT JOIN monthly_network_triplets_country_no_null_imeis
-                                            ON SUBSTRING(imei_norm, 1, 8) = tac
-                           WHERE %s = msisdn """, [msisdn])
+        # network_msisdns holds a row per operator, so these are grouped to give a row per IMEI-IMSI pair seen in the
+        # country
+        cursor.execute("""SELECT nm.imei_norm, nm.imsi, manufacturer AS gsma_manufacturer,
+                                 model_name AS gsma_model_name
+                            FROM (SELECT imei_norm, imsi
+                                    FROM network_msisdns
+                                   WHERE msisdn = %(msisdn)s
+                                     AND virt_msisdn_shard = calc_virt_msisdn_shard(%(msisdn)s)
+                                GROUP BY imei_norm, imsi) nm
+                       LEFT JOIN gsma_data
+                                            ON tac = SUBSTRING(nm.imei_norm, 1, 8)""",
+                       {'msisdn': msisdn})
 
         resp = [MSISDN().dump(rec._asdict()).data for rec in cursor]
         return jsonify(resp)
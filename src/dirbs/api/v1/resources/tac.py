@@ -36,6 +36,7 @@ from typing import Union
 from flask import abort, jsonify
 
 from dirbs.api.common.db import get_db_connection
+from dirbs.api.common.tac import gsma_tac_dictionary
 from dirbs.api.v1.schemas.tac import GSMATacInfo
 
 
@@ -58,8 +59,7 @@ def api(tac: str) -> Union[abort, jsonify]:
         abort(400, 'Bad TAC format')
 
     with get_db_connection() as db_conn, db_conn.cursor() as cursor:
-        cursor.execute('SELECT * FROM gsma_data WHERE tac = %s', [tac])
-        rec = cursor.fetchone()
+        rec = gsma_tac_dictionary.lookup(cursor, [tac]).get(tac)
 
         if rec is None:
             return jsonify(GSMATacInfo().dump(dict(tac=tac, gsma=None)).data)
@@ -36,6 +36,7 @@ from flask import jsonify
 
 from dirbs.api.common.db import get_db_connection
 from dirbs.api.common.catalog import _build_sql_query_filters
+from dirbs.api.common.pagination import paginate, offset_keys
 from dirbs.api.v2.schemas.catalog import CatalogFile, Keys
 
 
@@ -55,63 +56,47 @@ def catalog_api(**kwargs: dict) -> jsonify:
     # Build filters to be applied to the SQL query
     filters, filter_params = _build_sql_query_filters(**kwargs)
 
-    query = sql.SQL("""SELECT array_agg(status ORDER BY run_id DESC)::TEXT[] AS status_list, dc.*,
-                              count(*) OVER() AS total_count
-                                     FROM (SELECT file_id,
-                                                  filename,
-                                                  file_type,
-                                                  compressed_size_bytes,
-                                                  modified_time,
-                                                  is_valid_zip,
-                                                  is_valid_format,
-                                                  md5,
-                                                  extra_attributes,
-                                                  first_seen,
-                                                  last_seen,
-                                                  uncompressed_size_bytes,
-                                                  num_records
-                                             FROM data_catalog
-                                                  {filters}
-                                         ORDER BY last_seen DESC, file_id DESC
-                                            LIMIT ALL) dc
-                                LEFT JOIN (SELECT run_id, status, extra_metadata
-                                             FROM job_metadata
-                                            WHERE command = 'dirbs-import') jm
-                                           ON md5 = (extra_metadata->>'input_file_md5')::uuid
-                                 GROUP BY file_id,
-                                          filename,
-                                          file_type,
-                                          compressed_size_bytes,
-                                          modified_time,
-                                          is_valid_zip,
-                                          is_valid_format,
-                                          md5,
-                                          extra_attributes,
-                                          first_seen,
-                                          last_seen,
-                                          uncompressed_size_bytes,
-                                          num_records
-                                 ORDER BY last_seen DESC, file_id {sort_order} 
-                                 OFFSET {data_offset} 
-                                 LIMIT {data_limit}""")  # noqa Q444
-
     where_clause = sql.SQL('')
     if len(filters) > 0:
         where_clause = sql.SQL('WHERE {0}').format(sql.SQL(' AND ').join(filters))
 
+    query = sql.SQL("""SELECT file_id,
+                              filename,
+                              file_type,
+                              compressed_size_bytes,
+                              modified_time,
+                              is_valid_zip,
+                              is_valid_format,
+                              md5,
+                              extra_attributes,
+                              first_seen,
+                              last_seen,
+                              uncompressed_size_bytes,
+                              num_records
+                         FROM data_catalog
+                              {filters}""").format(filters=where_clause)
+
     with get_db_connection() as conn, conn.cursor() as cursor:
-        cursor.execute(cursor.mogrify(query.format(filters=where_clause,
-                                                   sort_order=sql.SQL(sort_order),
-                                                   data_offset=sql.SQL(str(data_offset)),
-                                                   data_limit=sql.SQL(str(data_limit))),
-                                      filter_params))
-
-        result = cursor.fetchall()
-        result_size = result[0][-1] if result else 0
-        resp = [CatalogFile().dump(rec._asdict()).data for rec in result]
-        keys = {'current_key': data_offset,
-                'next_key': data_offset + data_limit if resp else '',
-                'result_size': result_size}
+        page_cursor = kwargs.get('cursor')
+        rows, page_keys = paginate(cursor, query, filter_params, [('last_seen', 'DESC'), ('file_id', sort_order)],
+                                   offset=data_offset, limit=data_limit, page_cursor=page_cursor,
+                                   include_count=kwargs.get('include_count', True))
+
+        # Only look up the import history of the files on this page, rather than of the whole catalog
+        status_lists = {}
+        if rows:
+            cursor.execute("""SELECT input_file_md5 AS md5,
+                                     array_agg(status ORDER BY run_id DESC)::TEXT[] AS status_list
+                                FROM job_metadata
+                               WHERE input_file_md5 = ANY(%s::UUID[])
+                            GROUP BY input_file_md5""", [[str(rec.md5) for rec in rows]])
+            status_lists = {str(rec.md5): rec.status_list for rec in cursor}
+
+        # Files that have never been imported keep the [None] status_list of the original outer join
+        resp = [CatalogFile().dump(dict(rec._asdict(), status_list=status_lists.get(str(rec.md5), [None]))).data
+                for rec in rows]
+        keys = {**offset_keys(offset=data_offset, limit=data_limit, page_cursor=page_cursor, has_rows=bool(resp)),
+                **page_keys}
 
         return jsonify({
             '_keys': Keys().dump(dict(keys)).data,
@@ -35,8 +35,11 @@ import re
 from flask import jsonify, current_app
 from psycopg2 import sql
 
+from dirbs.api.common.cache import cached_results
 from dirbs.api.common.db import get_db_connection
 from dirbs.api.common.imei import validate_imei, get_conditions, is_paired, is_in_registration_list
+from dirbs.api.common.pagination import paginate, offset_keys
+from dirbs.api.common.tac import gsma_tac_dictionary
 from dirbs.api.v2.schemas.imei import IMEIInfo, IMEI, IMEISubscribers, IMEIPairings
 
 
@@ -161,10 +164,7 @@ def is_exempted_device(cursor, imei_norm: str) -> bool:
     exempted_device_types = current_app.config['DIRBS_CONFIG'].region_config.exempted_device_types
 
     if len(exempted_device_types) > 0:
-        cursor.execute("""SELECT device_type
-                            FROM gsma_data
-                           WHERE tac = '{tac}'""".format(tac=imei_norm[:8]))
-        result = cursor.fetchone()
+        result = gsma_tac_dictionary.lookup(cursor, [imei_norm[:8]]).get(imei_norm[:8])
         if result is not None:
             return result.device_type in exempted_device_types
         return False
@@ -208,24 +208,23 @@ def imei_info_api(imei: str) -> jsonify:
         return {}
 
 
-def imei_api(imei: str, include_registration_status: bool = False, include_stolen_status: bool = False) -> jsonify:
+def _imei_results(db_conn, cursor, imei_norms: list, include_registration_status: bool,
+                  include_stolen_status: bool) -> dict:
     """
-    IMEI API handler.
+    Method to compute the IMEI API response for a list of normalized IMEIs.
 
     Arguments:
-        imei: value of the IMEI
-        include_registration_status: boolean weather to include reg status or not (default False)
-        include_stolen_status: boolean weather to include stolen status or not (default False)
+        db_conn: PostgreSQL database connection object
+        cursor: PostgreSQL database cursor
+        imei_norms: list of normalized IMEIs
+        include_registration_status: boolean weather to include reg status or not
+        include_stolen_status: boolean weather to include stolen status or not
     Returns:
-        JSON response
+        dict of normalized IMEI -> serialized IMEI response
     """
-    imei_norm = validate_imei(imei)
-    tac = imei_norm[:8]
-
-    tac = imei_norm[:8]
-    with get_db_connection() as db_conn, db_conn.cursor() as cursor:
-        cursor.execute('SELECT NOT EXISTS (SELECT * FROM gsma_data WHERE tac = %s) AS not_in_gsma', [tac])
-        rt_gsma_not_found = cursor.fetchone()[0]
+    results = {}
+    gsma_data = gsma_tac_dictionary.lookup(cursor, [imei_norm[:8] for imei_norm in imei_norms])
+    for imei_norm in imei_norms:
         first_seen_date = first_seen(cursor, imei_norm)
         condition_results = get_conditions(cursor, imei_norm)
         response = {
@@ -252,7 +251,7 @@ def imei_api(imei: str, include_registration_status: bool = False, include_stole
                 'is_paired': is_paired(cursor, imei_norm),
                 'is_exempted_device': is_exempted_device(cursor, imei_norm),
                 'in_registration_list': is_in_registration_list(db_conn, cursor, imei_norm),
-                'gsma_not_found': rt_gsma_not_found
+                'gsma_not_found': imei_norm[:8] not in gsma_data
             }
         }
 
@@ -261,7 +260,45 @@ def imei_api(imei: str, include_registration_status: bool = False, include_stole
         if include_stolen_status:
             response['stolen_status'] = stolen_list_status(cursor, imei_norm)
 
-        return jsonify(IMEI().dump(response).data)
+        results[imei_norm] = IMEI().dump(response).data
+    return results
+
+
+def _cached_imei_results(imei_norms: list, include_registration_status: bool, include_stolen_status: bool) -> dict:
+    """
+    Method to fetch the IMEI API response for a list of normalized IMEIs, using the per-IMEI result cache.
+
+    Arguments:
+        imei_norms: list of normalized IMEIs
+        include_registration_status: boolean weather to include reg status or not
+        include_stolen_status: boolean weather to include stolen status or not
+    Returns:
+        dict of normalized IMEI -> serialized IMEI response
+    """
+    namespace = 'imei:{0:d}:{1:d}'.format(bool(include_registration_status), bool(include_stolen_status))
+
+    def _compute(missing_imei_norms):
+        with get_db_connection() as db_conn, db_conn.cursor() as cursor:
+            return _imei_results(db_conn, cursor, missing_imei_norms, include_registration_status,
+                                 include_stolen_status)
+
+    return cached_results(namespace, imei_norms, _compute)
+
+
+def imei_api(imei: str, include_registration_status: bool = False, include_stolen_status: bool = False) -> jsonify:
+    """
+    IMEI API handler.
+
+    Arguments:
+        imei: value of the IMEI
+        include_registration_status: boolean weather to include reg status or not (default False)
+        include_stolen_status: boolean weather to include stolen status or not (default False)
+    Returns:
+        JSON response
+    """
+    imei_norm = validate_imei(imei)
+    results = _cached_imei_results([imei_norm], include_registration_status, include_stolen_status)
+    return jsonify(results[imei_norm])
 
 
 def imei_subscribers_api(imei: str, **kwargs: dict) -> jsonify:
@@ -280,29 +317,22 @@ def imei_subscribers_api(imei: str, **kwargs: dict) -> jsonify:
     order = kwargs.get('order')
 
     with get_db_connection() as db_conn, db_conn.cursor() as cursor:
-        query = """SELECT DISTINCT imsi, msisdn, last_seen, COUNT(*) OVER() AS total_count
-                     FROM monthly_network_triplets_country_no_null_imeis
-                    WHERE imei_norm = %(imei_norm)s
-                      AND virt_imei_shard = calc_virt_imei_shard(%(imei_norm)s)
-                 ORDER BY last_seen {order_type}
-                 OFFSET {data_offset}
-                 LIMIT {data_limit}""".format(order_type=order, data_offset=offset, data_limit=limit)  # noqa Q447
-
-        cursor.execute(query, {'imei_norm': imei_norm})
-        if cursor is not None:
-            subscribers = [{'imsi': x.imsi,
-                            'msisdn': x.msisdn,
-                            'last_seen': x.last_seen,
-                            'total_count': x.total_count} for x in cursor]
-            keys = {'current_key': offset,
-                    'next_key': offset + limit if subscribers else '',
-                    'result_size': subscribers[0].get('total_count') if subscribers else 0}
-            return jsonify(IMEISubscribers().dump(dict(imei_norm=imei_norm,
-                                                       subscribers=subscribers,
-                                                       _keys=keys)).data)
-
-        keys = {'current_key': offset, 'next_key': '', 'result_size': 0}
-        return jsonify(IMEISubscribers().dump(dict(imei_norm=imei_norm, subscribers=None, _keys=keys)))
+        query = sql.SQL("""SELECT DISTINCT imsi, msisdn, last_seen,
+                                  COALESCE(imsi, '') AS imsi_key, COALESCE(msisdn, '') AS msisdn_key
+                             FROM monthly_network_triplets_country_no_null_imeis
+                            WHERE imei_norm = %(imei_norm)s
+                              AND virt_imei_shard = calc_virt_imei_shard(%(imei_norm)s)""")
+        sort_keys = [('last_seen', order), ('imsi_key', order), ('msisdn_key', order)]
+        page_cursor = kwargs.get('cursor')
+        rows, page_keys = paginate(cursor, query, {'imei_norm': imei_norm}, sort_keys,
+                                   offset=offset, limit=limit, page_cursor=page_cursor,
+                                   include_count=kwargs.get('include_count', True))
+        subscribers = [{'imsi': x.imsi, 'msisdn': x.msisdn, 'last_seen': x.last_seen} for x in rows]
+        keys = {**offset_keys(offset=offset, limit=limit, page_cursor=page_cursor, has_rows=bool(subscribers)),
+                **page_keys}
+        return jsonify(IMEISubscribers().dump(dict(imei_norm=imei_norm,
+                                                   subscribers=subscribers,
+                                                   _keys=keys)).data)
 
 
 def imei_pairings_api(imei: str, **kwargs: dict) -> jsonify:
@@ -321,29 +351,28 @@ def imei_pairings_api(imei: str, **kwargs: dict) -> jsonify:
     order = kwargs.get('order')
 
     with get_db_connection() as db_conn, db_conn.cursor() as cursor:
-        query = """SELECT pairing_list.imsi, network_triplets.last_seen, COUNT(*) OVER() AS total_count
-                     FROM pairing_list
-                LEFT JOIN monthly_network_triplets_country_no_null_imeis AS network_triplets
-                           ON network_triplets.imsi = pairing_list.imsi
-                      AND network_triplets.imei_norm = pairing_list.imei_norm
-                    WHERE pairing_list.imei_norm = %(imei_norm)s
-                      AND pairing_list.virt_imei_shard = calc_virt_imei_shard(%(imei_norm)s)
-                ORDER BY last_seen {order_type} 
-                OFFSET {data_offset} 
-                LIMIT {data_limit}""".format(order_type=order, data_offset=offset, data_limit=limit)  # noqa Q447
-
-        cursor.execute(query, {'imei_norm': imei_norm})
-        if cursor is not None:
-            pairings = [{'imsi': x.imsi, 'last_seen': x.last_seen, 'total_count': x.total_count} for x in cursor]
-            keys = {'current_key': offset,
-                    'next_key': offset + limit if pairings else '',
-                    'result_size': pairings[0].get('total_count') if pairings else 0}
-            return jsonify(IMEIPairings().dump(dict(imei_norm=imei_norm,
-                                                    pairs=pairings,
-                                                    _keys=keys)).data)
-
-        keys = {'current_key': offset, 'next_key': '', 'result_size': 0}
-        return jsonify(IMEIPairings().dump(dict(imei_norm=imei_norm, pairs=None, _keys=keys)))
+        # Pairings never seen on the network have a NULL last_seen and sort as if seen at the end of time, which
+        # matches the NULLS LAST/NULLS FIRST default for ascending/descending order
+        query = sql.SQL("""SELECT pairing_list.imsi, network_triplets.last_seen,
+                                  COALESCE(network_triplets.last_seen, '9999-12-31'::DATE) AS last_seen_key,
+                                  COALESCE(network_triplets.msisdn, '') AS msisdn_key
+                             FROM pairing_list
+                        LEFT JOIN monthly_network_triplets_country_no_null_imeis AS network_triplets
+                                   ON network_triplets.imsi = pairing_list.imsi
+                              AND network_triplets.imei_norm = pairing_list.imei_norm
+                            WHERE pairing_list.imei_norm = %(imei_norm)s
+                              AND pairing_list.virt_imei_shard = calc_virt_imei_shard(%(imei_norm)s)""")
+        sort_keys = [('last_seen_key', order), ('imsi', order), ('msisdn_key', order)]
+        page_cursor = kwargs.get('cursor')
+        rows, page_keys = paginate(cursor, query, {'imei_norm': imei_norm}, sort_keys,
+                                   offset=offset, limit=limit, page_cursor=page_cursor,
+                                   include_count=kwargs.get('include_count', True))
+        pairings = [{'imsi': x.imsi, 'last_seen': x.last_seen} for x in rows]
+        keys = {**offset_keys(offset=offset, limit=limit, page_cursor=page_cursor, has_rows=bool(pairings)),
+                **page_keys}
+        return jsonify(IMEIPairings().dump(dict(imei_norm=imei_norm,
+                                                pairs=pairings,
+                                                _keys=keys)).data)
 
 
 def imei_batch_api(**kwargs: dict) -> jsonify:
@@ -359,48 +388,6 @@ def imei_batch_api(**kwargs: dict) -> jsonify:
     include_registration_status = kwargs.get('include_registration_status')
     include_stolen_status = kwargs.get('include_stolen_status')
 
-    data = []
-    with get_db_connection() as db_conn, db_conn.cursor() as cursor:
-        for imei in imeis:
-            imei_norm = validate_imei(imei)
-            tac = imei_norm[:8]
-            condition_results = get_conditions(cursor, imei_norm)
-            first_seen_date = first_seen(cursor, imei_norm)
-            cursor.execute('SELECT NOT EXISTS (SELECT * FROM gsma_data WHERE tac = %s) AS not_in_gsma', [tac])
-            rt_gsma_not_found = cursor.fetchone()[0]
-
-            response = {
-                'imei_norm': imei_norm,
-                'block_date': block_date(cursor, imei_norm),
-                'first_seen': first_seen_date,
-                'classification_state': {
-                    'blocking_conditions': [
-                        dict({
-                            'condition_name': key,
-                            'condition_met': value['result']
-                        }) for key, value in condition_results.items() if value['blocking']
-                    ],
-                    'informative_conditions': [
-                        dict({
-                            'condition_name': key,
-                            'condition_met': value['result']
-                        }) for key, value in condition_results.items() if not value['blocking']
-                    ]
-                },
-                'realtime_checks': {
-                    'ever_observed_on_network': True if first_seen_date else False,
-                    'invalid_imei': False if re.match(r'^\d{14}$', imei_norm) else True,
-                    'is_paired': is_paired(cursor, imei_norm),
-                    'is_exempted_device': is_exempted_device(cursor, imei_norm),
-                    'gsma_not_found': rt_gsma_not_found,
-                    'in_registration_list': is_in_registration_list(db_conn, cursor, imei_norm)
-                }
-            }
-
-            if include_registration_status:
-                response['registration_status'] = registration_list_status(cursor, imei_norm)
-            if include_stolen_status:
-                response['stolen_status'] = stolen_list_status(cursor, imei_norm)
-
-            data.append(IMEI().dump(response).data)
-        return jsonify({'results': data})
+    imei_norms = [validate_imei(imei) for imei in imeis]
+    results = _cached_imei_results(imei_norms, include_registration_status, include_stolen_status)
+    return jsonify({'results': [results[imei_norm] for imei_norm in imei_norms]})
@@ -37,12 +37,14 @@ from flask import jsonify
 from psycopg2 import sql
 
 from dirbs.api.common.db import get_db_connection
+from dirbs.api.common.pagination import paginate, offset_keys
 from dirbs.api.v2.schemas.job_metadata import JobKeys, JobMetadata
 
 
 def get_metadata(command: List[str] = None, subcommand: List[str] = None,
                  run_id: List[int] = None, status: List[str] = None,
-                 order: str = 'ASC', offset: int = 0, limit: int = 10):
+                 order: str = 'ASC', offset: int = 0, limit: int = 10, page_cursor: str = None,
+                 include_count: bool = True):
     """Job Metadata API method handler.
 
     Arguments:
@@ -53,8 +55,10 @@ def get_metadata(command: List[str] = None, subcommand: List[str] = None,
         order: Ascending or Descending order by start_time of the job (default ASC)
         offset: Offset of the results to fetch from (default from start)
         limit: number of results per page (default 10)
+        page_cursor: cursor from the next_cursor key of the previous page, used instead of offset (default None)
+        include_count: whether to count the total number of matching jobs (default True)
     Returns:
-        PostgreSQL records callables
+        PostgreSQL records callables, pagination keys
     """
     with get_db_connection() as db_conn, db_conn.cursor() as cursor:
         # Build the query with params retrieved from request
@@ -71,25 +75,20 @@ def get_metadata(command: List[str] = None, subcommand: List[str] = None,
                                            .format(sql.Identifier('run_id')), [(run_id)])
             filters_sql.append(sql.SQL(str(mogrified_sql, db_conn.encoding)))
 
-        base_sql = sql.SQL("""SELECT *, COUNT(*) OVER() AS total_count FROM job_metadata""")
-
-        final_sql = base_sql
+        final_sql = sql.SQL("""SELECT * FROM job_metadata""")
 
         if len(filters_sql) > 0:
-            final_sql = sql.SQL('{0} WHERE {1}').format(base_sql, sql.SQL(' AND ').join(filters_sql))
-
-        final_sql = sql.SQL('{final_sql} ORDER BY start_time {order_type} OFFSET {offset} LIMIT {limit}').format(
-            final_sql=final_sql,
-            order_type=sql.SQL(order),
-            offset=sql.SQL(str(offset)),
-            limit=sql.SQL(str(limit))
-        )
+            # The page query is executed with parameters, so any % in the bound filters must be escaped
+            where_sql = sql.SQL(' AND ').join(filters_sql).as_string(db_conn).replace('%', '%%')
+            final_sql = sql.SQL('{0} WHERE {1}').format(final_sql, sql.SQL(where_sql))
 
-        cursor.execute(final_sql)
-        return cursor.fetchall()
+        sort_keys = [('start_time', order), ('command', order), ('run_id', order)]
+        return paginate(cursor, final_sql, None, sort_keys, offset=offset, limit=limit,
+                        page_cursor=page_cursor, include_count=include_count)
 
 
-def job_metadata_api(order, offset, limit, command=None, subcommand=None, run_id=None, status=None, show_details=True):
+def job_metadata_api(order, offset, limit, command=None, subcommand=None, run_id=None, status=None, show_details=True,
+                     cursor=None, include_count=True):
     """
     Defines handler method for job-metadata GET API (version 2.0).
 
@@ -101,11 +100,13 @@ def job_metadata_api(order, offset, limit, command=None, subcommand=None, run_id
     :param order: sorting order (Ascending/Descending, default None)
     :param offset: offset of data (default None)
     :param limit: limit of the data (default None)
+    :param cursor: pagination cursor from the previous page (default None)
+    :param include_count: count the total number of matching jobs (default True)
     :return: json
     """
-    result = get_metadata(command, subcommand, run_id, status, order, offset, limit)
-    result_size = result[0][-1] if result else 0
-    keys = {'current_key': offset, 'next_key': offset + limit if result else 0, 'result_size': result_size}
+    result, page_keys = get_metadata(command, subcommand, run_id, status, order, offset, limit, cursor, include_count)
+    keys = {**offset_keys(offset=offset, limit=limit, page_cursor=cursor, has_rows=bool(result), no_next_key=0),
+            **page_keys}
     if not show_details:
         response = {
             '_keys': JobKeys().dump(dict(keys)).data,
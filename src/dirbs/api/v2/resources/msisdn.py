@@ -55,15 +55,22 @@ def msisdn_api(msisdn: str) -> Union[abort, jsonify]:
         abort(400, 'Bad MSISDN format (can only contain digit characters)')
 
     with get_db_connection() as db_conn, db_conn.cursor() as cursor:
-        cursor.execute("""SELECT mntc.imei_norm, mntc.imsi, reg.imei_norm AS reg_imei, reg.make, reg.model,
+        # network_msisdns is partitioned on calc_virt_msisdn_shard(msisdn), so this lookup only probes one partition.
+        # Its per-operator rows are grouped to give a row per IMEI-IMSI pair seen in the country
+        cursor.execute("""SELECT nm.imei_norm, nm.imsi, reg.imei_norm AS reg_imei, reg.make, reg.model,
                                  reg.brand_name, gsma.tac, gsma.manufacturer,
-                                 gsma.model_name, gsma.optional_fields, mntc.last_seen
-                            FROM gsma_data AS gsma
-                      RIGHT JOIN monthly_network_triplets_country_no_null_imeis AS mntc
-                                            ON SUBSTRING(imei_norm, 1, 8) = tac
+                                 gsma.model_name, gsma.optional_fields, nm.last_seen
+                            FROM (SELECT imei_norm, imsi, MAX(last_seen) AS last_seen
+                                    FROM network_msisdns
+                                   WHERE msisdn = %(msisdn)s
+                                     AND virt_msisdn_shard = calc_virt_msisdn_shard(%(msisdn)s)
+                                GROUP BY imei_norm, imsi) nm
+                       LEFT JOIN gsma_data AS gsma
+                                            ON gsma.tac = SUBSTRING(nm.imei_norm, 1, 8)
                        LEFT JOIN registration_list AS reg
-                                            ON reg.imei_norm = mntc.imei_norm
-                           WHERE msisdn = %s """, [msisdn])
+                                            ON reg.imei_norm = nm.imei_norm
+                                           AND reg.virt_imei_shard = calc_virt_imei_shard(nm.imei_norm)""",
+                       {'msisdn': msisdn})
         recs = cursor.fetchall()
         data = [MSISDN().dump(dict(imei_norm=rec[0], imsi=rec[1], last_seen=rec[10],
                                    gsma=rec._asdict() if rec[6] else None,
@@ -33,11 +33,31 @@ POSSIBILITY OF SUCH DAMAGE.
 
 from flask import jsonify
 
+from dirbs.api.common.cache import cached_results
 from dirbs.api.common.db import get_db_connection
-from dirbs.api.common.tac import validate_tac
+from dirbs.api.common.tac import validate_tac, gsma_tac_dictionary
 from dirbs.api.v2.schemas.tac import TacInfo
 
 
+def _cached_tac_results(tacs: list) -> dict:
+    """
+    Method to fetch the TAC API response for a list of TACs, using the per-TAC result cache.
+
+    Arguments:
+        tacs: list of 8 digit TAC values
+    Returns:
+        dict of TAC -> serialized TAC response
+    """
+    def _compute(missing_tacs):
+        with get_db_connection() as db_conn, db_conn.cursor() as cursor:
+            gsma_data = gsma_tac_dictionary.lookup(cursor, missing_tacs)
+        return {tac: TacInfo().dump(dict(tac=tac,
+                                         gsma=gsma_data[tac]._asdict() if tac in gsma_data else None)).data
+                for tac in missing_tacs}
+
+    return cached_results('tac', tacs, _compute)
+
+
 def tac_api(tac: str) -> jsonify:
     """
     TAC GET API endpoint (version 2).
@@ -48,14 +68,7 @@ def tac_api(tac: str) -> jsonify:
         JSON response
     """
     validate_tac(tac)
-    with get_db_connection() as db_conn, db_conn.cursor() as cursor:
-        cursor.execute("""SELECT tac, manufacturer, bands, allocation_date, model_name, device_type,
-                                 optional_fields
-                            FROM gsma_data
-                           WHERE tac = %s""", [tac])
-        gsma_data = cursor.fetchone()
-        return jsonify(TacInfo().dump(dict(tac=tac,
-                                           gsma=gsma_data._asdict() if gsma_data is not None else None)).data)
+    return jsonify(_cached_tac_results([tac])[tac])
 
 
 def tac_batch_api(**kwargs: dict) -> jsonify:
@@ -68,19 +81,5 @@ def tac_batch_api(**kwargs: dict) -> jsonify:
         JSON response
     """
     tacs = list(set(kwargs.get('tacs')))
-
-    with get_db_connection() as db_conn, db_conn.cursor() as cursor:
-        cursor.execute("""SELECT tac, manufacturer, bands, allocation_date, model_name, device_type,
-                                 optional_fields
-                            FROM gsma_data
-                           WHERE tac IN %(tacs)s""", {'tacs': tuple(tacs)})
-        gsma_data = cursor.fetchall()
-        response = []
-        for rec in gsma_data:
-            response.append(TacInfo().dump(dict(tac=rec.tac,
-                                                gsma=rec._asdict())).data)
-        existing_tacs = [res['tac'] for res in response]
-        for tac in tacs:
-            if tac not in existing_tacs:
-                response.append(TacInfo().dump(dict(tac=tac, gsma=None)).data)
-        return jsonify({'results': response})
+    results = _cached_tac_results(tacs)
+    return jsonify({'results': [results[tac] for tac in tacs]})
@@ -34,6 +34,8 @@ from enum import Enum
 
 from marshmallow import Schema, fields, pre_dump, validate
 
+from dirbs.api.common.pagination import RESULT_SIZE_CAP
+
 
 class FileType(Enum):
     """Enum for the supported data import file types."""
@@ -109,6 +111,13 @@ class CatalogArgs(Schema):
     order = fields.String(missing='ASC',
                           validate=validate.OneOf([f.value for f in SortingOrders]),
                           description='The sort order for the results using imsi-msisdn as the key')
+    cursor = fields.String(required=False,
+                           description='Cursor to continue from, taken from the next_cursor key of the previous '
+                                       'page. When supplied, offset is ignored, results are fetched by key and '
+                                       'current_key and next_key are returned empty')
+    include_count = fields.Boolean(missing=True,
+                                   description='Whether or not to count the total number of results in result_size. '
+                                               'Counting stops at {0:d} results'.format(RESULT_SIZE_CAP))
 
     @property
     def fields_dict(self):
@@ -121,7 +130,9 @@ class Keys(Schema):
 
     current_key = fields.String()
     next_key = fields.String()
+    next_cursor = fields.String()
     result_size = fields.Integer()
+    result_size_capped = fields.Boolean()
 
 
 class Catalog(Schema):
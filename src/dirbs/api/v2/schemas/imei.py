@@ -36,6 +36,8 @@ from enum import Enum
 from flask import abort
 from marshmallow import Schema, fields, validate
 
+from dirbs.api.common.pagination import RESULT_SIZE_CAP
+
 
 class StolenStatus(Schema):
     """Defines schema for StolenList status."""
@@ -175,6 +177,13 @@ class SubscriberArgs(Schema):
     order = fields.String(missing='ASC',
                           validate=validate.OneOf([f.value for f in SortingOrders]),
                           description='The sort order for the results using imsi-msisdn as the key')
+    cursor = fields.String(required=False,
+                           description='Cursor to continue from, taken from the next_cursor key of the previous '
+                                       'page. When supplied, offset is ignored, results are fetched by key and '
+                                       'current_key and next_key are returned empty')
+    include_count = fields.Boolean(missing=True,
+                                   description='Whether or not to count the total number of results in result_size. '
+                                               'Counting stops at {0:d} results'.format(RESULT_SIZE_CAP))
 
     @property
     def fields_dict(self):
@@ -187,7 +196,9 @@ class IMEIKeys(Schema):
 
     current_key = fields.String()
     next_key = fields.String()
+    next_cursor = fields.String()
     result_size = fields.Integer()
+    result_size_capped = fields.Boolean()
 
 
 class IMEISubscribers(Schema):
@@ -34,6 +34,8 @@ from enum import Enum
 
 from marshmallow import Schema, fields, validate
 
+from dirbs.api.common.pagination import RESULT_SIZE_CAP
+
 
 class JobMetadata(Schema):
     """Define schema for the metadata associated with a DIRBS job."""
@@ -103,6 +105,13 @@ class JobMetadataArgs(Schema):
     limit = fields.Integer(missing=10,
                            validate=validate.Range(min=1, error='Value must be greater than 0'),
                            description='Number of results to return on the current page')
+    cursor = fields.String(required=False,
+                           description='Cursor to continue from, taken from the next_cursor key of the previous '
+                                       'page. When supplied, offset is ignored, results are fetched by key and '
+                                       'current_key and next_key are returned empty')
+    include_count = fields.Boolean(missing=True,
+                                   description='Whether or not to count the total number of results in result_size. '
+                                               'Counting stops at {0:d} results'.format(RESULT_SIZE_CAP))
 
     @property
     def fields_dict(self):
@@ -115,7 +124,9 @@ class JobKeys(Schema):
 
     current_key = fields.String()
     next_key = fields.String()
+    next_cursor = fields.String()
     result_size = fields.Integer()
+    result_size_capped = fields.Boolean()
 
 
 class Jobs(Schema):
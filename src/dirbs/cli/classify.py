@@ -100,7 +100,8 @@ def cli(ctx, config, statsd, logger, run_id, conn, metadata_conn, command, metri
         conditions = config.conditions
 
     # Query the job metadata table for all successful classification runs
-    successful_job_runs = metadata.query_for_command_runs(metadata_conn, 'dirbs-classify', successful_only=True)
+    successful_job_runs = metadata.query_for_command_runs(metadata_conn, 'dirbs-classify', successful_only=True,
+                                                          limit=1)
     if successful_job_runs and not disable_sanity_checks and not _perform_sanity_checks(
             config, successful_job_runs[0].extra_metadata):
         raise ClassifySanityCheckFailedException(
@@ -188,6 +189,7 @@ def cli(ctx, config, statsd, logger, run_id, conn, metadata_conn, command, metri
                 matched_imei_counts[condition.label] = job_state['num_matched_imeis']
                 metadata.add_optional_job_metadata(metadata_conn, command, run_id,
                                                    matched_imei_counts=matched_imei_counts)
+                metadata.record_successful_condition_run(metadata_conn, run_id, condition.config.as_dict())
                 # Output StatsD stats
                 statsd.gauge('{0}matched_imeis.{1}'.format(metrics_run_root, condition.label.lower()),
                              job_state['num_matched_imeis'])
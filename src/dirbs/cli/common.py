@@ -515,6 +515,69 @@ def unhandled_exception_handler(f):
     return decorated
 
 
+def log_job_success(statsd, metadata_conn, command, run_id, metrics_root):
+    """
+    Record the successful completion of a job in StatsD and the job_metadata table.
+
+    Arguments:
+        statsd -- statsd instance
+        metadata_conn -- autocommit metadata connection
+        command -- command name of the job
+        run_id -- run_id of the job
+        metrics_root -- statsd metrics root of the job
+    """
+    statsd.gauge('{0}last_success'.format(metrics_root), int(time.time()))
+    metadata.log_job_success(metadata_conn, command, run_id)
+
+
+def log_job_failure(statsd, metadata_conn, logger, command, run_id, metrics_root):
+    """
+    Record the failure of a job in StatsD and, if it got a run_id, the job_metadata table.
+
+    Arguments:
+        statsd -- statsd instance
+        metadata_conn -- autocommit metadata connection
+        logger -- dirbs logger instance
+        command -- command name of the job
+        run_id -- run_id of the job, or -1 if it failed before getting one
+        metrics_root -- statsd metrics root of the job
+    """
+    statsd.gauge('{0}last_failure'.format(metrics_root), int(time.time()))
+    if run_id != -1:
+        metadata.log_job_failure(metadata_conn, command, run_id, logger)
+
+
+@contextlib.contextmanager
+def tracked_job(statsd, metadata_conn, logger, *, command, subcommand, metrics_root):
+    """
+    Context manager recording a job run started from within another command, in the same way as cli_wrapper.
+
+    The job gets its own run_id and its success or failure and total runtime are tracked in StatsD and the
+    job_metadata table.
+
+    Arguments:
+        statsd -- statsd instance
+        metadata_conn -- autocommit metadata connection
+        logger -- dirbs logger instance
+        command -- command name of the job
+        subcommand -- subcommand name of the job
+        metrics_root -- statsd metrics root of the job
+    Returns:
+        tuple of the run_id and statsd metrics run root of the job
+    """
+    st = time.time()
+    run_id = metadata.store_job_metadata(metadata_conn, command, logger, job_subcommand=subcommand)
+    metrics_run_root = '{0}runs.{1:d}.'.format(metrics_root, run_id)
+    try:
+        yield run_id, metrics_run_root
+        log_job_success(statsd, metadata_conn, command, run_id, metrics_root)
+    except:  # noqa: E722
+        log_job_failure(statsd, metadata_conn, logger, command, run_id, metrics_root)
+        raise
+    finally:
+        statsd.gauge('{0}runtime.total'.format(metrics_run_root), int((time.time() - st) * 1000))
+
+
 def cli_wrapper(command=None, subcommand=None, logger_name=None, metrics_root=None,
                 duration_callback=None, required_role='dirbs_core_poweruser'):  # noqa: C901
     """
@@ -603,14 +666,10 @@ def cli_wrapper(command=None, subcommand=None, logger_name=None, metrics_root=No
                       **kwargs)
 
                 # Update the last success timestamp
-                statsd.gauge('{0}last_success'.format(_metrics_root), int(time.time()))
-                metadata.log_job_success(metadata_conn, _command, run_id)
+                log_job_success(statsd, metadata_conn, _command, run_id, _metrics_root)
             except:  # noqa: E722
                 # Make sure we track the last failure timestamp for any exception and re-raise
-                statsd.gauge('{0}last_failure'.format(_metrics_root), int(time.time()))
-                # Log metadata in job_metadata table
-                if run_id != -1:
-                    metadata.log_job_failure(metadata_conn, _command, run_id, logger)
+                log_job_failure(statsd, metadata_conn, logger, _command, run_id, _metrics_root)
                 raise
             finally:
                 # Make sure we init file logging so with date as a last resort so we flush our buffered
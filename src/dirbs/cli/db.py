@@ -399,13 +399,29 @@ def repartition(ctx, num_physical_shards):
         partition_utils.repartition_exceptions_lists(conn, num_physical_shards=num_physical_shards)
         logger.info('Re-partitioned exceptions_lists table')
 
+        logger.info('Re-building list snapshot tables...')
+        partition_utils.create_list_snapshots(conn, num_physical_shards=num_physical_shards)
+        logger.info('Re-built list snapshot tables')
+
         logger.info('Re-partitioning network_imeis table...')
         partition_utils.repartition_network_imeis(conn, num_physical_shards=num_physical_shards)
         logger.info('Re-partitioned network_imeis table')
 
+        logger.info('Re-partitioning network_msisdns table...')
+        partition_utils.repartition_network_msisdns(conn, num_physical_shards=num_physical_shards)
+        logger.info('Re-partitioned network_msisdns table')
+
+        logger.info('Re-partitioning network_imeis_per_mno table...')
+        partition_utils.repartition_network_imeis_per_mno(conn, num_physical_shards=num_physical_shards)
+        logger.info('Re-partitioned network_imeis_per_mno table')
+
         logger.info('Re-partitioning monthly_network_triplets tables...')
         partition_utils.repartition_monthly_network_triplets(conn, num_physical_shards=num_physical_shards)
         logger.info('Re-partitioned monthly_network_triplets tables')
 
+        logger.info('Re-partitioning monthly_network_imei_imsis table...')
+        partition_utils.repartition_monthly_network_imei_imsis(conn, num_physical_shards=num_physical_shards)
+        logger.info('Re-partitioned monthly_network_imei_imsis table')
+
         # Update schema metadata table
         cursor.execute('UPDATE schema_metadata SET phys_shards = %s', [num_physical_shards])
@@ -31,15 +31,22 @@ BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
 POSSIBILITY OF SUCH DAMAGE.
 """
 
+import csv
 import logging
+import os
 import sys
+from concurrent import futures
 from functools import wraps
 
 import click
+from psycopg2 import sql
 
 import dirbs.cli.common as common
+import dirbs.metadata as metadata
+import dirbs.utils as utils
 from dirbs.importer.exceptions import ImportCheckException
 from dirbs.importer import importer_factory
+from dirbs.importer.abstract_importer import SharedImportExecutors
 
 
 def _process_batch_size(ctx, param, val):
@@ -279,65 +286,66 @@ def _common_import_params(ctx):
             'extract_dir': ctx.obj['EXTRACT_DIR']}
 
 
-@cli.command()
-@click.argument('operator_id', callback=_validate_operator_id)
-@click.argument('input_file', type=click.Path(exists=True, dir_okay=False), callback=_validate_input_file_extension)
-@click.option('--disable-leading-zero-check',
-              default=False,
-              is_flag=True,
-              help='Skip checking if the import data appears to have lost leading zeros.')
-@click.option('--disable-null-check',
-              default=False,
-              is_flag=True,
-              help='Skip checking the ratio of IMSIs, MSISDNs, IMEIs and RATs that are NULL.')
-@click.option('--disable-clean-check',
-              default=False,
-              is_flag=True,
-              help='Skip checking the ratio of IMEIs and IMSIs that are the wrong length or contain invalid '
-                   'characters.')
-@click.option('--disable-region-check',
-              default=False,
-              is_flag=True,
-              help='Skip checking the ratio of MSISDNs and IMSIs that have out of region cc and mcc values.')
-@click.option('--disable-home-check',
-              default=False,
-              is_flag=True,
-              help='Skip checking the ratio of and IMSIs that have out of region mcc and mnc pair values.')
-@click.option('--disable-msisdn-import',
-              default=False,
-              is_flag=True,
-              help='Skip importing MSISDN field even if it does exist in input data.',
-              callback=_process_disable_msisdn_import,
-              expose_value=False)
-@click.option('--disable-rat-import',
-              default=False,
-              is_flag=True,
-              help='Skip importing RAT field if it does not exist in input data.',
-              callback=_process_disable_rat_import,
-              expose_value=False)
-@click.option('--disable-auto-analyze',
-              default=False,
-              is_flag=True,
-              help='Skip auto analyzing of historic tables associated with operator data import')
-@disable_historic_check_option
-@click.pass_context
-@common.unhandled_exception_handler
-@handle_import_check_exception
-@common.cli_wrapper(command='dirbs-import', subcommand='operator', required_role='dirbs_core_import_operator',
-                    metrics_root=lambda ctx, *args, **kwargs:
-                        'dirbs.import.operator.{0}'.format(ctx.params['operator_id'].lower() + '.'))
-def operator(ctx, config, statsd, logger, run_id, conn, metadata_conn, command, metrics_root, metrics_run_root,
-             operator_id, input_file, disable_leading_zero_check, disable_null_check, disable_clean_check,
-             disable_region_check, disable_home_check, disable_historic_check, disable_auto_analyze):
+def _operator_import_options(f):
     """
-    Import the CSV operator data found in INPUT into the PostgreSQL database.
+    Decorator used to parse all the operator data import check options.
 
-    OPERATOR_ID is an ID up to 16 characters to unique identify the operator.
+    :param f: obj
+    :return: obj
+    """
+    f = disable_historic_check_option(f)
+    f = click.option('--disable-auto-analyze',
+                     default=False,
+                     is_flag=True,
+                     help='Skip auto analyzing of historic tables associated with operator data import')(f)
+    f = click.option('--disable-rat-import',
+                     default=False,
+                     is_flag=True,
+                     help='Skip importing RAT field if it does not exist in input data.',
+                     callback=_process_disable_rat_import,
+                     expose_value=False)(f)
+    f = click.option('--disable-msisdn-import',
+                     default=False,
+                     is_flag=True,
+                     help='Skip importing MSISDN field even if it does exist in input data.',
+                     callback=_process_disable_msisdn_import,
+                     expose_value=False)(f)
+    f = click.option('--disable-home-check',
+                     default=False,
+                     is_flag=True,
+                     help='Skip checking the ratio of and IMSIs that have out of region mcc and mnc pair values.')(f)
+    f = click.option('--disable-region-check',
+                     default=False,
+                     is_flag=True,
+                     help='Skip checking the ratio of MSISDNs and IMSIs that have out of region cc and mcc values.')(f)
+    f = click.option('--disable-clean-check',
+                     default=False,
+                     is_flag=True,
+                     help='Skip checking the ratio of IMEIs and IMSIs that are the wrong length or contain invalid '
+                          'characters.')(f)
+    f = click.option('--disable-null-check',
+                     default=False,
+                     is_flag=True,
+                     help='Skip checking the ratio of IMSIs, MSISDNs, IMEIs and RATs that are NULL.')(f)
+    f = click.option('--disable-leading-zero-check',
+                     default=False,
+                     is_flag=True,
+                     help='Skip checking if the import data appears to have lost leading zeros.')(f)
+    return f
+
+
+def _operator_import_params(ctx, config, *, disable_leading_zero_check, disable_null_check, disable_clean_check,
+                            disable_region_check, disable_home_check, disable_historic_check, disable_auto_analyze):
+    """
+    Dictionary containing parameters provided to the operator data importer, excluding the operator ID.
+
+    :param ctx: current cli context obj
+    :param config: dirbs config obj
+    :return: dict
     """
     op_tc = config.operator_threshold_config
     params = _common_import_params(ctx)
-    params.update({'operator_id': operator_id,
-                   'null_imei_threshold': op_tc.null_imei_threshold,
+    params.update({'null_imei_threshold': op_tc.null_imei_threshold,
                    'null_imsi_threshold': op_tc.null_imsi_threshold,
                    'null_msisdn_threshold': op_tc.null_msisdn_threshold,
                    'null_rat_threshold': op_tc.null_rat_threshold,
@@ -362,11 +370,198 @@ def operator(ctx, config, statsd, logger, run_id, conn, metadata_conn, command,
                    'perform_historic_checks': not disable_historic_check,
                    'perform_auto_analyze': not disable_auto_analyze,
                    'leading_zero_suspect_limit': op_tc.leading_zero_suspect_limit})
+    return params
+
+
+@cli.command()
+@click.argument('operator_id', callback=_validate_operator_id)
+@click.argument('input_file', type=click.Path(exists=True, dir_okay=False), callback=_validate_input_file_extension)
+@_operator_import_options
+@click.pass_context
+@common.unhandled_exception_handler
+@handle_import_check_exception
+@common.cli_wrapper(command='dirbs-import', subcommand='operator', required_role='dirbs_core_import_operator',
+                    metrics_root=lambda ctx, *args, **kwargs:
+                        'dirbs.import.operator.{0}'.format(ctx.params['operator_id'].lower() + '.'))
+def operator(ctx, config, statsd, logger, run_id, conn, metadata_conn, command, metrics_root, metrics_run_root,
+             operator_id, input_file, **check_options):
+    """
+    Import the CSV operator data found in INPUT into the PostgreSQL database.
+
+    OPERATOR_ID is an ID up to 16 characters to unique identify the operator.
+    """
+    params = _operator_import_params(ctx, config, **check_options)
+    params['operator_id'] = operator_id
     with importer_factory.make_data_importer('operator', input_file, config, statsd, conn, metadata_conn,
                                              run_id, metrics_root, metrics_run_root, **params) as importer:
         importer.import_data()
 
 
+def _parse_operator_manifest(ctx, param, manifest_file):
+    """
+    Parse and validate an operator data import manifest.
+
+    The manifest is a CSV file with a header row containing the columns operator_id and input_file. Relative input
+    file paths are resolved relative to the directory containing the manifest.
+
+    :param ctx: current cli context obj
+    :param param: param
+    :param manifest_file: path to the manifest file
+    :return: list of (operator_id, input_file) tuples
+    """
+    manifest_dir = os.path.dirname(os.path.abspath(manifest_file))
+    with open(manifest_file, 'r') as f:
+        reader = csv.DictReader(f)
+        if reader.fieldnames is None or {'operator_id', 'input_file'} - set(reader.fieldnames):
+            raise click.BadParameter('Manifest must have a header containing the columns operator_id and input_file')
+        entries = []
+        for row in reader:
+            operator_id = _validate_operator_id(ctx, param, row['operator_id'].strip())
+            input_file = os.path.join(manifest_dir, row['input_file'].strip())
+            if not os.path.isfile(input_file):
+                raise click.BadParameter('Input file {0} for operator {1} does not exist'
+                                         .format(input_file, operator_id))
+            entries.append((operator_id, _validate_input_file_extension(ctx, param, input_file)))
+
+    if len(entries) == 0:
+        raise click.BadParameter('Manifest does not contain any operator data files')
+    operator_ids = [operator_id for operator_id, _ in entries]
+    duplicate_ids = sorted({operator_id for operator_id in operator_ids if operator_ids.count(operator_id) > 1})
+    if duplicate_ids:
+        raise click.BadParameter('Only one file per operator can be imported concurrently, found multiple files for '
+                                 '{0}'.format(', '.join(duplicate_ids)))
+    return entries
+
+
+def _import_operator_file(config, statsd, logger, shared_executors, params, operator_id, input_file):
+    """
+    Import a single operator data file from a manifest, recording it as its own dirbs-import operator job.
+
+    :param config: dirbs config obj
+    :param statsd: statsd obj
+    :param logger: dirbs logger obj
+    :param shared_executors: SharedImportExecutors used by all imports in the manifest
+    :param params: operator data importer params
+    :param operator_id: operator id of the file to import
+    :param input_file: path of the file to import
+    :return: run_id of the import job
+    """
+    metrics_root = 'dirbs.import.operator.{0}.'.format(operator_id)
+    with utils.create_db_connection(config.db_config) as conn, \
+            utils.create_db_connection(config.db_config, autocommit=True) as metadata_conn, \
+            common.tracked_job(statsd, metadata_conn, logger, command='dirbs-import', subcommand='operator',
+                               metrics_root=metrics_root) as (run_id, metrics_run_root), \
+            importer_factory.make_data_importer('operator', input_file, config, statsd, conn, metadata_conn,
+                                                run_id, metrics_root, metrics_run_root, operator_id=operator_id,
+                                                shared_executors=shared_executors, **params) as importer:
+        importer.import_data()
+    return run_id
+
+
+def _manifest_connection_budget(max_db_connections, num_files):
+    """
+    Split the configured database connections between the file imports in a manifest and their shared worker pools.
+
+    Each file import being run holds its own connection and metadata connection, while the shared upload and database
+    worker pools can both be busy at once for imports at different stages. Concurrent file imports are capped so
+    that these all fit within max_db_connections, keeping at least one file import and one worker of each kind.
+
+    :param max_db_connections: configured max number of database connections
+    :param num_files: number of files in the manifest
+    :return: tuple of the max number of concurrent file imports and the max number of connections per worker pool
+    """
+    max_concurrent_files = max(1, min(num_files, max_db_connections // 4))
+    max_worker_connections = max(1, (max_db_connections - 2 * max_concurrent_files) // 2)
+    return max_concurrent_files, max_worker_connections
+
+
+def _analyze_table(config, logger, tbl_name):
+    """
+    ANALYZE a table using a separate DB connection.
+
+    :param config: dirbs config obj
+    :param logger: dirbs logger obj
+    :param tbl_name: name of the table to ANALYZE
+    """
+    with utils.create_db_connection(config.db_config) as conn, conn.cursor() as cursor:
+        logger.debug('Running ANALYZE on {0}...'.format(tbl_name))
+        cursor.execute(sql.SQL('ANALYZE {0}').format(sql.Identifier(tbl_name)))
+        logger.debug('Finished running ANALYZE on {0}'.format(tbl_name))
+
+
+@cli.command(name='operator_manifest')
+@click.argument('manifest_entries', metavar='MANIFEST_FILE', type=click.Path(exists=True, dir_okay=False),
+                callback=_parse_operator_manifest)
+@_operator_import_options
+@click.pass_context
+@common.unhandled_exception_handler
+@handle_import_check_exception
+@common.cli_wrapper(command='dirbs-import', subcommand='operator_manifest',
+                    required_role='dirbs_core_import_operator')
+def operator_manifest(ctx, config, statsd, logger, run_id, conn, metadata_conn, command, metrics_root,
+                      metrics_run_root, manifest_entries, **check_options):
+    """
+    Concurrently import the operator data files listed in MANIFEST_FILE into the PostgreSQL database.
+
+    MANIFEST_FILE is a CSV file with a header containing the columns operator_id and input_file, listing at most
+    one file per operator. Each file is imported as a separate dirbs-import operator job, but all imports share the
+    same pre-validation, upload and database worker pools. Only the steps that contend between operators are
+    serialized and the historic tables are ANALYZEd once after all imports have completed.
+    """
+    params = _operator_import_params(ctx, config, **check_options)
+    mp_config = config.multiprocessing_config
+    max_concurrent_files, max_worker_connections = _manifest_connection_budget(mp_config.max_db_connections,
+                                                                               len(manifest_entries))
+    run_ids = {}
+    failed_operator_ids = []
+    unexpected_exceptions = []
+    with SharedImportExecutors(max_local_cpus=mp_config.max_local_cpus,
+                               max_db_connections=max_worker_connections) as shared_executors:
+        logger.info('Concurrently importing {0:d} operator data files, up to {1:d} at a time...'
+                    .format(len(manifest_entries), max_concurrent_files))
+        with futures.ThreadPoolExecutor(max_workers=max_concurrent_files) as executor:
+            futures_to_operator_id = {}
+            for operator_id, input_file in manifest_entries:
+                f = executor.submit(_import_operator_file, config, statsd, logger, shared_executors, params,
+                                    operator_id, input_file)
+                futures_to_operator_id[f] = operator_id
+
+            for f in futures.as_completed(futures_to_operator_id):
+                operator_id = futures_to_operator_id[f]
+                try:
+                    run_ids[operator_id] = f.result()
+                    logger.info('Finished importing operator data for {0}'.format(operator_id))
+                except ImportCheckException as ex:
+                    failed_operator_ids.append(operator_id)
+                    logger.error('Failed to import operator data for {0}: {1}'.format(operator_id, str(ex)))
+                except Exception as ex:
+                    failed_operator_ids.append(operator_id)
+                    unexpected_exceptions.append(ex)
+                    logger.error('Failed to import operator data for {0} due to an unexpected exception'
+                                 .format(operator_id), exc_info=True)
+
+        tables_to_analyze = shared_executors.tables_to_analyze
+        if tables_to_analyze:
+            logger.info('Running ANALYZE on {0:d} historic tables updated by the imports...'
+                        .format(len(tables_to_analyze)))
+            analyze_futures = [shared_executors.db_executor.submit(_analyze_table, config, logger, tbl_name)
+                               for tbl_name in tables_to_analyze]
+            for f in futures.as_completed(analyze_futures):
+                f.result()
+            logger.info('Finished running ANALYZE on historic tables updated by the imports')
+
+    metadata.add_optional_job_metadata(metadata_conn, command, run_id,
+                                       manifest=[{'operator_id': operator_id, 'input_file': input_file,
+                                                  'run_id': run_ids.get(operator_id)}
+                                                 for operator_id, input_file in manifest_entries],
+                                       failed_operator_ids=sorted(failed_operator_ids))
+    if unexpected_exceptions:
+        raise unexpected_exceptions[0]
+    if failed_operator_ids:
+        logger.error('Failed to import operator data for: {0}'.format(', '.join(sorted(failed_operator_ids))))
+        sys.exit(1)
+
+
 @cli.command(name='gsma_tac')
 @click.argument('input_file', type=click.Path(exists=True, dir_okay=False), callback=_validate_input_file_extension)
 @disable_historic_check_option
@@ -33,6 +33,7 @@ POSSIBILITY OF SUCH DAMAGE.
 """
 
 import datetime
+from concurrent import futures
 
 from dateutil import relativedelta
 from psycopg2 import sql
@@ -50,6 +51,7 @@ import dirbs.partition_utils as partition_utils
 @common.parse_verbosity_option
 @common.parse_db_options
 @common.parse_statsd_options
+@common.parse_multiprocessing_options
 @click.option('--curr-date',
               help='Sets current date in YYYYMMDD format for testing. By default, uses system current date.',
               callback=common.validate_date,
@@ -65,7 +67,12 @@ def cli(ctx, curr_date):
 @click.pass_context
 @common.unhandled_exception_handler
 @common.cli_wrapper(command='dirbs-prune', subcommand='triplets', required_role='dirbs_core_power_user')
-def triplets(ctx, config, statsd, logger, run_id, conn, metadata_conn, command, metrics_root, metrics_run_root):
+@click.option('--estimate-row-counts',
+              is_flag=True,
+              help='If set, use planner statistics rather than COUNT(*) for any partition missing from the '
+                   'partition inventory. Row counts reported for such partitions will be approximate.')
+def triplets(ctx, config, statsd, logger, run_id, conn, metadata_conn, command, metrics_root, metrics_run_root,
+             estimate_row_counts):
     """Prune old monthly_network_triplets data."""
     curr_date = ctx.obj['CURR_DATE']
 
@@ -77,7 +84,7 @@ def triplets(ctx, config, statsd, logger, run_id, conn, metadata_conn, command,
     if curr_date is None:
         curr_date = datetime.date.today()
 
-    with conn.cursor() as cursor:
+    with conn:
         logger.info('Pruning monthly_network_triplets data outside the retention window from database...')
         retention_months = config.retention_config.months_retention
         first_month_to_drop = datetime.date(curr_date.year, curr_date.month, 1) - relativedelta.relativedelta(
@@ -92,54 +99,123 @@ def triplets(ctx, config, statsd, logger, run_id, conn, metadata_conn, command,
             operator_monthly_partitions.extend(utils.child_table_names(conn, op_partition))
 
         parent_tbl_names = ['monthly_network_triplets_country', 'monthly_network_triplets_per_mno']
-        rows_before = {}
+        partition_parents = {tblname: 'monthly_network_triplets_country' for tblname in country_monthly_partitions}
+        partition_parents.update({tblname: 'monthly_network_triplets_per_mno'
+                                  for tblname in operator_monthly_partitions})
+        partition_rows = _monthly_partition_row_counts(conn, partition_parents, logger,
+                                                       estimate_row_counts=estimate_row_counts)
+
+        rows_before = {tbl: 0 for tbl in parent_tbl_names}
+        for tblname, parent_tbl_name in partition_parents.items():
+            rows_before[parent_tbl_name] += partition_rows[tblname]
         for tbl in parent_tbl_names:
-            logger.debug('Calculating original number of rows in {0} table...'.format(tbl))
-            cursor.execute(sql.SQL('SELECT COUNT(*) FROM {0}'.format(tbl)))
-            rows_before[tbl] = cursor.fetchone()[0]
-            logger.debug('Calculated original number of rows in {0} table'.format(tbl))
             statsd.gauge('{0}.{1}.rows_before'.format(metrics_run_root, tbl), rows_before[tbl])
         metadata.add_optional_job_metadata(metadata_conn, command, run_id, rows_before=rows_before)
 
-        total_rows_pruned = 0
+        rows_pruned = {tbl: 0 for tbl in parent_tbl_names}
         total_partitions = country_monthly_partitions + operator_monthly_partitions
         for tblname in total_partitions:
             invariants_list = utils.table_invariants_list(conn, [tblname], ['triplet_month', 'triplet_year'])
             assert len(invariants_list) <= 1
             if len(invariants_list) == 0:
                 logger.warning('Found empty partition {0}. Dropping...'.format(tblname))
-                cursor.execute(sql.SQL("""DROP TABLE {0} CASCADE""").format(sql.Identifier(tblname)))
+                _drop_monthly_partition(conn, tblname)
             else:
                 month, year = tuple(invariants_list[0])
 
                 # Check if table year/month is outside the retention window
                 if (datetime.date(year, month, 1) < first_month_to_drop):
-                    # Calculate number of rows in the partition table
-                    cursor.execute(sql.SQL("""SELECT COUNT(*) FROM {0}""").format(sql.Identifier(tblname)))
-                    partition_table_rows = cursor.fetchone()[0]
-                    total_rows_pruned += partition_table_rows
+                    partition_table_rows = partition_rows[tblname]
+                    rows_pruned[partition_parents[tblname]] += partition_table_rows
 
                     logger.info('Dropping table {0} with {1} rows...'.format(tblname, partition_table_rows))
-                    cursor.execute(sql.SQL("""DROP TABLE {0} CASCADE""").format(sql.Identifier(tblname)))
+                    _drop_monthly_partition(conn, tblname)
                     logger.info('Dropped table {0}'.format(tblname))
 
-        rows_after = {}
+        # monthly_network_imei_imsis summarises monthly_network_triplets_per_mno, so it shares the retention window
+        for tblname in utils.child_table_names(conn, 'monthly_network_imei_imsis'):
+            invariants_list = utils.table_invariants_list(conn, [tblname], ['triplet_month', 'triplet_year'])
+            if len(invariants_list) == 0 or datetime.date(invariants_list[0].triplet_year,
+                                                          invariants_list[0].triplet_month, 1) < first_month_to_drop:
+                logger.info('Dropping table {0}...'.format(tblname))
+                _drop_monthly_partition(conn, tblname)
+                logger.info('Dropped table {0}'.format(tblname))
+
+        # So do the per-TAC IMEI sketches used by the top models reports
+        with conn.cursor() as cursor:
+            cursor.execute("""DELETE FROM monthly_per_mno_tac_hll_sketches
+                                    WHERE make_date(triplet_year, triplet_month, 1) < %s""", [first_month_to_drop])
+            logger.info('Pruned {0:d} per-TAC IMEI sketches outside the retention window'.format(cursor.rowcount))
+
+            # The MSISDN reverse index shares the retention window, based on when each entry was last seen
+            cursor.execute("""DELETE FROM network_msisdns
+                                    WHERE last_seen < %s""", [first_month_to_drop])
+            logger.info('Pruned {0:d} network_msisdns rows outside the retention window'.format(cursor.rowcount))
+
+        rows_after = {tbl: rows_before[tbl] - rows_pruned[tbl] for tbl in parent_tbl_names}
         for tbl in parent_tbl_names:
-            logger.debug('Calculating new number of rows in {0} table...'.format(tbl))
-            cursor.execute(sql.SQL('SELECT COUNT(*) FROM {0}'.format(tbl)))
-            rows_after[tbl] = cursor.fetchone()[0]
-            logger.debug('Calculated new number of rows in {0} table'.format(tbl))
             statsd.gauge('{0}.{1}.rows_after'.format(metrics_run_root, tbl), rows_after[tbl])
-        metadata.add_optional_job_metadata(metadata_conn, command, run_id, rows_after=rows_after)
-
-        total_rows_before = sum(rows_before.values())
-        total_rows_after = sum(rows_after.values())
+        metadata.add_optional_job_metadata(metadata_conn, command, run_id, rows_after=rows_after,
+                                           row_counts_estimated=estimate_row_counts)
 
-        assert (total_rows_before - total_rows_after) == total_rows_pruned
+        total_rows_pruned = sum(rows_pruned.values())
         logger.info('Pruned {0:d} rows of monthly_network_triplets data outside the retention window from database'
                     .format(total_rows_pruned))
 
 
+def _monthly_partition_row_counts(conn, partition_parents, logger, *, estimate_row_counts=False):
+    """
+    Function to return the number of rows in each monthly_network_triplets partition.
+
+    Row counts are read from the partition inventory maintained by the operator importer. Partitions missing from the
+    inventory are added to it, either by counting their rows or, if estimate_row_counts is set, by using planner
+    statistics (in which case the count is not stored).
+
+    Arguments:
+        conn: dirbs db connection object
+        partition_parents: dict of monthly partition name -> parent table name
+        logger: dirbs logger object
+        estimate_row_counts: bool to use planner statistics for partitions missing from the inventory
+    Returns:
+        dict of monthly partition name -> number of rows
+    """
+    with conn.cursor() as cursor:
+        cursor.execute("""SELECT table_name, num_rows
+                            FROM partition_inventory
+                           WHERE table_name = ANY(%s)""", [list(partition_parents.keys())])
+        partition_rows = {res.table_name: res.num_rows for res in cursor}
+
+        for tblname, parent_tbl_name in partition_parents.items():
+            if tblname in partition_rows:
+                continue
+
+            if estimate_row_counts:
+                logger.warning('Partition {0} missing from partition inventory. Using estimated row count'
+                               .format(tblname))
+                partition_rows[tblname] = utils.estimated_table_row_count(conn, tblname)
+            else:
+                logger.warning('Partition {0} missing from partition inventory. Counting rows...'.format(tblname))
+                cursor.execute(sql.SQL('SELECT COUNT(*) FROM {0}').format(sql.Identifier(tblname)))
+                partition_rows[tblname] = cursor.fetchone()[0]
+                cursor.execute("""INSERT INTO partition_inventory(table_name, parent_table_name, num_rows)
+                                       VALUES (%s, %s, %s)""", [tblname, parent_tbl_name, partition_rows[tblname]])
+
+        return partition_rows
+
+
+def _drop_monthly_partition(conn, tblname):
+    """
+    Function to drop a monthly_network_triplets partition and remove it from the partition inventory.
+
+    Arguments:
+        conn: dirbs db connection object
+        tblname: name of the monthly partition to drop
+    """
+    with conn.cursor() as cursor:
+        cursor.execute(sql.SQL("""DROP TABLE {0} CASCADE""").format(sql.Identifier(tblname)))
+        cursor.execute('DELETE FROM partition_inventory WHERE table_name = %s', [tblname])
+
+
 @cli.command(name='classification_state')
 @click.pass_context
 @common.unhandled_exception_handler
@@ -169,49 +245,149 @@ def classification_state(ctx, config, statsd, logger, run_id, conn, metadata_con
                 'pruned'.format(first_month_to_drop))
 
     with utils.db_role_setter(conn, role_name='dirbs_core_power_user'), conn.cursor() as cursor:
-        logger.debug('Calculating original number of rows in classification_state table...')
-        cursor.execute('SELECT COUNT(*) FROM classification_state')
-        rows_before = cursor.fetchone()[0]
-        logger.debug('Calculated original number of rows in classification_state table')
-        statsd.gauge('{0}rows_before'.format(metrics_run_root), rows_before)
-        metadata.add_optional_job_metadata(metadata_conn, command, run_id, rows_before=rows_before)
-
-        # Calculate number of rows in the classification table outside retention window
-        cursor.execute(sql.SQL("""SELECT COUNT(*)
-                                    FROM classification_state
-                                   WHERE end_date < %s """), [first_month_to_drop])
-        total_rows_out_window_to_prune = cursor.fetchone()[0]
-        logger.info('Found {0:d} rows of classification_state table '
-                    'with end_date outside the retention window to prune.'.format(total_rows_out_window_to_prune))
-
-        # Calculate number of rows in the classification with conditions no longer existing
-        cursor.execute(sql.SQL("""SELECT COUNT(*)
-                                    FROM classification_state
-                                   WHERE NOT starts_with_prefix(cond_name, %s)"""), [cond_config_list])
-        total_rows_no_cond_to_prune = cursor.fetchone()[0]
-        logger.info('Found {0:d} rows of classification_state table with conditions '
-                    'no longer existing to prune.'.format(total_rows_no_cond_to_prune))
-
-        logger.debug('Re-creating classification_state table...')
-        # Basically, we just re-partition the classification_state table to re-create it, passing a src_filter_sql
-        # parameter
-        num_phys_imei_shards = partition_utils.num_physical_imei_shards(conn)
-        src_filter_sql = cursor.mogrify("""WHERE (end_date > %s
-                                              OR end_date IS NULL)
-                                             AND cond_name LIKE ANY(%s)""",
-                                        [first_month_to_drop, cond_config_list])
-        partition_utils.repartition_classification_state(conn, num_physical_shards=num_phys_imei_shards,
-                                                         src_filter_sql=str(src_filter_sql, encoding=conn.encoding))
-        logger.debug('Re-created classification_state table')
+        prune_filter_sql = cursor.mogrify("""WHERE end_date <= %s
+                                               OR NOT cond_name LIKE ANY(%s)""",
+                                          [first_month_to_drop, cond_config_list])
+        prune_filter_sql = str(prune_filter_sql, encoding=conn.encoding)
+
+        # Decide between in-place and rewrite pruning using planner estimates so that we never have to scan the
+        # whole table just to find out how much of it needs pruning
+        estimated_total_rows = utils.estimated_table_row_count(conn, 'classification_state')
+        estimated_rows_to_prune = utils.estimated_query_row_count(
+            conn, sql.SQL('SELECT 1 FROM classification_state {0}').format(sql.SQL(prune_filter_sql)))
+        if estimated_total_rows > 0:
+            estimated_prune_ratio = min(estimated_rows_to_prune / estimated_total_rows, 1)
+        else:
+            estimated_prune_ratio = 0
+        rewrite_threshold = config.retention_config.prune_rewrite_threshold
+        logger.info('Estimated {0:d} of {1:d} rows of classification_state table to prune (ratio={2:f}, '
+                    'rewrite_threshold={3:f})'.format(estimated_rows_to_prune, estimated_total_rows,
+                                                      estimated_prune_ratio, rewrite_threshold))
+
+        if estimated_prune_ratio >= rewrite_threshold:
+            prune_mode = 'rewrite'
+            logger.debug('Calculating original number of rows in classification_state table...')
+            cursor.execute('SELECT COUNT(*) FROM classification_state')
+            rows_before = cursor.fetchone()[0]
+            logger.debug('Calculated original number of rows in classification_state table')
+
+            logger.debug('Re-creating classification_state table...')
+            # Basically, we just re-partition the classification_state table to re-create it, passing a
+            # src_filter_sql parameter that keeps every row not matched by the prune filter
+            num_phys_imei_shards = partition_utils.num_physical_imei_shards(conn)
+            src_filter_sql = cursor.mogrify("""WHERE (end_date > %s
+                                                  OR end_date IS NULL)
+                                                 AND cond_name LIKE ANY(%s)""",
+                                            [first_month_to_drop, cond_config_list])
+            rows_kept = partition_utils.repartition_classification_state(conn,
+                                                                         num_physical_shards=num_phys_imei_shards,
+                                                                         src_filter_sql=str(src_filter_sql,
+                                                                                            encoding=conn.encoding))
+            logger.debug('Re-created classification_state table')
+            total_rows_pruned = rows_before - rows_kept
+        else:
+            prune_mode = 'in_place'
+            total_rows_pruned = _prune_classification_state_in_place(conn, config, logger,
+                                                                     prune_filter_sql=prune_filter_sql)
+
+    statsd.gauge('{0}rows_pruned'.format(metrics_run_root), total_rows_pruned)
+    metadata.add_optional_job_metadata(metadata_conn, command, run_id,
+                                       prune_mode=prune_mode,
+                                       estimated_prune_ratio=estimated_prune_ratio,
+                                       estimated_rows_to_prune=estimated_rows_to_prune,
+                                       rows_pruned=total_rows_pruned)
+    logger.info('Pruned {0:d} rows from classification_state table'.format(total_rows_pruned))
 
-        logger.debug('Calculating new number of rows in classification_state table...')
-        cursor.execute('SELECT COUNT(*) FROM classification_state')
-        rows_after = cursor.fetchone()[0]
-        logger.debug('Calculated new number of rows in classification_state table')
-        statsd.gauge('{0}rows_after'.format(metrics_run_root), rows_after)
-        metadata.add_optional_job_metadata(metadata_conn, command, run_id, rows_after=rows_after)
 
-        logger.info('Pruned {0:d} rows from classification_state table'.format(rows_after - rows_before))
+def _prune_classification_state_single_shard(db_config, *, shard_name, prune_filter_sql, batch_size):
+    """
+    Job function to delete rows matching a prune filter from a single classification_state shard.
+
+    Rows are deleted in batches of at most batch_size rows, committing after each batch so that no single
+    transaction holds row locks or accumulates dead tuples for the whole shard. Each batch carries on from the
+    highest row_id deleted by the previous one, so that batches never rescan the rows already checked. The shard is
+    vacuumed afterwards so that the freed space can be reused by subsequent classifications.
+
+    Arguments:
+        db_config: dirbs db configuration object
+        shard_name: name of the classification_state shard to prune
+        prune_filter_sql: WHERE clause identifying rows to be pruned
+        batch_size: maximum number of rows to delete per transaction
+    Returns:
+        number of rows pruned from the shard
+    """
+    rows_pruned = 0
+    with utils.create_db_connection(db_config) as conn, \
+            utils.db_role_setter(conn, role_name='dirbs_core_power_user'), conn.cursor() as cursor:
+        # The prune filter is applied in a sub-query so that the row_id condition can not bind to only part of it
+        delete_sql = sql.SQL("""WITH deleted AS (
+                                     DELETE FROM {shard}
+                                           WHERE row_id IN (SELECT row_id
+                                                              FROM (SELECT row_id
+                                                                      FROM {shard}
+                                                                           {prune_filter_sql}) prune_sq
+                                                             WHERE row_id > %s
+                                                          ORDER BY row_id
+                                                             LIMIT %s)
+                                       RETURNING row_id
+                                 )
+                                 SELECT COUNT(*) AS batch_rows, MAX(row_id) AS max_row_id
+                                   FROM deleted""").format(shard=sql.Identifier(shard_name),
+                                                           prune_filter_sql=sql.SQL(prune_filter_sql))
+        last_max_row_id = 0
+        while True:
+            cursor.execute(delete_sql, [last_max_row_id, batch_size])
+            batch_rows, max_row_id = cursor.fetchone()
+            conn.commit()
+            rows_pruned += batch_rows
+            if batch_rows < batch_size:
+                break
+            last_max_row_id = max_row_id
+
+        if rows_pruned > 0:
+            # VACUUM can not run inside a transaction block
+            conn.autocommit = True
+            cursor.execute(sql.SQL('VACUUM ANALYZE {0}').format(sql.Identifier(shard_name)))
+            conn.autocommit = False
+
+    return rows_pruned
+
+
+def _prune_classification_state_in_place(conn, config, logger, *, prune_filter_sql):
+    """
+    Function to prune the classification_state table in-place, deleting from each shard in parallel.
+
+    Arguments:
+        conn: dirbs db connection object
+        config: dirbs config object
+        logger: dirbs logger object
+        prune_filter_sql: WHERE clause identifying rows to be pruned
+    Returns:
+        total number of rows pruned
+    """
+    shard_names = [shard_name for shard_name, _, _
+                   in partition_utils.physical_imei_shards(conn, tbl_name='classification_state')]
+    # Make sure this connection holds no locks that the shard workers could wait on
+    conn.commit()
+
+    nworkers = config.multiprocessing_config.max_db_connections
+    batch_size = config.retention_config.prune_batch_size
+    logger.info('Pruning {0:d} classification_state shards in-place using up to {1:d} workers...'
+                .format(len(shard_names), nworkers))
+    total_rows_pruned = 0
+    with futures.ThreadPoolExecutor(max_workers=nworkers) as executor:
+        futures_to_shard = {executor.submit(_prune_classification_state_single_shard,
+                                            config.db_config,
+                                            shard_name=shard_name,
+                                            prune_filter_sql=prune_filter_sql,
+                                            batch_size=batch_size): shard_name
+                            for shard_name in shard_names}
+        for f in futures.as_completed(futures_to_shard):
+            shard_rows_pruned = f.result()
+            logger.debug('Pruned {0:d} rows from {1}'.format(shard_rows_pruned, futures_to_shard[f]))
+            total_rows_pruned += shard_rows_pruned
+
+    return total_rows_pruned
 
 
 def _warn_about_prune_all(prune_all, logger):
@@ -452,6 +628,12 @@ def lists(ctx, config, statsd, logger, run_id, conn, metadata_conn, command, met
                                                                         encoding=conn.encoding))
         logger.debug('Re-created exceptions lists table')
 
+        # listgen builds the old lists from the snapshots, so they must match the pruned list history. IMEIs that are
+        # still listed but whose history rows were pruned are then re-added by the next listgen run
+        logger.debug('Re-building list snapshot tables...')
+        partition_utils.create_list_snapshots(conn, num_physical_shards=num_phys_imei_shards)
+        logger.debug('Re-built list snapshot tables')
+
         logger.debug('Calculating new number of rows in lists tables...')
         cursor.execute(row_count_sql)
         rows_after = cursor.fetchone()
@@ -34,6 +34,7 @@ POSSIBILITY OF SUCH DAMAGE.
 import datetime
 import pkgutil
 import os
+from functools import wraps
 
 import click
 
@@ -42,11 +43,15 @@ import dirbs.cli.common as common
 import dirbs.metadata as metadata
 from dirbs import report_schema_version
 from dirbs.config.region import OperatorConfig
-from dirbs.reports import CountryReport, OperatorReport, generate_monthly_report_stats
+from dirbs.reports import CountryReport, OperatorReport, ReportData, generate_monthly_report_stats
 from dirbs.reports.csv_reports import reports_validation_checks, make_report_directory, write_report, \
     write_country_gsma_not_found_report, write_country_duplicates_report, write_condition_imei_overlaps, \
     operators_configured_check, write_stolen_violations, write_non_active_pairs, write_un_registered_subscribers, \
-    write_classified_triplets, write_blacklist_violations, write_association_list_violations, write_transient_msisdns
+    write_classified_triplets, write_blacklist_violations, write_association_list_violations, \
+    write_transient_msisdns, write_triplets_scan_reports, TRIPLETS_SCAN_REPORT_TYPES
+
+# Reports that can be generated together by the combined subcommand
+COMBINED_REPORT_TYPES = ['stolen_violations', 'non_active_pairs'] + TRIPLETS_SCAN_REPORT_TYPES
 
 
 def _parse_month_year_report_options_args(f: callable) -> callable:
@@ -125,6 +130,23 @@ def _parse_force_refresh(f: callable) -> callable:
                              'from previously-calculated data (default: --no-refresh).')(f)
 
 
+def _parse_partial_refresh(f: callable) -> callable:
+    """
+    Function to parse partial refresh option on the command line.
+
+    Arguments:
+        f: callable function
+    Returns:
+        click option
+    """
+    return click.option('--partial-refresh',
+                        is_flag=True,
+                        help='When refreshing, only recalculate the report data whose inputs (operator imports, '
+                             'GSMA import or classification) changed since the data was last generated for this '
+                             'month and copy the rest. Per-TAC compliance data is only written if compliance data '
+                             'was recalculated.')(f)
+
+
 def _parse_disable_retention_check(f: callable) -> callable:
     """
     Function to parse disable retention check option on the command line.
@@ -185,7 +207,7 @@ def _validate_month(ctx, param, val: int) -> int:
     Raises:
         click.BadParameter: When month value does not lie in between 1-12
     """
-    if val < 1 or val > 12:
+    if val is not None and (val < 1 or val > 12):
         raise click.BadParameter('Month must be between 1 and 12')
     return val
 
@@ -203,7 +225,7 @@ def _validate_year(ctx, param, val: int) -> int:
     Raises:
         click.BadParameter: When year value does not lie in between 2000-2100
     """
-    if val < 2000 or val > 2100:
+    if val is not None and (val < 2000 or val > 2100):
         raise click.BadParameter('Year must be between 2000 and 2100')
     return val
 
@@ -231,6 +253,59 @@ def _parse_positive_int(ctx: callable, param, value: str) -> int:
         raise click.BadParameter('--period value must be positive integer')
 
 
+def _validate_combined_report_types(ctx, param, val: str) -> list:
+    """
+    Helper function to validate the comma-separated list of reports for the combined subcommand.
+
+    Arguments:
+        ctx: click cmd context
+        param: required default parameter
+        val: comma-separated list of report types
+    Returns:
+        report_types: list of unique report types, in the order given
+    Raises:
+        click.BadParameter: When an unknown report type is given
+    """
+    report_types = []
+    for rt in [x.strip() for x in val.split(',') if x.strip()]:
+        if rt not in COMBINED_REPORT_TYPES:
+            raise click.BadParameter('Invalid report type specified: {0} (must be one of {1})'
+                                     .format(rt, ', '.join(COMBINED_REPORT_TYPES)))
+        if rt not in report_types:
+            report_types.append(rt)
+    if not report_types:
+        raise click.BadParameter('At least one report type must be specified')
+    return report_types
+
+
+def _check_combined_report_options(f: callable) -> callable:
+    """
+    Decorator used to check that the options required by each report of the combined subcommand were given.
+
+    Arguments:
+        f: callable function to be decorated
+    Returns:
+        f: decorated callable function
+    """
+    required_options = {
+        'blacklist_violations': ['month', 'year'],
+        'association_list_violations': ['month', 'year'],
+        'classified_triplets': ['conditions'],
+        'non_active_pairs': ['period']
+    }
+
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        for rt in kwargs['report_types']:
+            for option in required_options.get(rt, []):
+                if kwargs[option] is None:
+                    raise click.UsageError('--{0} is required to generate the {1} report'
+                                           .format(option, rt))
+        return f(*args, **kwargs)
+
+    return decorated
+
+
 @click.group(no_args_is_help=False)
 @common.setup_initial_logging
 @click.version_option()
@@ -253,13 +328,14 @@ def cli(ctx: callable) -> None:
 @cli.command()  # noqa: C901
 @common.parse_multiprocessing_options
 @_parse_month_year_report_options_args
+@_parse_partial_refresh
 @click.pass_context
 @common.unhandled_exception_handler
 @common.cli_wrapper(command='dirbs-report', subcommand='standard', required_role='dirbs_core_report')
 def standard(ctx: callable, config: callable, statsd: callable, logger: callable, run_id: int, conn: callable,
              metadata_conn: callable, command: str, metrics_root: callable, metrics_run_root: callable,
              force_refresh: bool, disable_retention_check: bool, disable_data_check: bool,
-             debug_query_performance: bool, month: int, year: int, output_dir: str) -> None:
+             debug_query_performance: bool, month: int, year: int, output_dir: str, partial_refresh: bool) -> None:
     """Generate standard monthly operator and country-level reports.
 
     Arguments:
@@ -280,12 +356,14 @@ def standard(ctx: callable, config: callable, statsd: callable, logger: callable
         month: reporting month
         year: reporting year
         output_dir: output directory path
+        partial_refresh: bool to only recalculate report data whose inputs changed when refreshing
     Returns:
         None
     """
     # Store metadata
     metadata.add_optional_job_metadata(metadata_conn, command, run_id,
                                        refreshed_data=force_refresh,
+                                       partial_refresh=partial_refresh,
                                        month=month,
                                        year=year,
                                        report_schema_version=report_schema_version,
@@ -299,7 +377,8 @@ def standard(ctx: callable, config: callable, statsd: callable, logger: callable
                                                                                    statsd, metrics_run_root,
                                                                                    run_id,
                                                                                    force_refresh,
-                                                                                   debug_query_performance)
+                                                                                   debug_query_performance,
+                                                                                   partial_refresh=partial_refresh)
 
     # Store metadata about the report data ID and classification run ID
     metadata.add_optional_job_metadata(metadata_conn, command, run_id, data_id=data_id,
@@ -328,6 +407,13 @@ def standard(ctx: callable, config: callable, statsd: callable, logger: callable
     js_filename = asset_map['js/report.js']
     css_filename = asset_map['css/report.css']
 
+    # Load the stored report data for the country and all operators up front, so that generating each report does
+    # not need any further queries
+    with utils.CodeProfiler() as cp:
+        logger.info('Loading report data...')
+        report_data = ReportData(conn, data_id, month, year)
+    statsd.gauge('{0}runtime.report_data_load'.format(metrics_run_root), cp.duration)
+
     # Next, generate the country level report
     report_metadata = []
     with utils.CodeProfiler() as cp:
@@ -337,7 +423,8 @@ def standard(ctx: callable, config: callable, statsd: callable, logger: callable
         if per_tac_compliance_data is not None:
             country_per_tac_compliance_data = per_tac_compliance_data[OperatorConfig.COUNTRY_OPERATOR_NAME]
         report = CountryReport(conn, data_id, config, month, year, country_name,
-                               has_compliance_data=country_per_tac_compliance_data is not None)
+                               has_compliance_data=country_per_tac_compliance_data is not None,
+                               report_data=report_data)
         report_metadata.extend(write_report(report, month, year, report_dir, country_name,
                                             css_filename, js_filename, country_per_tac_compliance_data))
 
@@ -351,7 +438,8 @@ def standard(ctx: callable, config: callable, statsd: callable, logger: callable
             if per_tac_compliance_data is not None:
                 operator_per_tac_compliance_data = per_tac_compliance_data.get(op.id)
             report = OperatorReport(conn, data_id, config, month, year, op,
-                                    has_compliance_data=operator_per_tac_compliance_data is not None)
+                                    has_compliance_data=operator_per_tac_compliance_data is not None,
+                                    report_data=report_data)
             report_prefix = '{0}_{1}'.format(country_name, op.id)
             report_metadata.extend(write_report(report, month, year, report_dir, report_prefix,
                                                 css_filename, js_filename, operator_per_tac_compliance_data))
@@ -674,6 +762,7 @@ def unregistered_subscribers(ctx: callable, config: callable, statsd: callable,
 
 
 @cli.command(name='classified_triplets')
+@common.parse_multiprocessing_options
 @click.pass_context
 @common.unhandled_exception_handler
 @click.argument('conditions', callback=common.validate_conditions)
@@ -706,13 +795,14 @@ def classified_triplets(ctx: callable, config: callable, statsd: callable, logge
     report_dir = make_report_directory(ctx, output_dir, run_id, conn, config)
 
     with utils.CodeProfiler() as cp:
-        report_metadata = write_classified_triplets(logger, conditions, report_dir, conn)
+        report_metadata = write_classified_triplets(logger, config, conditions, report_dir, conn)
 
     statsd.gauge('{0}runtime.per_report.classified_triplets'.format(metrics_run_root), cp.duration)
     metadata.add_optional_job_metadata(metadata_conn, command, run_id, report_outputs=report_metadata)
 
 
 @cli.command(name='blacklist_violations')
+@common.parse_multiprocessing_options
 @click.pass_context
 @common.unhandled_exception_handler
 @_parse_month
@@ -753,6 +843,7 @@ def blacklist_violations(ctx: callable, config: callable, statsd: callable, logg
 
 
 @cli.command(name='association_list_violations')
+@common.parse_multiprocessing_options
 @click.pass_context
 @common.unhandled_exception_handler
 @_parse_month
@@ -825,3 +916,108 @@ def transient_msisdns(ctx: callable, config: callable, statsd: callable, logger:
 
     statsd.gauge('{0}runtime.per_report.transient_msisdns'.format(metrics_run_root), cp.duration)
     metadata.add_optional_job_metadata(metadata_conn, command, run_id, report_outputs=report_metadata)
+
+
+@cli.command(name='combined')  # noqa: C901
+@common.parse_multiprocessing_options
+@_check_combined_report_options
+@click.pass_context
+@common.unhandled_exception_handler
+@_parse_output_dir
+@common.cli_wrapper(command='dirbs-report', subcommand='combined', required_role='dirbs_core_report')
+@click.option('--reports', 'report_types',
+              required=True,
+              callback=_validate_combined_report_types,
+              help='Comma-separated list of reports to generate ({0}).'.format(', '.join(COMBINED_REPORT_TYPES)))
+@click.option('--month',
+              type=int,
+              default=None,
+              callback=_validate_month,
+              help='Reporting month for the blacklist_violations and association_list_violations reports.')
+@click.option('--year',
+              type=int,
+              default=None,
+              callback=_validate_year,
+              help='Reporting year for the blacklist_violations and association_list_violations reports.')
+@click.option('--conditions',
+              default=None,
+              callback=common.validate_conditions,
+              help='Comma-separated list of condition names for the classified_triplets report.')
+@click.option('--period',
+              type=click.IntRange(min=1),
+              default=None,
+              help='Period in days for a pair to be counted as not active for the non_active_pairs report.')
+@click.option('--newer-than',
+              default=None,
+              callback=common.validate_date,
+              help='Include only violations and IMSIs observed on the network after this date (YYYYMMDD) in the '
+                   'stolen_violations and unregistered_subscribers reports.')
+@click.option('--filter-by-conditions',
+              help='Comma-separated list of condition names to filter the stolen_violations report by.',
+              callback=common.validate_conditions,
+              default=None)
+def combined(ctx: callable, config: callable, statsd: callable, logger: callable, run_id: int, conn: callable,
+             metadata_conn: callable, command: str, metrics_root: callable, metrics_run_root: callable,
+             output_dir: str, report_types: list, month: int, year: int, conditions: list, period: int,
+             newer_than: str, filter_by_conditions: list) -> None:
+    """Generate several per-MNO reports in a single job, sharing one scan of the per-MNO triplets.
+
+    The blacklist_violations, association_list_violations, classified_triplets and unregistered_subscribers reports
+    are generated from a single scan of the per-MNO triplets. The files written are the same as those written by the
+    individual subcommands.
+
+    Arguments:
+        ctx: click context object
+        config: DIRBS config object
+        statsd: DIRBS statsd connection object
+        logger: DIRBS custom logger object
+        run_id: run id of the current job
+        conn: DIRBS PostgreSQL connection object
+        metadata_conn: DIRBS PostgreSQL metadata connection object
+        command: name of the command
+        metrics_root: root object for the statsd metrics
+        metrics_run_root: root object for the statsd run metrics
+        output_dir: output directory path
+        report_types: list of reports to generate
+        month: reporting month
+        year: reporting year
+        conditions: list of conditions for classified triplets
+        period: period in days for a pair being count as not active
+        newer_than: violation newer then this date
+        filter_by_conditions: list of condition to filter the stolen violations by
+    Returns:
+        None
+    """
+    operators_configured_check(config, logger)
+    metadata.add_optional_job_metadata(metadata_conn, command, run_id,
+                                       report_schema_version=report_schema_version,
+                                       report_types=report_types,
+                                       output_dir=os.path.abspath(str(output_dir)))
+    report_dir = make_report_directory(ctx, output_dir, run_id, conn, config)
+    report_outputs = {}
+
+    triplets_scan_report_types = [rt for rt in report_types if rt in TRIPLETS_SCAN_REPORT_TYPES]
+    if triplets_scan_report_types:
+        with utils.CodeProfiler() as cp:
+            report_outputs.update(write_triplets_scan_reports(logger, config, report_dir, conn,
+                                                              triplets_scan_report_types,
+                                                              month=month,
+                                                              year=year,
+                                                              conditions=conditions,
+                                                              newer_than=newer_than))
+        statsd.gauge('{0}runtime.per_report.triplets_scan'.format(metrics_run_root), cp.duration)
+
+    if 'stolen_violations' in report_types:
+        with utils.CodeProfiler() as cp:
+            report_outputs['stolen_violations'] = write_stolen_violations(config, logger, report_dir, conn,
+                                                                          filter_by_conditions, newer_than)
+        statsd.gauge('{0}runtime.per_report.blacklist_violations_stolen'.format(metrics_run_root), cp.duration)
+
+    if 'non_active_pairs' in report_types:
+        last_seen_date = datetime.date.today() - datetime.timedelta(period)
+        with utils.CodeProfiler() as cp:
+            report_outputs['non_active_pairs'] = write_non_active_pairs(conn, logger, report_dir, last_seen_date)
+        statsd.gauge('{0}runtime.per_report.non_active_pairs'.format(metrics_run_root), cp.duration)
+
+    # Store the outputs of each report in the job metadata
+    metadata.add_optional_job_metadata(metadata_conn, command, run_id, report_outputs=report_outputs)
@@ -42,6 +42,8 @@ class RetentionConfig(ConfigSection):
         super(RetentionConfig, self).__init__(**retention_config)
         self.months_retention = self._parse_positive_int('months_retention')
         self.blacklist_retention = self._parse_positive_int('blacklist_retention')
+        self.prune_batch_size = self._parse_positive_int('prune_batch_size', allow_zero=False)
+        self.prune_rewrite_threshold = self._parse_float_ratio('prune_rewrite_threshold')
 
     @property
     def section_name(self):
@@ -54,4 +56,6 @@ class RetentionConfig(ConfigSection):
         return {
             'months_retention': 3,
             'blacklist_retention': 0,
+            'prune_batch_size': 100000,
+            'prune_rewrite_threshold': 0.5
         }
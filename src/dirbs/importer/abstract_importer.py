@@ -33,6 +33,7 @@ POSSIBILITY OF SUCH DAMAGE.
 
 import os
 import copy
+import contextlib
 import zipfile
 import time
 from enum import Enum
@@ -57,6 +58,52 @@ class UploadPipelineJobType(Enum):
     UPLOAD = 2
 
 
+class SharedImportExecutors:
+    """Worker pools and locks shared between importers running concurrently in the same process.
+
+    Importers given an instance of this class submit their pre-validation, upload and database jobs to the shared
+    pools rather than starting their own, so that the total number of worker processes and database connections
+    stays within the configured limits however many imports are running. Steps which contend on shared rows are
+    serialized using serial_lock and ANALYZE of shared parent tables is deferred so that it can be run once after all
+    the imports have completed.
+    """
+
+    def __init__(self, *, max_local_cpus, max_db_connections):
+        """
+        Constructor.
+
+        :param max_local_cpus: max number of local cpus to be used for pre-validation
+        :param max_db_connections: max number of database connections to be used for upload and copy jobs
+        """
+        self.prevalidator = futures.ProcessPoolExecutor(max_workers=max_local_cpus)
+        self.uploader = futures.ProcessPoolExecutor(max_workers=max_db_connections)
+        self.db_executor = futures.ThreadPoolExecutor(max_workers=max_db_connections)
+        self.serial_lock = threading.Lock()
+        self._tables_to_analyze = set()
+        self._tables_lock = threading.Lock()
+
+    def __enter__(self):
+        """Context manager support (with statement)."""
+        return self
+
+    def __exit__(self, exc_type, value, traceback):
+        """Context manager support (with statement)."""
+        self.prevalidator.shutdown()
+        self.uploader.shutdown()
+        self.db_executor.shutdown()
+
+    def defer_analyze(self, tbl_name):
+        """Queue a table to be ANALYZEd once all importers sharing these executors have finished."""
+        with self._tables_lock:
+            self._tables_to_analyze.add(tbl_name)
+
+    @property
+    def tables_to_analyze(self):
+        """Sorted list of tables queued for ANALYZE by the importers sharing these executors."""
+        with self._tables_lock:
+            return sorted(self._tables_to_analyze)
+
+
 class AbstractImporter:
     """Base class for all data importers in DIRBS Core."""
 
@@ -68,7 +115,7 @@ class AbstractImporter:
                  db_config, input_filename, logger, statsd,
                  prevalidator_path='/opt/validator/bin/validate', prevalidator_schema_path='/opt/dirbs/etc/schema',
                  batch_size=100000, expected_suffix='.csv', extract=True, no_cleanup=False, extract_dir=None,
-                 max_db_connections=1, max_local_cpus=1):
+                 max_db_connections=1, max_local_cpus=1, shared_executors=None):
         """
         Constructor.
 
@@ -90,6 +137,8 @@ class AbstractImporter:
         :param extract_dir: directory path to extract files (default None)
         :param max_db_connections: max number of database connection for this job (default 1)
         :param max_local_cpus: max number of local cpu to be used (default 1)
+        :param shared_executors: SharedImportExecutors instance to use instead of starting per-import worker pools
+                                 (default None)
         """
         assert import_id != -1
         self.import_id = import_id
@@ -109,6 +158,7 @@ class AbstractImporter:
         self._no_cleanup = no_cleanup
         self._max_db_connections = max_db_connections
         self._max_local_cpus = max_local_cpus
+        self._shared_executors = shared_executors
         self._data_length = -1
         self._was_entered = False
         self._need_previous_count_for_stats = True
@@ -144,6 +194,7 @@ class AbstractImporter:
         del state['_metadata_conn']
         del state['_statsd']
         del state['_logger']
+        del state['_shared_executors']
         return state
 
     def __setstate__(self, state):
@@ -300,14 +351,38 @@ class AbstractImporter:
             cursor.execute('SELECT pg_advisory_unlock(%s::BIGINT)', [self._import_lock_key])
             return cursor.fetchone()[0]
 
+    @contextlib.contextmanager
+    def _upload_pipeline_executors(self):
+        """Context manager yielding the (prevalidator, uploader) executors to use for the upload pipeline."""
+        if self._shared_executors is not None:
+            yield self._shared_executors.prevalidator, self._shared_executors.uploader
+        else:
+            with futures.ProcessPoolExecutor(max_workers=self._max_local_cpus) as prevalidator, \
+                    futures.ProcessPoolExecutor(max_workers=self._max_db_connections) as uploader:
+                yield prevalidator, uploader
+
+    @contextlib.contextmanager
+    def _db_executor(self):
+        """Context manager yielding the thread pool executor to use for parallel database jobs."""
+        if self._shared_executors is not None:
+            yield self._shared_executors.db_executor
+        else:
+            with futures.ThreadPoolExecutor(max_workers=self._max_db_connections) as executor:
+                yield executor
+
+    def _serialized_step(self):
+        """Context manager to serialize a step that contends with other imports sharing the same executors."""
+        if self._shared_executors is not None:
+            return self._shared_executors.serial_lock
+        return contextlib.nullcontext()
+
     def _compute_md5_hash(self):
         """Method to compute the MD5 hash for the filename."""
         self._logger.info('Computing MD5 hash of the input file...')
         with open(self._filename, 'rb') as f:
             md5 = compute_md5_hash(f)
         self._logger.info('Computed MD5 hash of the input file')
-        metadata.add_optional_job_metadata(self._metadata_conn, 'dirbs-import', self.import_id,
-                                           input_file_md5=md5)
+        metadata.add_input_file_md5(self._metadata_conn, self.import_id, md5)
 
     def _upload_pipeline(self):
         """Method to handle extracting, splitting, preprocessing, pre-validating and uploading input file."""
@@ -322,29 +397,35 @@ class AbstractImporter:
         # A job is only ever submitted for upload once it has passed pre-validation but that should happen as soon
         # as a batch has been pre-validated
         futures_to_type = {}
-        with futures.ProcessPoolExecutor(max_workers=self._max_local_cpus) as prevalidator, \
-                futures.ProcessPoolExecutor(max_workers=self._max_db_connections) as uploader:
+        with self._upload_pipeline_executors() as (prevalidator, uploader):
             self._logger.info('Simultaneously splitting, pre-validating and uploading '
                               '({0} pre-validation workers, {1} upload workers)'
                               .format(self._max_local_cpus, self._max_db_connections))
-            for f in self._split_file(file_to_split):
-                # We check for any completed jobs. We do this inside the loop with a zero timeout so that we can
-                # kick off any upload jobs as soon as possible. We also do this before we kick off pre-validation
-                # job so that when we exit this for loop we still have some jobs pending -- we do this so that we
-                # at least the final batch has a progress message printed out
-                self._process_pipeline_jobs(executor=uploader, futures_to_type=futures_to_type,
-                                            state=pipeline_state, timeout=0)
-
-                # Process new split batch
-                pipeline_state['num_batches'] += 1
-                processed_fn = self._preprocess_file(f)  # Pre-process file
-                job = prevalidator.submit(self._prevalidate_file, processed_fn)  # Kick-off pre-validation job
-                futures_to_type[job] = UploadPipelineJobType.PREVALIDATE
-
-            # At this point, we are complete with splitting, so we just need to wait until all futures are done
-            while futures_to_type:
-                self._process_pipeline_jobs(executor=uploader, futures_to_type=futures_to_type,
-                                            state=pipeline_state, num_batches_finalized=True)
+            try:
+                for f in self._split_file(file_to_split):
+                    # We check for any completed jobs. We do this inside the loop with a zero timeout so that we can
+                    # kick off any upload jobs as soon as possible. We also do this before we kick off pre-validation
+                    # job so that when we exit this for loop we still have some jobs pending -- we do this so that
+                    # we at least the final batch has a progress message printed out
+                    self._process_pipeline_jobs(executor=uploader, futures_to_type=futures_to_type,
+                                                state=pipeline_state, timeout=0)
+
+                    # Process new split batch
+                    pipeline_state['num_batches'] += 1
+                    processed_fn = self._preprocess_file(f)  # Pre-process file
+                    job = prevalidator.submit(self._prevalidate_file, processed_fn)  # Kick-off pre-validation job
+                    futures_to_type[job] = UploadPipelineJobType.PREVALIDATE
+
+                # At this point, we are complete with splitting, so we just need to wait until all futures are done
+                while futures_to_type:
+                    self._process_pipeline_jobs(executor=uploader, futures_to_type=futures_to_type,
+                                                state=pipeline_state, num_batches_finalized=True)
+            except:  # noqa: E722
+                # Don't leave queued batches for a failed import behind in the executors, as they may be shared
+                # with other imports that are still running
+                for pending_future in futures_to_type:
+                    pending_future.cancel()
+                raise
 
             # Calculate number of uploaded rows
             with self._conn as conn, conn.cursor() as cursor:
@@ -37,6 +37,7 @@ from collections import defaultdict
 from functools import partial
 
 from psycopg2 import sql
+from psycopg2.extras import execute_values
 from dateutil.rrule import rrule, MONTHLY
 
 import dirbs.importer.exceptions as exceptions
@@ -122,7 +123,7 @@ class OperatorDataImporter(AbstractImporter):
         # We don't want to get any global row count for this imported as it could be horrendously slow
         self._need_previous_count_for_stats = False
         # By default the system will automatically run Analyze on monthly_network_triplets_country,
-        # network_imeis and monthly_network_triplets_per_mno of the data
+        # network_imeis, network_imeis_per_mno, network_msisdns and monthly_network_triplets_per_mno of the data
         self._perform_auto_analyze = perform_auto_analyze
         # These will be set to non-None during import
         self._min_connection_date = None
@@ -212,6 +213,26 @@ class OperatorDataImporter(AbstractImporter):
         """Id for the staging hll sketches table to use for this import."""
         return sql.Identifier(self._staging_hll_sketches_tbl_name)
 
+    @property
+    def _staging_tac_hll_sketches_tbl_name(self):
+        """Name for the staging per-TAC hll sketches table to use for this import."""
+        return 'staging_tac_hll_sketches_import_{0}'.format(self.import_id)
+
+    @property
+    def _staging_tac_hll_sketches_tbl_id(self):
+        """Id for the staging per-TAC hll sketches table to use for this import."""
+        return sql.Identifier(self._staging_tac_hll_sketches_tbl_name)
+
+    @property
+    def _staging_msisdns_tbl_name(self):
+        """Name for the staging table holding this import's network_msisdns rows, split by MSISDN shard."""
+        return 'staging_msisdns_import_{0}'.format(self.import_id)
+
+    @property
+    def _staging_msisdns_tbl_id(self):
+        """Id for the staging table holding this import's network_msisdns rows, split by MSISDN shard."""
+        return sql.Identifier(self._staging_msisdns_tbl_name)
+
     def _perform_filename_checks(self, input_filename):
         """Overrides AbstractImporter._perform_filename_checks."""
         super()._perform_filename_checks(input_filename)
@@ -246,6 +267,20 @@ class OperatorDataImporter(AbstractImporter):
             cursor.execute(sql.SQL("""CREATE UNLOGGED TABLE {0} (LIKE daily_per_mno_hll_sketches)""")
                            .format(self._staging_hll_sketches_tbl_id))
 
+            self._tables_to_cleanup_list.append(self._staging_tac_hll_sketches_tbl_name)
+            cursor.execute(sql.SQL("""CREATE UNLOGGED TABLE {0} (LIKE monthly_per_mno_tac_hll_sketches)""")
+                           .format(self._staging_tac_hll_sketches_tbl_id))
+
+            # network_msisdns is sharded on MSISDN rather than IMEI, so the staging data is split by MSISDN shard
+            # into this table once, rather than having each network_msisdns job scan the whole staging table
+            if self._perform_msisdn_import:
+                self._tables_to_cleanup_list.append(self._staging_msisdns_tbl_name)
+                cursor.execute(sql.SQL("""CREATE UNLOGGED TABLE {0} (LIKE network_msisdns)
+                                          PARTITION BY RANGE (virt_msisdn_shard)""")
+                               .format(self._staging_msisdns_tbl_id))
+                partition_utils.create_imei_shard_partitions(self._conn, tbl_name=self._staging_msisdns_tbl_name,
+                                                             unlogged=True)
+
     def _on_staging_table_shard_creation(self, shard_name, virt_imei_range_start, virt_imei_range_end):
         """Overrides AbstractImporter._on_staging_table_shard_creation."""
         with self._conn.cursor() as cursor:
@@ -627,33 +662,20 @@ class OperatorDataImporter(AbstractImporter):
         # Go ahead and create any new monthly_network_triplets partitions
         #
         self._logger.info('Creating required new monthly_network_triplets partitions...')
-        with self._conn as conn, self._conn.cursor() as cursor:
+        # The country partitions are shared between operators, so serialize this with any concurrent imports
+        with self._serialized_step(), self._conn as conn:
             for month, year in self._month_year_tuples_for_import():
                 self._create_monthly_network_triplets_partitions(conn, month, year)
         self._logger.info('Created required new monthly_network_triplets partitions')
 
         #
-        # Get before count by summing monthly_network_triplets_per_mno COUNTs for each month/year partition
-        # for this operator
-        #
-        rows_before = 0
-        with self._conn as conn, self._conn.cursor() as cursor:
-            for month, year in self._month_year_tuples_for_import():
-                imei_shard_name = partition_utils.monthly_network_triplets_per_mno_partition(
-                    operator_id=self._operator_id,
-                    month=month,
-                    year=year
-                )
-                cursor.execute(sql.SQL('SELECT COUNT(*) FROM {0}').format(sql.Identifier(imei_shard_name)))
-                rows_before += cursor.fetchone()[0]
-
-        #
-        # Parallelize updating of monthly_network_triplets and network_imeis tables
+        # Parallelize updating of monthly_network_triplets, network_imeis and network_msisdns tables
         #
         n_partitions = partition_utils.num_physical_imei_shards(self._conn)
-        with futures.ThreadPoolExecutor(max_workers=self._max_db_connections) as executor:
+        with self._db_executor() as executor:
             self._logger.info(
-                'Simultaneously updating monthly_network_triplets and network_imeis using up to {0:d} workers...'
+                'Simultaneously updating monthly_network_triplets, network_imeis and network_msisdns using up to '
+                '{0:d} workers...'
                 .format(self._max_db_connections)
             )
             futures_to_cb = {}
@@ -663,6 +685,7 @@ class OperatorDataImporter(AbstractImporter):
             month_year_tuples = self._month_year_tuples_for_import()
             monthly_network_triplets_state = defaultdict(int)
             monthly_network_triplets_state['num_jobs'] = n_partitions * len(month_year_tuples)
+            monthly_network_triplets_state['num_inserted_per_partition'] = defaultdict(int)
             for month, year in self._month_year_tuples_for_import():
                 for name, rstart, rend in partition_utils.physical_imei_shards(self._conn, tbl_name=src_tbl_name):
                     f = executor.submit(self._update_monthly_network_triplets, month, year, name, rstart, rend)
@@ -678,13 +701,26 @@ class OperatorDataImporter(AbstractImporter):
                 f = executor.submit(self._update_network_imeis, name, rstart, rend)
                 futures_to_cb[f] = partial(self._process_network_imeis_result, network_imeis_state)
 
-            # Wait for all monthly_network_triplets and network_imeis jobs to complete
+            # Queue jobs splitting each staging table shard by MSISDN shard, ready for the network_msisdns jobs
+            if self._perform_msisdn_import:
+                staging_msisdns_state = defaultdict(int)
+                staging_msisdns_state['num_jobs'] = n_partitions
+                for name, rstart, rend in partition_utils.physical_imei_shards(self._conn, tbl_name=src_tbl_name):
+                    f = executor.submit(self._split_staging_msisdns, name)
+                    futures_to_cb[f] = partial(self._process_staging_msisdns_result, staging_msisdns_state)
+
+            # Wait for all monthly_network_triplets, network_imeis and staging MSISDN jobs to complete
             for f in futures.as_completed(futures_to_cb):
                 futures_to_cb[f](f)
 
+            # Now that the staging data is split by MSISDN shard, each network_msisdns job only reads its own shard
+            if self._perform_msisdn_import:
+                self._run_network_msisdns_jobs(executor, n_partitions)
+
             # Update the daily_per_mno_hll_sketches on main thread so that we don't update the same rows
-            # from multiple transactions (causes deadlock)
-            with self._conn, self._conn.cursor() as cursor:
+            # from multiple transactions (causes deadlock). This is also serialized with any concurrent imports
+            # sharing our executors
+            with self._serialized_step(), self._conn, self._conn.cursor() as cursor:
                 cursor.execute(sql.SQL("""
                     INSERT INTO daily_per_mno_hll_sketches AS target(data_date, operator_id, creation_date,
                                                                      triplet_hll, imei_hll, imsi_hll, msisdn_hll,
@@ -714,39 +750,72 @@ class OperatorDataImporter(AbstractImporter):
                                 creation_date = excluded.creation_date;""")  # noqa: Q441, Q449
                                .format(self._staging_hll_sketches_tbl_id))
 
+                # The per-TAC sketches used by the top models reports are merged in the same way
+                cursor.execute(sql.SQL("""
+                    INSERT INTO monthly_per_mno_tac_hll_sketches AS target(triplet_year, triplet_month, operator_id,
+                                                                           tac, imei_hll)
+                         SELECT triplet_year, triplet_month, operator_id, tac, hll_union_agg(imei_hll)
+                           FROM {0}
+                       GROUP BY triplet_year, triplet_month, operator_id, tac
+                    ON CONFLICT (triplet_year, triplet_month, operator_id, tac)
+                      DO UPDATE
+                            SET imei_hll = target.imei_hll || excluded.imei_hll""")  # noqa: Q441, Q449
+                               .format(self._staging_tac_hll_sketches_tbl_id))
+
             #
-            # Calculate number of rows that were inserted/updated
+            # Record the number of rows inserted into each monthly partition in the partition inventory. This is
+            # done on the main thread for the same reason as the HLL sketches above, since the country partitions
+            # are shared between operators
             #
-            rows_after = 0
-            with self._conn as conn, self._conn.cursor() as cursor:
-                for month, year in self._month_year_tuples_for_import():
-                    imei_shard_name = partition_utils.monthly_network_triplets_per_mno_partition(
-                        operator_id=self._operator_id,
-                        month=month,
-                        year=year
-                    )
-                    cursor.execute(sql.SQL('SELECT COUNT(*) FROM {0}').format(sql.Identifier(imei_shard_name)))
-                    rows_after += cursor.fetchone()[0]
-
-            inserted_triplet_count = rows_after - rows_before
-            updated_triplet_count = monthly_network_triplets_state['num_inserted_or_updated'] - inserted_triplet_count
+            with self._serialized_step(), self._conn, self._conn.cursor() as cursor:
+                execute_values(cursor,
+                               """INSERT INTO partition_inventory AS target(table_name, parent_table_name, num_rows)
+                                       VALUES %s
+                                  ON CONFLICT (table_name)
+                                    DO UPDATE
+                                          SET num_rows = target.num_rows + excluded.num_rows""",
+                               [(tbl_name, parent_tbl_name, num_rows)
+                                for (tbl_name, parent_tbl_name), num_rows
+                                in sorted(monthly_network_triplets_state['num_inserted_per_partition'].items())],
+                               template='(%s, %s, %s)')
+
+            inserted_triplet_count = monthly_network_triplets_state['num_inserted']
+            updated_triplet_count = monthly_network_triplets_state['num_updated']
 
             #
             # ANALYZE the parent tables -- for partitioned tables, this will also ANALYZE the children.
             # by default the system will auto analyze the tables, if disabled the DBA should take care of the activity
             #
+            # When sharing executors with concurrent imports, the ANALYZE is deferred so that the shared parent tables
+            # are only ANALYZEd once after all imports are complete.
+            #
             if self._perform_auto_analyze:
-                executor.submit(self._analyze_job, 'monthly_network_triplets_country')
-                executor.submit(self._analyze_job, 'monthly_network_triplets_per_mno_{0}'.format(self._operator_id))
-                executor.submit(self._analyze_job, 'network_imeis')
+                for tbl_name in self._tables_to_analyze:
+                    if self._shared_executors is not None:
+                        self._shared_executors.defer_analyze(tbl_name)
+                    else:
+                        executor.submit(self._analyze_job, tbl_name)
             else:
                 self._logger.warning('Skipping auto analyze of associated historic tables...')
                 self._logger.debug('Skipping auto analyze of monthly_network_triplets_country...\n'
                                    'Skipping auto analyze of monthly_network_triplets_country_per_mno_{0}...\n'
-                                   'Skipping auto analyze of network_imeis...'.format(self._operator_id))
+                                   'Skipping auto analyze of monthly_network_imei_imsis...\n'
+                                   'Skipping auto analyze of network_imeis...\n'
+                                   'Skipping auto analyze of network_imeis_per_mno...\n'
+                                   'Skipping auto analyze of network_msisdns...'.format(self._operator_id))
 
         return inserted_triplet_count, updated_triplet_count, 0
 
+    @property
+    def _tables_to_analyze(self):
+        """List of historic tables that should be ANALYZEd after this import."""
+        return ['monthly_network_triplets_country',
+                'monthly_network_triplets_per_mno_{0}'.format(self._operator_id),
+                'monthly_network_imei_imsis',
+                'network_imeis',
+                'network_imeis_per_mno',
+                'network_msisdns']
+
     def _analyze_job(self, tbl_name):
         """Helper function to ANALYZE a table in a separate process."""
         with create_db_connection(self._db_config) as conn, conn.cursor() as cursor:
@@ -761,17 +830,59 @@ class OperatorDataImporter(AbstractImporter):
         self._logger.info('Updated network_imeis table with unseen imeis [{0:d} of {1:d} partitions]'
                           .format(state['num_processed'], state['num_jobs']))
 
+    def _run_network_msisdns_jobs(self, executor, n_partitions):
+        """Update every network_msisdns partition from the MSISDN-sharded staging data, waiting for completion."""
+        futures_to_cb = {}
+        network_msisdns_state = defaultdict(int)
+        network_msisdns_state['num_jobs'] = n_partitions
+        for name, rstart, rend in partition_utils.physical_imei_shards(self._conn, tbl_name='network_msisdns'):
+            f = executor.submit(self._update_network_msisdns, name, rstart, rend)
+            futures_to_cb[f] = partial(self._process_network_msisdns_result, network_msisdns_state)
+
+        for f in futures.as_completed(futures_to_cb):
+            futures_to_cb[f](f)
+
+    def _process_staging_msisdns_result(self, state, future):
+        """Process a staging MSISDN split future, mutating the passed state."""
+        future.result()  # will throw exception if this one was thrown in thread
+        state['num_processed'] += 1
+        self._logger.info('Split staging data by MSISDN shard [{0:d} of {1:d} partitions]'
+                          .format(state['num_processed'], state['num_jobs']))
+
+    def _process_network_msisdns_result(self, state, future):
+        """Process a network_msisdns future, mutating the passed state."""
+        future.result()  # will throw exception if this one was thrown in thread
+        state['num_processed'] += 1
+        self._logger.info('Updated network_msisdns table with seen MSISDNs [{0:d} of {1:d} partitions]'
+                          .format(state['num_processed'], state['num_jobs']))
+
     def _process_monthly_network_triplets_result(self, state, month, year, future):
         """Process a monthly_network_triplet future, mutating the passed state."""
-        inserted_or_updated_triplet_count = future.result()  # will throw exception if this one was thrown in thread
+        # will throw exception if this one was thrown in thread
+        country_inserted_count, inserted_triplet_count, updated_triplet_count = future.result()
         state['num_processed'] += 1
-        state['num_inserted_or_updated'] += inserted_or_updated_triplet_count
+        state['num_inserted'] += inserted_triplet_count
+        state['num_updated'] += updated_triplet_count
+        country_partition = partition_utils.monthly_network_triplets_country_partition(month=month, year=year)
+        per_mno_partition = partition_utils.monthly_network_triplets_per_mno_partition(operator_id=self._operator_id,
+                                                                                       month=month, year=year)
+        state['num_inserted_per_partition'][(country_partition, 'monthly_network_triplets_country')] += \
+            country_inserted_count
+        state['num_inserted_per_partition'][(per_mno_partition, 'monthly_network_triplets_per_mno')] += \
+            inserted_triplet_count
         self._logger.info('Updated monthly_network_triplet tables for {0:02d}/{1:d} [{2:d} of {3:d} partitions]'
                           .format(month, year, state['num_processed'], state['num_jobs']))
 
     def _update_monthly_network_triplets(self, month, year, src_partition, virt_imei_shard_start,
                                          virt_imei_shard_end):
-        """Helper function to update the monthly_network_triplets tables (country and per-MNO)."""
+        """Helper function to update the monthly_network_triplets tables (country and per-MNO).
+
+        The per-operator IMEI-IMSI pairs in monthly_network_imei_imsis are updated from the same aggregated data.
+
+        Returns a tuple of the number of triplets inserted into the country partition and the number of triplets
+        inserted and updated in the per-MNO partition. These are tallied from the upserts themselves using
+        RETURNING (xmax = 0), which is only true for freshly inserted rows.
+        """
         with create_db_connection(self._db_config) as conn, conn.cursor() as cursor:
             start_date, end_date = self._date_range_for_month_year(month, year)
 
@@ -835,16 +946,30 @@ class OperatorDataImporter(AbstractImporter):
                 """  # noqa: Q441
             )
 
+            # Tally of inserted and updated rows, common to both insertions
+            upsert_tally_sql = sql.SQL(
+                """SELECT COUNT(*) FILTER (WHERE inserted) AS num_inserted,
+                          COUNT(*) FILTER (WHERE NOT inserted) AS num_updated
+                     FROM upserted"""
+            )
+
             cursor.execute(
                 sql.SQL(
-                    """INSERT INTO {0} AS target(triplet_year, triplet_month, first_seen, last_seen, date_bitmask,
-                                                 triplet_hash, imei_norm, imsi, msisdn, virt_imei_shard)
-                            SELECT triplet_year, triplet_month, first_seen, last_seen, date_bitmask, triplet_hash,
-                                   imei_norm, imsi, msisdn, virt_imei_shard
-                              FROM {1}
-                                   {2}
+                    """WITH upserted AS (
+                           INSERT INTO {0} AS target(triplet_year, triplet_month, first_seen, last_seen,
+                                                     date_bitmask, triplet_hash, imei_norm, imsi, msisdn,
+                                                     virt_imei_shard)
+                                SELECT triplet_year, triplet_month, first_seen, last_seen, date_bitmask,
+                                       triplet_hash, imei_norm, imsi, msisdn, virt_imei_shard
+                                  FROM {1}
+                                       {2}
+                             RETURNING (xmax = 0) AS inserted
+                       )
+                       {3}
                     """
-                ).format(sql.Identifier(dest_partition), sql.Identifier(aggregated_data_temp_table), on_conflict_sql))
+                ).format(sql.Identifier(dest_partition), sql.Identifier(aggregated_data_temp_table), on_conflict_sql,
+                         upsert_tally_sql))
+            country_inserted_count = cursor.fetchone().num_inserted
 
             # Now insert into the per-MNO table
             base_partition = partition_utils.monthly_network_triplets_per_mno_partition(month=month, year=year,
@@ -854,14 +979,38 @@ class OperatorDataImporter(AbstractImporter):
                                                              virt_imei_range_end=virt_imei_shard_end)
             cursor.execute(
                 sql.SQL(
-                    """INSERT INTO {0} AS target
-                            SELECT *
-                              FROM {1}
-                                   {2}
+                    """WITH upserted AS (
+                           INSERT INTO {0} AS target
+                                SELECT *
+                                  FROM {1}
+                                       {2}
+                             RETURNING (xmax = 0) AS inserted
+                       )
+                       {3}
                     """
-                ).format(sql.Identifier(dest_partition), sql.Identifier(aggregated_data_temp_table), on_conflict_sql))
+                ).format(sql.Identifier(dest_partition), sql.Identifier(aggregated_data_temp_table), on_conflict_sql,
+                         upsert_tally_sql))
+            tally = cursor.fetchone()
 
-            inserted_or_updated_triplet_count = cursor.rowcount
+            # Keep the per-operator IMEI-IMSI pairs used for the overloading histograms up to date
+            base_partition = partition_utils.monthly_network_imei_imsis_partition(month=month, year=year)
+            dest_partition = partition_utils.imei_shard_name(base_name=base_partition,
+                                                             virt_imei_range_start=virt_imei_shard_start,
+                                                             virt_imei_range_end=virt_imei_shard_end)
+            cursor.execute(
+                sql.SQL(
+                    """INSERT INTO {0} AS target(triplet_year, triplet_month, operator_id, pair_hash, imei_norm, imsi,
+                                                 date_bitmask, virt_imei_shard)
+                            SELECT triplet_year, triplet_month, operator_id, hash_triplet(imei_norm, imsi, NULL),
+                                   imei_norm, imsi, bit_or(date_bitmask), virt_imei_shard
+                              FROM {1}
+                          GROUP BY triplet_year, triplet_month, operator_id, imei_norm, imsi, virt_imei_shard
+                                   ON CONFLICT (pair_hash, operator_id)
+                                   DO UPDATE
+                                         SET date_bitmask = target.date_bitmask | excluded.date_bitmask
+                                       WHERE (target.date_bitmask | excluded.date_bitmask) != target.date_bitmask
+                    """  # noqa: Q441
+                ).format(sql.Identifier(dest_partition), sql.Identifier(aggregated_data_temp_table)))
 
             # Update daily_per_mno_hll_sketches table
             hll_partition_base_name = '{0}_{1:02d}_{2:d}'.format(self._staging_hll_sketches_tbl_name, month, year)
@@ -899,7 +1048,27 @@ class OperatorDataImporter(AbstractImporter):
                             sql.Identifier(src_partition)),
                            [self._operator_id, year, month, start_date, end_date])
 
-        return inserted_or_updated_triplet_count
+            # Update the per-TAC IMEI sketches used by the top models reports
+            tac_hll_partition_base_name = '{0}_{1:02d}_{2:d}'.format(self._staging_tac_hll_sketches_tbl_name,
+                                                                     month, year)
+            tac_hll_partition_name = partition_utils.imei_shard_name(base_name=tac_hll_partition_base_name,
+                                                                     virt_imei_range_start=virt_imei_shard_start,
+                                                                     virt_imei_range_end=virt_imei_shard_end)
+            cursor.execute(sql.SQL("""CREATE UNLOGGED TABLE {0} (LIKE {1}) INHERITS ({1})""")
+                           .format(sql.Identifier(tac_hll_partition_name),
+                                   self._staging_tac_hll_sketches_tbl_id))
+
+            cursor.execute(sql.SQL("""
+                INSERT INTO {0} (triplet_year, triplet_month, operator_id, tac, imei_hll)
+                     SELECT triplet_year, triplet_month, operator_id, SUBSTRING(imei_norm, 1, 8),
+                            hll_add_agg(hll_hash_text(imei_norm))
+                       FROM {1}
+                      WHERE imei_norm IS NOT NULL
+                   GROUP BY triplet_year, triplet_month, operator_id, SUBSTRING(imei_norm, 1, 8)
+                """).format(sql.Identifier(tac_hll_partition_name),  # noqa: Q447
+                            sql.Identifier(aggregated_data_temp_table)))
+
+        return country_inserted_count, tally.num_inserted, tally.num_updated
 
     def _month_year_tuples_for_import(self):
         """Helper function to return a set of month/year tuples for a given import."""
@@ -944,8 +1113,16 @@ class OperatorDataImporter(AbstractImporter):
                 indices = partition_utils.monthly_network_triplets_per_mno_indices()
                 partition_utils.add_indices(conn, tbl_name=imei_shard_name, idx_metadata=indices)
 
+            imei_shard_name = partition_utils.monthly_network_imei_imsis_partition(month=month, year=year)
+            cursor.execute(table_exists_sql(), [imei_shard_name])
+            partition_exists = cursor.fetchone()[0]
+            if not partition_exists:
+                partition_utils.create_monthly_network_imei_imsis_partition(conn, month=month, year=year)
+                indices = partition_utils.monthly_network_imei_imsis_indices()
+                partition_utils.add_indices(conn, tbl_name=imei_shard_name, idx_metadata=indices)
+
     def _update_network_imeis(self, src_partition, virt_imei_shard_start, virt_imei_shard_end):
-        """Helper function to update the network_imeis table."""
+        """Helper function to update the network_imeis and network_imeis_per_mno tables."""
         dest_partition = partition_utils.imei_shard_name(base_name='network_imeis',
                                                          virt_imei_range_start=virt_imei_shard_start,
                                                          virt_imei_range_end=virt_imei_shard_end)
@@ -977,6 +1154,70 @@ class OperatorDataImporter(AbstractImporter):
 
             cursor.execute(sql.SQL(query).format(sql.Identifier(dest_partition), sql.Identifier(src_partition)))
 
+            # Track the date each IMEI was first seen on this operator, so that gross adds can be attributed to
+            # operators without probing the monthly_network_triplets partitions
+            per_mno_partition = partition_utils.imei_shard_name(base_name='network_imeis_per_mno',
+                                                                virt_imei_range_start=virt_imei_shard_start,
+                                                                virt_imei_range_end=virt_imei_shard_end)
+            cursor.execute(sql.SQL("""INSERT INTO {0} AS target (imei_norm, operator_id, first_seen, virt_imei_shard)
+                                           SELECT imei_norm, %s, MIN(connection_date), calc_virt_imei_shard(imei_norm)
+                                             FROM {1}
+                                            WHERE imei_norm IS NOT NULL
+                                         GROUP BY imei_norm
+                                                  ON CONFLICT (imei_norm, operator_id)
+                                                  DO UPDATE
+                                                        SET first_seen = excluded.first_seen
+                                                      WHERE excluded.first_seen < target.first_seen
+                                   """).format(sql.Identifier(per_mno_partition), sql.Identifier(src_partition)),
+                           [self._operator_id])
+
+    def _split_staging_msisdns(self, src_partition):
+        """Helper function to aggregate a staging table shard into the MSISDN-sharded staging_msisdns table."""
+        with create_db_connection(self._db_config) as conn, conn.cursor() as cursor:
+            # Since the key includes the IMEI, each IMEI-sharded staging shard can be aggregated on its own
+            cursor.execute(sql.SQL("""INSERT INTO {0} (msisdn, imei_norm, imsi, operator_id, first_seen, last_seen,
+                                                      virt_msisdn_shard)
+                                           SELECT msisdn_norm,
+                                                  imei_norm,
+                                                  imsi_norm,
+                                                  %s,
+                                                  MIN(connection_date),
+                                                  MAX(connection_date),
+                                                  calc_virt_msisdn_shard(msisdn_norm)
+                                             FROM {1}
+                                            WHERE imei_norm IS NOT NULL
+                                              AND msisdn_norm IS NOT NULL
+                                         GROUP BY msisdn_norm, imei_norm, imsi_norm
+                                   """).format(self._staging_msisdns_tbl_id, sql.Identifier(src_partition)),
+                           [self._operator_id])
+
+    def _update_network_msisdns(self, dest_partition, virt_msisdn_shard_start, virt_msisdn_shard_end):
+        """Helper function to update a single partition of the network_msisdns table."""
+        src_partition = partition_utils.imei_shard_name(base_name=self._staging_msisdns_tbl_name,
+                                                        virt_imei_range_start=virt_msisdn_shard_start,
+                                                        virt_imei_range_end=virt_msisdn_shard_end)
+        with create_db_connection(self._db_config) as conn, conn.cursor() as cursor:
+            # A NULL IMSI is not matched by the unique index on the IMSI, so those rows are upserted separately
+            # against the partial unique index that covers them
+            for imsi_filter, conflict_target in [
+                ('imsi IS NOT NULL', '(msisdn, imei_norm, imsi, operator_id)'),
+                ('imsi IS NULL', '(msisdn, imei_norm, operator_id) WHERE imsi IS NULL')
+            ]:
+                cursor.execute(sql.SQL("""INSERT INTO {0} AS target
+                                               SELECT *
+                                                 FROM {1}
+                                                WHERE {2}
+                                                      ON CONFLICT {3}
+                                                      DO UPDATE
+                                                            SET first_seen = LEAST(excluded.first_seen,
+                                                                                   target.first_seen),
+                                                                last_seen = GREATEST(excluded.last_seen,
+                                                                                     target.last_seen)
+                                                          WHERE excluded.first_seen < target.first_seen
+                                                             OR excluded.last_seen > target.last_seen
+                                       """).format(sql.Identifier(dest_partition), sql.Identifier(src_partition),
+                                                   sql.SQL(imsi_filter), sql.SQL(conflict_target)))
+
     def _output_stats(self, rows_before, rows_inserted, rows_updated, row_deleted):
         """Overrides AbstractImporter._output_stats."""
         assert rows_before == -1 and 'rows_before should not be -1'
@@ -37,6 +37,8 @@ import re
 import contextlib
 import zipfile
 import glob
+import itertools
+import string
 from functools import partial
 from concurrent import futures
 import csv
@@ -279,6 +281,29 @@ class ListsGenerator:
         """Per-MNO exceptions list partition name."""
         return '{0}_{1}'.format(self._exceptions_lists_tblname, operator_id)
 
+    @property
+    def _blacklist_snapshot_tblname(self):
+        """Table name for the snapshot of the current blacklist."""
+        return 'current_blacklist'
+
+    @property
+    def _notifications_lists_snapshot_tblname(self):
+        """Table name for the snapshot of the current notifications lists."""
+        return 'current_notifications_lists'
+
+    def _notifications_lists_snapshot_part_tblname(self, operator_id):
+        """Per-MNO notifications list snapshot partition name."""
+        return '{0}_{1}'.format(self._notifications_lists_snapshot_tblname, operator_id)
+
+    @property
+    def _exceptions_lists_snapshot_tblname(self):
+        """Table name for the snapshot of the current exceptions lists."""
+        return 'current_exceptions_lists'
+
+    def _exceptions_lists_snapshot_part_tblname(self, operator_id):
+        """Per-MNO exceptions list snapshot partition name."""
+        return '{0}_{1}'.format(self._exceptions_lists_snapshot_tblname, operator_id)
+
     @property
     def _blacklist_old_tblname(self):
         """Name to use for the temporary base blacklist used for generating the delta."""
@@ -358,6 +383,11 @@ class ListsGenerator:
         """Name to use for the intermediate MCC-MNC -> operator lookup table."""
         return 'listgen_temp_{0}_new_mcc_mnc_table'.format(self._run_id)
 
+    @property
+    def _imsi_prefix_len(self):
+        """Length of the IMSI prefix used to look up the home operator (MCC plus the longest MNC by default)."""
+        return max([6] + [len(p['mcc'] + p['mnc']) for op in self._operators for p in op.mcc_mnc_pairs])
+
     @property
     def _notifications_imei_new_tblname(self):
         """Name to use for the intermediate IMEIs to notify table."""
@@ -458,8 +488,9 @@ class ListsGenerator:
     def _queue_intermediate_table_job(self, executor, futures_to_cb, fn, description):
         """Function to queue a job to calculate an intermediate table."""
         self._logger.debug('Calculating intermediate table containing {0} [QUEUED]...'.format(description))
-        futures_to_cb[executor.submit(fn, executor)] = partial(self._process_intermediate_table_job_result,
-                                                               description)
+        future = executor.submit(fn, executor)
+        futures_to_cb[future] = partial(self._process_intermediate_table_job_result, description)
+        return future
 
     def _process_intermediate_table_job_result(self, description, future):
         """Function to process the results of a job to calculate an intermediate table."""
@@ -516,20 +547,41 @@ class ListsGenerator:
                                                  description='blocking conditions')
                 self._run_intermediate_table_job(self._conn, self._populate_mcc_mnc_table,
                                                  description='MCC-MNC operator mappings')
-                # Create new blacklist table
-                self._run_intermediate_table_job(self._conn, self._populate_new_blacklist,
-                                                 description='IMEIs to blacklist')
+                num_phys_shards = partition_utils.num_physical_imei_shards(self._conn)
+                curr_date = self._blocking_curr_date()
 
-            # Create required notifications and pairings tables in parallel before we can kick off the per-MNO
-            # pairing and and notifications. These jobs have the responsibilities of kicking off those per-MNO jobs
+            # Populate the new blacklist in parallel, one job per physical IMEI shard. These are queued first so that
+            # they are picked up by the thread pool ahead of the jobs below which wait on them
             futures_to_cb = {}
+            blacklist_shard_jobs = {}
+            virt_imei_shard_ranges = partition_utils.virt_imei_shard_bounds(num_phys_shards)
+            for shard_num, shard_range in enumerate(virt_imei_shard_ranges, start=1):
+                virt_imei_range_start, virt_imei_range_end = shard_range
+                future = self._queue_intermediate_table_job(executor,
+                                                            futures_to_cb,
+                                                            partial(self._populate_new_blacklist_single_shard,
+                                                                    virt_imei_range_start,
+                                                                    virt_imei_range_end,
+                                                                    curr_date),
+                                                            'IMEIs to blacklist (shard {shard_num} of '
+                                                            '{num_phys_shards})'
+                                                            .format(shard_num=shard_num,
+                                                                    num_phys_shards=num_phys_shards))
+                blacklist_shard_jobs[future] = (shard_num, virt_imei_range_start, virt_imei_range_end)
+
+            # Create required notifications and pairings tables in parallel before we can kick off the per-MNO
+            # pairing and and notifications. These jobs have the responsibilities of kicking off those per-MNO jobs.
+            # The notifications job works shard by shard as each blacklist shard completes, whereas the exceptions
+            # job needs the whole blacklist before it can start
             self._queue_intermediate_table_job(executor,
                                                futures_to_cb,
-                                               self._populate_new_notifications_lists,
+                                               partial(self._populate_new_notifications_lists,
+                                                       blacklist_shard_jobs,
+                                                       curr_date),
                                                'per-MNO notifications for all operators')
             self._queue_intermediate_table_job(executor,
                                                futures_to_cb,
-                                               self._populate_new_exceptions_lists,
+                                               partial(self._populate_new_exceptions_lists, blacklist_shard_jobs),
                                                'per-MNO exceptions for all operators')
             self._wait_for_futures(futures_to_cb)
 
@@ -600,7 +652,7 @@ class ListsGenerator:
 
             tblname = self._mnc_mcc_new_tblname
             cursor.execute(sql.SQL("""CREATE UNLOGGED TABLE {0} (
-                                          mcc_mnc_pattern       TEXT NOT NULL,
+                                          imsi_prefix           TEXT NOT NULL,
                                           operator_id           TEXT NOT NULL
                                       )""")
                            .format(sql.Identifier(tblname)))
@@ -674,29 +726,55 @@ class ListsGenerator:
         return num_records, cp.duration
 
     def _populate_mcc_mnc_table(self, conn):
-        """Function to populate the MCC-MNC -> operator ID lookup table for this run."""
+        """Function to populate the IMSI prefix -> operator ID lookup table for this run.
+
+        Each configured MCC-MNC is expanded to all the fixed-length IMSI prefixes starting with it, so that the home
+        operator of an IMSI can be found with an exact match on its leading digits. As no configured MCC-MNC can
+        start with another one, each prefix maps to at most one operator.
+        """
+        imsi_prefix_len = self._imsi_prefix_len
+        imsi_prefixes = []
+        for op in self._operators:
+            for p in op.mcc_mnc_pairs:
+                mcc_mnc = p['mcc'] + p['mnc']
+                for suffix in itertools.product(string.digits, repeat=imsi_prefix_len - len(mcc_mnc)):
+                    imsi_prefixes.append((mcc_mnc + ''.join(suffix), op.id))
+
         with conn.cursor() as cursor, CodeProfiler() as cp:
             tblname = self._mnc_mcc_new_tblname
             execute_values(cursor,
-                           sql.SQL("""INSERT INTO {0}(mcc_mnc_pattern, operator_id)
+                           sql.SQL("""INSERT INTO {0}(imsi_prefix, operator_id)
                                            VALUES %s""").format(sql.Identifier(tblname)).as_string(cursor),
-                           [(p['mcc'] + p['mnc'] + '%', op.id) for op in self._operators for p in op.mcc_mnc_pairs])
-            self._add_pk(conn, tblname=tblname, pk_columns=['mcc_mnc_pattern'])
+                           imsi_prefixes)
+            self._add_pk(conn, tblname=tblname, pk_columns=['imsi_prefix'])
             self._analyze_helper(cursor, tblname)
 
         # Need to get table count since execute_values doesn't retain insert count
         num_records = self._get_total_record_count(conn, tblname)
         return num_records, cp.duration
 
-    def _populate_new_blacklist(self, conn):
-        """Function to create and generate the blacklisted IMEIs temp table for this run."""
-        with CodeProfiler() as cp:
-            tblname = self._blacklist_new_tblname
-            num_records = self._populate_new_blacklist_or_notifications_imei_table(conn,
-                                                                                   tblname, is_blacklist=True)
+    def _populate_new_blacklist_single_shard(self, virt_imei_range_start, virt_imei_range_end, curr_date, executor):
+        """Function to generate a single IMEI shard of the blacklisted IMEIs temp table for this run."""
+        with create_db_connection(self._config.db_config) as conn, CodeProfiler() as cp:
+            num_records = self._populate_new_blacklist_or_notifications_imei_shard(conn,
+                                                                                   virt_imei_range_start,
+                                                                                   virt_imei_range_end,
+                                                                                   curr_date,
+                                                                                   is_blacklist=True)
 
         return num_records, cp.duration
 
+    def _blocking_curr_date(self):
+        """Function to get the current date for the purposes of blacklisting and notifications."""
+        # Most of the time, there is no curr_date and we use the date of the run
+        if self._curr_date is not None:
+            return self._curr_date
+
+        # Query for metadata date for this run_id
+        job_start_time = metadata.job_start_time_by_run_id(self._metadata_conn, self._run_id)
+        assert job_start_time is not None
+        return job_start_time.date()
+
     @property
     def _is_valid_and_check_digit_queries(self):
         """Property generating a tuple of queries to generate is_valid and imei_norm_with_check_digit values."""
@@ -734,24 +812,35 @@ class ListsGenerator:
             barred_filter_sql = sql.SQL('TRUE')
         return barred_filter_sql
 
-    def _populate_new_blacklist_or_notifications_imei_table(self, conn, tblname, *, is_blacklist):
-        """Helper function to DRY out populating either an IMEI table for blacklist or notifications."""
+    def _populate_new_blacklist_or_notifications_imei_shard(self, conn, virt_imei_range_start, virt_imei_range_end,
+                                                            curr_date, *, is_blacklist):
+        """Helper function to DRY out populating a single IMEI shard of either the blacklist or notifications."""
         is_valid_query, imei_norm_with_check_digit_query = self._is_valid_and_check_digit_queries
 
         if is_blacklist:
-            block_date_filter = sql.SQL('block_date <= %s')
+            base_tblname = self._blacklist_new_tblname
+            block_date_filter = sql.SQL('block_date <= %(curr_date)s')
             exclude_blacklisted_imeis_query = sql.SQL('')
             include_amnesty_column = sql.SQL('')
 
         else:
-            block_date_filter = sql.SQL('block_date > %s')
+            base_tblname = self._notifications_imei_new_tblname
+            block_date_filter = sql.SQL('block_date > %(curr_date)s')
+            # An IMEI always maps to the same virtual shard, so only the matching blacklist shard needs to be checked
+            blacklist_shard = partition_utils.imei_shard_name(base_name=self._blacklist_new_tblname,
+                                                              virt_imei_range_start=virt_imei_range_start,
+                                                              virt_imei_range_end=virt_imei_range_end)
             exclude_blacklisted_imeis_query = \
                 sql.SQL("""AND NOT EXISTS (SELECT 1
-                                             FROM {blacklist_tblname}
+                                             FROM {blacklist_shard}
                                             WHERE imei_norm = cs.imei_norm)""").format(
-                    blacklist_tblname=sql.Identifier(self._blacklist_new_tblname))
+                    blacklist_shard=sql.Identifier(blacklist_shard))
             include_amnesty_column = sql.SQL(', amnesty_granted')
 
+        tblname = partition_utils.imei_shard_name(base_name=base_tblname,
+                                                  virt_imei_range_start=virt_imei_range_start,
+                                                  virt_imei_range_end=virt_imei_range_end)
+
         # Populate table
         query = sql.SQL("""INSERT INTO {tblname}(imei_norm,
                                                  virt_imei_shard,
@@ -778,10 +867,12 @@ class ListsGenerator:
                                                  USING (cond_name)
                                                  WHERE end_date IS NULL
                                                    AND block_date IS NOT NULL
-                                                   AND {block_date_filter}) cs
+                                                   AND {block_date_filter}
+                                                   AND virt_imei_shard >= %(virt_imei_range_start)s
+                                                   AND virt_imei_shard < %(virt_imei_range_end)s) cs
                                          WHERE NOT EXISTS(SELECT 1
                                                             FROM golden_list gl
-                                                           WHERE hashed_imei_norm = md5(cs.imei_norm)::UUID)
+                                                           WHERE gl.hashed_imei_norm = cs.hashed_imei_norm)
                                                {exclude_blacklisted_imeis_query}
                                       GROUP BY imei_norm) bl_imeis,
                                        LATERAL ({is_valid_query}) is_valid_tbl,
@@ -794,56 +885,47 @@ class ListsGenerator:
                                     block_date_filter=block_date_filter,
                                     exclude_blacklisted_imeis_query=exclude_blacklisted_imeis_query)
 
-        # Get current date for the purposes of blacklisting. Most of the time, this will be NULL and use the date
-        # of the run
-        if self._curr_date is not None:
-            curr_date = self._curr_date
-        else:
-            # Query for metadata date for this run_id
-            job_start_time = metadata.job_start_time_by_run_id(self._metadata_conn, self._run_id)
-            assert job_start_time is not None
-            curr_date = job_start_time.date()
-
         with conn.cursor() as cursor:
-            cursor.execute(query, [curr_date])
+            cursor.execute(query, {'curr_date': curr_date,
+                                   'virt_imei_range_start': virt_imei_range_start,
+                                   'virt_imei_range_end': virt_imei_range_end})
             num_records = cursor.rowcount
             self._add_pk(conn, tblname=tblname, pk_columns=['imei_norm'])
             self._analyze_helper(cursor, tblname)
             return num_records
 
-    def _populate_new_notifications_lists(self, executor):
+    def _populate_new_notifications_lists(self, blacklist_shard_jobs, curr_date, executor):
         """Top-level job function to populate per-MNO notification lists."""
         with create_db_connection(self._config.db_config) as conn, CodeProfiler() as cp:
-            # First generate the table of IMEIs to notify and commit so that other tables can see results
-            with conn:
-                self._run_intermediate_table_job(conn,
-                                                 self._populate_new_notifications_imei_table,
-                                                 description='IMEIS to notify')
-
-            # Queue jobs to calculate the triplets to notify. This is done in parallel as this tends to be the
-            # slowest part of the list generation process
-            num_phys_shards = partition_utils.num_physical_imei_shards(conn)
-            virt_imei_shard_ranges = partition_utils.virt_imei_shard_bounds(num_phys_shards)
+            # Queue jobs to calculate the IMEIs and triplets to notify for each shard and allocate them to the per-MNO
+            # lists as soon as the corresponding blacklist shard is done. This is done in parallel as this tends to be
+            # the slowest part of the list generation process
+            num_phys_shards = len(blacklist_shard_jobs)
             per_shard_jobs = {}
-            for shard_num, shard_range in enumerate(virt_imei_shard_ranges, start=1):
-                virt_imei_range_start, virt_imei_range_end = shard_range
+            for blacklist_future in futures.as_completed(blacklist_shard_jobs):
+                # Raises if the blacklist shard failed. The result itself is processed by the main thread
+                blacklist_future.result()
+                shard_num, virt_imei_range_start, virt_imei_range_end = blacklist_shard_jobs[blacklist_future]
                 self._queue_intermediate_table_job(executor,
                                                    per_shard_jobs,
-                                                   partial(self._populate_new_notifications_triplets_single_shard,
+                                                   partial(self._populate_new_notifications_single_shard,
                                                            virt_imei_range_start,
-                                                           virt_imei_range_end),
-                                                   'triplets to notify (shard {shard_num} of {num_phys_shards})'
+                                                           virt_imei_range_end,
+                                                           curr_date),
+                                                   'IMEIs, triplets and per-MNO notifications (shard {shard_num} of '
+                                                   '{num_phys_shards})'
                                                    .format(shard_num=shard_num, num_phys_shards=num_phys_shards))
 
             self._wait_for_futures(per_shard_jobs)
 
-            # Now that we have calculate all the prerequisites, populate each MNO's notification list in parallel
+            # Each shard job above has already allocated its triplets to the per-MNO notification lists, so all that
+            # is left is to add the primary key to each MNO's notification list in parallel
             per_mno_jobs = {}
             for op in self._operators:
                 self._queue_intermediate_table_job(executor,
                                                    per_mno_jobs,
-                                                   partial(self._populate_new_notifications_list, op.id),
-                                                   'per-MNO notifications for {0}'.format(op.id))
+                                                   partial(self._add_new_notifications_list_pk, op.id),
+                                                   'per-MNO notifications for {0} (primary key)'.format(op.id))
             self._wait_for_futures(per_mno_jobs)
 
             # ANALYZE parent table, which analyzes children as well
@@ -852,26 +934,44 @@ class ListsGenerator:
 
         return -1, cp.duration
 
-    def _populate_new_notifications_imei_table(self, conn):
-        """Function to populate the new table of unique IMEIs to notify."""
-        with CodeProfiler() as cp:
-            tblname = self._notifications_imei_new_tblname
-            num_records = self._populate_new_blacklist_or_notifications_imei_table(conn, tblname, is_blacklist=False)
+    def _populate_new_notifications_single_shard(self, virt_imei_range_start, virt_imei_range_end, curr_date,
+                                                 executor):
+        """Job function to populate a single IMEI shard of the IMEIs, triplets and per-MNO lists to notify."""
+        with create_db_connection(self._config.db_config) as conn, CodeProfiler() as cp:
+            # Commit so that the triplets query sees a fully analyzed IMEI shard
+            with conn:
+                num_records = self._populate_new_blacklist_or_notifications_imei_shard(conn,
+                                                                                       virt_imei_range_start,
+                                                                                       virt_imei_range_end,
+                                                                                       curr_date,
+                                                                                       is_blacklist=False)
+            self._logger.info('Calculated IMEIs to notify for virtual IMEI shards [{0:d}, {1:d}) [{2:d} rows '
+                              'inserted]'.format(virt_imei_range_start, virt_imei_range_end, num_records))
+            with conn:
+                num_records = self._populate_new_notifications_triplets_single_shard(conn,
+                                                                                     virt_imei_range_start,
+                                                                                     virt_imei_range_end)
+            with conn:
+                num_routed_records = self._route_new_notifications_triplets_single_shard(conn,
+                                                                                         virt_imei_range_start,
+                                                                                         virt_imei_range_end)
+            self._logger.info('Allocated triplets to notify for virtual IMEI shards [{0:d}, {1:d}) to per-MNO '
+                              'notifications lists [{2:d} rows inserted]'
+                              .format(virt_imei_range_start, virt_imei_range_end, num_routed_records))
 
         return num_records, cp.duration
 
     @property
-    def _home_network_query(self):
-        """Property generating a query to find the home network in the MCC-MNC table."""
-        return sql.SQL("""SELECT operator_id
-                            FROM {mcc_mnc_table}
-                           WHERE imsi LIKE mcc_mnc_pattern
-                           LIMIT 1
-                       """).format(mcc_mnc_table=sql.Identifier(self._mnc_mcc_new_tblname))
-
-    def _populate_new_notifications_triplets_single_shard(self, virt_imei_range_start, virt_imei_range_end, executor):
-        """Function to create and generate the new table of unique IMEI/IMSI/MSISDN notifications triplets."""
-        with create_db_connection(self._config.db_config) as conn, conn.cursor() as cursor, CodeProfiler() as cp:
+    def _home_network_join_query(self):
+        """Property generating a join to find the home network of an IMSI in the IMSI prefix lookup table."""
+        return sql.SQL("""LEFT JOIN {imsi_prefix_table} home_network_tbl
+                                 ON home_network_tbl.imsi_prefix = LEFT(imsi, {imsi_prefix_len})
+                       """).format(imsi_prefix_table=sql.Identifier(self._mnc_mcc_new_tblname),
+                                   imsi_prefix_len=sql.Literal(self._imsi_prefix_len))
+
+    def _populate_new_notifications_triplets_single_shard(self, conn, virt_imei_range_start, virt_imei_range_end):
+        """Function to generate a single IMEI shard of the new unique IMEI/IMSI/MSISDN notifications triplets table."""
+        with conn.cursor() as cursor:
             notifications_imeis_shard = \
                 partition_utils.imei_shard_name(base_name=self._notifications_imei_new_tblname,
                                                 virt_imei_range_start=virt_imei_range_start,
@@ -927,8 +1027,7 @@ class ListsGenerator:
                           FROM {notifications_imeis_shard}
                     INNER JOIN monthly_network_triplets_per_mno network_triplets
                          USING (imei_norm)
-                     LEFT JOIN LATERAL ({home_network_query}) home_network_tbl
-                               ON TRUE
+                               {home_network_join_query}
                          WHERE NOT EXISTS (SELECT 1
                                              FROM {pairing_list_shard}
                                             WHERE end_date IS NULL
@@ -947,7 +1046,7 @@ class ListsGenerator:
                 """).format(notifications_triplets_shard=sql.Identifier(notifications_triplets_shard),  # noqa: Q447
                             notifications_imeis_shard=sql.Identifier(notifications_imeis_shard),
                             pairing_list_shard=sql.Identifier(pairing_list_shard),
-                            home_network_query=self._home_network_query,
+                            home_network_join_query=self._home_network_join_query,
                             notify_filter=imsi_change_filter)
 
             lookback_end_date = compute_analysis_end_date(conn, self._curr_date)
@@ -962,48 +1061,68 @@ class ListsGenerator:
             num_records = cursor.rowcount
             self._add_pk(conn, tblname=notifications_triplets_shard, pk_columns=['imei_norm', 'imsi', 'msisdn'])
 
-        return num_records, cp.duration
+        return num_records
 
-    def _populate_new_notifications_list(self, operator_id, executor):
-        """Function to allocate new notifications triplets to new per-MNO notifications list tables."""
-        with create_db_connection(self._config.db_config) as conn, conn.cursor() as cursor, CodeProfiler() as cp:
-            operator_partition_name = self._notifications_lists_new_part_tblname(operator_id)
-            notifications_triplets_tblname = self._notifications_triplets_new_tblname
-            cursor.execute(sql.SQL("""INSERT INTO {operator_partition_name}(imei_norm,
-                                                                            virt_imei_shard,
-                                                                            imsi,
-                                                                            msisdn,
-                                                                            block_date,
-                                                                            reasons,
-                                                                            operator_id,
-                                                                            is_valid,
-                                                                            amnesty_granted,
-                                                                            imei_norm_with_check_digit)
+    def _route_new_notifications_triplets_single_shard(self, conn, virt_imei_range_start, virt_imei_range_end):
+        """Function to allocate a single IMEI shard of new notifications triplets to the per-MNO notifications lists.
+
+        The shard is read once and each triplet is inserted via the parent table, which routes it to the partition
+        for its home operator or, if the home operator is unknown, to the partition of each operator it was seen on.
+        """
+        notifications_triplets_shard = \
+            partition_utils.imei_shard_name(base_name=self._notifications_triplets_new_tblname,
+                                            virt_imei_range_start=virt_imei_range_start,
+                                            virt_imei_range_end=virt_imei_range_end)
+        with conn.cursor() as cursor:
+            cursor.execute(sql.SQL("""INSERT INTO {notifications_lists_tblname}(imei_norm,
+                                                                                virt_imei_shard,
+                                                                                imsi,
+                                                                                msisdn,
+                                                                                block_date,
+                                                                                reasons,
+                                                                                operator_id,
+                                                                                is_valid,
+                                                                                amnesty_granted,
+                                                                                imei_norm_with_check_digit)
                                            SELECT imei_norm,
                                                   virt_imei_shard,
                                                   imsi,
                                                   msisdn,
                                                   block_date,
                                                   reasons,
-                                                  %s,
+                                                  routed_operator,
                                                   is_valid,
                                                   amnesty_granted,
                                                   imei_norm_with_check_digit
-                                             FROM {notifications_tblname}
-                                            WHERE home_operator = %s
-                                               OR (home_operator IS NULL
-                                              AND %s = ANY(fallback_operators))
-                                   """).format(operator_partition_name=sql.Identifier(operator_partition_name),
-                                               notifications_tblname=sql.Identifier(notifications_triplets_tblname)),
-                           [operator_id, operator_id, operator_id])
-            num_records = cursor.rowcount
+                                             FROM {notifications_triplets_shard},
+                                                  LATERAL unnest(CASE WHEN home_operator IS NOT NULL
+                                                                      THEN ARRAY[home_operator]
+                                                                      ELSE fallback_operators
+                                                                  END) routed_operator
+                                            WHERE routed_operator = ANY(%s)
+                                   """).format(notifications_lists_tblname=sql.Identifier(
+                                               self._notifications_lists_new_tblname),
+                                               notifications_triplets_shard=sql.Identifier(
+                                                   notifications_triplets_shard)),
+                           [[op.id for op in self._operators]])
+            return cursor.rowcount
+
+    def _add_new_notifications_list_pk(self, operator_id, executor):
+        """Function to add the primary key to a new per-MNO notifications list table once it is populated."""
+        with create_db_connection(self._config.db_config) as conn, CodeProfiler() as cp:
+            operator_partition_name = self._notifications_lists_new_part_tblname(operator_id)
             self._add_pk(conn, tblname=operator_partition_name, pk_columns=['imei_norm', 'imsi', 'msisdn'])
 
-        return num_records, cp.duration
+        return -1, cp.duration
 
-    def _populate_new_exceptions_lists(self, executor):
+    def _populate_new_exceptions_lists(self, blacklist_shard_jobs, executor):
         """Top-level job function to create the new per-MNO pairings lists."""
         with create_db_connection(self._config.db_config) as conn, CodeProfiler() as cp:
+            # The pairings table checks against the whole blacklist, so wait for every shard of it. Calling result()
+            # raises if any shard failed. The results themselves are processed by the main thread
+            for blacklist_future in futures.as_completed(blacklist_shard_jobs):
+                blacklist_future.result()
+
             # Commit so that queued jobs can see results
             with conn:
                 # First generate the table of IMEI/IMSIs to pair, along with home network.
@@ -1075,26 +1194,25 @@ class ListsGenerator:
                                            imsi,
                                            is_valid,
                                            imei_norm_with_check_digit,
-                                           operator_id,
+                                           home_network_tbl.operator_id,
                                            is_blacklisted,
                                            is_barred,
                                            have_barred_tac,
                                            msisdn
-                                      FROM pairing_list pl,
+                                      FROM pairing_list pl
+                                           {home_network_join_query},
                                            LATERAL ({is_valid_query}) is_valid_tbl,
                                            LATERAL ({imei_norm_with_check_digit_query}) check_digit_tbl,
                                            LATERAL ({is_blacklisted_query}) is_blacklisted_tbl,
                                            LATERAL ({is_barred_query}) is_barred_tbl,
                                            LATERAL ({have_barred_tac_query}) have_barred_tac_tbl
-                                 LEFT JOIN LATERAL ({home_network_query}) home_network_tbl
-                                           ON TRUE
                             """).format(tblname=sql.Identifier(tblname),
                                         is_valid_query=is_valid_query,
                                         imei_norm_with_check_digit_query=imei_norm_with_check_digit_query,
                                         is_blacklisted_query=is_blacklisted_query,
                                         is_barred_query=is_barred_query,
                                         have_barred_tac_query=have_barred_tac_query,
-                                        home_network_query=self._home_network_query)
+                                        home_network_join_query=self._home_network_join_query)
 
             cursor.execute(query)
             num_records = cursor.rowcount
@@ -1226,8 +1344,9 @@ class ListsGenerator:
             tblname = self._blacklist_old_tblname
             cursor.execute(sql.SQL("""INSERT INTO {0}(imei_norm, virt_imei_shard, block_date, reasons)
                                            SELECT imei_norm, virt_imei_shard, block_date, reasons
-                                             FROM gen_blacklist()
-                                   """).format(sql.Identifier(tblname)))
+                                             FROM {1}
+                                   """).format(sql.Identifier(tblname),
+                                               sql.Identifier(self._blacklist_snapshot_tblname)))
             num_records = cursor.rowcount
             self._add_pk(conn, tblname=tblname, pk_columns=['imei_norm'])
             self._analyze_helper(cursor, tblname)
@@ -1239,10 +1358,12 @@ class ListsGenerator:
         with create_db_connection(self._config.db_config) as conn, conn.cursor() as cursor, CodeProfiler() as cp:
             tblname = self._exceptions_lists_old_part_tblname(operator_id)
             cursor.execute(sql.SQL("""INSERT INTO {0}(operator_id, imei_norm, virt_imei_shard, imsi, msisdn)
-                                           SELECT %s, imei_norm, virt_imei_shard, imsi, msisdn
-                                             FROM gen_exceptions_list(%s)
-                                   """).format(sql.Identifier(tblname)),
-                           [operator_id, operator_id])
+                                           SELECT operator_id, imei_norm, virt_imei_shard, imsi, msisdn
+                                             FROM {1}
+                                            WHERE operator_id = %s
+                                   """).format(sql.Identifier(tblname),
+                                               sql.Identifier(self._exceptions_lists_snapshot_tblname)),
+                           [operator_id])
             num_records = cursor.rowcount
             self._add_pk(conn, tblname=tblname, pk_columns=['imei_norm', 'imsi', 'msisdn'])
 
@@ -1260,11 +1381,13 @@ class ListsGenerator:
                                                       block_date,
                                                       reasons,
                                                       amnesty_granted)
-                                           SELECT %s, imei_norm, virt_imei_shard, imsi, msisdn, block_date, reasons,
-                                                  amnesty_granted
-                                             FROM gen_notifications_list(%s)
-                                   """).format(sql.Identifier(tblname)),
-                           [operator_id, operator_id])
+                                           SELECT operator_id, imei_norm, virt_imei_shard, imsi, msisdn, block_date,
+                                                  reasons, amnesty_granted
+                                             FROM {1}
+                                            WHERE operator_id = %s
+                                   """).format(sql.Identifier(tblname),
+                                               sql.Identifier(self._notifications_lists_snapshot_tblname)),
+                           [operator_id])
             num_records = cursor.rowcount
             self._add_pk(conn, tblname=tblname, pk_columns=['imei_norm', 'imsi', 'msisdn'])
 
@@ -1625,6 +1748,8 @@ class ListsGenerator:
             with conn.cursor() as cursor:
                 self._analyze_helper(cursor, self._notifications_lists_tblname)
                 self._analyze_helper(cursor, self._exceptions_lists_tblname)
+                self._analyze_helper(cursor, self._notifications_lists_snapshot_tblname)
+                self._analyze_helper(cursor, self._exceptions_lists_snapshot_tblname)
 
     def _create_missing_delta_storage_partitions(self, conn):
         """Loops through the operators and makes sure we have a notifications/exception partition available."""
@@ -1641,6 +1766,17 @@ class ListsGenerator:
                                                  allow_existing=True,
                                                  fillfactor=45)
 
+            for parent_name, child_name_fn in [(self._notifications_lists_snapshot_tblname,
+                                                self._notifications_lists_snapshot_part_tblname),
+                                               (self._exceptions_lists_snapshot_tblname,
+                                                self._exceptions_lists_snapshot_part_tblname)]:
+                self._create_operator_partitions(conn,
+                                                 parent_tbl_name=parent_name,
+                                                 child_name_fn=child_name_fn,
+                                                 is_unlogged=False,
+                                                 allow_existing=True,
+                                                 fillfactor=80)
+
         return -1, cp.duration
 
     def _create_missing_notifications_partition_indices(self, conn, operator_id):
@@ -1653,6 +1789,10 @@ class ListsGenerator:
                                                            is_unique=True,
                                                            partial_sql='WHERE end_run_id IS NULL')]
             partition_utils.add_indices(conn, tbl_name=tbl_name, idx_metadata=idx_metadata, if_not_exists=True)
+            partition_utils.add_indices(conn,
+                                        tbl_name=self._notifications_lists_snapshot_part_tblname(operator_id),
+                                        idx_metadata=partition_utils.per_mno_lists_snapshot_indices(),
+                                        if_not_exists=True)
 
         return -1, cp.duration
 
@@ -1666,6 +1806,10 @@ class ListsGenerator:
                                                            is_unique=True,
                                                            partial_sql='WHERE end_run_id IS NULL')]
             partition_utils.add_indices(conn, tbl_name=tbl_name, idx_metadata=idx_metadata, if_not_exists=True)
+            partition_utils.add_indices(conn,
+                                        tbl_name=self._exceptions_lists_snapshot_part_tblname(operator_id),
+                                        idx_metadata=partition_utils.per_mno_lists_snapshot_indices(),
+                                        if_not_exists=True)
 
         return -1, cp.duration
 
@@ -1704,7 +1848,19 @@ class ListsGenerator:
                                    """).format(tbl=tbl, delta_tbl=delta_tbl),
                            [self._run_id])
             per_type_counts['new'] = cursor.rowcount
+            # Keep the snapshot of the current blacklist in step with the history table in the same transaction
+            snapshot_tbl = sql.Identifier(self._blacklist_snapshot_tblname)
+            cursor.execute(sql.SQL("""DELETE FROM {snapshot_tbl} bs
+                                       USING {delta_tbl} delta
+                                       WHERE bs.imei_norm = delta.imei_norm
+                                   """).format(snapshot_tbl=snapshot_tbl, delta_tbl=delta_tbl))
+            cursor.execute(sql.SQL("""INSERT INTO {snapshot_tbl}(imei_norm, virt_imei_shard, block_date, reasons)
+                                           SELECT imei_norm, virt_imei_shard, block_date, reasons
+                                             FROM {delta_tbl}
+                                            WHERE delta_reason != 'unblocked'
+                                   """).format(snapshot_tbl=snapshot_tbl, delta_tbl=delta_tbl))
             self._analyze_helper(cursor, self._blacklist_tblname)
+            self._analyze_helper(cursor, self._blacklist_snapshot_tblname)
 
         return per_type_counts, cp.duration
 
@@ -1754,6 +1910,27 @@ class ListsGenerator:
                                    """).format(tbl=tbl, delta_tbl=delta_tbl),
                            [self._run_id])
             per_type_counts['new'] = cursor.rowcount
+            # Keep the snapshot of the current notifications list in step with the history table
+            snapshot_tbl = sql.Identifier(self._notifications_lists_snapshot_part_tblname(operator_id))
+            cursor.execute(sql.SQL("""DELETE FROM {snapshot_tbl} ns
+                                       USING {delta_tbl} delta
+                                       WHERE ns.imei_norm = delta.imei_norm
+                                         AND ns.imsi = delta.imsi
+                                         AND ns.msisdn = delta.msisdn
+                                   """).format(snapshot_tbl=snapshot_tbl, delta_tbl=delta_tbl))
+            cursor.execute(sql.SQL("""INSERT INTO {snapshot_tbl}(operator_id,
+                                                                 imei_norm,
+                                                                 virt_imei_shard,
+                                                                 imsi,
+                                                                 msisdn,
+                                                                 block_date,
+                                                                 reasons,
+                                                                 amnesty_granted)
+                                           SELECT operator_id, imei_norm, virt_imei_shard, imsi, msisdn, block_date,
+                                                  reasons, amnesty_granted
+                                             FROM {delta_tbl}
+                                            WHERE delta_reason NOT IN ('resolved', 'blacklisted')
+                                   """).format(snapshot_tbl=snapshot_tbl, delta_tbl=delta_tbl))
             self._create_missing_notifications_partition_indices(conn, operator_id)
 
         return per_type_counts, cp.duration
@@ -1792,6 +1969,19 @@ class ListsGenerator:
                                    """).format(tbl=tbl, delta_tbl=delta_tbl),
                            [self._run_id])
             per_type_counts['new'] = cursor.rowcount
+            # Keep the snapshot of the current exceptions list in step with the history table
+            snapshot_tbl = sql.Identifier(self._exceptions_lists_snapshot_part_tblname(operator_id))
+            cursor.execute(sql.SQL("""DELETE FROM {snapshot_tbl} es
+                                       USING {delta_tbl} delta
+                                       WHERE es.imei_norm = delta.imei_norm
+                                         AND es.imsi = delta.imsi
+                                         AND es.msisdn = delta.msisdn
+                                   """).format(snapshot_tbl=snapshot_tbl, delta_tbl=delta_tbl))
+            cursor.execute(sql.SQL("""INSERT INTO {snapshot_tbl}(operator_id, imei_norm, virt_imei_shard, imsi, msisdn)
+                                           SELECT operator_id, imei_norm, virt_imei_shard, imsi, msisdn
+                                             FROM {delta_tbl}
+                                            WHERE delta_reason != 'removed'
+                                   """).format(snapshot_tbl=snapshot_tbl, delta_tbl=delta_tbl))
             self._create_missing_exceptions_partition_indices(conn, operator_id)
 
         return per_type_counts, cp.duration
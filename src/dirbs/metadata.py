@@ -145,6 +145,31 @@ def add_optional_job_metadata(conn, job_command, run_id, **new_metadata):
         assert cursor.rowcount == 1
 
 
+def add_input_file_md5(conn, run_id, md5):
+    """
+    Log the MD5 hash of the input file of an import job.
+
+    The hash is stored both in the indexed input_file_md5 column, used to link import runs to data catalog entries,
+    and in the extra_metadata JSON.
+
+    Arguments:
+        conn: dirbs db connection object
+        run_id: id of the currently running import job
+        md5: MD5 hash of the input file
+    """
+    # An auto-commit connection must be used to ensure the log is not rolled back due to any reason, it
+    # must be preserved.
+    assert conn.autocommit
+    with conn.cursor() as cursor:
+        cursor.execute("""UPDATE job_metadata
+                             SET input_file_md5 = %s::UUID,
+                                 extra_metadata = extra_metadata || %s
+                           WHERE command = 'dirbs-import'
+                             AND run_id = %s""",
+                       [md5, json.dumps({'input_file_md5': md5}), run_id])
+        assert cursor.rowcount == 1
+
+
 def add_time_metadata(conn, job_command, run_id, path):
     """
     Log additional JSON metadata about this job but leave core fields unchanged.
@@ -167,7 +192,38 @@ def add_time_metadata(conn, job_command, run_id, path):
         assert cursor.rowcount == 1
 
 
-def query_for_command_runs(conn, job_command, subcommand=None, successful_only=False, run_id=None):
+def record_successful_condition_run(conn, run_id, cond_config):
+    """
+    Record that a classification condition completed successfully in a dirbs-classify run.
+
+    This maintains the per-condition summary used by dirbs.utils.most_recently_run_condition_info so that it does
+    not need to walk the full history of dirbs-classify runs.
+
+    Arguments:
+        conn: dirbs db connection object
+        run_id: id of the currently running dirbs-classify job
+        cond_config: dict containing the config of the condition that completed, as stored in the job metadata
+    """
+    # An auto-commit connection must be used so that the summary is consistent with the matched_imei_counts
+    # already logged for this run in job_metadata.
+    assert conn.autocommit
+    with conn.cursor() as cursor:
+        cursor.execute("""INSERT INTO classification_condition_last_run AS target(cond_name, run_id, cond_config,
+                                                                                 last_successful_run)
+                               SELECT %s, run_id, %s, start_time
+                                 FROM job_metadata
+                                WHERE command = 'dirbs-classify'
+                                  AND run_id = %s
+                          ON CONFLICT (cond_name)
+                            DO UPDATE
+                                  SET run_id = excluded.run_id,
+                                      cond_config = excluded.cond_config,
+                                      last_successful_run = excluded.last_successful_run
+                                WHERE target.last_successful_run <= excluded.last_successful_run""",
+                       [cond_config['label'], json.dumps(cond_config), run_id])
+
+
+def query_for_command_runs(conn, job_command, subcommand=None, successful_only=False, run_id=None, limit=None):
     """
     Get all the metadata for all the invocations of a job commands, sorted most recent runs first.
 
@@ -177,6 +233,7 @@ def query_for_command_runs(conn, job_command, subcommand=None, successful_only=F
         subcommand: name of the sub-command used, default is None
         successful_only: bool to filter only successful jobs, default is False means it will fetch all of them
         run_id: id of the currently running job
+        limit: maximum number of most recent runs to return, default is None means it will fetch all of them
     Returns:
         psycopg2 results object containing all the results based on the argument given
     """
@@ -199,15 +256,23 @@ def query_for_command_runs(conn, job_command, subcommand=None, successful_only=F
         else:
             run_id_filter_sql = sql.SQL('')
 
+        if limit is not None:
+            limit_sql = sql.SQL('LIMIT %s')
+            query_params.append(limit)
+        else:
+            limit_sql = sql.SQL('')
+
         cursor.execute(sql.SQL("""SELECT *
                                     FROM job_metadata
                                    WHERE command = %s
                                      AND {status_filter_sql}
                                          {subcommand_filter_sql}
                                          {run_id_filter_sql}
-                                ORDER BY start_time DESC""").format(status_filter_sql=status_filter_sql,
-                                                                    subcommand_filter_sql=subcommand_filter_sql,
-                                                                    run_id_filter_sql=run_id_filter_sql),
+                                ORDER BY start_time DESC
+                                         {limit_sql}""").format(status_filter_sql=status_filter_sql,
+                                                                subcommand_filter_sql=subcommand_filter_sql,
+                                                                run_id_filter_sql=run_id_filter_sql,
+                                                                limit_sql=limit_sql),
                        query_params)
         return cursor.fetchall()
 
@@ -381,6 +381,8 @@ def repartition_classification_state(conn, *, num_physical_shards, src_filter_sq
         conn: dirbs db connection object
         num_physical_shards: number of physical shards to use
         src_filter_sql: custom filter sql, default is None
+    Returns:
+        number of rows copied into the new table
     """
     with conn.cursor() as cursor, utils.db_role_setter(conn, role_name='dirbs_core_power_user'):
         # Create parent partition
@@ -388,6 +390,7 @@ def repartition_classification_state(conn, *, num_physical_shards, src_filter_sq
             """CREATE TABLE classification_state_new (
                    LIKE classification_state INCLUDING DEFAULTS
                                              INCLUDING IDENTITY
+                                             INCLUDING GENERATED
                                              INCLUDING CONSTRAINTS
                                              INCLUDING STORAGE
                                              INCLUDING COMMENTS
@@ -402,16 +405,26 @@ def repartition_classification_state(conn, *, num_physical_shards, src_filter_sq
                                      num_physical_shards=num_physical_shards,
                                      perms_func=_grant_perms_classification_state, fillfactor=80)
 
-        # Insert data from original partition
-        base_sql = sql.SQL("""INSERT INTO classification_state_new
-                                   SELECT *
-                                     FROM classification_state""")
+        # Insert data from original partition. Generated columns are computed by the new table, so only the other
+        # columns are copied
+        cursor.execute("""SELECT attname
+                            FROM pg_attribute
+                           WHERE attrelid = 'classification_state'::regclass
+                             AND attnum > 0
+                             AND NOT attisdropped
+                             AND attgenerated = ''
+                        ORDER BY attnum""")
+        cols_sql = sql.SQL(', ').join([sql.Identifier(x.attname) for x in cursor.fetchall()])
+        base_sql = sql.SQL("""INSERT INTO classification_state_new({0})
+                                   SELECT {0}
+                                     FROM classification_state""").format(cols_sql)
         if src_filter_sql is not None:
             insert_sql = sql.SQL('{0} {1}').format(base_sql, sql.SQL(src_filter_sql))
         else:
             insert_sql = base_sql
 
         cursor.execute(insert_sql)
+        rows_copied = cursor.rowcount
 
         # Add in indexes to each partition
         idx_metadata = [
@@ -431,6 +444,8 @@ def repartition_classification_state(conn, *, num_physical_shards, src_filter_sq
         rename_table_and_indices(conn, old_tbl_name='classification_state_new',
                                  new_tbl_name='classification_state', idx_metadata=idx_metadata)
 
+    return rows_copied
+
 
 def _grant_perms_registration_list(conn, *, part_name):
     """
@@ -936,6 +951,118 @@ def repartition_exceptions_lists(conn, *, num_physical_shards, src_filter_sql=No
                                  new_tbl_name='exceptions_lists', idx_metadata=exceptions_lists_indices())
 
 
+def blacklist_snapshot_indices():
+    """Index metadata for the blacklist snapshot."""
+    return [IndexMetadatum(idx_cols=['imei_norm'], is_unique=True)]
+
+
+def per_mno_lists_snapshot_indices():
+    """Index metadata for the notifications and exceptions lists snapshots."""
+    return [IndexMetadatum(idx_cols=['imei_norm', 'imsi', 'msisdn'], is_unique=True)]
+
+
+def create_list_snapshots(conn, *, num_physical_shards=None):
+    """
+    Function to (re-)create the snapshots of the current blacklist, notifications lists and exceptions lists.
+
+    The snapshots only contain the latest version of each list and are kept up to date by dirbs-listgen as it stores
+    the list deltas. Rebuilding them scans the full list history, so this is only needed when they are first created
+    or when the list tables are repartitioned.
+
+    Arguments:
+        conn: dirbs db connection object
+        num_physical_shards: number of physical shards, default None (use the current number)
+    """
+    if num_physical_shards is None:
+        num_physical_shards = num_physical_imei_shards(conn)
+
+    with conn.cursor() as cursor, utils.db_role_setter(conn, role_name='dirbs_core_listgen'):
+        cursor.execute("""DROP TABLE IF EXISTS current_blacklist,
+                                               current_notifications_lists,
+                                               current_exceptions_lists CASCADE""")
+
+        cursor.execute(
+            """CREATE TABLE current_blacklist (
+                   imei_norm        TEXT NOT NULL,
+                   virt_imei_shard  SMALLINT NOT NULL,
+                   block_date       DATE NOT NULL,
+                   reasons          TEXT[] NOT NULL
+               )
+               PARTITION BY RANGE (virt_imei_shard)
+            """
+        )
+        _grant_perms_list(conn, part_name='current_blacklist')
+        create_imei_shard_partitions(conn, tbl_name='current_blacklist', num_physical_shards=num_physical_shards,
+                                     perms_func=_grant_perms_list)
+        cursor.execute("""INSERT INTO current_blacklist(imei_norm, virt_imei_shard, block_date, reasons)
+                               SELECT imei_norm, virt_imei_shard, block_date, reasons
+                                 FROM blacklist
+                                WHERE end_run_id IS NULL
+                                  AND delta_reason != 'unblocked'""")
+        add_indices(conn, tbl_name='current_blacklist', idx_metadata=blacklist_snapshot_indices())
+
+        cursor.execute(
+            """CREATE TABLE current_notifications_lists (
+                   operator_id      TEXT NOT NULL,
+                   imei_norm        TEXT NOT NULL,
+                   virt_imei_shard  SMALLINT NOT NULL,
+                   imsi             TEXT NOT NULL,
+                   msisdn           TEXT NOT NULL,
+                   block_date       DATE NOT NULL,
+                   reasons          TEXT[] NOT NULL,
+                   amnesty_granted  BOOLEAN
+               )
+               PARTITION BY LIST (operator_id)
+            """
+        )
+        cursor.execute(
+            """CREATE TABLE current_exceptions_lists (
+                   operator_id      TEXT NOT NULL,
+                   imei_norm        TEXT NOT NULL,
+                   virt_imei_shard  SMALLINT NOT NULL,
+                   imsi             TEXT NOT NULL,
+                   msisdn           TEXT NOT NULL
+               )
+               PARTITION BY LIST (operator_id)
+            """
+        )
+
+        for list_type, current_filter_sql, columns in [
+            ('notifications', "delta_reason NOT IN ('resolved', 'blacklisted')",
+             ['operator_id', 'imei_norm', 'virt_imei_shard', 'imsi', 'msisdn', 'block_date', 'reasons',
+              'amnesty_granted']),
+            ('exceptions', "delta_reason != 'removed'",
+             ['operator_id', 'imei_norm', 'virt_imei_shard', 'imsi', 'msisdn'])
+        ]:
+            src_tbl_name = '{0}_lists'.format(list_type)
+            snapshot_tbl_name = 'current_{0}_lists'.format(list_type)
+            _grant_perms_list(conn, part_name=snapshot_tbl_name)
+
+            # Partitions are only needed for the operators that currently have list entries. dirbs-listgen creates
+            # any others when it stores lists for them
+            cursor.execute(sql.SQL("""SELECT DISTINCT operator_id
+                                        FROM {src_tbl}
+                                       WHERE end_run_id IS NULL
+                                         AND {current_filter}""")
+                           .format(src_tbl=sql.Identifier(src_tbl_name),
+                                   current_filter=sql.SQL(current_filter_sql)))
+            for op_id in [x.operator_id for x in cursor.fetchall()]:
+                tbl_name = '{0}_{1}'.format(snapshot_tbl_name, op_id)
+                create_per_mno_lists_partition(conn, parent_tbl_name=snapshot_tbl_name, tbl_name=tbl_name,
+                                               operator_id=op_id, num_physical_shards=num_physical_shards)
+
+            cursor.execute(sql.SQL("""INSERT INTO {snapshot_tbl}({columns})
+                                           SELECT {columns}
+                                             FROM {src_tbl}
+                                            WHERE end_run_id IS NULL
+                                              AND {current_filter}""")
+                           .format(snapshot_tbl=sql.Identifier(snapshot_tbl_name),
+                                   columns=sql.SQL(', ').join(map(sql.Identifier, columns)),
+                                   src_tbl=sql.Identifier(src_tbl_name),
+                                   current_filter=sql.SQL(current_filter_sql)))
+            add_indices(conn, tbl_name=snapshot_tbl_name, idx_metadata=per_mno_lists_snapshot_indices())
+
+
 def _grant_perms_network_imeis(conn, *, part_name):
     """
     Function to DRY out granting of permissions to network_imeis partitions.
@@ -998,6 +1125,135 @@ def repartition_network_imeis(conn, *, num_physical_shards):
                                  new_tbl_name='network_imeis', idx_metadata=idx_metadata)
 
 
+def network_msisdns_indices():
+    """Index metadata for network_msisdns partitions."""
+    return [
+        IndexMetadatum(idx_cols=cols, is_unique=is_uniq, partial_sql=partial)
+        for cols, is_uniq, partial in [
+            (['msisdn', 'imei_norm', 'imsi', 'operator_id'], True, None),
+            (['msisdn', 'imei_norm', 'operator_id'], True, 'WHERE imsi IS NULL')
+        ]
+    ]
+
+
+def create_network_msisdns(conn, *, tbl_name='network_msisdns', num_physical_shards=None):
+    """
+    Function to create the network_msisdns table and its MSISDN shard partitions.
+
+    network_msisdns is a reverse index from MSISDN to the IMEI, IMSI and operator it has been seen with on the
+    network, along with the first and last dates it was seen. It is range partitioned on
+    calc_virt_msisdn_shard(msisdn), so that looking up an MSISDN only needs to probe a single partition. A NULL IMSI
+    is kept, so it is made unique by a separate partial index.
+
+    Arguments:
+        conn: dirbs db connection object
+        tbl_name: name of the table to create, default 'network_msisdns'
+        num_physical_shards: number of physical shards, default None (use the current number)
+    """
+    with conn.cursor() as cursor, utils.db_role_setter(conn, role_name='dirbs_core_import_operator'):
+        cursor.execute(
+            sql.SQL(
+                """CREATE TABLE {0} (
+                       msisdn             TEXT NOT NULL,
+                       imei_norm          TEXT NOT NULL,
+                       imsi               TEXT,
+                       operator_id        TEXT NOT NULL,
+                       first_seen         DATE NOT NULL,
+                       last_seen          DATE NOT NULL,
+                       virt_msisdn_shard  SMALLINT NOT NULL
+                   )
+                   PARTITION BY RANGE (virt_msisdn_shard)
+                """
+            ).format(sql.Identifier(tbl_name))
+        )
+        _grant_perms_network_imeis(conn, part_name=tbl_name)
+        # The virtual MSISDN shards use the same 0-99 range as the IMEI shards, so the same physical layout is used
+        create_imei_shard_partitions(conn, tbl_name=tbl_name, num_physical_shards=num_physical_shards,
+                                     perms_func=_grant_perms_network_imeis, fillfactor=80)
+
+
+def repartition_network_msisdns(conn, *, num_physical_shards):
+    """
+    Function to repartition the network_msisdns table.
+
+    Arguments:
+        conn: dirbs db connection object
+        num_physical_shards: number of physical shards
+    """
+    create_network_msisdns(conn, tbl_name='network_msisdns_new', num_physical_shards=num_physical_shards)
+    with conn.cursor() as cursor, utils.db_role_setter(conn, role_name='dirbs_core_import_operator'):
+        cursor.execute("""INSERT INTO network_msisdns_new
+                               SELECT *
+                                 FROM network_msisdns""")
+        add_indices(conn, tbl_name='network_msisdns_new', idx_metadata=network_msisdns_indices())
+
+        cursor.execute('DROP TABLE network_msisdns CASCADE')
+        rename_table_and_indices(conn, old_tbl_name='network_msisdns_new',
+                                 new_tbl_name='network_msisdns', idx_metadata=network_msisdns_indices())
+
+
+def network_imeis_per_mno_indices():
+    """Index metadata for network_imeis_per_mno partitions."""
+    return [
+        IndexMetadatum(idx_cols=cols, is_unique=is_uniq, partial_sql=partial)
+        for cols, is_uniq, partial in [
+            (['imei_norm', 'operator_id'], True, None),
+            (['first_seen'], False, None)
+        ]
+    ]
+
+
+def create_network_imeis_per_mno(conn, *, tbl_name='network_imeis_per_mno', num_physical_shards=None):
+    """
+    Function to create the network_imeis_per_mno table and its IMEI shard partitions.
+
+    network_imeis_per_mno stores the date each IMEI was first seen on each operator. An IMEI is a gross add for an
+    operator in the month it was first seen on the network if it was also first seen on that operator in that month,
+    so gross adds can be attributed by joining this table to network_imeis on the shard key.
+
+    Arguments:
+        conn: dirbs db connection object
+        tbl_name: name of the table to create, default 'network_imeis_per_mno'
+        num_physical_shards: number of physical shards, default None (use the current number)
+    """
+    with conn.cursor() as cursor, utils.db_role_setter(conn, role_name='dirbs_core_import_operator'):
+        cursor.execute(
+            sql.SQL(
+                """CREATE TABLE {0} (
+                       imei_norm        TEXT NOT NULL,
+                       operator_id      TEXT NOT NULL,
+                       first_seen       DATE NOT NULL,
+                       virt_imei_shard  SMALLINT NOT NULL
+                   )
+                   PARTITION BY RANGE (virt_imei_shard)
+                """
+            ).format(sql.Identifier(tbl_name))
+        )
+        _grant_perms_network_imeis(conn, part_name=tbl_name)
+        create_imei_shard_partitions(conn, tbl_name=tbl_name, num_physical_shards=num_physical_shards,
+                                     perms_func=_grant_perms_network_imeis, fillfactor=80)
+
+
+def repartition_network_imeis_per_mno(conn, *, num_physical_shards):
+    """
+    Function to repartition the network_imeis_per_mno table.
+
+    Arguments:
+        conn: dirbs db connection object
+        num_physical_shards: number of physical shards
+    """
+    create_network_imeis_per_mno(conn, tbl_name='network_imeis_per_mno_new', num_physical_shards=num_physical_shards)
+    with conn.cursor() as cursor, utils.db_role_setter(conn, role_name='dirbs_core_import_operator'):
+        cursor.execute("""INSERT INTO network_imeis_per_mno_new
+                               SELECT *
+                                 FROM network_imeis_per_mno""")
+        add_indices(conn, tbl_name='network_imeis_per_mno_new', idx_metadata=network_imeis_per_mno_indices())
+
+        cursor.execute('DROP TABLE network_imeis_per_mno CASCADE')
+        rename_table_and_indices(conn, old_tbl_name='network_imeis_per_mno_new',
+                                 new_tbl_name='network_imeis_per_mno', idx_metadata=network_imeis_per_mno_indices())
+
+
 def _grant_perms_monthly_network_triplets(conn, *, part_name):
     """
     Function to DRY out granting of permissions to monthly_network_triplet partitions.
@@ -1156,6 +1412,132 @@ def monthly_network_triplets_per_mno_indices():
     ]
 
 
+def monthly_network_imei_imsis_partition(*, month, year, suffix=''):
+    """
+    Function to DRY out the name of a monthly_network_imei_imsis partition for a month and year.
+
+    Arguments:
+        month: partition month
+        year: partition year
+        suffix: suffix string, default empty
+    Returns:
+        name of the monthly_network_imei_imsis partition for month/year
+    """
+    return 'monthly_network_imei_imsis{0}_{1:d}_{2:02d}'.format(suffix, year, month)
+
+
+def create_monthly_network_imei_imsis(conn, *, tbl_name='monthly_network_imei_imsis'):
+    """
+    Function to create the parent monthly_network_imei_imsis table.
+
+    monthly_network_imei_imsis stores each distinct IMEI-IMSI pair seen by each operator in a month, along with the
+    days of the month it was seen. It is a compact summary of monthly_network_triplets_per_mno without the MSISDN,
+    which is all that is needed to calculate the IMEI-IMSI and IMSI-IMEI overloading histograms. It is range
+    partitioned on (triplet_year, triplet_month) and then on virt_imei_shard.
+
+    Arguments:
+        conn: dirbs db connection object
+        tbl_name: name of the table to create, default 'monthly_network_imei_imsis'
+    """
+    with conn.cursor() as cursor, utils.db_role_setter(conn, role_name='dirbs_core_import_operator'):
+        cursor.execute(
+            sql.SQL(
+                """CREATE TABLE {0} (
+                       triplet_year     SMALLINT NOT NULL,
+                       triplet_month    SMALLINT NOT NULL,
+                       operator_id      TEXT NOT NULL,
+                       pair_hash        UUID NOT NULL,
+                       imei_norm        TEXT,
+                       imsi             TEXT,
+                       date_bitmask     INTEGER NOT NULL,
+                       virt_imei_shard  SMALLINT NOT NULL
+                   )
+                   PARTITION BY RANGE (triplet_year, triplet_month)
+                """
+            ).format(sql.Identifier(tbl_name))
+        )
+        _grant_perms_monthly_network_triplets(conn, part_name=tbl_name)
+
+
+def create_monthly_network_imei_imsis_partition(conn, *, month, year, suffix='', num_physical_shards=None,
+                                                fillfactor=45):
+    """
+    Function to DRY out creation of a new month/year partition for monthly_network_imei_imsis.
+
+    Arguments:
+        conn: dirbs db connection object
+        month: partition month
+        year: partition year
+        suffix: suffix string, default empty
+        num_physical_shards: number of physical shards to apply, default none
+        fillfactor: fill factor of the partition, default 45%
+    """
+    if num_physical_shards is None:
+        num_physical_shards = num_physical_imei_shards(conn)
+
+    with conn.cursor() as cursor, utils.db_role_setter(conn, role_name='dirbs_core_import_operator'):
+        part_name = monthly_network_imei_imsis_partition(month=month, year=year, suffix=suffix)
+        assert len(part_name) < 64
+
+        parent_tbl_name = 'monthly_network_imei_imsis{0}'.format(suffix)
+        cursor.execute(
+            sql.SQL(
+                """CREATE TABLE {0} PARTITION OF {1}
+                   FOR VALUES FROM %s TO %s PARTITION BY RANGE (virt_imei_shard)
+                """
+            ).format(sql.Identifier(part_name), sql.Identifier(parent_tbl_name)),
+            [(year, month), (year, month + 1)]
+        )
+        _grant_perms_monthly_network_triplets(conn, part_name=part_name)
+
+        # Create child partitions
+        create_imei_shard_partitions(conn, tbl_name=part_name, num_physical_shards=num_physical_shards,
+                                     perms_func=_grant_perms_monthly_network_triplets, fillfactor=fillfactor)
+
+
+def monthly_network_imei_imsis_indices():
+    """Index metadata for monthly_network_imei_imsis partitions."""
+    return [
+        IndexMetadatum(idx_cols=cols, is_unique=is_uniq, partial_sql=partial)
+        for cols, is_uniq, partial in [
+            (['pair_hash', 'operator_id'], True, None)
+        ]
+    ]
+
+
+def repartition_monthly_network_imei_imsis(conn, *, num_physical_shards):
+    """
+    Function to repartition the monthly_network_imei_imsis table.
+
+    Arguments:
+        conn: dirbs db connection object
+        num_physical_shards: number of physical shards to apply
+    """
+    create_monthly_network_imei_imsis(conn, tbl_name='monthly_network_imei_imsis_new')
+    with conn.cursor() as cursor, utils.db_role_setter(conn, role_name='dirbs_core_import_operator'):
+        monthly_partitions = utils.child_table_names(conn, 'monthly_network_imei_imsis')
+        year_month_tuples = sorted({(x.triplet_year, x.triplet_month)
+                                    for x in utils.table_invariants_list(conn, monthly_partitions,
+                                                                         ['triplet_year', 'triplet_month'])},
+                                   reverse=True)
+        for year, month in year_month_tuples:
+            # As for monthly_network_triplets, only the most recent month is likely to still be updated
+            fillfactor = 45 if (year, month) == year_month_tuples[0] else 100
+            create_monthly_network_imei_imsis_partition(conn, month=month, year=year, suffix='_new',
+                                                        num_physical_shards=num_physical_shards,
+                                                        fillfactor=fillfactor)
+
+        cursor.execute("""INSERT INTO monthly_network_imei_imsis_new
+                               SELECT *
+                                 FROM monthly_network_imei_imsis""")
+        add_indices(conn, tbl_name='monthly_network_imei_imsis_new', idx_metadata=monthly_network_imei_imsis_indices())
+
+        cursor.execute('DROP TABLE monthly_network_imei_imsis CASCADE')
+        rename_table_and_indices(conn, old_tbl_name='monthly_network_imei_imsis_new',
+                                 new_tbl_name='monthly_network_imei_imsis',
+                                 idx_metadata=monthly_network_imei_imsis_indices())
+
+
 def repartition_monthly_network_triplets(conn, *, num_physical_shards):
     """
     Function to repartition the monthly_network_triplets_country and monthly_network_triplets_country tables.
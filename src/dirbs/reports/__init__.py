@@ -33,4 +33,5 @@ POSSIBILITY OF SUCH DAMAGE.
 
 from .country import CountryReport    # noqa: 401
 from .operator import OperatorReport    # noqa: 401
+from .report_data import ReportData    # noqa: 401
 from .stats_generator import generate_monthly_report_stats    # noqa: 401
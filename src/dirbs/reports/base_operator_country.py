@@ -38,20 +38,26 @@ import logging
 from collections import defaultdict
 
 from jinja2 import Environment, PackageLoader
-from psycopg2 import sql
 
 from dirbs import report_schema_version, __version__
 from dirbs.reports.exceptions import MissingStatsException
+from dirbs.reports.report_data import ReportData
 from dirbs.utils import format_datetime_for_report, JSONEncoder
 
 
 class BaseOperatorCountryReport:
     """Base class for both operator and country reports."""
 
-    def __init__(self, conn, data_id, config, month, year, template_name, operator_id, has_compliance_data=False):
-        """Constructor."""
+    def __init__(self, conn, data_id, config, month, year, template_name, operator_id, has_compliance_data=False,
+                 report_data=None):
+        """Constructor.
+
+        report_data is an optional ReportData instance shared between the country report and all operator reports
+        for the same data_id. If not supplied, the report data is loaded on demand.
+        """
         self.conn = conn
         self.data_id = data_id
+        self._report_data = report_data
         self.has_compliance_data = has_compliance_data
         self.template_env = Environment(loader=PackageLoader('dirbs', 'templates'),
                                         trim_blocks=True,
@@ -110,126 +116,69 @@ class BaseOperatorCountryReport:
 
     def _gen_base_report_data(self):  # noqa: C901
         """Generates the base data for the country/operator report."""
-        with self.conn.cursor() as cursor:
-            cursor.execute("""SELECT *
-                                FROM report_data_metadata
-                               WHERE data_id = %s""",
-                           [self.data_id])
-            _metadata = cursor.fetchone()
-            if _metadata is None:
-                raise MissingStatsException('No metadata available for data_id {0:d}!'
-                                            .format(self.data_id))
-
-            cursor.execute("""SELECT *
-                                FROM report_monthly_stats
-                               WHERE data_id = %s
-                                 AND operator_id = %s""",
-                           [self.data_id, self.operator_id])
-            _monthly_stats = cursor.fetchone()
-            if _monthly_stats is None:
-                raise MissingStatsException('report_monthly_stats entry missing for operator {0} and data_id {1:d}'
-                                            .format(self.operator_id, self.data_id))
-
-            cursor.execute("""SELECT *
-                                FROM report_monthly_conditions
-                               WHERE data_id = %s
-                            ORDER BY sort_order""",
-                           [self.data_id])
-            _conditions = cursor.fetchall()
-            if len(_conditions) == 0:
-                self.logger.warning('No monthly condition config available for operator {0} and data_id {1:d}'
-                                    .format(self.operator_id, self.data_id))
-
-            classification_conditions = [{'label': c.cond_name,
-                                          'blocking': c.was_blocking,
-                                          'config': c.last_successful_config,
-                                          'last_successful_run': format_datetime_for_report(c.last_successful_run)}
-                                         for c in _conditions]
-            cursor.execute("""SELECT *
-                                FROM report_daily_stats
-                               WHERE data_id = %s
-                                 AND operator_id = %s
-                            ORDER BY data_date""",
-                           [self.data_id, self.operator_id])
-            _daily_stats = cursor.fetchall()
-            if len(_daily_stats) == 0:
-                self.logger.warning('No daily stats available for operator {0} and data_id {1:d}'
-                                    .format(self.operator_id, self.data_id))
-
-            cursor.execute("""SELECT *
-                                FROM report_monthly_condition_stats
-                               WHERE data_id = %s
-                                 AND operator_id = %s""",
-                           [self.data_id, self.operator_id])
-            _condition_stats = cursor.fetchall()
-            if len(_condition_stats) == 0:
-                self.logger.warning('No monthly condition stats available for operator {0} and data_id {1:d}'
-                                    .format(self.operator_id, self.data_id))
-
-            cursor.execute("""SELECT *
-                                FROM report_monthly_top_models_imei
-                               WHERE data_id = %s
-                                 AND operator_id = %s
-                            ORDER BY rank_pos""",
-                           [self.data_id, self.operator_id])
-            _top_models_imei = cursor.fetchall()
-            if len(_top_models_imei) == 0:
-                self.logger.warning('No monthly top models by IMEI available for operator {0} and data_id {1:d}'
-                                    .format(self.operator_id, self.data_id))
-
-            cursor.execute("""SELECT *
-                                FROM report_monthly_top_models_gross_adds
-                               WHERE data_id = %s
-                                 AND operator_id = %s
-                            ORDER BY rank_pos""",
-                           [self.data_id, self.operator_id])
-            _top_models_gross_adds = cursor.fetchall()
-            if len(_top_models_gross_adds) == 0:
-                self.logger.warning('No monthly top models by gross adds available for operator {0} and data_id {1:d}'
-                                    .format(self.operator_id, self.data_id))
-
-            cursor.execute("""SELECT *
-                                FROM report_monthly_imei_imsi_overloading
-                               WHERE data_id = %s
-                                 AND operator_id = %s
-                            ORDER BY seen_with_imsis""",
-                           [self.data_id, self.operator_id])
-            _imei_imsi_overloading = cursor.fetchall()
-            if len(_imei_imsi_overloading) == 0:
-                self.logger.warning('No monthly IMEI/IMSI overloading stats available for operator {0} and '
-                                    'data_id {1:d}'.format(self.operator_id, self.data_id))
-
-            cursor.execute("""SELECT *
-                                FROM report_monthly_average_imei_imsi_overloading
-                               WHERE data_id = %s
-                                 AND operator_id = %s
-                            ORDER BY bin_start""",
-                           [self.data_id, self.operator_id])
-            _daily_imei_imsi_overloading = cursor.fetchall()
-            if len(_daily_imei_imsi_overloading) == 0:
-                self.logger.warning(('No monthly average IMEI/IMSI overloading stats available for '
-                                     'operator {0} and data_id {1:d}').format(self.operator_id, self.data_id))
-
-            cursor.execute("""SELECT *
-                                FROM report_monthly_imsi_imei_overloading
-                               WHERE data_id = %s
-                                 AND operator_id = %s
-                            ORDER BY seen_with_imeis""",
-                           [self.data_id, self.operator_id])
-            _imsi_imei_overloading = cursor.fetchall()
-            if len(_imsi_imei_overloading) == 0:
-                self.logger.warning('No monthly IMSI/IMEI overloading stats available for operator {0} and '
-                                    'data_id {1:d}'.format(self.operator_id, self.data_id))
-
-            cursor.execute("""SELECT *
-                                FROM report_monthly_condition_stats_combinations
-                               WHERE data_id = %s
-                                 AND operator_id = %s""",
-                           [self.data_id, self.operator_id])
-            _condition_combination_stats = cursor.fetchall()
-            if len(_condition_combination_stats) == 0:
-                self.logger.warning('No monthly condition combination stats available for operator {0} and '
-                                    'data_id {1:d}'.format(self.operator_id, self.data_id))
+        if self._report_data is None:
+            self._report_data = ReportData(self.conn, self.data_id, self.month, self.year)
+        rd = self._report_data
+
+        _metadata = rd.metadata
+        if _metadata is None:
+            raise MissingStatsException('No metadata available for data_id {0:d}!'
+                                        .format(self.data_id))
+
+        _monthly_stats = next(iter(rd.rows('report_monthly_stats', self.operator_id)), None)
+        if _monthly_stats is None:
+            raise MissingStatsException('report_monthly_stats entry missing for operator {0} and data_id {1:d}'
+                                        .format(self.operator_id, self.data_id))
+
+        _conditions = rd.conditions
+        if len(_conditions) == 0:
+            self.logger.warning('No monthly condition config available for operator {0} and data_id {1:d}'
+                                .format(self.operator_id, self.data_id))
+
+        classification_conditions = [{'label': c.cond_name,
+                                      'blocking': c.was_blocking,
+                                      'config': c.last_successful_config,
+                                      'last_successful_run': format_datetime_for_report(c.last_successful_run)}
+                                     for c in _conditions]
+        _daily_stats = rd.rows('report_daily_stats', self.operator_id)
+        if len(_daily_stats) == 0:
+            self.logger.warning('No daily stats available for operator {0} and data_id {1:d}'
+                                .format(self.operator_id, self.data_id))
+
+        _condition_stats = rd.rows('report_monthly_condition_stats', self.operator_id)
+        if len(_condition_stats) == 0:
+            self.logger.warning('No monthly condition stats available for operator {0} and data_id {1:d}'
+                                .format(self.operator_id, self.data_id))
+
+        _top_models_imei = rd.rows('report_monthly_top_models_imei', self.operator_id)
+        if len(_top_models_imei) == 0:
+            self.logger.warning('No monthly top models by IMEI available for operator {0} and data_id {1:d}'
+                                .format(self.operator_id, self.data_id))
+
+        _top_models_gross_adds = rd.rows('report_monthly_top_models_gross_adds', self.operator_id)
+        if len(_top_models_gross_adds) == 0:
+            self.logger.warning('No monthly top models by gross adds available for operator {0} and data_id {1:d}'
+                                .format(self.operator_id, self.data_id))
+
+        _imei_imsi_overloading = rd.rows('report_monthly_imei_imsi_overloading', self.operator_id)
+        if len(_imei_imsi_overloading) == 0:
+            self.logger.warning('No monthly IMEI/IMSI overloading stats available for operator {0} and '
+                                'data_id {1:d}'.format(self.operator_id, self.data_id))
+
+        _daily_imei_imsi_overloading = rd.rows('report_monthly_average_imei_imsi_overloading', self.operator_id)
+        if len(_daily_imei_imsi_overloading) == 0:
+            self.logger.warning(('No monthly average IMEI/IMSI overloading stats available for '
+                                 'operator {0} and data_id {1:d}').format(self.operator_id, self.data_id))
+
+        _imsi_imei_overloading = rd.rows('report_monthly_imsi_imei_overloading', self.operator_id)
+        if len(_imsi_imei_overloading) == 0:
+            self.logger.warning('No monthly IMSI/IMEI overloading stats available for operator {0} and '
+                                'data_id {1:d}'.format(self.operator_id, self.data_id))
+
+        _condition_combination_stats = rd.rows('report_monthly_condition_stats_combinations', self.operator_id)
+        if len(_condition_combination_stats) == 0:
+            self.logger.warning('No monthly condition combination stats available for operator {0} and '
+                                'data_id {1:d}'.format(self.operator_id, self.data_id))
 
         report_data = {
             'start_date': self.start_date.isoformat(),
@@ -334,47 +283,19 @@ class BaseOperatorCountryReport:
         })
         return report_data
 
-    def _previous_reporting_periods(self):
-        """Returns a list of month/year tuples to use when generatic data for historic trends."""
-        month = self.month
-        year = self.year
-        periods = []
-        for i in range(5):
-            month -= 1
-            if month == 0:
-                month = 12
-                year -= 1
-            periods.append((month, year))
-
-        periods.reverse()
-        return periods
-
     def _historic_monthly_stats(self, table_name, as_list=False):
         """Returns a list of historic table results for months previous to this one."""
         rv = []
-        with self.conn.cursor() as cursor:
-            for month, year in self._previous_reporting_periods():
-                cursor.execute(sql.SQL("""SELECT *
-                                            FROM {0}
-                                           WHERE data_id = (SELECT MAX(data_id)
-                                                              FROM report_data_metadata
-                                                             WHERE report_month = %s
-                                                               AND report_year = %s)
-                                             AND operator_id = %s""").format(sql.Identifier(table_name)),
-                               [month, year, self.operator_id])
-                if not as_list:
-                    # If this is None, it means there is no data. Historic monthly stats are expected to be
-                    # None is there is no data for this month
-                    rv.append(cursor.fetchone())
-                else:
-                    # For conditions, desired behaviour is the same. If no data exists for a month, we put None in
-                    # the array. Otherwise, we put all the results in as a list (there is one result for every
-                    # condition)
-                    results = cursor.fetchall()
-                    if len(results) == 0:
-                        rv.append(None)
-                    else:
-                        rv.append(results)
+        for results in self._report_data.historic_rows(table_name, self.operator_id):
+            if not as_list:
+                # If this is None, it means there is no data. Historic monthly stats are expected to be
+                # None is there is no data for this month
+                rv.append(results[0] if len(results) > 0 else None)
+            else:
+                # For conditions, desired behaviour is the same. If no data exists for a month, we put None in
+                # the array. Otherwise, we put all the results in as a list (there is one result for every
+                # condition)
+                rv.append(results if len(results) > 0 else None)
 
         return rv
 
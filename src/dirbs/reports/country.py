@@ -38,11 +38,13 @@ from .base_operator_country import BaseOperatorCountryReport
 class CountryReport(BaseOperatorCountryReport):
     """Class used to generation country-level reports."""
 
-    def __init__(self, conn, data_id, config, month, year, country_name, has_compliance_data=False):
+    def __init__(self, conn, data_id, config, month, year, country_name, has_compliance_data=False,
+                 report_data=None):
         """Constructor."""
         super(CountryReport, self).__init__(conn, data_id, config, month, year, 'country_report.html',
                                             OperatorConfig.COUNTRY_OPERATOR_NAME,
-                                            has_compliance_data=has_compliance_data)
+                                            has_compliance_data=has_compliance_data,
+                                            report_data=report_data)
         self.country_name = country_name
 
     def gen_report_data(self):
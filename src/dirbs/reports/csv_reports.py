@@ -36,9 +36,12 @@ import sys
 import csv
 import json
 import logging
+import shutil
 import hashlib
+import tempfile
 import datetime
 import contextlib
+from concurrent import futures
 
 import numpy as np
 from psycopg2 import sql
@@ -501,6 +504,96 @@ def _extra_missing_operator_check(config: callable, conn: callable, month: int,
         sys.exit(1)
 
 
+def _write_report_shard(db_config: callable, *, part_dir: str, report_name: str, filename_key_map: dict,
+                        query: callable, params: dict, rows_func: callable, virt_imei_range_start: int,
+                        virt_imei_range_end: int) -> dict:
+    """Helper method to stream the rows of a single virtual IMEI shard range into per-key part files.
+
+    Arguments:
+        db_config: DIRBS db config object
+        part_dir: path to the directory to write the part files to
+        report_name: name of the report, used to name the part files and the server-side cursor
+        filename_key_map: map from report filename to the keys returned by rows_func
+        query: SQL query with virt_imei_range_start and virt_imei_range_end named placeholders
+        params: dict of the other named query parameters
+        rows_func: function mapping a result row to a list of (key, csv row) tuples
+        virt_imei_range_start: start of the virtual IMEI shard range (inclusive)
+        virt_imei_range_end: end of the virtual IMEI shard range (exclusive)
+    Returns:
+        map from key to part filename
+    """
+    key_part_filename_map = {k: '{0}.part_{1:d}_{2:d}'.format(fn, virt_imei_range_start, virt_imei_range_end - 1)
+                             for fn, k in filename_key_map.items()}
+    with contextlib.ExitStack() as stack:
+        key_csvwriter_map = {k: csv.writer(stack.enter_context(open(os.path.join(part_dir, fn), 'w',
+                                                                    encoding='utf-8')))
+                             for k, fn in key_part_filename_map.items()}
+        conn = stack.enter_context(utils.create_db_connection(db_config))
+        cursor_name = '{0}_{1:d}_{2:d}'.format(report_name, virt_imei_range_start, virt_imei_range_end - 1)
+        cursor = stack.enter_context(conn.cursor(name=cursor_name))
+        cursor.execute(query, dict(params,
+                                   virt_imei_range_start=virt_imei_range_start,
+                                   virt_imei_range_end=virt_imei_range_end))
+        for res in cursor:
+            for key, row in rows_func(res):
+                key_csvwriter_map[key].writerow(row)
+
+    return key_part_filename_map
+
+
+def _write_sharded_report(conn: callable, config: callable, logger: callable, report_dir: str, *, report_name: str,
+                          filename_key_map: dict, header: list, query: callable, params: dict, rows_func: callable,
+                          key_header_map: dict = None) -> None:
+    """Helper method to write a report per virtual IMEI shard range in parallel and concatenate the results.
+
+    Each shard range is queried on its own connection through a server-side cursor, so that no result set is ever
+    held in memory. The per-range part files are concatenated in shard order under a single header per report file.
+    They are written to a temporary directory under report_dir, so that they are removed even if a shard job fails.
+
+    Arguments:
+        conn: DIRBS PostgreSQL connection object
+        config: DIRBS config object
+        logger: DIRBS logger object
+        report_dir: path to report directory
+        report_name: name of the report, used to name the part files and the server-side cursors
+        filename_key_map: map from report filename to the keys returned by rows_func
+        header: header row written to each report file
+        query: SQL query with virt_imei_range_start and virt_imei_range_end named placeholders
+        params: dict of the other named query parameters
+        rows_func: function mapping a result row to a list of (key, csv row) tuples
+        key_header_map: optional map from key to header row, overriding header for that key's report file
+    """
+    shard_bounds = partition_utils.virt_imei_shard_bounds(partition_utils.num_physical_imei_shards(conn))
+    nworkers = config.multiprocessing_config.max_db_connections
+    logger.debug('Querying {0:d} virtual IMEI shard ranges for {1} report using up to {2:d} workers...'
+                 .format(len(shard_bounds), report_name, nworkers))
+    with tempfile.TemporaryDirectory(prefix='.{0}_parts_'.format(report_name), dir=report_dir) as part_dir:
+        with futures.ThreadPoolExecutor(max_workers=nworkers) as executor:
+            shard_futures = [executor.submit(_write_report_shard,
+                                             config.db_config,
+                                             part_dir=part_dir,
+                                             report_name=report_name,
+                                             filename_key_map=filename_key_map,
+                                             query=query,
+                                             params=params,
+                                             rows_func=rows_func,
+                                             virt_imei_range_start=virt_imei_range_start,
+                                             virt_imei_range_end=virt_imei_range_end)
+                             for virt_imei_range_start, virt_imei_range_end in shard_bounds]
+            # Results are collected in shard order so that the concatenated files are deterministic
+            shard_part_filename_maps = [f.result() for f in shard_futures]
+
+        for fn, key in filename_key_map.items():
+            report_path = os.path.join(report_dir, fn)
+            with open(report_path, 'w', encoding='utf-8') as report_file:
+                csv.writer(report_file).writerow((key_header_map or {}).get(key, header))
+            # Part files are appended as bytes so that the CSV line terminators are preserved
+            with open(report_path, 'ab') as report_file:
+                for part_filename_map in shard_part_filename_maps:
+                    with open(os.path.join(part_dir, part_filename_map[key]), 'rb') as part_file:
+                        shutil.copyfileobj(part_file, report_file)
+
+
 def write_stolen_violations(config: callable, logger: callable, report_dir: str, conn: callable,
                             filter_by_conditions: list, newer_than: str) -> callable:
     """Helper method to write per operator stolen list violation reports.
@@ -516,62 +609,54 @@ def write_stolen_violations(config: callable, logger: callable, report_dir: str,
         Report metadata
     """
     logger.info('Generating per-MNO stolen list violations reports...')
-    with contextlib.ExitStack() as stack:
-        # Push files into exit stack so that they will all be closed.
-        operator_ids = [o.id for o in config.region_config.operators]
-        filename_op_map = {'stolen_violations_{0}.csv'.format(o): o for o in operator_ids}
-        opname_file_map = {o: stack.enter_context(open(os.path.join(report_dir, fn), 'w', encoding='utf8'))
-                           for fn, o in filename_op_map.items()}
-        # Create a map from operator name to csv writer
-        opname_csvwriter_map = {o: csv.writer(opname_file_map[o]) for o in operator_ids}
-        # Write the header to each csvwriter
-        for _, writer in opname_csvwriter_map.items():
-            writer.writerow(['imei_norm', 'last_seen', 'reporting_date'])
-
-        # Run a query to find all the classified IMEIs seen on multiple operators
-        blacklist_violations_grace_period_days = config.report_config.blacklist_violations_grace_period_days
-        with conn.cursor() as cursor:
-            query = sql.SQL("""SELECT imei_norm, last_seen, reporting_date, operator_id
-                                 FROM (SELECT imei_norm, MIN(reporting_date) AS reporting_date
-                                         FROM stolen_list
-                                     GROUP BY imei_norm) AS stolen_imeis
-                                 JOIN LATERAL (
-                                       SELECT imei_norm, operator_id, MAX(last_seen) AS last_seen
-                                         FROM monthly_network_triplets_per_mno_no_null_imeis nt
-                                        WHERE imei_norm = stolen_imeis.imei_norm
-                                          AND virt_imei_shard = calc_virt_imei_shard(stolen_imeis.imei_norm)
-                                     GROUP BY imei_norm, operator_id) network_imeis
-                                USING (imei_norm)
-                                WHERE network_imeis.last_seen > stolen_imeis.reporting_date + %s
-                                      {0}
-                                      {1}""")
-
-            if filter_by_conditions:
-                cond_filter_query = """AND EXISTS(SELECT 1
-                                                    FROM classification_state
-                                                   WHERE imei_norm = stolen_imeis.imei_norm
-                                                     AND virt_imei_shard =
-                                                            calc_virt_imei_shard(stolen_imeis.imei_norm)
-                                                     AND cond_name IN %s
-                                                     AND end_date IS NULL)"""  # noqa: Q449
-                sql_bytes = cursor.mogrify(cond_filter_query, [tuple([c.label for c in filter_by_conditions])])
-                conditions_filter_sql = sql.SQL(str(sql_bytes, conn.encoding))
-            else:
-                conditions_filter_sql = sql.SQL('')
-
-            if newer_than:
-                newer_than_query = 'AND last_seen > %s'
-                sql_bytes = cursor.mogrify(newer_than_query, [newer_than])
-                date_filter_sql = sql.SQL(str(sql_bytes, conn.encoding))
-            else:
-                date_filter_sql = sql.SQL('')
-
-            cursor.execute(query.format(conditions_filter_sql, date_filter_sql),
-                           [blacklist_violations_grace_period_days])
-            for res in cursor:
-                opname_csvwriter_map[res.operator_id].writerow([res.imei_norm, res.last_seen.strftime('%Y%m%d'),
-                                                                res.reporting_date.strftime('%Y%m%d')])
+    operator_ids = [o.id for o in config.region_config.operators]
+    filename_op_map = {'stolen_violations_{0}.csv'.format(o): o for o in operator_ids}
+    params = {'grace_period_days': config.report_config.blacklist_violations_grace_period_days}
+
+    # Find all the stolen IMEIs seen on the network after they were reported stolen. The stolen list is joined
+    # to the triplets within the shard range rather than probing the triplets once per stolen IMEI.
+    query = sql.SQL("""SELECT nt.imei_norm, MAX(nt.last_seen) AS last_seen, stolen_imeis.reporting_date,
+                              nt.operator_id
+                         FROM (SELECT imei_norm, MIN(reporting_date) AS reporting_date
+                                 FROM stolen_list
+                                WHERE virt_imei_shard >= %(virt_imei_range_start)s
+                                  AND virt_imei_shard < %(virt_imei_range_end)s
+                                      {conditions_filter}
+                             GROUP BY imei_norm) AS stolen_imeis
+                         JOIN monthly_network_triplets_per_mno_no_null_imeis nt
+                              ON nt.imei_norm = stolen_imeis.imei_norm
+                        WHERE nt.virt_imei_shard >= %(virt_imei_range_start)s
+                          AND nt.virt_imei_shard < %(virt_imei_range_end)s
+                     GROUP BY nt.imei_norm, nt.operator_id, stolen_imeis.reporting_date
+                       HAVING MAX(nt.last_seen) > stolen_imeis.reporting_date + %(grace_period_days)s
+                              {date_filter}""")
+
+    if filter_by_conditions:
+        conditions_filter_sql = sql.SQL("""AND EXISTS(SELECT 1
+                                                        FROM classification_state cs
+                                                       WHERE cs.imei_norm = stolen_list.imei_norm
+                                                         AND cs.virt_imei_shard = stolen_list.virt_imei_shard
+                                                         AND cs.cond_name IN %(conditions)s
+                                                         AND cs.end_date IS NULL)""")  # noqa: Q449
+        params['conditions'] = tuple([c.label for c in filter_by_conditions])
+    else:
+        conditions_filter_sql = sql.SQL('')
 
+    if newer_than:
+        date_filter_sql = sql.SQL('AND MAX(nt.last_seen) > %(newer_than)s')
+        params['newer_than'] = newer_than
+    else:
+        date_filter_sql = sql.SQL('')
+
+    _write_sharded_report(conn, config, logger, report_dir,
+                          report_name='stolen_violations',
+                          filename_key_map=filename_op_map,
+                          header=['imei_norm', 'last_seen', 'reporting_date'],
+                          query=query.format(conditions_filter=conditions_filter_sql, date_filter=date_filter_sql),
+                          params=params,
+                          rows_func=lambda res: [(res.operator_id, [res.imei_norm,
+                                                                    res.last_seen.strftime('%Y%m%d'),
+                                                                    res.reporting_date.strftime('%Y%m%d')])])
     return _gen_metadata_for_reports(list(filename_op_map.keys()), report_dir)
 
 
@@ -625,50 +710,45 @@ def write_un_registered_subscribers(logger: callable, config: callable, report_d
         metadata
     """
     logger.info('Generating per-MNO unregistered subscribers list...')
-    with contextlib.ExitStack() as stack:
-        # push files to the exit stack so that they will all be closed properly.
-        operator_ids = [o.id for o in config.region_config.operators]
-        filename_op_map = {'unregistered_subscribers_{0}.csv'.format(o): o for o in operator_ids}
-        opname_file_map = {o: stack.enter_context(open(os.path.join(report_dir, fn), 'w', encoding='utf-8'))
-                           for fn, o in filename_op_map.items()}
-
-        # create a map from operator name to csv writer
-        opname_csvwriter_map = {o: csv.writer(opname_file_map[o]) for o in operator_ids}
-
-        # write the header to each file
-        for _, writer in opname_csvwriter_map.items():
-            writer.writerow(['imsi', 'first_seen', 'last_seen'])
-
-        # query to find all the unregistered imsis across the operators
-        with conn.cursor() as cursor:
-            query = sql.SQL("""SELECT imsi, first_seen, last_seen, operator_id
-                                 FROM monthly_network_triplets_per_mno_no_null_imeis AS mno
-                                WHERE NOT EXISTS (SELECT 1
-                                                    FROM subscribers_registration_list
-                                                   WHERE imsi = mno.imsi) {0}""")
-
-            if newer_than:
-                newer_than_query = 'AND last_seen > %s'
-                sql_bytes = cursor.mogrify(newer_than_query, [newer_than])
-                date_filter_sql = sql.SQL(str(sql_bytes, conn.encoding))
-            else:
-                date_filter_sql = sql.SQL('')
-
-            cursor.execute(query.format(date_filter_sql))
-            for res in cursor:
-                opname_csvwriter_map[res.operator_id].writerow([res.imsi,
-                                                                res.first_seen.strftime('%Y%m%d'),
-                                                                res.last_seen.strftime('%Y%m%d')])
-
+    operator_ids = [o.id for o in config.region_config.operators]
+    filename_op_map = {'unregistered_subscribers_{0}.csv'.format(o): o for o in operator_ids}
+    params = {}
+
+    # query to find all the unregistered imsis across the operators
+    query = sql.SQL("""SELECT imsi, first_seen, last_seen, operator_id
+                         FROM monthly_network_triplets_per_mno_no_null_imeis AS mno
+                        WHERE mno.virt_imei_shard >= %(virt_imei_range_start)s
+                          AND mno.virt_imei_shard < %(virt_imei_range_end)s
+                          AND NOT EXISTS (SELECT 1
+                                            FROM subscribers_registration_list
+                                           WHERE imsi = mno.imsi) {0}""")
+
+    if newer_than:
+        date_filter_sql = sql.SQL('AND last_seen > %(newer_than)s')
+        params['newer_than'] = newer_than
+    else:
+        date_filter_sql = sql.SQL('')
+
+    _write_sharded_report(conn, config, logger, report_dir,
+                          report_name='unregistered_subscribers',
+                          filename_key_map=filename_op_map,
+                          header=['imsi', 'first_seen', 'last_seen'],
+                          query=query.format(date_filter_sql),
+                          params=params,
+                          rows_func=lambda res: [(res.operator_id, [res.imsi,
+                                                                    res.first_seen.strftime('%Y%m%d'),
+                                                                    res.last_seen.strftime('%Y%m%d')])])
     logger.info('per-MNO unregistered subscribers list generated successfully')
     return _gen_metadata_for_reports(list(filename_op_map.keys()), report_dir)
 
 
-def write_classified_triplets(logger: callable, conditions: list, report_dir: str, conn: callable):
+def write_classified_triplets(logger: callable, config: callable, conditions: list, report_dir: str,
+                              conn: callable):
     """Helper method to write classified triplets reports.
 
     Arguments:
         logger: DIRBS logger object
+        config: DIRBS config object
         conditions: conditions list to write report about
         report_dir: reporting directory
         conn: DIRBS PostgreSQL connection
@@ -676,39 +756,28 @@ def write_classified_triplets(logger: callable, conditions: list, report_dir: st
         Report Metadata
     """
     logger.info('Generating per-condition classified triplets list...')
-    with contextlib.ExitStack() as stack:
-        # push files to the exit stack, to close them properly
-        condition_labels = [c.label for c in conditions]
-        filename_cond_map = {'classified_triplets_{0}.csv'.format(c): c for c in condition_labels}
-        cond_label_file_map = {c: stack.enter_context(open(os.path.join(report_dir, fn), 'w', encoding='utf-8'))
-                               for fn, c in filename_cond_map.items()}
-
-        # create mapping between condition label and csv writer
-        cond_label_csvwriter_map = {c: csv.writer(cond_label_file_map[c]) for c in condition_labels}
-
-        # write headers to the files
-        for _, writer in cond_label_csvwriter_map.items():
-            writer.writerow(['imei', 'imsi', 'msisdn', 'operator'])
+    condition_labels = [c.label for c in conditions]
+    filename_cond_map = {'classified_triplets_{0}.csv'.format(c): c for c in condition_labels}
 
-        # run query to find all classified triplets for the given conditions
-        with conn.cursor() as cursor:
-            query = """SELECT cs.imei_norm AS imei, cs.cond_name, mno.imsi,
+    # run query to find all classified triplets for the given conditions
+    query = sql.SQL("""SELECT cs.imei_norm AS imei, cs.cond_name, mno.imsi,
                               mno.msisdn, mno.operator_id AS operator
                          FROM classification_state AS cs
                    INNER JOIN monthly_network_triplets_per_mno_no_null_imeis AS mno
                               ON mno.imei_norm = cs.imei_norm
-                        WHERE cs.cond_name IN %s
-                          AND cs.virt_imei_shard = calc_virt_imei_shard(cs.imei_norm)
+                             AND mno.virt_imei_shard = cs.virt_imei_shard
+                        WHERE cs.cond_name IN %(conditions)s
                           AND cs.end_date IS NULL
-                          AND mno.virt_imei_shard = calc_virt_imei_shard(mno.imei_norm)"""  # noqa: Q440
-            sql_bytes = cursor.mogrify(query, [tuple([c for c in condition_labels])])
-            query = sql.SQL(str(sql_bytes, conn.encoding))
-            cursor.execute(query)
-
-            for res in cursor:
-                cond_label_csvwriter_map[res.cond_name].writerow([res.imei, res.imsi, res.msisdn, res.operator])
-        logger.info('Per-condition classified triplets list generated successfully.')
-
+                          AND cs.virt_imei_shard >= %(virt_imei_range_start)s
+                          AND cs.virt_imei_shard < %(virt_imei_range_end)s""")  # noqa: Q440
+    _write_sharded_report(conn, config, logger, report_dir,
+                          report_name='classified_triplets',
+                          filename_key_map=filename_cond_map,
+                          header=['imei', 'imsi', 'msisdn', 'operator'],
+                          query=query,
+                          params={'conditions': tuple(condition_labels)},
+                          rows_func=lambda res: [(res.cond_name, [res.imei, res.imsi, res.msisdn, res.operator])])
+    logger.info('Per-condition classified triplets list generated successfully.')
     return _gen_metadata_for_reports(list(filename_cond_map.keys()), report_dir)
 
 
@@ -727,33 +796,29 @@ def write_blacklist_violations(logger: callable, config: callable, report_dir: s
         Report Metadata
     """
     logger.info('Generating per-MNO blacklist violations...')
-    with contextlib.ExitStack() as stack:
-        # push files to the stack to handle
-        operator_ids = [o.id for o in config.region_config.operators]
-        filename_op_map = {'blacklist_violations_{0}.csv'.format(o): o for o in operator_ids}
-        opname_file_map = {o: stack.enter_context(open(os.path.join(report_dir, fn), 'w', encoding='utf-8'))
-                           for fn, o in filename_op_map.items()}
-        opname_csvwriter_map = {o: csv.writer(opname_file_map[o]) for o in operator_ids}
-
-        # write the headers
-        for _, writer in opname_csvwriter_map.items():
-            writer.writerow(['imei', 'last_seen'])
-
-        # query to find blacklist violations
-        with conn.cursor() as cursor:
-            cursor.execute("""SELECT imei_norm AS imei, last_seen, operator_id
-                                FROM classification_state
-                                JOIN monthly_network_triplets_per_mno_no_null_imeis
-                               USING (imei_norm)
-                               WHERE triplet_month = %s
-                                 AND triplet_year = %s
-                                 AND end_date IS NULL
-                                 AND block_date IS NOT NULL
-                                 AND last_seen > block_date""",
-                           [month, year])
-            for res in cursor:
-                opname_csvwriter_map[res.operator_id].writerow([res.imei, res.last_seen])
-        logger.info('Per-MNO blacklist violation generated successfully.')
+    operator_ids = [o.id for o in config.region_config.operators]
+    filename_op_map = {'blacklist_violations_{0}.csv'.format(o): o for o in operator_ids}
+
+    # query to find blacklist violations
+    query = sql.SQL("""SELECT imei_norm AS imei, last_seen, operator_id
+                         FROM classification_state
+                         JOIN monthly_network_triplets_per_mno_no_null_imeis
+                        USING (imei_norm, virt_imei_shard)
+                        WHERE triplet_month = %(month)s
+                          AND triplet_year = %(year)s
+                          AND virt_imei_shard >= %(virt_imei_range_start)s
+                          AND virt_imei_shard < %(virt_imei_range_end)s
+                          AND end_date IS NULL
+                          AND block_date IS NOT NULL
+                          AND last_seen > block_date""")
+    _write_sharded_report(conn, config, logger, report_dir,
+                          report_name='blacklist_violations',
+                          filename_key_map=filename_op_map,
+                          header=['imei', 'last_seen'],
+                          query=query,
+                          params={'month': month, 'year': year},
+                          rows_func=lambda res: [(res.operator_id, [res.imei, res.last_seen])])
+    logger.info('Per-MNO blacklist violation generated successfully.')
     return _gen_metadata_for_reports(list(filename_op_map.keys()), report_dir)
 
 
@@ -772,36 +837,191 @@ def write_association_list_violations(logger: callable, config: callable, report
         Report Metadata
     """
     logger.info('Generating per-MNO association list violations...')
-    with contextlib.ExitStack() as stack:
-        operator_ids = [o.id for o in config.region_config.operators]
-        filename_op_map = {'association_violations_{0}.csv'.format(o): o for o in operator_ids}
-        opname_file_map = {o: stack.enter_context(open(os.path.join(report_dir, fn), 'w', encoding='utf-8'))
-                           for fn, o in filename_op_map.items()}
-        opname_csvwriter_map = {o: csv.writer(opname_file_map[o]) for o in operator_ids}
+    operator_ids = [o.id for o in config.region_config.operators]
+    filename_op_map = {'association_violations_{0}.csv'.format(o): o for o in operator_ids}
+
+    query = sql.SQL("""SELECT imei_norm imei, imsi, msisdn, first_seen, last_seen, operator_id
+                         FROM monthly_network_triplets_per_mno_no_null_imeis mno
+                        WHERE NOT EXISTS(SELECT 1
+                                           FROM (SELECT imei_norm, imsi
+                                                   FROM device_association_list dal
+                                             INNER JOIN subscribers_registration_list srl
+                                                        ON dal.uid = srl.uid) association
+                                          WHERE mno.imei_norm = association.imei_norm
+                                            AND mno.imsi = association.imsi)
+                          AND mno.triplet_month = %(month)s
+                          AND mno.triplet_year = %(year)s
+                          AND mno.virt_imei_shard >= %(virt_imei_range_start)s
+                          AND mno.virt_imei_shard < %(virt_imei_range_end)s""")  # noqa: Q449
+    _write_sharded_report(conn, config, logger, report_dir,
+                          report_name='association_violations',
+                          filename_key_map=filename_op_map,
+                          header=['imei', 'imsi', 'msisdn', 'first_seen', 'last_seen'],
+                          query=query,
+                          params={'month': month, 'year': year},
+                          rows_func=lambda res: [(res.operator_id, [res.imei,
+                                                                    res.imsi,
+                                                                    res.msisdn,
+                                                                    res.first_seen,
+                                                                    res.last_seen])])
+    logger.info('Per-MNO association list violations list generated successfully.')
+    return _gen_metadata_for_reports(list(filename_op_map.keys()), report_dir)
 
-        for _, writer in opname_csvwriter_map.items():
-            writer.writerow(['imei', 'imsi', 'msisdn', 'first_seen', 'last_seen'])
 
-        with conn.cursor() as cursor:
-            cursor.execute("""SELECT imei_norm imei, imsi, msisdn, first_seen, last_seen, operator_id
-                                FROM monthly_network_triplets_per_mno_no_null_imeis mno
-                               WHERE NOT EXISTS(SELECT 1
-                                                  FROM (SELECT imei_norm, imsi
-                                                          FROM device_association_list dal
-                                                    INNER JOIN subscribers_registration_list srl
-                                                               ON dal.uid = srl.uid) association
-                                                 WHERE mno.imei_norm = association.imei_norm
-                                                   AND mno.imsi = association.imsi)
-                                 AND mno.triplet_month = %s
-                                 AND mno.triplet_year = %s""", [month, year])  # noqa: Q449
-            for res in cursor:
-                opname_csvwriter_map[res.operator_id].writerow([res.imei,
-                                                                res.imsi,
-                                                                res.msisdn,
-                                                                res.first_seen,
-                                                                res.last_seen])
-        logger.info('Per-MNO association list violations list generated successfully.')
-    return _gen_metadata_for_reports(list(filename_op_map.keys()), report_dir)
+TRIPLETS_SCAN_REPORT_TYPES = ['blacklist_violations', 'association_list_violations', 'classified_triplets',
+                              'unregistered_subscribers']
+
+
+def _triplets_scan_rows(res: callable) -> list:
+    """Helper method to fan out a triplets scan result row to the reports it belongs to.
+
+    Arguments:
+        res: result row of the triplets scan query
+    Returns:
+        list of (key, csv row) tuples
+    """
+    rows = []
+    if res.is_unregistered_subscriber:
+        rows.append((('unregistered_subscribers', res.operator_id),
+                     [res.imsi, res.first_seen.strftime('%Y%m%d'), res.last_seen.strftime('%Y%m%d')]))
+    if res.is_association_list_violation:
+        rows.append((('association_list_violations', res.operator_id),
+                     [res.imei_norm, res.imsi, res.msisdn, res.first_seen, res.last_seen]))
+    for _ in range(res.num_blacklist_violations):
+        rows.append((('blacklist_violations', res.operator_id), [res.imei_norm, res.last_seen]))
+    for cond_name in res.classified_cond_names:
+        rows.append((('classified_triplets', cond_name), [res.imei_norm, res.imsi, res.msisdn, res.operator_id]))
+    return rows
+
+
+def write_triplets_scan_reports(logger: callable, config: callable, report_dir: str, conn: callable,
+                                report_types: list, *, month: int = None, year: int = None, conditions: list = None,
+                                newer_than: str = None) -> dict:
+    """Helper method to write several per-MNO triplet reports from a single scan of the per-MNO triplets.
+
+    Each triplet row is evaluated against the predicate of every requested report in the same query and fanned out
+    to the writers of all reports it belongs to. The files written are identical to those written by the individual
+    report helpers.
+
+    Arguments:
+        logger: DIRBS logger object
+        config: DIRBS config object
+        report_dir: reporting directory
+        conn: DIRBS PostgreSQL connection object
+        report_types: list of reports to generate, a subset of TRIPLETS_SCAN_REPORT_TYPES
+        month: reporting month for the blacklist and association list violations reports
+        year: reporting year for the blacklist and association list violations reports
+        conditions: conditions list for the classified triplets report
+        newer_than: only include unregistered subscribers seen after this date
+    Returns:
+        map from report type to report metadata
+    """
+    assert report_types and all([rt in TRIPLETS_SCAN_REPORT_TYPES for rt in report_types])
+    logger.info('Generating {0} from a single scan of the per-MNO triplets...'.format(', '.join(report_types)))
+    operator_ids = [o.id for o in config.region_config.operators]
+    filename_key_map = {}
+    key_header_map = {}
+    params = {'month': month, 'year': year}
+
+    # Each report contributes a column that is evaluated per triplet row. Columns for reports that were not
+    # requested are constants so that the result rows always have the same shape.
+    unregistered_sql = sql.SQL('FALSE')
+    association_sql = sql.SQL('FALSE')
+    blacklist_sql = sql.SQL('0')
+    classified_sql = sql.SQL("'{}'::TEXT[]")
+
+    if 'unregistered_subscribers' in report_types:
+        unregistered_sql = sql.SQL("""NOT EXISTS (SELECT 1
+                                                    FROM subscribers_registration_list
+                                                   WHERE imsi = mno.imsi)""")
+        if newer_than:
+            unregistered_sql = sql.SQL('{0} AND mno.last_seen > %(newer_than)s').format(unregistered_sql)
+            params['newer_than'] = newer_than
+        for o in operator_ids:
+            filename_key_map['unregistered_subscribers_{0}.csv'.format(o)] = ('unregistered_subscribers', o)
+            key_header_map[('unregistered_subscribers', o)] = ['imsi', 'first_seen', 'last_seen']
+
+    if 'association_list_violations' in report_types:
+        association_sql = sql.SQL("""mno.triplet_month = %(month)s
+                                     AND mno.triplet_year = %(year)s
+                                     AND NOT EXISTS(SELECT 1
+                                                      FROM (SELECT imei_norm, imsi
+                                                              FROM device_association_list dal
+                                                        INNER JOIN subscribers_registration_list srl
+                                                                   ON dal.uid = srl.uid) association
+                                                     WHERE mno.imei_norm = association.imei_norm
+                                                       AND mno.imsi = association.imsi)""")  # noqa: Q449
+        for o in operator_ids:
+            filename_key_map['association_violations_{0}.csv'.format(o)] = ('association_list_violations', o)
+            key_header_map[('association_list_violations', o)] = ['imei', 'imsi', 'msisdn',
+                                                                  'first_seen', 'last_seen']
+
+    if 'blacklist_violations' in report_types:
+        # Counted rather than tested for existence, as the blacklist violations report has one row per matching
+        # classification_state row
+        blacklist_sql = sql.SQL("""CASE WHEN mno.triplet_month = %(month)s AND mno.triplet_year = %(year)s
+                                        THEN (SELECT COUNT(*)
+                                                FROM classification_state cs
+                                               WHERE cs.imei_norm = mno.imei_norm
+                                                 AND cs.virt_imei_shard = mno.virt_imei_shard
+                                                 AND cs.end_date IS NULL
+                                                 AND cs.block_date IS NOT NULL
+                                                 AND mno.last_seen > cs.block_date)
+                                        ELSE 0
+                                    END""")
+        for o in operator_ids:
+            filename_key_map['blacklist_violations_{0}.csv'.format(o)] = ('blacklist_violations', o)
+            key_header_map[('blacklist_violations', o)] = ['imei', 'last_seen']
+
+    if 'classified_triplets' in report_types:
+        classified_sql = sql.SQL("""ARRAY(SELECT cs.cond_name
+                                            FROM classification_state cs
+                                           WHERE cs.imei_norm = mno.imei_norm
+                                             AND cs.virt_imei_shard = mno.virt_imei_shard
+                                             AND cs.cond_name IN %(conditions)s
+                                             AND cs.end_date IS NULL)""")
+        params['conditions'] = tuple([c.label for c in conditions])
+        for c in params['conditions']:
+            filename_key_map['classified_triplets_{0}.csv'.format(c)] = ('classified_triplets', c)
+            key_header_map[('classified_triplets', c)] = ['imei', 'imsi', 'msisdn', 'operator']
+
+    # If only the monthly reports were requested, only that month's triplets need to be scanned
+    if not set(report_types) - {'blacklist_violations', 'association_list_violations'}:
+        month_filter_sql = sql.SQL('AND mno.triplet_month = %(month)s AND mno.triplet_year = %(year)s')
+    else:
+        month_filter_sql = sql.SQL('')
+
+    query = sql.SQL("""SELECT *
+                         FROM (SELECT mno.imei_norm, mno.imsi, mno.msisdn, mno.first_seen, mno.last_seen,
+                                      mno.operator_id,
+                                      {unregistered_sql} AS is_unregistered_subscriber,
+                                      {association_sql} AS is_association_list_violation,
+                                      {blacklist_sql} AS num_blacklist_violations,
+                                      {classified_sql} AS classified_cond_names
+                                 FROM monthly_network_triplets_per_mno_no_null_imeis AS mno
+                                WHERE mno.virt_imei_shard >= %(virt_imei_range_start)s
+                                  AND mno.virt_imei_shard < %(virt_imei_range_end)s
+                                      {month_filter_sql}) triplets
+                        WHERE is_unregistered_subscriber
+                           OR is_association_list_violation
+                           OR num_blacklist_violations > 0
+                           OR cardinality(classified_cond_names) > 0""")
+
+    _write_sharded_report(conn, config, logger, report_dir,
+                          report_name='triplets_scan',
+                          filename_key_map=filename_key_map,
+                          header=[],
+                          key_header_map=key_header_map,
+                          query=query.format(unregistered_sql=unregistered_sql,
+                                             association_sql=association_sql,
+                                             blacklist_sql=blacklist_sql,
+                                             classified_sql=classified_sql,
+                                             month_filter_sql=month_filter_sql),
+                          params=params,
+                          rows_func=_triplets_scan_rows)
+    logger.info('Per-MNO triplet reports generated successfully.')
+    return {rt: _gen_metadata_for_reports([fn for fn, k in filename_key_map.items() if k[0] == rt], report_dir)
+            for rt in report_types}
 
 
 def write_transient_msisdns(logger: callable, period: int, report_dir: str, conn: callable, config: callable,
@@ -869,85 +1089,110 @@ def write_transient_msisdns(logger: callable, period: int, report_dir: str, conn
                 num_of_imeis=sql.Literal(num_of_imeis)
             )
             cursor.execute(query_bit_counts_in_period.as_string(conn))
-            msisdn_to_imei_count_map = [
-                {
-                    'msisdn': res.msisdn,
-                    'imei_count': res.imeis_count,
-                    'operator_id': res.operator_id
-                } for res in cursor]
-
-            possible_transients = []  # dict to identify possible transients based on tests
-            for val in msisdn_to_imei_count_map:
-                imei_extraction_query = sql.SQL("""SELECT DISTINCT imei_norm
-                                                     FROM monthly_network_triplets_country_no_null_imeis
-                                                    WHERE msisdn = {msisdn}
-                                                      AND last_seen >= {analysis_start_date}
-                                                      AND first_seen < {analysis_end_date}
-                                                 ORDER BY imei_norm ASC""").format(
-                    msisdn=sql.Literal(val.get('msisdn')),
-                    analysis_start_date=sql.Literal(analysis_start_date),
-                    analysis_end_date=sql.Literal(analysis_end_date)
-                )
-                cursor.execute(imei_extraction_query)
-                imei_list = [res.imei_norm for res in cursor if res.imei_norm.isnumeric()]
-                tac_list = [int(imei[:8]) for imei in imei_list]
-                imei_list = list(map(int, imei_list))
-
-                analysis_tests = {
-                    'identical_tac': False,
-                    'consecutive_tac': False,
-                    'arithmetic_tac': False,
-                    'consecutive_imei': False,
-                    'arithmetic_imei': False
-                }
-
-                logger.info('Performing TAC analysis on the data...')
-                if len(set(tac_list)) == 1:
-                    analysis_tests['identical_tac'] = True
-                else:
-                    if _have_consecutive_numbers(tac_list):
-                        analysis_tests['consecutive_tac'] = True
-
-                    if _is_arithmetic_series(tac_list):
-                        analysis_tests['arithmetic_tac'] = True
-
-                logger.info('Performing IMEIs analysis on data...')
-                if _have_consecutive_numbers(imei_list):
-                    analysis_tests['consecutive_imei'] = True
-
-                if _is_arithmetic_series(imei_list):
-                    analysis_tests['arithmetic_imei'] = True
-
-                if any(analysis_tests.values()):
-                    possible_transients.append(val)
-
-            for item in possible_transients:
-                opname_csvwriter_map[item.get('operator_id')].writerow([item.get('msisdn')])
+            candidates = [(res.msisdn, res.operator_id) for res in cursor]
+
+        transient_msisdns = _find_transient_msisdns(conn, logger, sorted(set([msisdn for msisdn, _ in candidates])),
+                                                    analysis_start_date, analysis_end_date)
+        for msisdn, operator_id in candidates:
+            if msisdn in transient_msisdns:
+                opname_csvwriter_map[operator_id].writerow([msisdn])
 
         logger.info('Per-MNO possible transient MSISDN lists generated successfully.')
     return _gen_metadata_for_reports(list(filename_op_map.keys()), report_dir)
 
 
-def _have_consecutive_numbers(input_list: list):
+def _find_transient_msisdns(conn: callable, logger: callable, msisdns: list, analysis_start_date: datetime.date,
+                            analysis_end_date: datetime.date) -> set:
+    """Helper method to find which of the candidate MSISDNs were seen with a suspicious sequence of IMEIs.
+
+    The distinct IMEIs of all candidate MSISDNs are streamed in a single query, ordered by MSISDN and IMEI, into
+    columnar arrays. Each MSISDN is a contiguous segment of those arrays, so the TAC and IMEI tests are evaluated
+    for all MSISDNs at once with NumPy segment operations.
+
+    Arguments:
+        conn: DIRBS postgresql connection object
+        logger: DIRBS logger object
+        msisdns: list of candidate MSISDNs
+        analysis_start_date: start date of the analysis window
+        analysis_end_date: end date of the analysis window
+    Returns:
+        set of MSISDNs that are possible transients
     """
-    Helper method to detect weather a list of numbers are consecutive in order.
+    if not msisdns:
+        return set()
+
+    segment_msisdns = []
+    segment_starts = []
+    imeis = []
+    tacs = []
+    with conn.cursor(name='transient_msisdns_imeis') as cursor:
+        cursor.execute("""SELECT DISTINCT msisdn, imei_norm
+                            FROM monthly_network_triplets_country_no_null_imeis
+                           WHERE msisdn = ANY(%s)
+                             AND last_seen >= %s
+                             AND first_seen < %s
+                        ORDER BY msisdn, imei_norm ASC""", [msisdns, analysis_start_date, analysis_end_date])
+        for res in cursor:
+            if not res.imei_norm.isnumeric():
+                continue
+            if not segment_msisdns or segment_msisdns[-1] != res.msisdn:
+                segment_msisdns.append(res.msisdn)
+                segment_starts.append(len(imeis))
+            imeis.append(int(res.imei_norm))
+            tacs.append(int(res.imei_norm[:8]))
+
+    if not segment_msisdns:
+        return set()
+
+    logger.info('Performing TAC and IMEI analysis on the IMEIs of {0:d} MSISDNs...'.format(len(segment_msisdns)))
+    segment_starts = np.array(segment_starts, dtype=np.int64)
+    imeis = np.array(imeis, dtype=np.int64)
+    tacs = np.array(tacs, dtype=np.int64)
+    identical_tac = np.minimum.reduceat(tacs, segment_starts) == np.maximum.reduceat(tacs, segment_starts)
+    is_transient = identical_tac | \
+        _segments_have_consecutive_numbers(tacs, segment_starts) | \
+        _segments_are_arithmetic_series(tacs, segment_starts) | \
+        _segments_have_consecutive_numbers(imeis, segment_starts) | \
+        _segments_are_arithmetic_series(imeis, segment_starts)
+    return set([msisdn for msisdn, transient in zip(segment_msisdns, is_transient) if transient])
+
+
+def _segments_have_consecutive_numbers(values: np.ndarray, segment_starts: np.ndarray) -> np.ndarray:
+    """
+    Helper method to detect whether the numbers in each segment of an array are consecutive once sorted.
 
     Arguments:
-        input_list: input list of integers
+        values: array of integers
+        segment_starts: array of the start offsets of each non-empty segment
     Returns:
-        Boolean: True/False
+        boolean array with one element per segment
     """
-    return True if sum(np.diff(sorted(input_list))) == (len(input_list) - 1) else False
+    segment_lengths = np.diff(np.append(segment_starts, len(values)))
+    segment_ranges = np.maximum.reduceat(values, segment_starts) - np.minimum.reduceat(values, segment_starts)
+    return segment_ranges == segment_lengths - 1
 
 
-def _is_arithmetic_series(input_list: list):
+def _segments_are_arithmetic_series(values: np.ndarray, segment_starts: np.ndarray) -> np.ndarray:
     """
-    Helper method to detect weather a list of numbers are arithmetic in order.
+    Helper method to detect whether the numbers in each segment of an array form an arithmetic series in order.
+
+    Segments with a single number are considered to be arithmetic series.
 
     Arguments:
-        input_list: input list of integers
+        values: array of integers
+        segment_starts: array of the start offsets of each non-empty segment
     Returns:
-        Boolean: True/False
+        boolean array with one element per segment
     """
-    diff_arr = np.diff(input_list)
-    return np.all(diff_arr == diff_arr[0])
+    segment_lengths = np.diff(np.append(segment_starts, len(values)))
+    # Drop the differences between the last number of a segment and the first number of the next one
+    diffs = np.delete(np.diff(values), segment_starts[1:] - 1)
+    num_diffs = segment_lengths - 1
+    has_diffs = num_diffs > 0
+    rv = np.ones(len(segment_starts), dtype=bool)
+    if not diffs.size:
+        return rv
+    diff_starts = np.cumsum(num_diffs[has_diffs]) - num_diffs[has_diffs]
+    first_diffs = np.repeat(diffs[diff_starts], num_diffs[has_diffs])
+    rv[has_diffs] = np.add.reduceat((diffs != first_diffs).astype(np.int64), diff_starts) == 0
+    return rv
@@ -38,13 +38,14 @@ class OperatorReport(BaseOperatorCountryReport):
     """Class used to generation operator-specific reports."""
 
     def __init__(self, conn, data_id, config, month, year, operator,
-                 has_compliance_data=False):
+                 has_compliance_data=False, report_data=None):
         """Constructor."""
         self.operator_name = operator.name
         self.operator_id = operator.id
         self.mcc_mnc_pairs = operator.mcc_mnc_pairs
         super(OperatorReport, self).__init__(conn, data_id, config, month, year, 'operator_report.html',
-                                             self.operator_id, has_compliance_data=has_compliance_data)
+                                             self.operator_id, has_compliance_data=has_compliance_data,
+                                             report_data=report_data)
 
     def gen_report_data(self):
         """Overrides BaseOperatorCountryReport.gen_report_data."""
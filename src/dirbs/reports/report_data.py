@@ -0,0 +1,164 @@
+"""
+DIRBS loader for the stored report data used by the operator and country reports.
+
+Copyright (c) 2018-2021 Qualcomm Technologies, Inc.
+
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification, are permitted (subject to the
+limitations in the disclaimer below) provided that the following conditions are met:
+
+- Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+  disclaimer.
+- Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the following
+  disclaimer in the documentation and/or other materials provided with the distribution.
+- Neither the name of Qualcomm Technologies, Inc. nor the names of its contributors may be used to endorse or promote
+  products derived from this software without specific prior written permission.
+- The origin of this software must not be misrepresented; you must not claim that you wrote the original software.
+  If you use this software in a product, an acknowledgment is required by displaying the trademark/logo as per the
+  details provided here: https://www.qualcomm.com/documents/dirbs-logo-and-brand-guidelines
+- Altered source versions must be plainly marked as such, and must not be misrepresented as being the original
+  software.
+- This notice may not be removed or altered from any source distribution.
+
+NO EXPRESS OR IMPLIED LICENSES TO ANY PARTY'S PATENT RIGHTS ARE GRANTED BY THIS LICENSE. THIS SOFTWARE IS PROVIDED BY
+THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR
+BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+POSSIBILITY OF SUCH DAMAGE.
+"""
+
+from collections import defaultdict
+
+from psycopg2 import sql
+
+
+# Number of reporting periods before the report month that historic trends are shown for
+NUM_HISTORIC_REPORTING_PERIODS = 5
+
+# Per-operator report tables and the order their rows are presented in, or None if the order does not matter
+_PER_OPERATOR_TABLE_ORDERING = {
+    'report_monthly_stats': None,
+    'report_daily_stats': 'data_date',
+    'report_monthly_condition_stats': None,
+    'report_monthly_top_models_imei': 'rank_pos',
+    'report_monthly_top_models_gross_adds': 'rank_pos',
+    'report_monthly_imei_imsi_overloading': 'seen_with_imsis',
+    'report_monthly_average_imei_imsi_overloading': 'bin_start',
+    'report_monthly_imsi_imei_overloading': 'seen_with_imeis',
+    'report_monthly_condition_stats_combinations': None
+}
+
+# Per-operator report tables that historic trends are shown for
+_HISTORIC_TABLES = {'report_monthly_stats', 'report_monthly_condition_stats'}
+
+
+def previous_reporting_periods(month, year):
+    """
+    Returns the list of month/year tuples to use when generating data for historic trends.
+
+    Arguments:
+        month: report month
+        year: report year
+    Returns:
+        list of (month, year) tuples for the previous reporting periods, oldest first
+    """
+    periods = []
+    for i in range(NUM_HISTORIC_REPORTING_PERIODS):
+        month -= 1
+        if month == 0:
+            month = 12
+            year -= 1
+        periods.append((month, year))
+
+    periods.reverse()
+    return periods
+
+
+class ReportData:
+    """Stored report data for the country and every operator for a report month and its historic periods.
+
+    The data for all operators is fetched using a fixed number of queries, so that the country report and every
+    operator report can be generated without any further database round trips.
+    """
+
+    def __init__(self, conn, data_id, month, year):
+        """Constructor."""
+        self.data_id = data_id
+        self.month = month
+        self.year = year
+        self._rows = {}
+
+        with conn.cursor() as cursor:
+            cursor.execute("""SELECT *
+                                FROM report_data_metadata
+                               WHERE data_id = %s""",
+                           [data_id])
+            self.metadata = cursor.fetchone()
+
+            cursor.execute("""SELECT *
+                                FROM report_monthly_conditions
+                               WHERE data_id = %s
+                            ORDER BY sort_order""",
+                           [data_id])
+            self.conditions = cursor.fetchall()
+
+            # Resolve the latest data_id for each of the historic reporting periods once, rather than once per table
+            # and operator
+            periods = previous_reporting_periods(month, year)
+            cursor.execute("""SELECT report_month, report_year, MAX(data_id) AS data_id
+                                FROM report_data_metadata
+                               WHERE (report_month, report_year) IN (SELECT *
+                                                                       FROM UNNEST(%s::INT[], %s::INT[]))
+                            GROUP BY report_month, report_year""",
+                           [[m for m, _ in periods], [y for _, y in periods]])
+            historic_data_ids = {(r.report_month, r.report_year): r.data_id for r in cursor}
+            self.historic_data_ids = [historic_data_ids.get(p) for p in periods]
+
+            all_data_ids = [data_id] + [x for x in self.historic_data_ids if x is not None]
+            for table_name, order_col in _PER_OPERATOR_TABLE_ORDERING.items():
+                data_ids = all_data_ids if table_name in _HISTORIC_TABLES else [data_id]
+                if order_col is None:
+                    order_sql = sql.SQL('')
+                else:
+                    order_sql = sql.SQL('ORDER BY {0}').format(sql.Identifier(order_col))
+                cursor.execute(sql.SQL("""SELECT *
+                                            FROM {0}
+                                           WHERE data_id = ANY(%s)
+                                                 {1}""").format(sql.Identifier(table_name), order_sql),
+                               [data_ids])
+                rows = defaultdict(list)
+                for r in cursor:
+                    rows[(r.data_id, r.operator_id)].append(r)
+                self._rows[table_name] = rows
+
+    def rows(self, table_name, operator_id, data_id=None):
+        """
+        Returns the rows of a per-operator report table for an operator.
+
+        Arguments:
+            table_name: name of the per-operator report table
+            operator_id: operator ID, or the country operator name for country-level rows
+            data_id: data ID to return rows for, default None (use the data ID for the report month)
+        Returns:
+            list of rows in report order
+        """
+        if data_id is None:
+            data_id = self.data_id
+        return self._rows[table_name].get((data_id, operator_id), [])
+
+    def historic_rows(self, table_name, operator_id):
+        """
+        Returns the rows of a per-operator report table for each of the historic reporting periods.
+
+        Arguments:
+            table_name: name of the per-operator report table
+            operator_id: operator ID, or the country operator name for country-level rows
+        Returns:
+            list with a list of rows for each historic reporting period (oldest first), empty if there is no data
+        """
+        return [self.rows(table_name, operator_id, data_id=x) if x is not None else []
+                for x in self.historic_data_ids]
@@ -31,6 +31,8 @@ BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
 POSSIBILITY OF SUCH DAMAGE.
 """
 
+import io
+import csv
 import logging
 import datetime
 from concurrent import futures
@@ -38,7 +40,6 @@ from collections import defaultdict, namedtuple
 from operator import attrgetter
 from functools import partial
 import json
-import copy
 
 from psycopg2 import sql
 from psycopg2.extras import execute_values
@@ -48,19 +49,64 @@ from dirbs import report_schema_version
 from dirbs.config.region import OperatorConfig
 import dirbs.utils as utils
 import dirbs.partition_utils as part_utils
+from dirbs.reports.report_data import ReportData
 
 
 ConditionTuple = namedtuple('ConditionTuple', ['label', 'blocking'])
 
+# Which report data groups to recalculate in a partial refresh, the operators to recalculate for each per-operator
+# group and the data_id to copy everything else from
+RefreshPlan = namedtuple('RefreshPlan', ['previous_data_id', 'groups', 'operators'])
+
+# Inputs that each group of report data depends on. In a partial refresh, only the groups with an input that changed
+# since the previous report data for the month was generated are recalculated
+_REPORT_DATA_GROUP_INPUTS = {
+    'monthly_id_stats': {'operator_imports'},
+    'distinct_id_counts': {'operator_imports'},
+    'gross_adds': {'operator_imports'},
+    'top_models_imei': {'operator_imports', 'gsma_import'},
+    'top_models_gross_adds': {'operator_imports', 'gsma_import'},
+    'compliance': {'operator_imports', 'classification'},
+    'imei_imsi_overloading': {'operator_imports'},
+    'daily_imei_imsi_overloading': {'operator_imports'},
+    'imsi_imei_overloading': {'operator_imports'}
+}
+
+# Groups whose per-operator data only depends on the imports for that operator, so that only the country and the
+# operators with new imports are recalculated in a partial refresh. Gross adds are relative to the first time an IMEI
+# was seen on any network, so anything using them depends on the imports for every operator
+_PER_OPERATOR_REPORT_DATA_GROUPS = {'monthly_id_stats', 'top_models_imei'}
+
+# Columns of report_monthly_stats calculated by each group
+_MONTHLY_STATS_GROUP_COLUMNS = {
+    'monthly_id_stats': ['num_null_imei_records', 'num_null_imsi_records', 'num_null_msisdn_records',
+                         'num_invalid_imei_imsis', 'num_invalid_imei_msisdns', 'num_invalid_triplets'],
+    'distinct_id_counts': ['num_triplets', 'num_imeis', 'num_imsis', 'num_msisdns', 'num_imei_imsis',
+                           'num_imei_msisdns', 'num_imsi_msisdns'],
+    'gross_adds': ['num_gross_adds'],
+    'compliance': ['num_compliant_imeis', 'num_noncompliant_imeis', 'num_noncompliant_imeis_blocking',
+                   'num_noncompliant_imeis_info_only', 'num_compliant_triplets', 'num_noncompliant_triplets',
+                   'num_noncompliant_triplets_blocking', 'num_noncompliant_triplets_info_only',
+                   'num_compliant_imei_imsis', 'num_noncompliant_imei_imsis', 'num_noncompliant_imei_imsis_blocking',
+                   'num_noncompliant_imei_imsis_info_only', 'num_compliant_imei_msisdns',
+                   'num_noncompliant_imei_msisdns', 'num_noncompliant_imei_msisdns_blocking',
+                   'num_noncompliant_imei_msisdns_info_only']
+}
+
 
 def generate_monthly_report_stats(config, conn, month, year, statsd, metrics_run_root, run_id, refresh_data=True,
-                                  debug_query_performance=False):
-    """Either generates stats for the reports or returns the data_id to use when using cached data."""
+                                  debug_query_performance=False, partial_refresh=False):
+    """Either generates stats for the reports or returns the data_id to use when using cached data.
+
+    If partial_refresh is set, only the report data whose inputs changed since the previous report data for this
+    month was generated is recalculated and the rest is copied from the previous report data.
+    """
     logger = logging.getLogger('dirbs.report')
     with conn.cursor() as cursor:
         # First, look for any existing report data for this month
         cursor.execute("""SELECT rdm.data_id,
-                                 rdm.class_run_id
+                                 rdm.class_run_id,
+                                 rdm.refresh_inputs
                             FROM report_data_metadata rdm
                             JOIN (SELECT MAX(data_id) AS data_id
                                     FROM report_data_metadata
@@ -71,9 +117,24 @@ def generate_monthly_report_stats(config, conn, month, year, statsd, metrics_run
                        [month, year, report_schema_version])
         result = cursor.fetchone()
         if result:
-            data_id, class_run_id = result
+            data_id, class_run_id, previous_inputs = result
         else:
-            data_id, class_run_id = (None, None)
+            data_id, class_run_id, previous_inputs = (None, None, None)
+
+        # Record the inputs up front, so that anything imported or classified while the data is being calculated is
+        # picked up by the next partial refresh
+        refresh_inputs = None
+        refresh_plan = None
+        if not data_id or refresh_data:
+            refresh_inputs = _report_data_inputs(conn, config)
+            if data_id and partial_refresh:
+                if previous_inputs is None:
+                    logger.info('No inputs recorded for the previous data for this month, so refreshing all data')
+                else:
+                    refresh_plan = _plan_partial_refresh(data_id, previous_inputs, refresh_inputs)
+                    if not refresh_plan.groups:
+                        logger.info('No inputs changed since the previous data for this month was generated')
+                        refresh_data = False
 
         # Commit connection here to prevent long-running transaction
         conn.commit()
@@ -85,7 +146,9 @@ def generate_monthly_report_stats(config, conn, month, year, statsd, metrics_run
             logger.info('No data previously generated for this month or refresh requested')
             data_id, class_run_id, per_tac_compliance_data = _refresh_data(config, conn, month, year, statsd,
                                                                            metrics_run_root, run_id,
-                                                                           debug_query_performance)
+                                                                           debug_query_performance,
+                                                                           refresh_inputs,
+                                                                           refresh_plan=refresh_plan)
             # Commit the connection so we can re-use this data even if subsequent operations fail
             conn.commit()
         else:
@@ -93,17 +156,75 @@ def generate_monthly_report_stats(config, conn, month, year, statsd, metrics_run
         return data_id, class_run_id, per_tac_compliance_data
 
 
-def _store_report_data_metadata(conn, month, year, class_run_id):
+def _store_report_data_metadata(conn, month, year, class_run_id, refresh_inputs):
     """Store new metadata about this data generation run and return the data_id for stats storage."""
     with conn.cursor() as cursor:
         cursor.execute("""INSERT INTO report_data_metadata(data_date, report_year, report_month,
-                                                           data_schema_version, class_run_id)
-                                      VALUES(%s, %s, %s, %s, %s)
+                                                           data_schema_version, class_run_id, refresh_inputs)
+                                      VALUES(%s, %s, %s, %s, %s, %s)
                             RETURNING data_id""",
-                       [datetime.date.today(), year, month, report_schema_version, class_run_id])
+                       [datetime.date.today(), year, month, report_schema_version, class_run_id,
+                        json.dumps(refresh_inputs)])
         return cursor.fetchone()[0]
 
 
+def _report_data_inputs(conn, config):
+    """Returns the inputs the report data is calculated from, as stored in report_data_metadata.refresh_inputs."""
+    condition_tuples = _sort_conditions([ConditionTuple(x.label, x.blocking) for x in config.conditions])
+    cond_run_info = utils.most_recently_run_condition_info(conn, [c.label for c in condition_tuples])
+    cond_run_ids = {k: v['run_id'] if v is not None else None for k, v in cond_run_info.items()}
+    with conn.cursor() as cursor:
+        cursor.execute("""SELECT extra_metadata->>'operator_id' AS operator_id,
+                                 MAX(run_id) AS run_id
+                            FROM job_metadata
+                           WHERE command = 'dirbs-import'
+                             AND subcommand = 'operator'
+                             AND status = 'success'
+                        GROUP BY extra_metadata->>'operator_id'""")
+        operator_import_run_ids = {res.operator_id: res.run_id for res in cursor}
+        cursor.execute("""SELECT MAX(run_id)
+                            FROM job_metadata
+                           WHERE command = 'dirbs-import'
+                             AND subcommand = 'gsma_tac'
+                             AND status = 'success'""")
+        gsma_import_run_id = cursor.fetchone()[0]
+
+    # Lists rather than tuples are used so that the inputs compare equal to those read back from the database
+    return {
+        'operator_imports': {op.id: operator_import_run_ids.get(op.id) for op in config.region_config.operators},
+        'gsma_import': gsma_import_run_id,
+        'classification': [[c.label, c.blocking, cond_run_ids[c.label]] for c in condition_tuples]
+    }
+
+
+def _plan_partial_refresh(previous_data_id, previous_inputs, refresh_inputs):
+    """Works out which report data needs recalculating given the inputs of the previous and the new report data."""
+    changed_inputs = {k for k, v in refresh_inputs.items() if previous_inputs.get(k) != v}
+    previous_operator_imports = previous_inputs.get('operator_imports', {})
+    changed_operators = {op for op, run_id in refresh_inputs['operator_imports'].items()
+                         if op not in previous_operator_imports or previous_operator_imports[op] != run_id}
+    groups = {g for g, inputs in _REPORT_DATA_GROUP_INPUTS.items() if inputs & changed_inputs}
+
+    # Per-operator groups are recalculated for every operator if anything other than the operator imports changed
+    operators = {}
+    for g in _PER_OPERATOR_REPORT_DATA_GROUPS & groups:
+        if changed_inputs & _REPORT_DATA_GROUP_INPUTS[g] - {'operator_imports'}:
+            operators[g] = set(refresh_inputs['operator_imports'])
+        else:
+            operators[g] = changed_operators
+    return RefreshPlan(previous_data_id, groups, operators)
+
+
+def _is_copied(refresh_plan, group, operator):
+    """Returns whether the report data for a group and operator is copied from the previous report data."""
+    if refresh_plan is None:
+        return False
+    if group not in refresh_plan.groups:
+        return True
+    return group in refresh_plan.operators and operator != OperatorConfig.COUNTRY_OPERATOR_NAME \
+        and operator not in refresh_plan.operators[group]
+
+
 def _sort_conditions(condition_tuples):
     """Sorts a list of condition_name, blocking tuples into the order expected by the report."""
     # Input format is (name, blocking) -> This put blocking conditions first, then sorts by name
@@ -131,8 +252,13 @@ def _log_perf_metric(statsd, metric_root, stat_name, duration, operator_id=None,
         statsd.gauge('{0}.normalized_triplets'.format(metric_key), norm_factor * duration)
 
 
-def _refresh_data(config, conn, month, year, statsd, metrics_run_root, run_id, debug_query_performance):
-    """Refreshes reporting stats from the DB and stores aggregated results into the various reporting tables."""
+def _refresh_data(config, conn, month, year, statsd, metrics_run_root, run_id, debug_query_performance,
+                  refresh_inputs, refresh_plan=None):
+    """Refreshes reporting stats from the DB and stores aggregated results into the various reporting tables.
+
+    If a refresh_plan is supplied, only the report data groups in the plan are recalculated and the rest of the report
+    data is copied from the previous report data for the month.
+    """
     logger = logging.getLogger('dirbs.report')
     nworkers = config.multiprocessing_config.max_db_connections
     db_config = config.db_config
@@ -159,15 +285,38 @@ def _refresh_data(config, conn, month, year, statsd, metrics_run_root, run_id, d
     per_operator_compliance_data = {}
     per_operator_daily_imei_imsi_overloading = {}
 
+    num_physical_shards = part_utils.num_physical_imei_shards(conn)
+
+    if refresh_plan is None:
+        refresh_groups = set(_REPORT_DATA_GROUP_INPUTS)
+        refresh_operators = {g: operators for g in _PER_OPERATOR_REPORT_DATA_GROUPS}
+    else:
+        refresh_groups = refresh_plan.groups
+        refresh_operators = {g: [op for op in operators if not _is_copied(refresh_plan, g, op)]
+                             for g in _PER_OPERATOR_REPORT_DATA_GROUPS}
+        logger.info('Partial refresh: recalculating {0} and copying the remaining data from data_id {1:d}...'
+                    .format(', '.join(sorted(refresh_groups)), refresh_plan.previous_data_id))
+        _copy_previous_report_data(conn, refresh_plan, operators, month, year, per_operator_record_counts,
+                                   per_operator_daily_stats, per_operator_monthly_stats,
+                                   per_operator_condition_counts, per_operator_top_model_imei_counts,
+                                   per_operator_top_model_gross_adds, per_operator_imei_imsi_overloading,
+                                   per_operator_imsi_imei_overloading, per_operator_compliance_data,
+                                   per_operator_daily_imei_imsi_overloading)
+
     # We use the per-operator record counts to normalize performance numbers, so we need to do this first
-    # in a separate executor
+    # in a separate executor. The record counts are calculated in the same pass over each shard as the counts of
+    # NULL and invalid identifiers
     with futures.ProcessPoolExecutor(max_workers=nworkers) as executor:
-        logger.info('Simultaneously calculating data volume for each operator using {0:d} workers...'
-                    .format(nworkers))
-        logger.info('Queueing jobs to calculate monthly record counts...')
+        logger.info('Simultaneously calculating data volume and data quality stats for each operator using {0:d} '
+                    'workers...'.format(nworkers))
+        logger.info('Queueing jobs to calculate monthly record counts and invalid identifier counts...')
         futures_to_cb = {}
-        _queue_record_count_jobs(executor, futures_to_cb, per_operator_record_counts, db_config,
-                                 operators, month, year, statsd, metrics_run_root, debug_query_performance)
+        if 'monthly_id_stats' in refresh_groups:
+            _queue_monthly_id_stats_jobs(executor, futures_to_cb, per_operator_record_counts,
+                                         per_operator_monthly_stats, db_config, month, year, num_physical_shards,
+                                         statsd, metrics_run_root, debug_query_performance,
+                                         operators=refresh_operators['monthly_id_stats']
+                                         if refresh_plan is not None else None)
 
         # Process futures as they are completed, calling the associated callback passing the
         # future as the only argument (other arguments to the callback get partially applied
@@ -179,31 +328,44 @@ def _refresh_data(config, conn, month, year, statsd, metrics_run_root, run_id, d
                     .format(nworkers))
         logger.info('Queueing jobs to calculate stats...')
         futures_to_cb = {}
-        _queue_compliance_jobs(executor, futures_to_cb, per_operator_condition_counts,
-                               per_operator_tac_compliance_data, per_operator_compliance_data,
-                               per_operator_monthly_stats, db_config, operators, month, year, condition_tuples,
-                               per_operator_record_counts, statsd, metrics_run_root, debug_query_performance, run_id)
-        _queue_imsi_imei_overloading_jobs(executor, futures_to_cb, per_operator_imsi_imei_overloading,
-                                          db_config, operators, month, year, per_operator_record_counts,
-                                          statsd, metrics_run_root, debug_query_performance)
-        _queue_imei_imsi_overloading_jobs(executor, futures_to_cb, per_operator_imei_imsi_overloading,
-                                          db_config, operators, month, year, per_operator_record_counts,
-                                          statsd, metrics_run_root, debug_query_performance)
-        _queue_daily_imei_imsi_overloading_jobs(executor, futures_to_cb, per_operator_daily_imei_imsi_overloading,
-                                                db_config, operators, month, year, per_operator_record_counts,
-                                                statsd, metrics_run_root, debug_query_performance)
-        _queue_monthly_stats_jobs(executor, futures_to_cb, per_operator_monthly_stats, db_config, operators,
-                                  month, year, per_operator_record_counts, statsd, metrics_run_root,
-                                  debug_query_performance)
-        _queue_top_model_gross_adds_jobs(executor, futures_to_cb, per_operator_top_model_gross_adds,
-                                         db_config, operators, month, year, per_operator_record_counts, statsd,
-                                         metrics_run_root, debug_query_performance)
-        _queue_top_model_imei_jobs(executor, futures_to_cb, per_operator_top_model_imei_counts,
-                                   db_config, operators, month, year, per_operator_record_counts,
-                                   statsd, metrics_run_root, debug_query_performance)
-        _queue_distinct_id_counts_jobs(executor, futures_to_cb, per_operator_monthly_stats, per_operator_daily_stats,
-                                       db_config, operators, month, year, per_operator_record_counts, statsd,
-                                       metrics_run_root, debug_query_performance)
+        queue_jobs = {
+            'compliance': partial(_queue_compliance_jobs, executor, futures_to_cb, per_operator_condition_counts,
+                                  per_operator_tac_compliance_data, per_operator_compliance_data,
+                                  per_operator_monthly_stats, db_config, operators, month, year, condition_tuples,
+                                  per_operator_record_counts, statsd, metrics_run_root, debug_query_performance,
+                                  run_id),
+            'imsi_imei_overloading': partial(_queue_imsi_imei_overloading_jobs, executor, futures_to_cb,
+                                             per_operator_imsi_imei_overloading, db_config, operators, month, year,
+                                             per_operator_record_counts, statsd, metrics_run_root,
+                                             debug_query_performance),
+            'imei_imsi_overloading': partial(_queue_imei_imsi_overloading_jobs, executor, futures_to_cb,
+                                             per_operator_imei_imsi_overloading, db_config, operators, month, year,
+                                             per_operator_record_counts, statsd, metrics_run_root,
+                                             debug_query_performance),
+            'daily_imei_imsi_overloading': partial(_queue_daily_imei_imsi_overloading_jobs, executor, futures_to_cb,
+                                                   per_operator_daily_imei_imsi_overloading, db_config, operators,
+                                                   month, year, per_operator_record_counts, statsd,
+                                                   metrics_run_root, debug_query_performance),
+            'gross_adds': partial(_queue_monthly_stats_jobs, executor, futures_to_cb, per_operator_monthly_stats,
+                                  db_config, operators, month, year, per_operator_record_counts, statsd,
+                                  metrics_run_root, debug_query_performance),
+            'top_models_gross_adds': partial(_queue_top_model_gross_adds_jobs, executor, futures_to_cb,
+                                             per_operator_top_model_gross_adds, db_config, operators, month, year,
+                                             per_operator_record_counts, statsd, metrics_run_root,
+                                             debug_query_performance),
+            'top_models_imei': partial(_queue_top_model_imei_jobs, executor, futures_to_cb,
+                                       per_operator_top_model_imei_counts, db_config,
+                                       refresh_operators['top_models_imei'], month, year,
+                                       per_operator_record_counts, statsd, metrics_run_root, debug_query_performance),
+            'distinct_id_counts': partial(_queue_distinct_id_counts_jobs, executor, futures_to_cb,
+                                          per_operator_monthly_stats, per_operator_daily_stats, db_config, operators,
+                                          month, year, per_operator_record_counts, statsd, metrics_run_root,
+                                          debug_query_performance)
+        }
+        # Only queue the jobs for the report data being recalculated
+        for group, queue_func in queue_jobs.items():
+            if group in refresh_groups:
+                queue_func()
         logger.info('Queued jobs to calculate stats. Processing will begin now...')
 
         # Process futures as they are completed, calling the associated callback passing the
@@ -256,26 +418,90 @@ def _refresh_data(config, conn, month, year, statsd, metrics_run_root, run_id, d
                                                per_operator_compliance_data,
                                                per_operator_daily_imei_imsi_overloading,
                                                statsd,
-                                               metrics_run_root)
+                                               metrics_run_root,
+                                               refresh_inputs)
     logger.info('Finished storing report data in DB')
+
+    # The per-TAC compliance data is not stored, so is only available if compliance was recalculated
+    if 'compliance' not in refresh_groups:
+        per_operator_tac_compliance_data = None
     return data_id, class_run_id, per_operator_tac_compliance_data
 
 
-def _queue_record_count_jobs(executor, futures_to_cb, results, db_config, operators, month, year,
-                             statsd, metrics_run_root, debug_query_performance):
-    """Helper function to queue jobs to calculate the record counts for each operator."""
-    for op in operators:
-        futures_to_cb[executor.submit(_calc_record_count, db_config, month, year, op)] \
-            = partial(_process_per_operator_monthly_future, op, 'monthly record count',
-                      statsd, metrics_run_root, results, debug_query_performance)
-    futures_to_cb[executor.submit(_calc_record_count, db_config, month, year)] \
-        = partial(_process_per_operator_monthly_future,
-                  OperatorConfig.COUNTRY_OPERATOR_NAME,
-                  'monthly record count',
-                  statsd,
-                  metrics_run_root,
-                  results,
-                  debug_query_performance)
+def _copy_previous_report_data(conn, refresh_plan, operators, month, year, per_operator_record_counts,
+                               per_operator_daily_stats, per_operator_monthly_stats, per_operator_condition_counts,
+                               per_operator_top_model_imei_counts, per_operator_top_model_gross_adds,
+                               per_operator_imei_imsi_overloading, per_operator_imsi_imei_overloading,
+                               per_operator_compliance_data, per_operator_daily_imei_imsi_overloading):
+    """Populates the results data structures with the previous report data that is not being recalculated."""
+    previous = ReportData(conn, refresh_plan.previous_data_id, month, year)
+    for op in operators + [OperatorConfig.COUNTRY_OPERATOR_NAME]:
+        copied_columns = [col for g, cols in _MONTHLY_STATS_GROUP_COLUMNS.items() if _is_copied(refresh_plan, g, op)
+                          for col in cols]
+        for r in previous.rows('report_monthly_stats', op):
+            if _is_copied(refresh_plan, 'monthly_id_stats', op):
+                per_operator_record_counts[op] = r.num_records
+            per_operator_monthly_stats[op].update({col: getattr(r, col) for col in copied_columns})
+
+        if _is_copied(refresh_plan, 'distinct_id_counts', op):
+            for r in previous.rows('report_daily_stats', op):
+                per_operator_daily_stats[op][r.data_date.day - 1].update(num_triplets=r.num_triplets,
+                                                                         num_imeis=r.num_imeis,
+                                                                         num_imsis=r.num_imsis,
+                                                                         num_msisdns=r.num_msisdns)
+
+        for group, table_name, results in [('top_models_imei', 'report_monthly_top_models_imei',
+                                            per_operator_top_model_imei_counts),
+                                           ('top_models_gross_adds', 'report_monthly_top_models_gross_adds',
+                                            per_operator_top_model_gross_adds)]:
+            if _is_copied(refresh_plan, group, op):
+                results[op] = [{'model': r.model,
+                                'manufacturer': r.manufacturer,
+                                'tech_generations': r.tech_generations,
+                                'imei_count': r.num_imeis} for r in previous.rows(table_name, op)]
+
+        if _is_copied(refresh_plan, 'imei_imsi_overloading', op):
+            per_operator_imei_imsi_overloading[op] = \
+                [{'num_imeis': r.num_imeis, 'seen_with_imsis': r.seen_with_imsis}
+                 for r in previous.rows('report_monthly_imei_imsi_overloading', op)]
+
+        if _is_copied(refresh_plan, 'daily_imei_imsi_overloading', op):
+            per_operator_daily_imei_imsi_overloading[op] = \
+                [{'num_imeis': r.num_imeis, 'bin_start': r.bin_start, 'bin_end': r.bin_end}
+                 for r in previous.rows('report_monthly_average_imei_imsi_overloading', op)]
+
+        if _is_copied(refresh_plan, 'imsi_imei_overloading', op):
+            per_operator_imsi_imei_overloading[op] = \
+                [{'num_imsis': r.num_imsis, 'seen_with_imeis': r.seen_with_imeis}
+                 for r in previous.rows('report_monthly_imsi_imei_overloading', op)]
+
+        if _is_copied(refresh_plan, 'compliance', op):
+            per_operator_condition_counts[op] = \
+                {r.cond_name: {'num_imeis': r.num_imeis,
+                               'num_triplets': r.num_triplets,
+                               'num_imei_imsis': r.num_imei_imsis,
+                               'num_imei_msisdns': r.num_imei_msisdns,
+                               'num_imei_gross_adds': r.num_imei_gross_adds}
+                 for r in previous.rows('report_monthly_condition_stats', op)}
+            per_operator_compliance_data[op] = \
+                {tuple(r.combination): {'num_imeis': r.num_imeis,
+                                        'num_imei_gross_adds': r.num_imei_gross_adds,
+                                        'num_imei_imsis': r.num_imei_imsis,
+                                        'num_imei_msisdns': r.num_imei_msisdns,
+                                        'num_subscriber_triplets': r.num_subscriber_triplets,
+                                        'compliance_level': r.compliance_level}
+                 for r in previous.rows('report_monthly_condition_stats_combinations', op)}
+
+
+def _queue_monthly_id_stats_jobs(executor, futures_to_cb, record_counts, monthly_stats, db_config, month, year,
+                                 num_physical_shards, statsd, metrics_run_root, debug_query_performance,
+                                 operators=None):
+    """Helper function to queue jobs to calculate the record and invalid identifier counts, one job per shard."""
+    for virt_imei_range_start, virt_imei_range_end in part_utils.virt_imei_shard_bounds(num_physical_shards):
+        futures_to_cb[executor.submit(_calc_monthly_id_stats, db_config, month, year,
+                                      virt_imei_range_start, virt_imei_range_end, operators)] \
+            = partial(_process_monthly_id_stats_future, virt_imei_range_start, virt_imei_range_end, record_counts,
+                      monthly_stats, statsd, metrics_run_root, debug_query_performance)
 
 
 def _queue_distinct_id_counts_jobs(executor, futures_to_cb, monthly_results, daily_results, db_config, operators,
@@ -293,12 +519,6 @@ def _queue_monthly_stats_jobs(executor, futures_to_cb, results, db_config, opera
     futures_to_cb[executor.submit(_calc_imei_gross_adds, db_config, operators, month, year)] \
         = partial(_process_monthly_future, 'IMEI gross add', per_operator_record_counts, statsd,
                   metrics_run_root, results, debug_query_performance)
-    futures_to_cb[executor.submit(_calc_invalid_id_null_counts, db_config, month, year)] \
-        = partial(_process_monthly_future, 'invalid identifier (null)', per_operator_record_counts, statsd,
-                  metrics_run_root, results, debug_query_performance)
-    futures_to_cb[executor.submit(_calc_invalid_id_pair_and_triplet_counts, db_config, month, year)] \
-        = partial(_process_monthly_future, 'invalid identifier (pairs and triplets)', per_operator_record_counts,
-                  statsd, metrics_run_root, results, debug_query_performance)
 
 
 def _queue_top_model_imei_jobs(executor, futures_to_cb, results, db_config, operators, month, year,
@@ -373,60 +593,27 @@ def _queue_imei_imsi_overloading_jobs(executor, futures_to_cb, results,
                                       db_config, operators, month, year, per_operator_record_counts,
                                       statsd, metrics_run_root, debug_query_performance):
     """Helper function to queue IMEI-IMSI overloading jobs."""
-    for op in operators:
-        futures_to_cb[executor.submit(_calc_imei_imsi_overloading, db_config, month, year, op)] \
-            = partial(_process_per_operator_monthly_future, op, 'IMEI-IMSI overloading',
-                      statsd, metrics_run_root, results, debug_query_performance,
-                      per_operator_record_counts=per_operator_record_counts)
-    futures_to_cb[executor.submit(_calc_imei_imsi_overloading, db_config, month, year)] \
-        = partial(_process_per_operator_monthly_future,
-                  OperatorConfig.COUNTRY_OPERATOR_NAME,
-                  'IMEI-IMSI overloading',
-                  statsd,
-                  metrics_run_root,
-                  results,
-                  debug_query_performance,
-                  per_operator_record_counts=per_operator_record_counts)
+    futures_to_cb[executor.submit(_calc_imei_imsi_overloading, db_config, operators, month, year)] \
+        = partial(_process_all_operators_monthly_future, 'IMEI-IMSI overloading', per_operator_record_counts,
+                  statsd, metrics_run_root, results, debug_query_performance)
 
 
 def _queue_daily_imei_imsi_overloading_jobs(executor, futures_to_cb, results,
                                             db_config, operators, month, year, per_operator_record_counts,
                                             statsd, metrics_run_root, debug_query_performance):
     """Helper function to queue average IMEI-IMSI overloading jobs."""
-    for op in operators:
-        futures_to_cb[executor.submit(_calc_daily_imei_imsi_overloading, db_config, month, year, op)] \
-            = partial(_process_per_operator_monthly_future, op, 'avg daily IMEI-IMSI overloading',
-                      statsd, metrics_run_root, results, debug_query_performance,
-                      per_operator_record_counts=per_operator_record_counts)
-    futures_to_cb[executor.submit(_calc_daily_imei_imsi_overloading, db_config, month, year)] \
-        = partial(_process_per_operator_monthly_future,
-                  OperatorConfig.COUNTRY_OPERATOR_NAME,
-                  'avg daily IMEI-IMSI overloading',
-                  statsd,
-                  metrics_run_root,
-                  results,
-                  debug_query_performance,
-                  per_operator_record_counts=per_operator_record_counts)
+    futures_to_cb[executor.submit(_calc_daily_imei_imsi_overloading, db_config, operators, month, year)] \
+        = partial(_process_all_operators_monthly_future, 'avg daily IMEI-IMSI overloading',
+                  per_operator_record_counts, statsd, metrics_run_root, results, debug_query_performance)
 
 
 def _queue_imsi_imei_overloading_jobs(executor, futures_to_cb, results,
                                       db_config, operators, month, year, per_operator_record_counts,
                                       statsd, metrics_run_root, debug_query_performance):
     """Helper function to queue IMSI-IMEI overloading jobs."""
-    for op in operators:
-        futures_to_cb[executor.submit(_calc_imsi_imei_overloading, db_config, month, year, op)] \
-            = partial(_process_per_operator_monthly_future, op, 'IMSI-IMEI overloading',
-                      statsd, metrics_run_root, results, debug_query_performance,
-                      per_operator_record_counts=per_operator_record_counts)
-    futures_to_cb[executor.submit(_calc_imsi_imei_overloading, db_config, month, year)] \
-        = partial(_process_per_operator_monthly_future,
-                  OperatorConfig.COUNTRY_OPERATOR_NAME,
-                  'IMSI-IMEI overloading',
-                  statsd,
-                  metrics_run_root,
-                  results,
-                  debug_query_performance,
-                  per_operator_record_counts=per_operator_record_counts)
+    futures_to_cb[executor.submit(_calc_imsi_imei_overloading, db_config, operators, month, year)] \
+        = partial(_process_all_operators_monthly_future, 'IMSI-IMEI overloading', per_operator_record_counts,
+                  statsd, metrics_run_root, results, debug_query_performance)
 
 
 def _monthly_network_triplets_partition(*, conn, month, year, operator=None):
@@ -453,16 +640,6 @@ def _monthly_network_triplets_partition(*, conn, month, year, operator=None):
     return partition_id
 
 
-def _calc_record_count(db_config, month, year, operator=None):
-    """Calculates the number of records being used during report generation. Useful for normalizing per metrics."""
-    with utils.create_db_connection(db_config) as conn, conn.cursor() as cursor, utils.CodeProfiler() as cp:
-        network_triplets_partition = _monthly_network_triplets_partition(conn=conn, operator=operator,
-                                                                         month=month, year=year)
-        cursor.execute(sql.SQL("""SELECT COUNT(*) FROM {0}""").format(network_triplets_partition))
-        record_count = cursor.fetchone()[0]
-    return record_count, cp.duration, [cp.duration]
-
-
 def _calc_distinct_id_counts(db_config, month, year):
     """Calculate per-operator and country daily and monthly ID counts for a given month and year."""
     with utils.create_db_connection(db_config) as conn, conn.cursor() as cursor, utils.CodeProfiler() as cp:
@@ -494,118 +671,118 @@ def _calc_distinct_id_counts(db_config, month, year):
     return results, cp.duration, [cp.duration]
 
 
-def _calc_invalid_id_null_counts(db_config, month, year):
-    """Calculate per-operator monthly stats about invalid data (null) for a given month and year."""
-    with utils.create_db_connection(db_config) as conn, conn.cursor() as cursor, utils.CodeProfiler() as cp:
-        results = defaultdict(lambda: dict(num_null_imei_records=0,
-                                           num_null_imsi_records=0,
-                                           num_null_msisdn_records=0))
-        durations = []
-        for column, result_label in [('imei_norm', 'num_null_imei_records'),
-                                     ('imsi', 'num_null_imsi_records'),
-                                     ('msisdn', 'num_null_msisdn_records')]:
-            with utils.CodeProfiler() as scp:
-                # Calculate per-operator NULL counts
-                cursor.execute(sql.SQL("""SELECT operator_id,
-                                                 COUNT(*) AS cnt
-                                            FROM monthly_network_triplets_per_mno
-                                           WHERE triplet_month = %s
-                                             AND triplet_year = %s
-                                             AND {0} IS NULL
-                                        GROUP BY operator_id""").format(sql.Identifier(column)),
-                               [month, year])
-                for res in cursor:
-                    results[res.operator_id][result_label] = res.cnt
-            durations.append(scp.duration)
-
-            with utils.CodeProfiler() as scp:
-                # Calculate per-country NULL counts
-                cursor.execute(sql.SQL("""SELECT COUNT(*) AS cnt
-                                            FROM monthly_network_triplets_country
-                                           WHERE triplet_month = %s
-                                             AND triplet_year = %s
-                                             AND {0} IS NULL""").format(sql.Identifier(column)),
-                               [month, year])
-                for res in cursor:
-                    results[OperatorConfig.COUNTRY_OPERATOR_NAME][result_label] = res.cnt
-            durations.append(scp.duration)
-
-    return _defaultdict_to_regular(results), cp.duration, durations
-
-
-def _calc_invalid_id_pair_and_triplet_counts(db_config, month, year):
-    """Calculate per-operator monthly stats about invalid data (pairs and triplets) for a given month and year."""
+def _calc_monthly_id_stats(db_config, month, year, virt_imei_range_start, virt_imei_range_end, operators=None):
+    """Calculate per-operator and country record counts and invalid identifier counts for a single IMEI shard.
+
+    All the counts for a table are calculated in a single pass over the shard. As the virtual IMEI shard is a
+    function of the IMEI, each distinct identifier pair or triplet falls into exactly one shard and the counts can be
+    summed over the shards. If a list of operators is supplied, the per-operator counts are only calculated for
+    those operators.
+    """
     with utils.create_db_connection(db_config) as conn, conn.cursor() as cursor, utils.CodeProfiler() as cp:
-        results = defaultdict(lambda: dict(num_invalid_imei_imsis=0, num_invalid_imei_msisdns=0,
-                                           num_invalid_triplets=0))
+        stats_sql = sql.SQL("""COUNT(*) AS num_records,
+                               COUNT(*) FILTER (WHERE imei_norm IS NULL) AS num_null_imei_records,
+                               COUNT(*) FILTER (WHERE imsi IS NULL) AS num_null_imsi_records,
+                               COUNT(*) FILTER (WHERE msisdn IS NULL) AS num_null_msisdn_records,
+                               COUNT(DISTINCT (imei_norm, imsi))
+                                   FILTER (WHERE imei_norm IS NULL OR imsi IS NULL) AS num_invalid_imei_imsis,
+                               COUNT(DISTINCT (imei_norm, msisdn))
+                                   FILTER (WHERE imei_norm IS NULL OR msisdn IS NULL) AS num_invalid_imei_msisdns,
+                               COUNT(DISTINCT (imei_norm, imsi, msisdn))
+                                   FILTER (WHERE imei_norm IS NULL OR imsi IS NULL OR msisdn IS NULL)
+                                   AS num_invalid_triplets""")
+        shard_filter_params = [year, month, virt_imei_range_start, virt_imei_range_end]
+        if operators is None:
+            operator_filter = sql.SQL('')
+            operator_filter_params = []
+        else:
+            operator_filter = sql.SQL('AND operator_id = ANY(%s)')
+            operator_filter_params = [list(operators)]
+        results = {}
         durations = []
-        for columns, result_label in [(['imei_norm', 'imsi'], 'num_invalid_imei_imsis'),
-                                      (['imei_norm', 'msisdn'], 'num_invalid_imei_msisdns'),
-                                      (['imei_norm', 'imsi', 'msisdn'], 'num_invalid_triplets')]:
-            # First, generate stats for each operator, for each stat
-            col_identifiers = sql.SQL(', ').join(map(sql.Identifier, columns))
-            null_filters = sql.SQL('({0})') \
-                .format(sql.SQL(' OR ').join(map(lambda x: sql.SQL('{0} IS NULL').format(sql.Identifier(x)), columns)))
-
-            with utils.CodeProfiler() as scp:
-                # Calculate per-operator invalid stat count
-                cursor.execute(sql.SQL("""SELECT operator_id,
-                                                 COUNT(*) AS cnt
-                                            FROM (SELECT DISTINCT operator_id, {0}
-                                                    FROM monthly_network_triplets_per_mno
-                                                   WHERE triplet_month = %s
-                                                     AND triplet_year = %s
-                                                     AND {1}) sq
-                                        GROUP BY operator_id""").format(col_identifiers, null_filters),
-                               [month, year])
-                for res in cursor:
-                    results[res.operator_id][result_label] = res.cnt
-            durations.append(scp.duration)
-
-            with utils.CodeProfiler() as scp:
-                # Calculate per-country invalid stat count
-                cursor.execute(sql.SQL("""SELECT COUNT(*) AS cnt
-                                            FROM (SELECT DISTINCT {0}
-                                                    FROM monthly_network_triplets_country
-                                                   WHERE triplet_month = %s
-                                                     AND triplet_year = %s
-                                                     AND {1}) sq""").format(col_identifiers, null_filters),
-                               [month, year])
-                for res in cursor:
-                    results[OperatorConfig.COUNTRY_OPERATOR_NAME][result_label] = res.cnt
-            durations.append(scp.duration)
-
-    return _defaultdict_to_regular(results), cp.duration, durations
+        with utils.CodeProfiler() as scp:
+            cursor.execute(sql.SQL("""SELECT operator_id,
+                                             {0}
+                                        FROM monthly_network_triplets_per_mno
+                                       WHERE triplet_year = %s
+                                         AND triplet_month = %s
+                                         AND virt_imei_shard >= %s
+                                         AND virt_imei_shard < %s
+                                             {1}
+                                    GROUP BY operator_id""").format(stats_sql, operator_filter),
+                           shard_filter_params + operator_filter_params)
+            for res in cursor:
+                res = res._asdict()
+                results[res.pop('operator_id')] = res
+        durations.append(scp.duration)
+
+        with utils.CodeProfiler() as scp:
+            cursor.execute(sql.SQL("""SELECT {0}
+                                        FROM monthly_network_triplets_country
+                                       WHERE triplet_year = %s
+                                         AND triplet_month = %s
+                                         AND virt_imei_shard >= %s
+                                         AND virt_imei_shard < %s""").format(stats_sql),
+                           shard_filter_params)
+            results[OperatorConfig.COUNTRY_OPERATOR_NAME] = cursor.fetchone()._asdict()
+        durations.append(scp.duration)
+
+    return results, cp.duration, durations
 
 
 def _calc_imei_gross_adds(db_config, operators, month, year):
     """Helper function to calculate IMEI gross adds."""
     with utils.create_db_connection(db_config) as conn, conn.cursor() as cursor, utils.CodeProfiler() as cp:
         start_date, end_date = _calc_date_range(month, year)
-        all_operators = copy.copy(operators)
-        all_operators.append(None)  # For country -- _monthly_network_triplets_partition will return country partition
         results = defaultdict(dict)
-        for op in all_operators:
-            network_triplets_partition = _monthly_network_triplets_partition(conn=conn, operator=op,
-                                                                             month=month, year=year)
-            cursor.execute(
-                sql.SQL("""SELECT COUNT(*) AS num_gross_adds
-                             FROM network_imeis
-                            WHERE network_imeis.first_seen >= %s
-                              AND network_imeis.first_seen < %s
-                              AND EXISTS (SELECT 1
-                                            FROM {0}
-                                           WHERE imei_norm = network_imeis.imei_norm)
-                        """).format(network_triplets_partition),
-                [start_date, end_date]
-            )
-            if op is None:
-                op = OperatorConfig.COUNTRY_OPERATOR_NAME
-            results[op]['num_gross_adds'] = cursor.fetchone().num_gross_adds
+        for op in operators + [OperatorConfig.COUNTRY_OPERATOR_NAME]:
+            results[op]['num_gross_adds'] = 0
+
+        # An IMEI first seen on the network this month is a gross add for each operator it was also first seen on
+        # this month, so the counts for every operator and the country come from a single aggregate
+        cursor.execute("""SELECT per_mno.operator_id,
+                                 GROUPING(per_mno.operator_id) AS is_country,
+                                 COUNT(DISTINCT imei_norm) AS num_gross_adds
+                            FROM network_imeis
+                            JOIN network_imeis_per_mno per_mno
+                           USING (imei_norm, virt_imei_shard)
+                           WHERE network_imeis.first_seen >= %s
+                             AND network_imeis.first_seen < %s
+                             AND per_mno.first_seen >= %s
+                             AND per_mno.first_seen < %s
+                        GROUP BY GROUPING SETS ((per_mno.operator_id), ())""",
+                       [start_date, end_date, start_date, end_date])
+        for res in cursor:
+            if res.is_country:
+                results[OperatorConfig.COUNTRY_OPERATOR_NAME]['num_gross_adds'] = res.num_gross_adds
+            elif res.operator_id in operators:
+                results[res.operator_id]['num_gross_adds'] = res.num_gross_adds
 
     return _defaultdict_to_regular(results), cp.duration, [cp.duration]
 
 
+def _gross_adds_query(month, year, operator=None):
+    """Returns a query and params selecting the IMEIs that were gross adds this month for an operator or country."""
+    start_date, end_date = _calc_date_range(month, year)
+    params = [start_date, end_date, start_date, end_date]
+    if operator is None:
+        operator_filter = sql.SQL('')
+    else:
+        operator_filter = sql.SQL('AND per_mno.operator_id = %s')
+        params.append(operator)
+
+    query = sql.SQL("""SELECT DISTINCT imei_norm
+                         FROM network_imeis
+                         JOIN network_imeis_per_mno per_mno
+                        USING (imei_norm, virt_imei_shard)
+                        WHERE network_imeis.first_seen >= %s
+                          AND network_imeis.first_seen < %s
+                          AND per_mno.first_seen >= %s
+                          AND per_mno.first_seen < %s
+                              {0}""").format(operator_filter)
+    return query, params
+
+
 def _calc_date_range(month, year):
     """Returns start_date, end_date tuple for this reporting month."""
     start_date = datetime.date(year, month, 1)
@@ -614,39 +791,39 @@ def _calc_date_range(month, year):
 
 
 def _calc_top_models_imei(db_config, month, year, operator=None):
-    """Helper function to calculate the top models by IMEI count."""
+    """Helper function to calculate the top models by IMEI count using the per-TAC IMEI sketches."""
+    params = [year, month]
+    if operator is None:
+        operator_filter = sql.SQL('')
+    else:
+        operator_filter = sql.SQL('AND operator_id = %s')
+        params.append(operator)
+
     with utils.create_db_connection(db_config) as conn:
-        network_triplets_partition = _monthly_network_triplets_partition(conn=conn, operator=operator,
-                                                                         month=month, year=year)
         return _calc_top_models_common(
             conn,
-            sql.SQL("""SELECT SUBSTRING(imei_norm, 1, 8) AS tac,
-                              COUNT(DISTINCT imei_norm) AS imei_count
-                         FROM {0}
-                        WHERE imei_norm IS NOT NULL
-                     GROUP BY tac""").format(network_triplets_partition)
+            sql.SQL("""SELECT tac,
+                              hll_cardinality(hll_union_agg(imei_hll))::BIGINT AS imei_count
+                         FROM monthly_per_mno_tac_hll_sketches
+                        WHERE triplet_year = %s
+                          AND triplet_month = %s
+                              {0}
+                     GROUP BY tac""").format(operator_filter),
+            params
         )
 
 
 def _calc_top_models_gross_adds(db_config, month, year, operator=None):
     """Helper function to calculate the top models by gross adds."""
     with utils.create_db_connection(db_config) as conn:
-        start_date, end_date = _calc_date_range(month, year)
-        network_triplets_partition = _monthly_network_triplets_partition(conn=conn, operator=operator,
-                                                                         month=month, year=year)
+        gross_adds_query, gross_adds_params = _gross_adds_query(month, year, operator)
         return _calc_top_models_common(
             conn,
             sql.SQL("""SELECT SUBSTRING(imei_norm, 1, 8) AS tac,
-                              COUNT(imei_norm) AS imei_count
-                         FROM network_imeis
-                        WHERE network_imeis.first_seen >= %s
-                          AND network_imeis.first_seen < %s
-                          AND EXISTS (SELECT 1
-                                        FROM {0}
-                                       WHERE imei_norm = network_imeis.imei_norm)
-                     GROUP BY tac
-                    """).format(network_triplets_partition),
-            [start_date, end_date]
+                              COUNT(*) AS imei_count
+                         FROM ({0}) gross_adds
+                     GROUP BY tac""").format(gross_adds_query),
+            gross_adds_params
         )
 
 
@@ -725,19 +902,11 @@ def _calc_compliance_data(db_config, month, year, condition_tuples, *, run_id, o
             cursor.execute('ANALYZE network_triplet_counts')
         durations.append(scp.duration)
 
-        start_date, end_date = _calc_date_range(month, year)
         with utils.CodeProfiler() as scp:
             cursor.execute('CREATE TEMP TABLE network_gross_adds(imei_norm TEXT NOT NULL)')
-            cursor.execute(sql.SQL("""INSERT INTO network_gross_adds(imei_norm)
-                                           SELECT imei_norm
-                                             FROM network_imeis
-                                            WHERE network_imeis.first_seen >= %s
-                                              AND network_imeis.first_seen < %s
-                                              AND EXISTS (SELECT 1
-                                                            FROM {network_triplets_partition_id}
-                                                           WHERE imei_norm = network_imeis.imei_norm)
-                                   """).format(network_triplets_partition_id=network_triplets_partition_id),
-                           [start_date, end_date])
+            gross_adds_query, gross_adds_params = _gross_adds_query(month, year, operator)
+            cursor.execute(sql.SQL('INSERT INTO network_gross_adds(imei_norm) {0}').format(gross_adds_query),
+                           gross_adds_params)
             cursor.execute('CREATE UNIQUE INDEX ON network_gross_adds(imei_norm)')
             cursor.execute('ANALYZE network_gross_adds')
         durations.append(scp.duration)
@@ -991,67 +1160,89 @@ def _defaultdict_to_regular(d):
     return d
 
 
-def _calc_imei_imsi_overloading(db_config, month, year, operator=None):
-    """Helper function to determine IMEI-IMSI overloading for a year, month and operator."""
+def _per_operator_histogram_results(cursor, operators, row_func):
+    """Helper function to split histogram rows for all operators and the country into per-operator lists."""
+    results = {op: [] for op in operators + [OperatorConfig.COUNTRY_OPERATOR_NAME]}
+    for r in cursor:
+        if r.is_country:
+            results[OperatorConfig.COUNTRY_OPERATOR_NAME].append(row_func(r))
+        elif r.operator_id in results:
+            results[r.operator_id].append(row_func(r))
+    return results
+
+
+def _calc_imei_imsi_overloading(db_config, operators, month, year):
+    """Helper function to determine IMEI-IMSI overloading for a year and month for all operators and the country."""
     with utils.create_db_connection(db_config) as conn, conn.cursor() as cursor, utils.CodeProfiler() as cp:
-        network_triplets_partition = _monthly_network_triplets_partition(conn=conn, operator=operator,
-                                                                         month=month, year=year)
-        cursor.execute(
-            sql.SQL("""SELECT COUNT(*) AS num_imeis,
-                              seen_with_imsis
-                         FROM (SELECT COUNT(DISTINCT imsi) AS seen_with_imsis
-                                 FROM {0}
-                             GROUP BY imei_norm) imsis_per_imei
-                     GROUP BY seen_with_imsis""").format(network_triplets_partition)
-        )
-        results = [{'num_imeis': r.num_imeis, 'seen_with_imsis': r.seen_with_imsis} for r in cursor]
+        cursor.execute("""SELECT operator_id,
+                                 is_country,
+                                 COUNT(*) AS num_imeis,
+                                 seen_with_imsis
+                            FROM (SELECT operator_id,
+                                         GROUPING(operator_id) AS is_country,
+                                         COUNT(DISTINCT imsi) AS seen_with_imsis
+                                    FROM monthly_network_imei_imsis
+                                   WHERE triplet_year = %s
+                                     AND triplet_month = %s
+                                GROUP BY GROUPING SETS ((operator_id, imei_norm), (imei_norm))) imsis_per_imei
+                        GROUP BY operator_id, is_country, seen_with_imsis""",
+                       [year, month])
+        results = _per_operator_histogram_results(
+            cursor, operators, lambda r: {'num_imeis': r.num_imeis, 'seen_with_imsis': r.seen_with_imsis})
     return results, cp.duration, [cp.duration]
 
 
-def _calc_daily_imei_imsi_overloading(db_config, month, year, operator=None, bin_width=0.1, _min_seen_days=5):
-    """Helper function to determine average IMEI-IMSI overloading for a year, month and operator."""
+def _calc_daily_imei_imsi_overloading(db_config, operators, month, year, bin_width=0.1, _min_seen_days=5):
+    """Helper function to determine average IMEI-IMSI overloading for a year and month for all operators."""
     with utils.create_db_connection(db_config) as conn, conn.cursor() as cursor, utils.CodeProfiler() as cp:
-        network_triplets_partition = _monthly_network_triplets_partition(conn=conn, operator=operator,
-                                                                         month=month, year=year)
         cursor.execute(
-            sql.SQL("""SELECT COUNT(*) AS num_imeis,
-                              (bin_id * %(bin_width)s)::REAL AS bin_start,
-                              ((bin_id + 1) * %(bin_width)s)::REAL AS bin_end
-                         FROM (SELECT imei_norm,
-                                      FLOOR(SUM(bitcount(combined_date_bitmask))::NUMERIC/
-                                      bitcount(bit_or(combined_date_bitmask))/%(bin_width)s)::INT AS bin_id
-                                 FROM (SELECT imei_norm,
-                                              imsi,
-                                              bit_or(date_bitmask) AS combined_date_bitmask
-                                         FROM {0}
-                                        WHERE imei_norm IS NOT NULL
-                                          AND is_valid_imsi(imsi)
-                                     GROUP BY imei_norm, imsi) all_imei_imsis
-                             GROUP BY imei_norm
-                                      HAVING bitcount(bit_or(combined_date_bitmask)) >= %(min_seen_days)s ) histogram
-                     GROUP BY bin_id""").format(network_triplets_partition),  # noqa: Q447
-            {'bin_width': bin_width, 'min_seen_days': _min_seen_days}
+            """SELECT operator_id,
+                      is_country,
+                      COUNT(*) AS num_imeis,
+                      (bin_id * %(bin_width)s)::REAL AS bin_start,
+                      ((bin_id + 1) * %(bin_width)s)::REAL AS bin_end
+                 FROM (SELECT operator_id,
+                              is_country,
+                              FLOOR(SUM(bitcount(combined_date_bitmask))::NUMERIC/
+                              bitcount(bit_or(combined_date_bitmask))/%(bin_width)s)::INT AS bin_id
+                         FROM (SELECT operator_id,
+                                      GROUPING(operator_id) AS is_country,
+                                      imei_norm,
+                                      bit_or(date_bitmask) AS combined_date_bitmask
+                                 FROM monthly_network_imei_imsis
+                                WHERE triplet_year = %(year)s
+                                  AND triplet_month = %(month)s
+                                  AND imei_norm IS NOT NULL
+                                  AND is_valid_imsi(imsi)
+                             GROUP BY GROUPING SETS ((operator_id, imei_norm, imsi), (imei_norm, imsi))) all_imei_imsis
+                     GROUP BY operator_id, is_country, imei_norm
+                              HAVING bitcount(bit_or(combined_date_bitmask)) >= %(min_seen_days)s) histogram
+             GROUP BY operator_id, is_country, bin_id""",  # noqa: Q447
+            {'bin_width': bin_width, 'min_seen_days': _min_seen_days, 'year': year, 'month': month}
         )
-        results = [{'num_imeis': r.num_imeis,
-                    'bin_start': r.bin_start,
-                    'bin_end': r.bin_end} for r in cursor]
+        results = _per_operator_histogram_results(
+            cursor, operators, lambda r: {'num_imeis': r.num_imeis, 'bin_start': r.bin_start, 'bin_end': r.bin_end})
     return results, cp.duration, [cp.duration]
 
 
-def _calc_imsi_imei_overloading(db_config, month, year, operator=None):
-    """Helper function to determine IMSI-IMEI overloading for a year, month and operator."""
+def _calc_imsi_imei_overloading(db_config, operators, month, year):
+    """Helper function to determine IMSI-IMEI overloading for a year and month for all operators and the country."""
     with utils.create_db_connection(db_config) as conn, conn.cursor() as cursor, utils.CodeProfiler() as cp:
-        network_triplets_partition = _monthly_network_triplets_partition(conn=conn, operator=operator,
-                                                                         month=month, year=year)
-        cursor.execute(
-            sql.SQL("""SELECT COUNT(*) AS num_imsis,
-                              seen_with_imeis
-                         FROM (SELECT COUNT(DISTINCT imei_norm) AS seen_with_imeis
-                                 FROM {0}
-                             GROUP BY imsi) imeis_per_imsi
-                     GROUP BY seen_with_imeis""").format(network_triplets_partition)
-        )
-        results = [{'num_imsis': r.num_imsis, 'seen_with_imeis': r.seen_with_imeis} for r in cursor]
+        cursor.execute("""SELECT operator_id,
+                                 is_country,
+                                 COUNT(*) AS num_imsis,
+                                 seen_with_imeis
+                            FROM (SELECT operator_id,
+                                         GROUPING(operator_id) AS is_country,
+                                         COUNT(DISTINCT imei_norm) AS seen_with_imeis
+                                    FROM monthly_network_imei_imsis
+                                   WHERE triplet_year = %s
+                                     AND triplet_month = %s
+                                GROUP BY GROUPING SETS ((operator_id, imsi), (imsi))) imeis_per_imsi
+                        GROUP BY operator_id, is_country, seen_with_imeis""",
+                       [year, month])
+        results = _per_operator_histogram_results(
+            cursor, operators, lambda r: {'num_imsis': r.num_imsis, 'seen_with_imeis': r.seen_with_imeis})
     return results, cp.duration, [cp.duration]
 
 
@@ -1091,6 +1282,24 @@ def _process_id_counts_future(per_operator_record_counts, statsd, metrics_run_ro
                      record_counts_map=per_operator_record_counts)
 
 
+def _process_monthly_id_stats_future(virt_imei_range_start, virt_imei_range_end, record_counts, monthly_stats,
+                                     statsd, metrics_run_root, debug_query_performance, f):
+    """Function to process the result of a per-shard record and invalid identifier counts future."""
+    logger = logging.getLogger('dirbs.report')
+    results, total_duration, component_durations = f.result()
+    logger.info('Calculated record counts and invalid identifier counts for all operators for virtual IMEI shards '
+                '{0:d} to {1:d} (duration {2:.3f}s)'
+                .format(virt_imei_range_start, virt_imei_range_end - 1, total_duration / 1000))
+    _print_component_query_perfomance(component_durations, debug_query_performance)
+    for operator, counts in results.items():
+        record_counts[operator] += counts.pop('num_records')
+        for k, v in counts.items():
+            monthly_stats[operator][k] += v
+    _log_perf_metric(statsd, metrics_run_root,
+                     'monthly identifier stats shard {0:d} {1:d}'.format(virt_imei_range_start, virt_imei_range_end),
+                     total_duration)
+
+
 def _process_monthly_future(type_string, per_operator_record_counts, statsd, metrics_run_root, monthly_stats,
                             debug_query_performance, f):
     """Helper function to process a monthly stat future and populate the results data structure."""
@@ -1119,6 +1328,18 @@ def _process_per_operator_monthly_future(operator, type_string, statsd,
                      operator_id=operator, record_counts_map=per_operator_record_counts)
 
 
+def _process_all_operators_monthly_future(type_string, per_operator_record_counts, statsd, metrics_run_root,
+                                          monthly_stats, debug_query_performance, f):
+    """Helper function to process a future calculating a monthly stat for all operators and the country at once."""
+    logger = logging.getLogger('dirbs.report')
+    results, total_duration, component_durations = f.result()
+    logger.info('Calculated {0} for all operators (duration {1:.3f}s)'.format(type_string, total_duration / 1000))
+    _print_component_query_perfomance(component_durations, debug_query_performance)
+    monthly_stats.update(results)
+    _log_perf_metric(statsd, metrics_run_root, type_string, total_duration,
+                     record_counts_map=per_operator_record_counts)
+
+
 def _process_per_operator_compliance_future(operator, condition_counts, per_operator_record_counts, statsd,
                                             metrics_run_root, tac_compliance_data, compliance_data, monthly_stats,
                                             debug_query_performance, f):
@@ -1137,6 +1358,66 @@ def _process_per_operator_compliance_future(operator, condition_counts, per_oper
                      operator_id=operator, record_counts_map=per_operator_record_counts)
 
 
+# Marker for NULL values when streaming report data with COPY, so that empty strings are not read as NULL
+_COPY_NULL = '\\N'
+
+
+class _CSVRowStream:
+    """File-like object that CSV-encodes rows lazily as they are read by COPY FROM STDIN."""
+
+    def __init__(self, rows):
+        """Constructor."""
+        self._rows = iter(rows)
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer, lineterminator='\n')
+
+    def read(self, size=-1):
+        """Return up to size characters of CSV, encoding as many further rows as needed."""
+        while size < 0 or self._buffer.tell() < size:
+            row = next(self._rows, None)
+            if row is None:
+                break
+            self._writer.writerow([_copy_csv_value(v) for v in row])
+        data = self._buffer.getvalue()
+        if size >= 0:
+            data, remainder = data[:size], data[size:]
+        else:
+            remainder = ''
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        self._buffer.write(remainder)
+        return data
+
+
+def _copy_csv_value(value):
+    """Format a single value for COPY in CSV format, writing NULLs as the _COPY_NULL marker."""
+    if value is None:
+        return _COPY_NULL
+    if isinstance(value, (list, tuple)):
+        return _copy_array_literal(value)
+    return value
+
+
+def _copy_array_literal(values):
+    """Format a list of booleans, numbers or NULLs as a PostgreSQL array literal for COPY."""
+    elements = []
+    for v in values:
+        if v is None:
+            elements.append('NULL')
+        elif isinstance(v, bool):
+            elements.append('t' if v else 'f')
+        else:
+            elements.append(str(v))
+    return '{{{0}}}'.format(','.join(elements))
+
+
+def _copy_csv_rows(cursor, tbl_name, columns, rows):
+    """Stream rows into the given columns of a report table using COPY FROM STDIN in CSV format."""
+    copy_sql = sql.SQL('COPY {0}({1}) FROM STDIN WITH (FORMAT csv, NULL {2})').format(
+        sql.Identifier(tbl_name), sql.SQL(', ').join(map(sql.Identifier, columns)), sql.Literal(_COPY_NULL))
+    cursor.copy_expert(copy_sql.as_string(cursor), _CSVRowStream(rows))
+
+
 def _store_report_data(conn,
                        operators,
                        month,
@@ -1153,7 +1434,8 @@ def _store_report_data(conn,
                        per_operator_compliance_data,
                        per_operator_daily_imei_imsi_overloading,
                        statsd,
-                       metrics_run_root):
+                       metrics_run_root,
+                       refresh_inputs):
     """Store the data for the reporting in the DB using the supplied data_id as a key."""
     logger = logging.getLogger('dirbs.report')
     cond_run_info = utils.most_recently_run_condition_info(conn, [c.label for c in condition_tuples])
@@ -1162,7 +1444,7 @@ def _store_report_data(conn,
         class_run_id = None
     else:
         class_run_id = max([v['run_id'] for k, v in successful_cond_run_info.items()])
-    data_id = _store_report_data_metadata(conn, month, year, class_run_id)
+    data_id = _store_report_data_metadata(conn, month, year, class_run_id, refresh_inputs)
     all_ops = operators + [OperatorConfig.COUNTRY_OPERATOR_NAME]
     cond_configs_map = {k: v['config'] if v is not None else None for k, v in cond_run_info.items()}
     cond_report_date_map = {k: v['last_successful_run'] if v is not None else None for k, v in cond_run_info.items()}
@@ -1172,72 +1454,41 @@ def _store_report_data(conn,
                        'run successfully: {0}'.format(', '.join(missing_cond_configs)))
 
     with conn.cursor() as cursor, utils.CodeProfiler() as cp:
-        execute_values(cursor,
-                       """INSERT INTO report_monthly_conditions(data_id,
-                                                                cond_name,
-                                                                sort_order,
-                                                                was_blocking,
-                                                                last_successful_config,
-                                                                last_successful_run)
-                               VALUES %s""",
-                       [(data_id, c.label, idx, c.blocking, json.dumps(cond_configs_map[c.label]),
+        _copy_csv_rows(cursor,
+                       'report_monthly_conditions',
+                       ['data_id', 'cond_name', 'sort_order', 'was_blocking', 'last_successful_config',
+                        'last_successful_run'],
+                       ((data_id, c.label, idx, c.blocking, json.dumps(cond_configs_map[c.label]),
                         cond_report_date_map[c.label])
-                        for idx, c in enumerate(condition_tuples)])
-
-        execute_values(cursor,
-                       """INSERT INTO report_daily_stats(data_id,
-                                                         num_triplets,
-                                                         num_imeis,
-                                                         num_imsis,
-                                                         num_msisdns,
-                                                         data_date,
-                                                         operator_id)
-                               VALUES %s""",
-                       [(data_id,
+                        for idx, c in enumerate(condition_tuples)))
+
+        _copy_csv_rows(cursor,
+                       'report_daily_stats',
+                       ['data_id', 'num_triplets', 'num_imeis', 'num_imsis', 'num_msisdns', 'data_date',
+                        'operator_id'],
+                       ((data_id,
                          dc['num_triplets'],
                          dc['num_imeis'],
                          dc['num_imsis'],
                          dc['num_msisdns'],
                          datetime.date(year, month, idx + 1), op)
                         for op in all_ops
-                        for idx, dc in enumerate(per_operator_daily_stats[op])])
-
-        execute_values(cursor,
-                       """INSERT INTO report_monthly_stats(data_id,
-                                                           num_triplets,
-                                                           num_imeis,
-                                                           num_imsis,
-                                                           num_msisdns,
-                                                           num_gross_adds,
-                                                           num_compliant_imeis,
-                                                           num_noncompliant_imeis,
-                                                           num_noncompliant_imeis_blocking,
-                                                           num_noncompliant_imeis_info_only,
-                                                           num_compliant_triplets,
-                                                           num_noncompliant_triplets,
-                                                           num_noncompliant_triplets_blocking,
-                                                           num_noncompliant_triplets_info_only,
-                                                           operator_id,
-                                                           num_records,
-                                                           num_null_imei_records,
-                                                           num_null_imsi_records,
-                                                           num_null_msisdn_records,
-                                                           num_invalid_imei_imsis,
-                                                           num_invalid_imei_msisdns,
-                                                           num_invalid_triplets,
-                                                           num_imei_imsis,
-                                                           num_imei_msisdns,
-                                                           num_imsi_msisdns,
-                                                           num_compliant_imei_imsis,
-                                                           num_noncompliant_imei_imsis,
-                                                           num_noncompliant_imei_imsis_blocking,
-                                                           num_noncompliant_imei_imsis_info_only,
-                                                           num_compliant_imei_msisdns,
-                                                           num_noncompliant_imei_msisdns,
-                                                           num_noncompliant_imei_msisdns_blocking,
-                                                           num_noncompliant_imei_msisdns_info_only)
-                               VALUES %s""",
-                       [(data_id,
+                        for idx, dc in enumerate(per_operator_daily_stats[op])))
+
+        _copy_csv_rows(cursor,
+                       'report_monthly_stats',
+                       ['data_id', 'num_triplets', 'num_imeis', 'num_imsis', 'num_msisdns', 'num_gross_adds',
+                        'num_compliant_imeis', 'num_noncompliant_imeis', 'num_noncompliant_imeis_blocking',
+                        'num_noncompliant_imeis_info_only', 'num_compliant_triplets', 'num_noncompliant_triplets',
+                        'num_noncompliant_triplets_blocking', 'num_noncompliant_triplets_info_only', 'operator_id',
+                        'num_records', 'num_null_imei_records', 'num_null_imsi_records', 'num_null_msisdn_records',
+                        'num_invalid_imei_imsis', 'num_invalid_imei_msisdns', 'num_invalid_triplets',
+                        'num_imei_imsis', 'num_imei_msisdns', 'num_imsi_msisdns', 'num_compliant_imei_imsis',
+                        'num_noncompliant_imei_imsis', 'num_noncompliant_imei_imsis_blocking',
+                        'num_noncompliant_imei_imsis_info_only', 'num_compliant_imei_msisdns',
+                        'num_noncompliant_imei_msisdns', 'num_noncompliant_imei_msisdns_blocking',
+                        'num_noncompliant_imei_msisdns_info_only'],
+                       ((data_id,
                          mc['num_triplets'],
                          mc['num_imeis'],
                          mc['num_imsis'],
@@ -1270,19 +1521,13 @@ def _store_report_data(conn,
                          mc['num_noncompliant_imei_msisdns'],
                          mc['num_noncompliant_imei_msisdns_blocking'],
                          mc['num_noncompliant_imei_msisdns_info_only'])
-                        for op, mc in ((op, per_operator_monthly_stats[op]) for op in all_ops)])
-
-        execute_values(cursor,
-                       """INSERT INTO report_monthly_condition_stats(data_id,
-                                                                     operator_id,
-                                                                     cond_name,
-                                                                     num_imeis,
-                                                                     num_triplets,
-                                                                     num_imei_imsis,
-                                                                     num_imei_msisdns,
-                                                                     num_imei_gross_adds)
-                               VALUES %s""",
-                       [(data_id,
+                        for op, mc in ((op, per_operator_monthly_stats[op]) for op in all_ops)))
+
+        _copy_csv_rows(cursor,
+                       'report_monthly_condition_stats',
+                       ['data_id', 'operator_id', 'cond_name', 'num_imeis', 'num_triplets', 'num_imei_imsis',
+                        'num_imei_msisdns', 'num_imei_gross_adds'],
+                       ((data_id,
                          op,
                          label,
                          counts['num_imeis'],
@@ -1292,18 +1537,13 @@ def _store_report_data(conn,
                          counts['num_imei_gross_adds'])
                         for op, label, counts in ((op, label, counts)
                                                   for op in all_ops
-                                                  for label, counts in per_operator_condition_counts[op].items())])
-
-        execute_values(cursor,
-                       """INSERT INTO report_monthly_top_models_imei(data_id,
-                                                                     rank_pos,
-                                                                     num_imeis,
-                                                                     model,
-                                                                     manufacturer,
-                                                                     tech_generations,
-                                                                     operator_id)
-                               VALUES %s""",
-                       [(data_id,
+                                                  for label, counts in per_operator_condition_counts[op].items())))
+
+        _copy_csv_rows(cursor,
+                       'report_monthly_top_models_imei',
+                       ['data_id', 'rank_pos', 'num_imeis', 'model', 'manufacturer', 'tech_generations',
+                        'operator_id'],
+                       ((data_id,
                          rank + 1,
                          tm['imei_count'],
                          '' if tm['model'] is None else tm['model'],
@@ -1312,18 +1552,13 @@ def _store_report_data(conn,
                          op)
                         for op, rank, tm in ((op, rank, tm)
                                              for op in all_ops
-                                             for rank, tm in enumerate(per_operator_top_model_imei_counts[op]))])
-
-        execute_values(cursor,
-                       """INSERT INTO report_monthly_top_models_gross_adds(data_id,
-                                                                           rank_pos,
-                                                                           num_imeis,
-                                                                           model,
-                                                                           manufacturer,
-                                                                           tech_generations,
-                                                                           operator_id)
-                               VALUES %s""",
-                       [(data_id,
+                                             for rank, tm in enumerate(per_operator_top_model_imei_counts[op]))))
+
+        _copy_csv_rows(cursor,
+                       'report_monthly_top_models_gross_adds',
+                       ['data_id', 'rank_pos', 'num_imeis', 'model', 'manufacturer', 'tech_generations',
+                        'operator_id'],
+                       ((data_id,
                          rank + 1,
                          tm['imei_count'],
                          '' if tm['model'] is None else tm['model'],
@@ -1332,64 +1567,47 @@ def _store_report_data(conn,
                          op)
                         for op, rank, tm in ((op, rank, tm)
                                              for op in all_ops
-                                             for rank, tm in enumerate(per_operator_top_model_gross_adds[op]))])
-
-        execute_values(cursor,
-                       """INSERT INTO report_monthly_imei_imsi_overloading(data_id,
-                                                                           num_imeis,
-                                                                           seen_with_imsis,
-                                                                           operator_id)
-                               VALUES %s""",
-                       [(data_id,
+                                             for rank, tm in enumerate(per_operator_top_model_gross_adds[op]))))
+
+        _copy_csv_rows(cursor,
+                       'report_monthly_imei_imsi_overloading',
+                       ['data_id', 'num_imeis', 'seen_with_imsis', 'operator_id'],
+                       ((data_id,
                          rec['num_imeis'],
                          rec['seen_with_imsis'],
                          op)
                         for op, rec in ((op, rec)
                                         for op in all_ops
-                                        for rec in per_operator_imei_imsi_overloading[op])])
-
-        execute_values(cursor,
-                       """INSERT INTO report_monthly_average_imei_imsi_overloading(data_id,
-                                                                                   num_imeis,
-                                                                                   bin_start,
-                                                                                   bin_end,
-                                                                                   operator_id)
-                               VALUES %s""",
-                       [(data_id,
+                                        for rec in per_operator_imei_imsi_overloading[op])))
+
+        _copy_csv_rows(cursor,
+                       'report_monthly_average_imei_imsi_overloading',
+                       ['data_id', 'num_imeis', 'bin_start', 'bin_end', 'operator_id'],
+                       ((data_id,
                          rec['num_imeis'],
                          rec['bin_start'],
                          rec['bin_end'],
                          op)
                         for op, rec in ((op, rec)
                                         for op in all_ops
-                                        for rec in per_operator_daily_imei_imsi_overloading[op])])
-
-        execute_values(cursor,
-                       """INSERT INTO report_monthly_imsi_imei_overloading(data_id,
-                                                                           num_imsis,
-                                                                           seen_with_imeis,
-                                                                           operator_id)
-                               VALUES %s""",
-                       [(data_id,
+                                        for rec in per_operator_daily_imei_imsi_overloading[op])))
+
+        _copy_csv_rows(cursor,
+                       'report_monthly_imsi_imei_overloading',
+                       ['data_id', 'num_imsis', 'seen_with_imeis', 'operator_id'],
+                       ((data_id,
                          rec['num_imsis'],
                          rec['seen_with_imeis'],
                          op)
                         for op, rec in ((op, rec)
                                         for op in all_ops
-                                        for rec in per_operator_imsi_imei_overloading[op])])
-
-        execute_values(cursor,
-                       """INSERT INTO report_monthly_condition_stats_combinations(data_id,
-                                                                                  combination,
-                                                                                  num_imeis,
-                                                                                  num_imei_gross_adds,
-                                                                                  num_imei_imsis,
-                                                                                  num_imei_msisdns,
-                                                                                  num_subscriber_triplets,
-                                                                                  compliance_level,
-                                                                                  operator_id)
-                               VALUES %s""",
-                       [(data_id,
+                                        for rec in per_operator_imsi_imei_overloading[op])))
+
+        _copy_csv_rows(cursor,
+                       'report_monthly_condition_stats_combinations',
+                       ['data_id', 'combination', 'num_imeis', 'num_imei_gross_adds', 'num_imei_imsis',
+                        'num_imei_msisdns', 'num_subscriber_triplets', 'compliance_level', 'operator_id'],
+                       ((data_id,
                          list(combination),
                          counts['num_imeis'],
                          counts['num_imei_gross_adds'],
@@ -1401,7 +1619,7 @@ def _store_report_data(conn,
                         for op, combination, counts in ((op, combination, counts)
                                                         for op in all_ops
                                                         for combination, counts in
-                                                        per_operator_compliance_data[op].items())])
+                                                        per_operator_compliance_data[op].items())))
 
     # Store performance datapoint for writing to DB
     statsd.gauge('{0}runtime.store_report_data'.format(metrics_run_root), cp.duration)
@@ -0,0 +1,50 @@
+"""
+DIRBS DB schema migration script (v90 -> v91).
+
+Copyright (c) 2018-2021 Qualcomm Technologies, Inc.
+
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification, are permitted (subject to the
+limitations in the disclaimer below) provided that the following conditions are met:
+
+- Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+  disclaimer.
+- Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the following
+  disclaimer in the documentation and/or other materials provided with the distribution.
+- Neither the name of Qualcomm Technologies, Inc. nor the names of its contributors may be used to endorse or promote
+  products derived from this software without specific prior written permission.
+- The origin of this software must not be misrepresented; you must not claim that you wrote the original software.
+  If you use this software in a product, an acknowledgment is required by displaying the trademark/logo as per the
+  details provided here: https://www.qualcomm.com/documents/dirbs-logo-and-brand-guidelines
+- Altered source versions must be plainly marked as such, and must not be misrepresented as being the original
+  software.
+- This notice may not be removed or altered from any source distribution.
+
+NO EXPRESS OR IMPLIED LICENSES TO ANY PARTY'S PATENT RIGHTS ARE GRANTED BY THIS LICENSE. THIS SOFTWARE IS PROVIDED BY
+THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR
+BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+POSSIBILITY OF SUCH DAMAGE.
+"""
+import logging
+
+import dirbs.schema_migrators
+import dirbs.partition_utils as part_utils
+
+
+class SchemaMigrator(dirbs.schema_migrators.AbstractMigrator):
+    """Class use to upgrade to V91 of the schema."""
+
+    def upgrade(self, conn):
+        """Overrides AbstractMigrator upgrade method."""
+        logger = logging.getLogger('dirbs.db')
+        logger.info('Creating current list snapshot tables from list history...')
+        part_utils.create_list_snapshots(conn)
+        logger.info('Created current list snapshot tables')
+
+
+migrator = SchemaMigrator
@@ -0,0 +1,103 @@
+"""
+DIRBS DB schema migration script (v91 -> v92).
+
+Copyright (c) 2018-2021 Qualcomm Technologies, Inc.
+
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification, are permitted (subject to the
+limitations in the disclaimer below) provided that the following conditions are met:
+
+- Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+  disclaimer.
+- Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the following
+  disclaimer in the documentation and/or other materials provided with the distribution.
+- Neither the name of Qualcomm Technologies, Inc. nor the names of its contributors may be used to endorse or promote
+  products derived from this software without specific prior written permission.
+- The origin of this software must not be misrepresented; you must not claim that you wrote the original software.
+  If you use this software in a product, an acknowledgment is required by displaying the trademark/logo as per the
+  details provided here: https://www.qualcomm.com/documents/dirbs-logo-and-brand-guidelines
+- Altered source versions must be plainly marked as such, and must not be misrepresented as being the original
+  software.
+- This notice may not be removed or altered from any source distribution.
+
+NO EXPRESS OR IMPLIED LICENSES TO ANY PARTY'S PATENT RIGHTS ARE GRANTED BY THIS LICENSE. THIS SOFTWARE IS PROVIDED BY
+THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR
+BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+POSSIBILITY OF SUCH DAMAGE.
+"""
+import logging
+
+import dirbs.schema_migrators
+import dirbs.utils as utils
+import dirbs.partition_utils as part_utils
+
+
+class SchemaMigrator(dirbs.schema_migrators.AbstractMigrator):
+    """Class use to upgrade to V92 of the schema."""
+
+    def _define_calc_virt_msisdn_shard_func(self, logger, conn):
+        """Helper method to define the calc_virt_msisdn_shard sql function."""
+        logger.debug('Defining calc_virt_msisdn_shard() function...')
+        with conn.cursor() as cursor:
+            # MSISDNs share prefixes and are often allocated sequentially, so we take the virtual shard from an MD5
+            # of the whole value rather than from its digits the way calc_virt_imei_shard does
+            cursor.execute("""CREATE FUNCTION calc_virt_msisdn_shard(msisdn TEXT) RETURNS SMALLINT
+                                  LANGUAGE plpgsql IMMUTABLE PARALLEL SAFE
+                                  AS $$
+                              DECLARE
+                                  msisdn_hash   BYTEA;
+                              BEGIN
+                                  msisdn_hash := decode(md5(COALESCE(msisdn, '')), 'hex');
+                                  RETURN ((get_byte(msisdn_hash, 0) << 8 | get_byte(msisdn_hash, 1)) % 100)::SMALLINT;
+                              END
+                              $$""")
+        logger.debug('calc_virt_msisdn_shard() function definition successful')
+
+    def _create_network_msisdns(self, logger, conn):
+        """Method to create and populate the network_msisdns table from the existing operator data."""
+        with conn.cursor() as cursor, utils.db_role_setter(conn, role_name='dirbs_core_import_operator'):
+            cursor.execute("""CREATE TABLE network_msisdns (
+                                  msisdn             TEXT NOT NULL,
+                                  imei_norm          TEXT NOT NULL,
+                                  imsi               TEXT,
+                                  operator_id        TEXT NOT NULL,
+                                  first_seen         DATE NOT NULL,
+                                  last_seen          DATE NOT NULL,
+                                  virt_msisdn_shard  SMALLINT NOT NULL
+                              )
+                              PARTITION BY RANGE (virt_msisdn_shard)""")
+            part_utils._grant_perms_network_imeis(conn, part_name='network_msisdns')
+            part_utils.create_imei_shard_partitions(conn, tbl_name='network_msisdns',
+                                                    perms_func=part_utils._grant_perms_network_imeis, fillfactor=80)
+            # Triplets with a NULL IMSI are kept, as the MSISDN API has always returned them
+            logger.debug('Populating network_msisdns from monthly_network_triplets_per_mno...')
+            cursor.execute("""INSERT INTO network_msisdns(msisdn, imei_norm, imsi, operator_id, first_seen, last_seen,
+                                                          virt_msisdn_shard)
+                                   SELECT msisdn, imei_norm, imsi, operator_id, MIN(first_seen), MAX(last_seen),
+                                          calc_virt_msisdn_shard(msisdn)
+                                     FROM monthly_network_triplets_per_mno
+                                    WHERE msisdn IS NOT NULL
+                                      AND imei_norm IS NOT NULL
+                                 GROUP BY msisdn, imei_norm, imsi, operator_id""")
+            logger.debug('Adding indices to network_msisdns...')
+            idx_metadata = [part_utils.IndexMetadatum(idx_cols=['msisdn', 'imei_norm', 'imsi', 'operator_id'],
+                                                      is_unique=True),
+                            part_utils.IndexMetadatum(idx_cols=['msisdn', 'imei_norm', 'operator_id'],
+                                                      is_unique=True, partial_sql='WHERE imsi IS NULL')]
+            part_utils.add_indices(conn, tbl_name='network_msisdns', idx_metadata=idx_metadata)
+
+    def upgrade(self, conn):
+        """Overrides AbstractMigrator upgrade method."""
+        logger = logging.getLogger('dirbs.db')
+        self._define_calc_virt_msisdn_shard_func(logger, conn)
+        logger.info('Creating network_msisdns table...')
+        self._create_network_msisdns(logger, conn)
+        logger.info('Created network_msisdns table')
+
+
+migrator = SchemaMigrator
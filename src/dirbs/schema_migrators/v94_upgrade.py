@@ -0,0 +1,65 @@
+"""
+DIRBS DB schema migration script (v93 -> v94).
+
+Copyright (c) 2018-2021 Qualcomm Technologies, Inc.
+
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification, are permitted (subject to the
+limitations in the disclaimer below) provided that the following conditions are met:
+
+- Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+  disclaimer.
+- Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the following
+  disclaimer in the documentation and/or other materials provided with the distribution.
+- Neither the name of Qualcomm Technologies, Inc. nor the names of its contributors may be used to endorse or promote
+  products derived from this software without specific prior written permission.
+- The origin of this software must not be misrepresented; you must not claim that you wrote the original software.
+  If you use this software in a product, an acknowledgment is required by displaying the trademark/logo as per the
+  details provided here: https://www.qualcomm.com/documents/dirbs-logo-and-brand-guidelines
+- Altered source versions must be plainly marked as such, and must not be misrepresented as being the original
+  software.
+- This notice may not be removed or altered from any source distribution.
+
+NO EXPRESS OR IMPLIED LICENSES TO ANY PARTY'S PATENT RIGHTS ARE GRANTED BY THIS LICENSE. THIS SOFTWARE IS PROVIDED BY
+THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR
+BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+POSSIBILITY OF SUCH DAMAGE.
+"""
+import logging
+
+import dirbs.schema_migrators
+import dirbs.utils as utils
+import dirbs.partition_utils as part_utils
+
+
+class SchemaMigrator(dirbs.schema_migrators.AbstractMigrator):
+    """Class use to upgrade to V94 of the schema."""
+
+    def _create_network_imeis_per_mno(self, logger, conn):
+        """Method to create and populate the network_imeis_per_mno table from the existing operator data."""
+        part_utils.create_network_imeis_per_mno(conn)
+        with conn.cursor() as cursor, utils.db_role_setter(conn, role_name='dirbs_core_import_operator'):
+            logger.debug('Populating network_imeis_per_mno from monthly_network_triplets_per_mno...')
+            cursor.execute("""INSERT INTO network_imeis_per_mno(imei_norm, operator_id, first_seen, virt_imei_shard)
+                                   SELECT imei_norm, operator_id, MIN(first_seen), calc_virt_imei_shard(imei_norm)
+                                     FROM monthly_network_triplets_per_mno
+                                    WHERE imei_norm IS NOT NULL
+                                 GROUP BY imei_norm, operator_id""")
+            logger.debug('Adding indices to network_imeis_per_mno...')
+            part_utils.add_indices(conn, tbl_name='network_imeis_per_mno',
+                                   idx_metadata=part_utils.network_imeis_per_mno_indices())
+
+    def upgrade(self, conn):
+        """Overrides AbstractMigrator upgrade method."""
+        logger = logging.getLogger('dirbs.db')
+        logger.info('Creating network_imeis_per_mno table...')
+        self._create_network_imeis_per_mno(logger, conn)
+        logger.info('Created network_imeis_per_mno table')
+
+
+migrator = SchemaMigrator
@@ -0,0 +1,83 @@
+"""
+DIRBS DB schema migration script (v94 -> v95).
+
+Copyright (c) 2018-2021 Qualcomm Technologies, Inc.
+
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification, are permitted (subject to the
+limitations in the disclaimer below) provided that the following conditions are met:
+
+- Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+  disclaimer.
+- Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the following
+  disclaimer in the documentation and/or other materials provided with the distribution.
+- Neither the name of Qualcomm Technologies, Inc. nor the names of its contributors may be used to endorse or promote
+  products derived from this software without specific prior written permission.
+- The origin of this software must not be misrepresented; you must not claim that you wrote the original software.
+  If you use this software in a product, an acknowledgment is required by displaying the trademark/logo as per the
+  details provided here: https://www.qualcomm.com/documents/dirbs-logo-and-brand-guidelines
+- Altered source versions must be plainly marked as such, and must not be misrepresented as being the original
+  software.
+- This notice may not be removed or altered from any source distribution.
+
+NO EXPRESS OR IMPLIED LICENSES TO ANY PARTY'S PATENT RIGHTS ARE GRANTED BY THIS LICENSE. THIS SOFTWARE IS PROVIDED BY
+THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR
+BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+POSSIBILITY OF SUCH DAMAGE.
+"""
+import logging
+
+import dirbs.schema_migrators
+import dirbs.utils as utils
+import dirbs.partition_utils as part_utils
+
+
+class SchemaMigrator(dirbs.schema_migrators.AbstractMigrator):
+    """Class use to upgrade to V95 of the schema."""
+
+    def _create_monthly_network_imei_imsis(self, logger, conn):
+        """Method to create and populate the monthly_network_imei_imsis table from the existing operator data."""
+        part_utils.create_monthly_network_imei_imsis(conn)
+
+        operator_monthly_partitions = []
+        for op_partition in utils.child_table_names(conn, 'monthly_network_triplets_per_mno'):
+            operator_monthly_partitions.extend(utils.child_table_names(conn, op_partition))
+        year_month_tuples = sorted({(x.triplet_year, x.triplet_month)
+                                    for x in utils.table_invariants_list(conn, operator_monthly_partitions,
+                                                                         ['triplet_year', 'triplet_month'])})
+
+        with conn.cursor() as cursor, utils.db_role_setter(conn, role_name='dirbs_core_import_operator'):
+            for year, month in year_month_tuples:
+                logger.debug('Populating monthly_network_imei_imsis for {0:02d}/{1:d}...'.format(month, year))
+                part_utils.create_monthly_network_imei_imsis_partition(conn, month=month, year=year)
+                cursor.execute("""INSERT INTO monthly_network_imei_imsis(triplet_year, triplet_month, operator_id,
+                                                                         pair_hash, imei_norm, imsi, date_bitmask,
+                                                                         virt_imei_shard)
+                                       SELECT triplet_year, triplet_month, operator_id,
+                                              hash_triplet(imei_norm, imsi, NULL), imei_norm, imsi,
+                                              bit_or(date_bitmask), virt_imei_shard
+                                         FROM monthly_network_triplets_per_mno
+                                        WHERE triplet_year = %(year)s
+                                          AND triplet_month = %(month)s
+                                     GROUP BY triplet_year, triplet_month, operator_id, imei_norm, imsi,
+                                              virt_imei_shard""",
+                               {'year': year, 'month': month})
+
+            logger.debug('Adding indices to monthly_network_imei_imsis...')
+            part_utils.add_indices(conn, tbl_name='monthly_network_imei_imsis',
+                                   idx_metadata=part_utils.monthly_network_imei_imsis_indices())
+
+    def upgrade(self, conn):
+        """Overrides AbstractMigrator upgrade method."""
+        logger = logging.getLogger('dirbs.db')
+        logger.info('Creating monthly_network_imei_imsis table...')
+        self._create_monthly_network_imei_imsis(logger, conn)
+        logger.info('Created monthly_network_imei_imsis table')
+
+
+migrator = SchemaMigrator
@@ -0,0 +1,74 @@
+--
+-- DIRBS SQL migration script (v88 -> v89)
+--
+-- Copyright (c) 2018-2021 Qualcomm Technologies, Inc.
+--
+-- All rights reserved.
+--
+-- Redistribution and use in source and binary forms, with or without modification, are permitted (subject to the
+-- limitations in the disclaimer below) provided that the following conditions are met:
+--
+-- - Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+--   disclaimer.
+-- - Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the following
+--   disclaimer in the documentation and/or other materials provided with the distribution.
+-- - Neither the name of Qualcomm Technologies, Inc. nor the names of its contributors may be used to endorse or promote
+--   products derived from this software without specific prior written permission.
+-- - The origin of this software must not be misrepresented; you must not claim that you wrote the original software.
+--   If you use this software in a product, an acknowledgment is required by displaying the trademark/logo as per the
+--   details provided here: https://www.qualcomm.com/documents/dirbs-logo-and-brand-guidelines
+-- - Altered source versions must be plainly marked as such, and must not be misrepresented as being the original software.
+-- - This notice may not be removed or altered from any source distribution.
+--
+-- NO EXPRESS OR IMPLIED LICENSES TO ANY PARTY'S PATENT RIGHTS ARE GRANTED BY THIS LICENSE. THIS SOFTWARE IS PROVIDED BY
+-- THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+-- THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+-- COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+-- DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR
+-- BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+-- (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+-- POSSIBILITY OF SUCH DAMAGE.
+--
+
+--
+-- Create per-condition summary of the last successful classification. This is maintained by dirbs-classify every
+-- time a condition finishes so that looking up the most recent run for a condition does not require walking the
+-- full history of dirbs-classify job metadata.
+--
+CREATE TABLE classification_condition_last_run (
+    cond_name               TEXT NOT NULL,
+    run_id                  BIGINT NOT NULL,
+    cond_config             JSONB NOT NULL,
+    last_successful_run     TIMESTAMPTZ NOT NULL,
+    PRIMARY KEY (cond_name)
+);
+
+GRANT SELECT ON classification_condition_last_run TO dirbs_core_job;
+GRANT INSERT, UPDATE ON classification_condition_last_run TO dirbs_core_classify;
+
+--
+-- Populate summary from existing dirbs-classify job metadata. A condition completed successfully in a run if it
+-- has an entry in matched_imei_counts, even if the overall job failed.
+--
+INSERT INTO classification_condition_last_run(cond_name, run_id, cond_config, last_successful_run)
+     SELECT DISTINCT ON (matched.cond_name)
+            matched.cond_name, jm.run_id, cond.cond_config, jm.start_time
+       FROM job_metadata jm
+ CROSS JOIN LATERAL jsonb_object_keys(CASE WHEN jsonb_typeof(jm.extra_metadata->'matched_imei_counts') = 'object'
+                                           THEN jm.extra_metadata->'matched_imei_counts'
+                                           ELSE '{}'::JSONB
+                                       END) AS matched(cond_name)
+ CROSS JOIN LATERAL (SELECT c AS cond_config
+                       FROM jsonb_array_elements(CASE WHEN jsonb_typeof(jm.extra_metadata->'conditions') = 'array'
+                                                      THEN jm.extra_metadata->'conditions'
+                                                      ELSE '[]'::JSONB
+                                                  END) AS c
+                      WHERE c->>'label' = matched.cond_name
+                      LIMIT 1) cond
+      WHERE jm.command = 'dirbs-classify'
+   ORDER BY matched.cond_name, jm.start_time DESC;
+
+--
+-- Index job_metadata for looking up the most recent runs of a command
+--
+CREATE INDEX ON job_metadata(command, start_time);
@@ -45,7 +45,6 @@ from psycopg2 import sql
 from psycopg2.extras import NamedTupleCursor
 
 from dirbs import db_schema_version as code_db_schema_version
-import dirbs.metadata as metadata
 from dirbs.config.common import ConfigParseException
 
 
@@ -746,26 +745,22 @@ def most_recently_run_condition_info(conn, cond_names, successful_only=False):
     """
     conditions_to_find = copy.copy(cond_names)
     rv = {}
-    # Get list of metadata for dirbs-classify, sorted in reverse order
-    job_metadata_list = metadata.query_for_command_runs(conn, 'dirbs-classify')
-    for job_metadata in job_metadata_list:
-        # Loop back through recent dirbs-classify runs looking for the last time a classification
-        # ran successfully. This is indicates in the metadata by the presence of an entry in the matched_imei_counts.
-        # This can happen even though the overall dirbs-classify job failed
-        extra_metadata = job_metadata.extra_metadata
-        metadata_conditions = extra_metadata.get('conditions', {})
-        matched_imei_counts = extra_metadata.get('matched_imei_counts', {})
-        conditions_lookup = {c['label']: c for c in metadata_conditions}
-        for req_cond_name in copy.copy(conditions_to_find):  # We modify the list in the loop, so take a copy
-            if req_cond_name in matched_imei_counts:
-                # If the name was in matched_imei_counts, it should always be in conditions as well
-                rv[req_cond_name] = {
-                    'run_id': job_metadata.run_id,
-                    'config': conditions_lookup[req_cond_name],
-                    'last_successful_run': job_metadata.start_time
-                }
-                # Remove this req_cond_name from conditions_to_find since we already found latest metadata
-                conditions_to_find.remove(req_cond_name)
+    # A condition ran successfully if it has an entry in matched_imei_counts for a run, even though the overall
+    # dirbs-classify job may have failed. dirbs-classify records the last such run for each condition in
+    # classification_condition_last_run as each condition completes, so this is a single primary key lookup.
+    with conn.cursor() as cursor:
+        cursor.execute("""SELECT cond_name, run_id, cond_config, last_successful_run
+                            FROM classification_condition_last_run
+                           WHERE cond_name = ANY(%s)""",
+                       [list(cond_names)])
+        for res in cursor:
+            rv[res.cond_name] = {
+                'run_id': res.run_id,
+                'config': res.cond_config,
+                'last_successful_run': res.last_successful_run
+            }
+            # Remove this cond_name from conditions_to_find since we already found latest metadata
+            conditions_to_find.remove(res.cond_name)
 
     # Any items in conditions_to_find at this point are conditions for which we never ran a successful condition
     # run
@@ -928,3 +923,46 @@ def is_table_partitioned(conn, tbl_name):
                                                 ON pg_partitioned_table.partrelid = pg_class.oid
                                           WHERE pg_class.relname = %s)""", [tbl_name])
         return cursor.fetchone().exists
+
+
+def estimated_table_row_count(conn, tbl_name):
+    """
+    Function to return the planner's estimate of the number of rows in a potentially partitioned table.
+
+    The estimate comes from pg_class.reltuples, so it is only as fresh as the last VACUUM or ANALYZE of each leaf
+    partition. Partitions that have never been analyzed contribute zero rows.
+
+    Arguments:
+        conn: DIRBS db connection object
+        tbl_name: name of the table to estimate rows for
+    Returns:
+        estimated number of rows
+    """
+    if is_table_partitioned(conn, tbl_name):
+        return sum(estimated_table_row_count(conn, child_tbl_name)
+                   for child_tbl_name in child_table_names(conn, tbl_name))
+
+    with conn.cursor() as cursor:
+        cursor.execute("""SELECT GREATEST(reltuples, 0)::BIGINT AS estimate
+                            FROM pg_class
+                           WHERE oid = to_regclass(%s)""", [tbl_name])
+        res = cursor.fetchone()
+        return res.estimate if res is not None else 0
+
+
+def estimated_query_row_count(conn, query, params=None):
+    """
+    Function to return the planner's estimate of the number of rows a query will return without running it.
+
+    Arguments:
+        conn: DIRBS db connection object
+        query: SQL query (string or psycopg2.sql.Composable) to estimate
+        params: optional parameters if query is parameterized, default None
+    Returns:
+        estimated number of rows
+    """
+    with conn.cursor() as cursor:
+        cursor.execute(sql.SQL('EXPLAIN (FORMAT JSON) {0}').format(
+            query if isinstance(query, sql.Composable) else sql.SQL(query)), params)
+        plan = cursor.fetchone()[0]
+        return int(plan[0]['Plan']['Plan Rows'])
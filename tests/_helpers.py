@@ -69,11 +69,11 @@ def job_metadata_importer(*, db_conn, command, run_id, subcommand=None, status,
     """Helper function for importing job_metadata data."""
     with db_conn, db_conn.cursor() as cursor:
         cursor.execute("""INSERT INTO job_metadata(command, run_id, subcommand, db_user, command_line,
-                                                   start_time, status, extra_metadata)
-                              VALUES(%s, %s, %s, 'test_user', %s, %s, %s, %s)
+                                                   start_time, status, extra_metadata, input_file_md5)
+                              VALUES(%s, %s, %s, 'test_user', %s, %s, %s, %s, %s::UUID)
                            RETURNING command, run_id""",
                        [command, run_id, subcommand, ' '.join(sys.argv), start_time, status,
-                        json.dumps(extra_metadata)])
+                        json.dumps(extra_metadata), extra_metadata.get('input_file_md5')])
         job_metadata_pk = [(x.command, x.run_id) for x in cursor.fetchall()]
     return job_metadata_pk[0]
 
@@ -0,0 +1,297 @@
+"""
+Deterministic synthetic data generator used by the benchmark suite.
+
+Copyright (c) 2018-2021 Qualcomm Technologies, Inc.
+
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification, are permitted (subject to the
+limitations in the disclaimer below) provided that the following conditions are met:
+
+- Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+  disclaimer.
+- Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the following
+  disclaimer in the documentation and/or other materials provided with the distribution.
+- Neither the name of Qualcomm Technologies, Inc. nor the names of its contributors may be used to endorse or promote
+  products derived from this software without specific prior written permission.
+- The origin of this software must not be misrepresented; you must not claim that you wrote the original software.
+  If you use this software in a product, an acknowledgment is required by displaying the trademark/logo as per the
+  details provided here: https://www.qualcomm.com/documents/dirbs-logo-and-brand-guidelines
+- Altered source versions must be plainly marked as such, and must not be misrepresented as being the original
+  software.
+- This notice may not be removed or altered from any source distribution.
+
+NO EXPRESS OR IMPLIED LICENSES TO ANY PARTY'S PATENT RIGHTS ARE GRANTED BY THIS LICENSE. THIS SOFTWARE IS PROVIDED BY
+THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR
+BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+POSSIBILITY OF SUCH DAMAGE.
+"""
+
+import calendar
+import csv
+import datetime
+import random
+import zipfile
+from os import path
+
+
+class SyntheticDataGenerator:
+    """Deterministic generator for DIRBS input files at a configurable scale factor.
+
+    A scale factor of 1 corresponds to roughly base_subscribers subscribers per operator for a single month of
+    operator data. All other inputs (GSMA TAC DB, registration, stolen and pairing lists) are sized relative to the
+    generated device population so that classification and list generation see realistic match ratios.
+    """
+
+    # Header used by the GSMA TAC DB dumps
+    gsma_header = ['TAC', 'Marketing Name', 'Internal Model Name', 'Manufacturer', 'Bands', 'Allocation Date',
+                   'Country Code', 'Fixed Code', 'Manufacturer Code', 'Radio Interface', 'Brand Name', 'Model Name',
+                   'Operating System', 'NFC', 'Bluetooth', 'WLAN', 'Device Type']
+    device_types = ['Smartphone', 'Handheld', 'Mobile Phone/Feature phone', 'Tablet', 'Module', 'Dongle']
+    # Characters that the pre-validator accepts in an IMEI but that make it unclean
+    unclean_imei_chars = 'ABCDEF*#'
+
+    def __init__(self,
+                 scale_factor,
+                 *,
+                 operators,
+                 country_codes,
+                 month,
+                 year,
+                 seed=1234,
+                 base_subscribers=10000,
+                 tacs_per_subscriber=0.005,
+                 max_active_days=5,
+                 unknown_tac_ratio=0.01,
+                 unclean_imei_ratio=0.005,
+                 duplicate_imei_ratio=0.02,
+                 transient_msisdn_ratio=0.005,
+                 duplicate_row_ratio=0.01,
+                 registration_ratio=0.6,
+                 stolen_ratio=0.005,
+                 pairing_ratio=0.01):
+        """Constructor.
+
+        Arguments:
+            scale_factor: positive multiplier applied to the base data volume
+            operators: list of (operator_id, [(mcc, mnc), ...]) tuples to generate data for
+            country_codes: list of country codes used to generate in-region MSISDNs
+            month: month of the generated operator data
+            year: year of the generated operator data
+            seed: seed for the random number generator so that runs are reproducible
+            base_subscribers: number of subscribers per operator at scale factor 1
+            tacs_per_subscriber: number of distinct GSMA TACs generated per subscriber
+            max_active_days: maximum number of days a triplet is seen on in the month
+            unknown_tac_ratio: ratio of devices whose TAC is not in the GSMA TAC DB
+            unclean_imei_ratio: ratio of devices reported with an invalid IMEI
+            duplicate_imei_ratio: ratio of devices seen with multiple IMSIs
+            transient_msisdn_ratio: ratio of MSISDNs seen with many different devices
+            duplicate_row_ratio: ratio of operator rows repeated verbatim in the dump
+            registration_ratio: ratio of valid devices found on the registration list
+            stolen_ratio: ratio of valid devices found on the stolen list
+            pairing_ratio: ratio of subscribers found on the pairing list
+        """
+        assert scale_factor > 0
+        self.scale_factor = scale_factor
+        self.operators = operators
+        self.country_codes = country_codes
+        self.month = month
+        self.year = year
+        self.seed = seed
+        self.num_subscribers = max(1, int(base_subscribers * scale_factor))
+        self.num_tacs = max(10, int(self.num_subscribers * tacs_per_subscriber))
+        self.max_active_days = max_active_days
+        self.unknown_tac_ratio = unknown_tac_ratio
+        self.unclean_imei_ratio = unclean_imei_ratio
+        self.duplicate_imei_ratio = duplicate_imei_ratio
+        self.transient_msisdn_ratio = transient_msisdn_ratio
+        self.duplicate_row_ratio = duplicate_row_ratio
+        self.registration_ratio = registration_ratio
+        self.stolen_ratio = stolen_ratio
+        self.pairing_ratio = pairing_ratio
+        self._rng = random.Random(seed)
+        self._gsma_tacs = []
+        self._unknown_tacs = []
+        self._valid_imeis = []
+        self._triplets = {}
+
+    @property
+    def _days_in_month(self):
+        """Number of days in the month being generated."""
+        return calendar.monthrange(self.year, self.month)[1]
+
+    def generate(self, output_dir):
+        """Generate all input files into output_dir.
+
+        Arguments:
+            output_dir: directory that the zipped input files are written to
+        Returns:
+            dict containing the path and row count of each generated file, keyed by input type
+        """
+        # Re-seed so that calling generate() multiple times produces identical data
+        self._rng.seed(self.seed)
+        self._generate_population()
+        rv = {'gsma_tac': self._write_gsma_tac_db(output_dir),
+              'registration_list': self._write_registration_list(output_dir),
+              'stolen_list': self._write_stolen_list(output_dir),
+              'pairing_list': self._write_pairing_list(output_dir),
+              'operator': {}}
+        for op_id, _ in self.operators:
+            rv['operator'][op_id] = self._write_operator_data(output_dir, op_id)
+        return rv
+
+    def _random_digits(self, num_digits):
+        """Return a string of num_digits random decimal digits."""
+        return ''.join(self._rng.choice('0123456789') for _ in range(num_digits))
+
+    def _new_imei(self, tac):
+        """Generate a new 14-digit IMEI with the supplied TAC."""
+        return tac + self._random_digits(6)
+
+    def _new_imsi(self, mcc, mnc):
+        """Generate a new 15-digit IMSI for the supplied MCC-MNC pair."""
+        return mcc + mnc + self._random_digits(15 - len(mcc) - len(mnc))
+
+    def _new_msisdn(self):
+        """Generate a new in-region MSISDN."""
+        cc = self._rng.choice(self.country_codes)
+        return cc + self._random_digits(12 - len(cc))
+
+    def _unclean_imei(self, imei):
+        """Replace a random character of an IMEI with one that makes it unclean."""
+        pos = self._rng.randrange(8, len(imei))
+        return imei[:pos] + self._rng.choice(self.unclean_imei_chars) + imei[pos + 1:]
+
+    def _generate_population(self):
+        """Generate TACs, devices and per-operator subscriber triplets."""
+        tacs = self._rng.sample(range(10000000, 99999999), self.num_tacs * 2)
+        self._gsma_tacs = [str(t) for t in tacs[:self.num_tacs]]
+        self._unknown_tacs = [str(t) for t in tacs[self.num_tacs:]]
+        self._valid_imeis = []
+        self._triplets = {}
+        for op_id, mcc_mnc_pairs in self.operators:
+            triplets = []
+            transient_msisdns = [self._new_msisdn()
+                                 for _ in range(max(1, int(self.num_subscribers * self.transient_msisdn_ratio)))]
+            for _ in range(self.num_subscribers):
+                if self._rng.random() < self.unknown_tac_ratio:
+                    imei = self._new_imei(self._rng.choice(self._unknown_tacs))
+                else:
+                    imei = self._new_imei(self._rng.choice(self._gsma_tacs))
+                    self._valid_imeis.append(imei)
+                if self._rng.random() < self.unclean_imei_ratio:
+                    imei = self._unclean_imei(imei)
+                mcc, mnc = self._rng.choice(mcc_mnc_pairs)
+                imsi = self._new_imsi(mcc, mnc)
+                msisdn = self._new_msisdn()
+                triplets.append((imei, imsi, msisdn))
+                if self._rng.random() < self.duplicate_imei_ratio:
+                    # Same device seen with a number of other SIMs during the month
+                    for _ in range(self._rng.randint(2, 10)):
+                        triplets.append((imei, self._new_imsi(mcc, mnc), self._new_msisdn()))
+            # Transient MSISDNs are each seen with a run of devices with consecutive serial numbers
+            for msisdn in transient_msisdns:
+                tac = self._rng.choice(self._gsma_tacs)
+                serial = self._rng.randint(0, 999000)
+                mcc, mnc = self._rng.choice(mcc_mnc_pairs)
+                imsi = self._new_imsi(mcc, mnc)
+                for offset in range(self._rng.randint(5, 20)):
+                    triplets.append(('{0}{1:06d}'.format(tac, serial + offset), imsi, msisdn))
+            self._triplets[op_id] = triplets
+
+    def _write_zipped_csv(self, output_dir, base_name, header, rows, delimiter=','):
+        """Write rows as a CSV with header into a zip file of the same name, returning the zip path."""
+        csv_name = '{0}.{1}'.format(base_name, 'txt' if delimiter == '|' else 'csv')
+        zip_path = path.join(output_dir, '{0}.zip'.format(base_name))
+        with zipfile.ZipFile(zip_path, 'w', compression=zipfile.ZIP_DEFLATED) as zf, \
+                zf.open(csv_name, 'w') as raw_file:
+            # zipfile only exposes a binary stream, so wrap each line ourselves
+            writer = csv.writer(_LineBuffer(raw_file), delimiter=delimiter, lineterminator='\n')
+            writer.writerow(header)
+            num_rows = 0
+            for row in rows:
+                writer.writerow(row)
+                num_rows += 1
+        return {'path': zip_path, 'num_rows': num_rows}
+
+    def _write_gsma_tac_db(self, output_dir):
+        """Write the GSMA TAC DB dump."""
+        def _rows():
+            for tac in self._gsma_tacs:
+                device_type = self._rng.choice(self.device_types)
+                manufacturer = 'Manufacturer {0}'.format(int(tac) % 50)
+                model_name = 'Model {0}'.format(tac)
+                allocation_date = datetime.date(self._rng.randint(2005, self.year - 1),
+                                                self._rng.randint(1, 12),
+                                                self._rng.randint(1, 28)).strftime('%d-%b-%Y')
+                yield [tac, model_name, model_name, manufacturer, 'GSM 1800,GSM 900,LTE FDD BAND 3', allocation_date,
+                       'Country', 'Fixed', 'Code', 'LTE', manufacturer, model_name, 'OS', 'Y', 'Y', 'Y', device_type]
+
+        return self._write_zipped_csv(output_dir, 'gsma_dump_synthetic_{0}'.format(self.year),
+                                      self.gsma_header, _rows(), delimiter='|')
+
+    def _write_registration_list(self, output_dir):
+        """Write the registration list, covering a subset of devices with a known TAC."""
+        def _rows():
+            for device_id, imei in enumerate(sorted(set(self._valid_imeis))):
+                if self._rng.random() < self.registration_ratio:
+                    yield [imei, 'make', 'model', 'whitelist', 'model_number', 'brand_name', 'Smartphone', 'LTE',
+                           device_id + 1]
+
+        return self._write_zipped_csv(output_dir, 'registration_list_synthetic',
+                                      ['APPROVED_IMEI', 'make', 'model', 'status', 'model_number', 'brand_name',
+                                       'device_type', 'radio_interface', 'device_id'],
+                                      _rows())
+
+    def _write_stolen_list(self, output_dir):
+        """Write the stolen list, covering a small subset of devices with a known TAC."""
+        def _rows():
+            for imei in sorted(set(self._valid_imeis)):
+                if self._rng.random() < self.stolen_ratio:
+                    reporting_date = datetime.date(self.year, self.month, self._rng.randint(1, self._days_in_month))
+                    yield [imei, reporting_date.strftime('%Y%m%d'), self._rng.choice(['blacklist', ''])]
+
+        return self._write_zipped_csv(output_dir, 'stolen_list_synthetic', ['IMEI', 'reporting_date', 'status'],
+                                      _rows())
+
+    def _write_pairing_list(self, output_dir):
+        """Write the pairing list, covering a small subset of subscribers across all operators."""
+        def _rows():
+            for op_id, _ in self.operators:
+                for imei, imsi, msisdn in self._triplets[op_id]:
+                    if self._rng.random() < self.pairing_ratio:
+                        yield [imei, imsi, msisdn]
+
+        return self._write_zipped_csv(output_dir, 'pairing_list_synthetic', ['imei', 'imsi', 'msisdn'], _rows())
+
+    def _write_operator_data(self, output_dir, op_id):
+        """Write a month of operator data for op_id, with each triplet seen on a random set of days."""
+        days_in_month = self._days_in_month
+
+        def _rows():
+            for imei, imsi, msisdn in self._triplets[op_id]:
+                num_days = self._rng.randint(1, min(self.max_active_days, days_in_month))
+                for day in sorted(self._rng.sample(range(1, days_in_month + 1), num_days)):
+                    row = ['{0:04d}{1:02d}{2:02d}'.format(self.year, self.month, day), imei, imsi, msisdn]
+                    yield row
+                    if self._rng.random() < self.duplicate_row_ratio:
+                        yield row
+
+        base_name = '{0}_{1:04d}{2:02d}01_{1:04d}{2:02d}{3:02d}'.format(op_id, self.year, self.month, days_in_month)
+        return self._write_zipped_csv(output_dir, base_name, ['date', 'imei', 'imsi', 'msisdn'], _rows())
+
+
+class _LineBuffer:
+    """Minimal text-to-binary adapter so that csv.writer can write directly into a zip member."""
+
+    def __init__(self, raw_file):
+        """Constructor."""
+        self._raw_file = raw_file
+
+    def write(self, text):
+        """Encode and write text to the underlying binary file."""
+        return self._raw_file.write(text.encode('utf8'))
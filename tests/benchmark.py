@@ -0,0 +1,180 @@
+"""
+Benchmark suite measuring pipeline throughput on synthetic data at configurable scale factors.
+
+Copyright (c) 2018-2021 Qualcomm Technologies, Inc.
+
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification, are permitted (subject to the
+limitations in the disclaimer below) provided that the following conditions are met:
+
+- Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+  disclaimer.
+- Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the following
+  disclaimer in the documentation and/or other materials provided with the distribution.
+- Neither the name of Qualcomm Technologies, Inc. nor the names of its contributors may be used to endorse or promote
+  products derived from this software without specific prior written permission.
+- The origin of this software must not be misrepresented; you must not claim that you wrote the original software.
+  If you use this software in a product, an acknowledgment is required by displaying the trademark/logo as per the
+  details provided here: https://www.qualcomm.com/documents/dirbs-logo-and-brand-guidelines
+- Altered source versions must be plainly marked as such, and must not be misrepresented as being the original
+  software.
+- This notice may not be removed or altered from any source distribution.
+
+NO EXPRESS OR IMPLIED LICENSES TO ANY PARTY'S PATENT RIGHTS ARE GRANTED BY THIS LICENSE. THIS SOFTWARE IS PROVIDED BY
+THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR
+BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+POSSIBILITY OF SUCH DAMAGE.
+"""
+
+import calendar
+import json
+import os
+from os import path
+
+import pytest
+from click.testing import CliRunner
+
+import dirbs
+import dirbs.metadata as metadata
+from dirbs.cli.classify import cli as dirbs_classify_cli
+from dirbs.cli.importer import cli as dirbs_import_cli
+from dirbs.cli.listgen import cli as dirbs_listgen_cli
+from dirbs.cli.report import cli as dirbs_report_cli
+from dirbs.logging import StatsClient
+from dirbs.utils import CodeProfiler
+from _synthetic_data import SyntheticDataGenerator
+
+# Benchmarks are slow and only make sense when run deliberately, so they are skipped unless a comma-separated list
+# of scale factors is given via this environment variable, e.g. DIRBS_BENCHMARK_SCALE_FACTORS=1,10
+BENCHMARK_SCALE_FACTORS_ENV = 'DIRBS_BENCHMARK_SCALE_FACTORS'
+# Directory to write the JSON results to. Defaults to the pytest temporary directory for the test.
+BENCHMARK_OUTPUT_DIR_ENV = 'DIRBS_BENCHMARK_OUTPUT_DIR'
+# Seed for the synthetic data generator
+BENCHMARK_SEED_ENV = 'DIRBS_BENCHMARK_SEED'
+
+BENCHMARK_MONTH = 11
+BENCHMARK_YEAR = 2016
+
+
+def _benchmark_scale_factors():
+    """Parse the list of scale factors to benchmark from the environment."""
+    scale_factors = os.environ.get(BENCHMARK_SCALE_FACTORS_ENV, '')
+    return [float(sf) for sf in scale_factors.split(',') if sf.strip()]
+
+
+class RecordingStatsClient(StatsClient):
+    """StatsClient that records every gauge and timing sent so that they can be written to the results."""
+
+    def __init__(self, statsd_config):
+        """Constructor."""
+        super().__init__(statsd_config)
+        self.gauges = {}
+        self.timings = {}
+
+    def reset(self):
+        """Clear all recorded stats."""
+        self.gauges = {}
+        self.timings = {}
+
+    def timing(self, stat, delta, rate=1):
+        """Overrides StatsClient.timing."""
+        self.timings[stat] = delta
+        return super().timing(stat, delta, rate)
+
+    def gauge(self, stat, value, rate=1, delta=False):
+        """Overrides StatsClient.gauge."""
+        if delta:
+            self.gauges[stat] = self.gauges.get(stat, 0) + value
+        else:
+            self.gauges[stat] = value
+        return super().gauge(stat, value, rate, delta)
+
+
+def _run_stage(results, *, name, cli, args, mocked_config, statsd, metadata_db_conn, command, subcommand=None):
+    """Run a single pipeline stage via its CLI entry point and append its timings to results."""
+    statsd.reset()
+    runner = CliRunner()
+    with CodeProfiler() as cp:
+        result = runner.invoke(cli, args, obj={'APP_CONFIG': mocked_config, 'STATSD_CLIENT': statsd})
+    assert result.exit_code == 0, 'Benchmark stage {0} failed: {1}'.format(name, result.output)
+
+    job = metadata.query_for_command_runs(metadata_db_conn, command, subcommand=subcommand)[0]
+    extra_metadata = job.extra_metadata or {}
+    results['stages'].append({
+        'stage': name,
+        'run_id': job.run_id,
+        'wall_time_ms': cp.duration,
+        'job_time_ms': int((job.end_time - job.start_time).total_seconds() * 1000),
+        'statsd_gauges': dict(statsd.gauges),
+        'statsd_timings': dict(statsd.timings),
+        'performance_timing': extra_metadata.get('performance_timing', {})
+    })
+
+
+@pytest.mark.skipif(not _benchmark_scale_factors(),
+                    reason='Set {0} to run the benchmark suite'.format(BENCHMARK_SCALE_FACTORS_ENV))
+@pytest.mark.parametrize('scale_factor', _benchmark_scale_factors())
+def test_pipeline_benchmark(scale_factor, postgres, db_conn, metadata_db_conn, mocked_config, tmpdir, logger):
+    """Benchmark import, classify, listgen and report on synthetic data at the given scale factor.
+
+    Each stage is run through its CLI entry point. The per-component timings sent to StatsD and stored in the
+    job metadata are written to a JSON file per scale factor so that they can be compared between releases.
+    """
+    seed = int(os.environ.get(BENCHMARK_SEED_ENV, 1234))
+    output_dir = os.environ.get(BENCHMARK_OUTPUT_DIR_ENV, str(tmpdir))
+    data_dir = str(tmpdir.mkdir('data'))
+    operators = [(op.id, [(p['mcc'], p['mnc']) for p in op.mcc_mnc_pairs])
+                 for op in mocked_config.region_config.operators]
+    generator = SyntheticDataGenerator(scale_factor,
+                                       operators=operators,
+                                       country_codes=mocked_config.region_config.country_codes,
+                                       month=BENCHMARK_MONTH,
+                                       year=BENCHMARK_YEAR,
+                                       seed=seed)
+    with CodeProfiler() as cp:
+        input_files = generator.generate(data_dir)
+
+    results = {
+        'code_version': dirbs.__version__,
+        'db_schema_version': dirbs.db_schema_version,
+        'scale_factor': scale_factor,
+        'seed': seed,
+        'data_generation_time_ms': cp.duration,
+        'input_rows': {k: v['num_rows'] for k, v in input_files.items() if k != 'operator'},
+        'stages': []
+    }
+    results['input_rows'].update({'operator.{0}'.format(op_id): v['num_rows']
+                                  for op_id, v in input_files['operator'].items()})
+
+    statsd = RecordingStatsClient(mocked_config.statsd_config)
+    stage_kwargs = dict(mocked_config=mocked_config, statsd=statsd, metadata_db_conn=metadata_db_conn)
+    for subcommand in ['gsma_tac', 'registration_list', 'stolen_list', 'pairing_list']:
+        _run_stage(results, name='import.{0}'.format(subcommand), cli=dirbs_import_cli,
+                   args=[subcommand, input_files[subcommand]['path']], command='dirbs-import',
+                   subcommand=subcommand, **stage_kwargs)
+    for op_id, op_file in input_files['operator'].items():
+        _run_stage(results, name='import.operator.{0}'.format(op_id), cli=dirbs_import_cli,
+                   args=['operator', '--disable-rat-import', op_id, op_file['path']], command='dirbs-import',
+                   subcommand='operator', **stage_kwargs)
+
+    curr_date = '{0:04d}{1:02d}{2:02d}'.format(BENCHMARK_YEAR, BENCHMARK_MONTH,
+                                               calendar.monthrange(BENCHMARK_YEAR, BENCHMARK_MONTH)[1])
+    _run_stage(results, name='classify', cli=dirbs_classify_cli,
+               args=['--disable-sanity-checks', '--curr-date', curr_date], command='dirbs-classify', **stage_kwargs)
+    _run_stage(results, name='listgen', cli=dirbs_listgen_cli,
+               args=['--curr-date', curr_date, str(tmpdir.mkdir('listgen'))], command='dirbs-listgen',
+               **stage_kwargs)
+    _run_stage(results, name='report.standard', cli=dirbs_report_cli,
+               args=['standard', '--disable-retention-check', '--disable-data-check', str(BENCHMARK_MONTH),
+                     str(BENCHMARK_YEAR), str(tmpdir.mkdir('report'))],
+               command='dirbs-report', subcommand='standard', **stage_kwargs)
+
+    results_file = path.join(output_dir, 'dirbs_benchmark_sf{0:g}.json'.format(scale_factor))
+    with open(results_file, 'w') as f:
+        json.dump(results, f, indent=2, sort_keys=True, default=str)
+    logger.info('Wrote benchmark results for scale factor {0:g} to {1}'.format(scale_factor, results_file))
@@ -475,6 +475,15 @@ def test_import_status(db_conn, mocked_config, tmpdir, monkeypatch, flask_app, a
     result = runner.invoke(dirbs_catalog_cli, obj={'APP_CONFIG': mocked_config})
     assert result.exit_code == 0
 
+    # the import run is linked to the cataloged file through the indexed input_file_md5 column
+    with db_conn.cursor() as cursor:
+        cursor.execute("""SELECT COUNT(*)
+                            FROM data_catalog
+                            JOIN job_metadata
+                                 ON input_file_md5 = md5
+                           WHERE command = 'dirbs-import'""")
+        assert cursor.fetchone()[0] == 1
+
     # call apis
     if api_version == 'v1':
         rv = flask_app.get(url_for('{0}.catalog_api'.format(api_version)))
@@ -679,3 +688,38 @@ def test_catalog_pagination(flask_app, db_conn):
     assert keys['result_size'] == 5
     assert keys['next_key'] == str(offset + limit)
     assert len(files) == limit
+
+
+def test_catalog_cursor_pagination(flask_app, db_conn):
+    """Verify that following next_cursor through Catalog API (version 2.0) returns every file exactly once.
+
+    Several of the files share the same last_seen time, so paging must also follow the file_id ordering.
+    """
+    _dummy_data_generator(db_conn)
+
+    for order in ['ASC', 'DESC']:
+        rv = flask_app.get(url_for('v2.catalog_get_api', limit=100, order=order))
+        assert rv.status_code == 200
+        all_file_ids = [f['file_id'] for f in json.loads(rv.data.decode('utf-8'))['files']]
+
+        for limit in [1, 2, 3]:
+            file_ids = []
+            rv = flask_app.get(url_for('v2.catalog_get_api', limit=limit, order=order))
+            paged_by_cursor = False
+            while True:
+                assert rv.status_code == 200
+                data = json.loads(rv.data.decode('utf-8'))
+                assert len(data['files']) <= limit
+                file_ids.extend([f['file_id'] for f in data['files']])
+                # The offset-based keys are left empty when paging by cursor
+                if paged_by_cursor:
+                    assert data['_keys']['current_key'] == ''
+                    assert data['_keys']['next_key'] == ''
+                if not data['_keys']['next_cursor']:
+                    break
+                rv = flask_app.get(url_for('v2.catalog_get_api', limit=limit, order=order,
+                                           cursor=data['_keys']['next_cursor']))
+                paged_by_cursor = True
+
+            assert file_ids == all_file_ids
+            assert len(set(file_ids)) == len(all_file_ids)
@@ -981,8 +981,20 @@ def test_basic_cli_classification_set_condition(postgres, operator_data_importer
         attr_list = [(res.imei_norm, res.start_date, res.cond_name) for res in cur.fetchall()]
         assert attr_list == [('8888#888622222', datetime.date(2018, 11, 1), 'malformed_imei')]
 
+    # The hashed IMEI used to match against the golden list should be stored along with the state
+    with db_conn.cursor() as cur:
+        cur.execute('SELECT COUNT(*) FROM classification_state WHERE hashed_imei_norm = md5(imei_norm)::UUID')
+        assert cur.fetchone()[0] == 1
+
     assert result.exit_code == 0
 
+    # Only the condition that was run should be recorded in the last successful run summary
+    with db_conn.cursor() as cur:
+        cur.execute('SELECT cond_name, cond_config FROM classification_condition_last_run')
+        res_list = cur.fetchall()
+        assert [res.cond_name for res in res_list] == ['malformed_imei']
+        assert res_list[0].cond_config['label'] == 'malformed_imei'
+
 
 @pytest.mark.parametrize('operator_data_importer',
                          [OperatorDataParams(
@@ -138,8 +138,10 @@ def test_cli_repartition(postgres, mocked_config, db_conn, operator_data_importe
         assert result.exit_code != 0
 
     partitioned_tables = ['classification_state', 'historic_pairing_list', 'historic_registration_list',
-                          'network_imeis', 'monthly_network_triplets_per_mno_operator1_2016_11',
-                          'monthly_network_triplets_country_2016_11', 'blacklist', 'exceptions_lists_operator1',
+                          'network_imeis', 'network_msisdns', 'network_imeis_per_mno',
+                          'monthly_network_triplets_per_mno_operator1_2016_11',
+                          'monthly_network_triplets_country_2016_11', 'monthly_network_imei_imsis_2016_11',
+                          'blacklist', 'exceptions_lists_operator1',
                           'notifications_lists_operator1', 'historic_stolen_list']
 
     with db_conn, db_conn.cursor() as cursor:
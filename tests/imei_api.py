@@ -33,9 +33,13 @@ POSSIBILITY OF SUCH DAMAGE.
 
 import json
 
-from flask import url_for
+from flask import url_for, g, current_app
+from flask_caching.backends import NullCache
 import pytest
 
+import dirbs.metadata as metadata
+from dirbs.api.common import cache as api_cache
+from dirbs.api.common.cache import data_version, cached_results
 from dirbs.importer.operator_data_importer import OperatorDataImporter
 from _fixtures import *  # noqa: F403, F401
 from _importer_params import GSMADataParams, OperatorDataParams, RegistrationListParams, PairListParams, \
@@ -55,6 +59,20 @@ def check_in_registration_list_helper(imei_list, expect_to_find_in_reg, api_vers
         assert False  # Fail if passed api versions other than 1.0
 
 
+def page_through_with_cursor_helper(flask_app, endpoint, results_key, *, limit, **kwargs):
+    """Helper function to follow next_cursor through every page of a v2 paginated API and return all the results."""
+    results = []
+    rv = flask_app.get(url_for(endpoint, limit=limit, **kwargs))
+    while True:
+        assert rv.status_code == 200
+        data = json.loads(rv.data.decode('utf-8'))
+        assert len(data[results_key]) <= limit
+        results.extend(data[results_key])
+        if not data['_keys']['next_cursor']:
+            return results
+        rv = flask_app.get(url_for(endpoint, limit=limit, cursor=data['_keys']['next_cursor'], **kwargs))
+
+
 def test_imei_get_api_responses(api_version, flask_app):
     """Test Depot not known yet.
 
@@ -860,6 +878,52 @@ def test_pagination_on_pairings_api(flask_app, registration_list_importer, pairi
     assert data['_keys']['next_key'] == str(int(offset) + int(limit))
 
 
+@pytest.mark.parametrize('operator_data_importer',
+                         [OperatorDataParams(
+                             content='date,imei,imsi,msisdn\n'
+                                     '20161122,38847733370026,111018001111111,111112222233334\n'
+                                     '20161121,38847733370026,111018001111111,111112222233399\n'
+                                     '20161120,38847733370026,111016222222222,111112222233338\n'
+                                     '20161120,38847733370026,111016333333333,',
+                             extract=False,
+                             perform_null_checks=False,
+                             perform_unclean_checks=False,
+                             perform_region_checks=False,
+                             perform_home_network_check=False,
+                             operator='operator1'
+                         )],
+                         indirect=True)
+@pytest.mark.parametrize('pairing_list_importer',
+                         [PairListParams(content='imei,imsi,msisdn\n'
+                                                 '38847733370026,111018001111111,111112222233334\n'
+                                                 '38847733370026,111015113222222,111112222233335\n'
+                                                 '38847733370020,111015113333333,111112222233336\n'
+                                                 '38847733370026,111016111111111,111112222233337\n'
+                                                 '38847733370026,111016222222222,111112222233338\n'
+                                                 '38847733370026,111016333333333,111112222233339')],
+                         indirect=True)
+@pytest.mark.parametrize('order', ['ASC', 'DESC'])
+def test_cursor_pagination_on_pairings_api(flask_app, operator_data_importer, pairing_list_importer, order):
+    """Test Depot not known yet.
+
+    Verify that following next_cursor through the IMEI-Pairings API returns every pairing exactly once, in the same
+    order as a single page, including pairings seen with several MSISDNs and pairings never seen on the network.
+    """
+    operator_data_importer.import_data()
+    pairing_list_importer.import_data()
+    imei = '38847733370026'
+    rv = flask_app.get(url_for('v2.imei_get_pairings_api', imei=imei, limit=100, order=order))
+    assert rv.status_code == 200
+    all_pairs = json.loads(rv.data.decode('utf-8'))['pairs']
+    assert len(all_pairs) == 6
+
+    for limit in [1, 2, 4]:
+        pairs = page_through_with_cursor_helper(flask_app, 'v2.imei_get_pairings_api', 'pairs', limit=limit,
+                                                imei=imei, order=order)
+        assert pairs == all_pairs
+        assert len({(p['imsi'], p['last_seen']) for p in pairs}) == len(all_pairs)
+
+
 @pytest.mark.parametrize('registration_list_importer',
                          [RegistrationListParams(content='approved_imei,make,model,status,'
                                                          'model_number,brand_name,device_type,'
@@ -1145,6 +1209,45 @@ def test_pagination_on_subscribers_api(flask_app, operator_data_importer):
     assert data['subscribers'][4]['last_seen'] == '2016-11-22'
 
 
+@pytest.mark.parametrize('operator_data_importer',
+                         [OperatorDataParams(
+                             content='date,imei,imsi,msisdn\n'
+                                     '20161122,01376803870943,123456789012345,123456789012345\n'
+                                     '20161122,01376803870943,111018001111111,345266728277662\n'
+                                     '20161122,01376803870943,111018001111111,\n'
+                                     '20161112,01376803870943,111018001111111,345266728277662\n'
+                                     '20161109,01376803870943,111021600211121,546367736265242\n'
+                                     '20161109,01376803870943,,546367736265242\n'
+                                     '20161107,01376803870943,111041600211121,321312332221122',
+                             extract=False,
+                             perform_null_checks=False,
+                             perform_unclean_checks=False,
+                             perform_region_checks=False,
+                             perform_home_network_check=False,
+                             operator='operator1'
+                         )],
+                         indirect=True)
+@pytest.mark.parametrize('order', ['ASC', 'DESC'])
+def test_cursor_pagination_on_subscribers_api(flask_app, operator_data_importer, order):
+    """Test Depot not known yet.
+
+    Verify that following next_cursor through the IMEI-Subscribers API returns every subscriber exactly once, in
+    the same order as a single page, including subscribers sharing a last_seen date and NULL IMSIs or MSISDNs.
+    """
+    operator_data_importer.import_data()
+    imei = '01376803870943'
+    rv = flask_app.get(url_for('v2.imei_get_subscribers_api', imei=imei, limit=100, order=order))
+    assert rv.status_code == 200
+    all_subscribers = json.loads(rv.data.decode('utf-8'))['subscribers']
+    assert len(all_subscribers) == 6
+
+    for limit in [1, 2, 3]:
+        subscribers = page_through_with_cursor_helper(flask_app, 'v2.imei_get_subscribers_api', 'subscribers',
+                                                      limit=limit, imei=imei, order=order)
+        assert subscribers == all_subscribers
+        assert len({(x['imsi'], x['msisdn'], x['last_seen']) for x in subscribers}) == len(all_subscribers)
+
+
 def test_batch_imei_api_response_structure(flask_app):
     """Test Depot not known yet.
 
@@ -1476,3 +1579,48 @@ def test_options_method_not_allowed_on_imei_info_api(flask_app):
     rv = flask_app.options(url_for('v2.imei_info_api', imei=imei))
     assert rv.status_code == 405
     assert b'The method is not allowed for the requested URL' in rv.data
+
+
+def test_api_data_version(flask_app, metadata_db_conn, logger):
+    """Test Depot not available yet.
+
+    Verify that the data version used to key cached API results changes only when a classification, import or
+    prune job completes successfully.
+    """
+    initial_version = data_version()
+
+    # A running job does not change the data version
+    run_id = metadata.store_job_metadata(metadata_db_conn, 'dirbs-classify', logger)
+    g.pop('data_version', None)
+    assert data_version() == initial_version
+
+    # Neither does a job that does not change the data served by the API
+    listgen_run_id = metadata.store_job_metadata(metadata_db_conn, 'dirbs-listgen', logger)
+    metadata.log_job_success(metadata_db_conn, 'dirbs-listgen', listgen_run_id)
+    g.pop('data_version', None)
+    assert data_version() == initial_version
+
+    metadata.log_job_success(metadata_db_conn, 'dirbs-classify', run_id)
+    g.pop('data_version', None)
+    assert data_version() != initial_version
+
+
+def test_cached_results_without_cache(flask_app, monkeypatch):
+    """Test Depot not available yet.
+
+    Verify that when the cache type is null, cached results are computed without looking up the data version.
+    """
+    monkeypatch.setitem(current_app.extensions['cache'], api_cache.cache, NullCache())
+
+    def _fail():
+        assert False, 'data version should not be computed when nothing can be cached'
+
+    monkeypatch.setattr(api_cache, 'data_version', _fail)
+    computed_keys = []
+
+    def _compute(keys):
+        computed_keys.extend(keys)
+        return {key: key.upper() for key in keys}
+
+    assert cached_results('test', ['a', 'b', 'a'], _compute) == {'a': 'A', 'b': 'B'}
+    assert computed_keys == ['a', 'b']
@@ -1328,3 +1328,40 @@ def test_job_metadata_v2_pagination(flask_app, db_conn):
     assert data['jobs'][1]['start_time'] >= data['jobs'][2]['start_time']
     assert data['jobs'][2]['start_time'] >= data['jobs'][3]['start_time']
     assert data['jobs'][3]['start_time'] >= data['jobs'][4]['start_time']
+
+
+def test_job_metadata_v2_cursor_pagination(flask_app, db_conn):
+    """Test Depot ID not known yet.
+
+    Verify that following next_cursor through metadata api version 2.0 returns every job exactly once.
+    """
+    for i in range(6):
+        job_metadata_importer(db_conn=db_conn, command='dirbs-classify', run_id=i, subcommand='',
+                              status='success')
+        job_metadata_importer(db_conn=db_conn, command='dirbs-prune',
+                              run_id=i, subcommand='triplets', status='success')
+
+    for order in ['ASC', 'DESC']:
+        seen_jobs = []
+        rv = flask_app.get(url_for('v2.job_metadata_get_api', limit=5, order=order, include_count=False))
+        assert rv.status_code == 200
+        data = json.loads(rv.data.decode('utf-8'))
+        assert data['_keys']['result_size'] is None
+        while True:
+            seen_jobs.extend([(job['command'], job['run_id']) for job in data['jobs']])
+            if not data['_keys']['next_cursor']:
+                break
+            rv = flask_app.get(url_for('v2.job_metadata_get_api', limit=5, order=order,
+                                       cursor=data['_keys']['next_cursor']))
+            assert rv.status_code == 200
+            data = json.loads(rv.data.decode('utf-8'))
+            assert data['_keys']['result_size'] == 12
+            assert data['_keys']['result_size_capped'] is False
+
+        assert len(seen_jobs) == 12
+        assert len(set(seen_jobs)) == 12
+
+    # a malformed cursor is rejected
+    rv = flask_app.get(url_for('v2.job_metadata_get_api', cursor='not-a-cursor'))
+    assert rv.status_code == 400
+    assert b"Bad 'cursor':'not-a-cursor' argument format." in rv.data
@@ -47,6 +47,7 @@ from dirbs.cli.listgen import cli as dirbs_listgen_cli
 from dirbs.cli.classify import cli as dirbs_classify_cli
 from dirbs.importer.operator_data_importer import OperatorDataImporter
 from dirbs.config import ConditionConfig
+import dirbs.partition_utils as partition_utils
 from _helpers import job_metadata_importer, expect_success
 from _importer_params import OperatorDataParams, PairListParams, GoldenListParams,\
     StolenListParams, RegistrationListParams, BarredListParams, BarredTacListParams
@@ -545,6 +546,49 @@ def test_blacklist_delta_changed(postgres, db_conn, tmpdir, mocked_config, logge
                            'TAC not found in GSMA TAC database,changed\n']
 
 
+@pytest.mark.parametrize('classification_data',
+                         ['classification_state/imei_api_class_state_v7.csv'],
+                         indirect=True)
+def test_current_list_snapshots(postgres, db_conn, tmpdir, mocked_config, logger, classification_data):
+    """Test current list snapshots.
+
+    Verify that the current list snapshots maintained by dirbs-listgen match the lists generated from the history
+    tables after each run, including when IMEIs are unblocked.
+    """
+    for sub_temp_dir, date in [('run0', '20160501'), ('run1', '20170101'), ('run2', '20160101')]:
+        _run_list_gen_rows_run_id(db_conn, tmpdir, mocked_config, sub_temp_dir, date=date)
+        with db_conn, db_conn.cursor() as cursor:
+            cursor.execute("""SELECT imei_norm, virt_imei_shard, block_date, reasons
+                                FROM current_blacklist
+                            ORDER BY imei_norm""")
+            snapshot_rows = cursor.fetchall()
+            cursor.execute("""SELECT imei_norm, virt_imei_shard, block_date, reasons
+                                FROM gen_blacklist()
+                            ORDER BY imei_norm""")
+            assert snapshot_rows == cursor.fetchall()
+
+            for op_id in [op.id for op in mocked_config.region_config.operators]:
+                cursor.execute("""SELECT imei_norm, imsi, msisdn, block_date, reasons, amnesty_granted
+                                    FROM current_notifications_lists
+                                   WHERE operator_id = %s
+                                ORDER BY imei_norm, imsi, msisdn""", [op_id])
+                snapshot_rows = cursor.fetchall()
+                cursor.execute("""SELECT imei_norm, imsi, msisdn, block_date, reasons, amnesty_granted
+                                    FROM gen_notifications_list(%s)
+                                ORDER BY imei_norm, imsi, msisdn""", [op_id])
+                assert snapshot_rows == cursor.fetchall()
+
+                cursor.execute("""SELECT imei_norm, imsi, msisdn
+                                    FROM current_exceptions_lists
+                                   WHERE operator_id = %s
+                                ORDER BY imei_norm, imsi, msisdn""", [op_id])
+                snapshot_rows = cursor.fetchall()
+                cursor.execute("""SELECT imei_norm, imsi, msisdn
+                                    FROM gen_exceptions_list(%s)
+                                ORDER BY imei_norm, imsi, msisdn""", [op_id])
+                assert snapshot_rows == cursor.fetchall()
+
+
 @pytest.mark.parametrize('classification_data',
                          ['classification_state/imei_api_class_state_v5.csv'],
                          indirect=True)
@@ -971,6 +1015,8 @@ def test_aggregate_blacklist_changes(postgres, db_conn, tmpdir, mocked_config):
                                        calc_virt_imei_shard('12345678901234'))""")
         cursor.execute("""SELECT COUNT(*) AS count_bl FROM blacklist""")
         assert cursor.fetchone().count_bl == 5
+        # History was written directly rather than by dirbs-listgen, so rebuild the current list snapshots
+        partition_utils.create_list_snapshots(db_conn)
 
     for i in [900, 1000, 1003, 1004, 1112, 1113, 1116]:
         job_metadata_importer(db_conn=db_conn, command='dirbs-listgen', run_id=i,
@@ -1046,6 +1092,8 @@ def test_aggregate_notifications_list_changes(postgres, db_conn, tmpdir, mocked_
                                                                    """)
         cursor.execute("""SELECT COUNT(*) AS count_nl FROM notifications_lists_operator1""")
         assert cursor.fetchone().count_nl == 9
+        # History was written directly rather than by dirbs-listgen, so rebuild the current list snapshots
+        partition_utils.create_list_snapshots(db_conn)
 
     for i in [900, 1000, 1003, 1004, 1112, 1113, 1116, 1120, 1121, 1122, 1125]:
         job_metadata_importer(db_conn=db_conn, command='dirbs-listgen', run_id=i,
@@ -1126,6 +1174,8 @@ def test_aggregate_exceptions_list_changes(postgres, db_conn, tmpdir, mocked_con
                                        calc_virt_imei_shard('12345678901234'), '12345678901234')""")
         cursor.execute('SELECT COUNT(*) AS count_ex FROM exceptions_lists_operator1')
         assert cursor.fetchone().count_ex == 5
+        # History was written directly rather than by dirbs-listgen, so rebuild the current list snapshots
+        partition_utils.create_list_snapshots(db_conn)
 
     for i in [900, 1000, 1003, 1116, 1113, 1112, 1004]:
         job_metadata_importer(db_conn=db_conn, command='dirbs-listgen', run_id=i,
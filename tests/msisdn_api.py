@@ -36,7 +36,9 @@ import json
 from flask import url_for
 import pytest
 
+from dirbs.importer.operator_data_importer import OperatorDataImporter
 from _fixtures import *  # noqa: F403, F401
+from _helpers import get_importer
 from _importer_params import GSMADataParams, OperatorDataParams, RegistrationListParams
 
 
@@ -219,6 +221,66 @@ def test_observed_msisdn(flask_app, operator_data_importer, gsma_tac_db_importer
         assert data['registration'] is None
 
 
+@pytest.mark.parametrize('operator_data_importer',
+                         [OperatorDataParams(
+                             content='date,imei,imsi,msisdn\n'
+                                     '20161121,01376803870943,123456789012345,123456789012345\n'
+                                     '20161201,01376803870943,123456789012345,123456789012345\n'
+                                     '20161122,01376803870943,,123456789012345\n'
+                                     '20161122,64220498727231,123456789012345,223456789012345',
+                             extract=False,
+                             perform_file_daterange_check=False,
+                             perform_null_checks=False,
+                             perform_unclean_checks=False,
+                             perform_region_checks=False,
+                             perform_home_network_check=False,
+                             perform_historic_checks=False,
+                             operator='operator1'
+                         )],
+                         indirect=True)
+def test_observed_msisdn_per_pair(flask_app, operator_data_importer, db_conn, metadata_db_conn, mocked_config,
+                                  tmpdir, logger, mocked_statsd, api_version):
+    """Verify MSISDN API returns one result per IMEI-IMSI pair seen in the country.
+
+    A pair seen by several operators or in several months is only returned once, with the date it was last seen by
+    any operator, and pairs with a NULL IMSI are returned.
+    """
+    operator_data_importer.import_data()
+    with get_importer(OperatorDataImporter,
+                      db_conn,
+                      metadata_db_conn,
+                      mocked_config.db_config,
+                      tmpdir,
+                      logger,
+                      mocked_statsd,
+                      OperatorDataParams(
+                          content='date,imei,imsi,msisdn\n'
+                                  '20161125,01376803870943,123456789012345,123456789012345',
+                          extract=False,
+                          perform_unclean_checks=False,
+                          perform_region_checks=False,
+                          perform_home_network_check=False,
+                          perform_historic_checks=False,
+                          operator='operator2'
+                      )) as new_imp:
+        new_imp.import_data()
+
+    msisdn = '123456789012345'
+    if api_version == 'v1':
+        rv = flask_app.get(url_for('{0}.msisdn_api'.format(api_version), msisdn=msisdn))
+        assert rv.status_code == 200
+        data = json.loads(rv.data.decode('utf-8'))
+        assert sorted((d['imei_norm'], d['imsi'] or '') for d in data) == \
+            [('01376803870943', ''), ('01376803870943', '123456789012345')]
+    else:  # api version 2
+        rv = flask_app.get(url_for('{0}.msisdn_get_api'.format(api_version), msisdn=msisdn))
+        assert rv.status_code == 200
+        data = json.loads(rv.data.decode('utf-8'))['results']
+        assert sorted((d['imei_norm'], d['imsi'] or '', d['last_seen']) for d in data) == \
+            [('01376803870943', '', '2016-11-22'),
+             ('01376803870943', '123456789012345', '2016-12-01')]
+
+
 def test_put_not_allowed(flask_app, db_conn, tmpdir, logger, api_version):
     """Test Depot ID not known yet.
 
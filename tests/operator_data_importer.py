@@ -37,9 +37,10 @@ import datetime
 import pytest
 from click.testing import CliRunner
 
-from dirbs.cli.importer import cli as dirbs_import_cli
+from dirbs.cli.importer import cli as dirbs_import_cli, _manifest_connection_budget
 from dirbs.config.region import OperatorConfig
 from dirbs.importer.operator_data_importer import OperatorDataImporter
+import dirbs.metadata as metadata
 from _helpers import get_importer, expect_success, expect_failure, logger_stream_contents
 from _fixtures import *  # noqa: F403, F401
 from _importer_params import OperatorDataParams, GSMADataParams
@@ -1261,6 +1262,261 @@ def test_last_seen_date_network_imeis(operator_data_importer, mocked_config, log
                    ('64220498727231', datetime.date(2016, 11, 22))]
 
 
+@pytest.mark.parametrize('operator_data_importer',
+                         [OperatorDataParams(
+                             content='date,imei,imsi,msisdn\n'
+                                     '20161122,01376803870943,123456789012345,123456789012345\n'
+                                     '20161121,01376803870943,123456789012345,123456789012345\n'
+                                     '20161121,64220299727231,125456789012345,223456789012345\n'
+                                     '20161120,64220498727231,123456789012345,223456789012345\n'
+                                     '20161123,64220498727231,,223456789012345',
+                             extract=False,
+                             perform_null_checks=False,
+                             perform_unclean_checks=False,
+                             perform_region_checks=False,
+                             perform_home_network_check=False,
+                             operator='operator1'
+                         )],
+                         indirect=True)
+def test_network_msisdns(operator_data_importer, mocked_config, logger, mocked_statsd, db_conn,
+                         metadata_db_conn, tmpdir):
+    """Verify that the network_msisdns reverse index is maintained for each MSISDN seen by the importer."""
+    expect_success(operator_data_importer, 5, db_conn, logger)
+
+    with get_importer(OperatorDataImporter,
+                      db_conn,
+                      metadata_db_conn,
+                      mocked_config.db_config,
+                      tmpdir,
+                      logger,
+                      mocked_statsd,
+                      OperatorDataParams(
+                          content='date,imei,imsi,msisdn\n'
+                                  '20161125,64220299727231,125456789012345,223456789012345',
+                          extract=False,
+                          perform_unclean_checks=False,
+                          perform_region_checks=False,
+                          perform_home_network_check=False,
+                          operator='operator2'
+                      )) as new_imp:
+        expect_success(new_imp, 6, db_conn, logger)
+
+    # Seeing a triplet again in a later month only moves its last_seen date, including when the IMSI is NULL
+    with get_importer(OperatorDataImporter,
+                      db_conn,
+                      metadata_db_conn,
+                      mocked_config.db_config,
+                      tmpdir,
+                      logger,
+                      mocked_statsd,
+                      OperatorDataParams(
+                          content='date,imei,imsi,msisdn\n'
+                                  '20161205,01376803870943,123456789012345,123456789012345\n'
+                                  '20161203,64220498727231,,223456789012345',
+                          extract=False,
+                          perform_file_daterange_check=False,
+                          perform_null_checks=False,
+                          perform_unclean_checks=False,
+                          perform_region_checks=False,
+                          perform_home_network_check=False,
+                          perform_historic_checks=False,
+                          operator='operator1'
+                      )) as new_imp:
+        expect_success(new_imp, 8, db_conn, logger)
+
+    with db_conn.cursor() as cursor:
+        cursor.execute("""SELECT msisdn, imei_norm, imsi, operator_id, first_seen, last_seen
+                            FROM network_msisdns
+                           WHERE virt_msisdn_shard = calc_virt_msisdn_shard(msisdn)
+                        ORDER BY msisdn, imei_norm, imsi NULLS LAST, operator_id""")
+        res = [tuple(x) for x in cursor.fetchall()]
+
+    # Triplets with a NULL IMSI are kept, as the MSISDN API returns them
+    assert res == [('123456789012345', '01376803870943', '123456789012345', 'operator1',
+                    datetime.date(2016, 11, 21), datetime.date(2016, 12, 5)),
+                   ('223456789012345', '64220299727231', '125456789012345', 'operator1',
+                    datetime.date(2016, 11, 21), datetime.date(2016, 11, 21)),
+                   ('223456789012345', '64220299727231', '125456789012345', 'operator2',
+                    datetime.date(2016, 11, 25), datetime.date(2016, 11, 25)),
+                   ('223456789012345', '64220498727231', '123456789012345', 'operator1',
+                    datetime.date(2016, 11, 20), datetime.date(2016, 11, 20)),
+                   ('223456789012345', '64220498727231', None, 'operator1',
+                    datetime.date(2016, 11, 23), datetime.date(2016, 12, 3))]
+
+
+@pytest.mark.parametrize('operator_data_importer',
+                         [OperatorDataParams(
+                             content='date,imei,imsi,msisdn\n'
+                                     '20161122,01376803870943,123456789012345,123456789012345\n'
+                                     '20161121,01376803870943,123456789012345,123456789012345\n'
+                                     '20161120,64220498727231,123456789012345,223456789012345',
+                             extract=False,
+                             perform_unclean_checks=False,
+                             perform_region_checks=False,
+                             perform_home_network_check=False,
+                             operator='operator1'
+                         )],
+                         indirect=True)
+def test_network_imeis_per_mno(operator_data_importer, mocked_config, logger, mocked_statsd, db_conn,
+                               metadata_db_conn, tmpdir):
+    """Verify that the date each IMEI was first seen on each operator is maintained by the importer."""
+    expect_success(operator_data_importer, 3, db_conn, logger)
+
+    with get_importer(OperatorDataImporter,
+                      db_conn,
+                      metadata_db_conn,
+                      mocked_config.db_config,
+                      tmpdir,
+                      logger,
+                      mocked_statsd,
+                      OperatorDataParams(
+                          content='date,imei,imsi,msisdn\n'
+                                  '20161025,64220498727231,123456789012345,223456789012345\n'
+                                  '20161026,01376803870943,123456789012345,123456789012345',
+                          extract=False,
+                          perform_unclean_checks=False,
+                          perform_region_checks=False,
+                          perform_home_network_check=False,
+                          perform_historic_checks=False,
+                          operator='operator2'
+                      )) as new_imp:
+        expect_success(new_imp, 5, db_conn, logger)
+
+    with get_importer(OperatorDataImporter,
+                      db_conn,
+                      metadata_db_conn,
+                      mocked_config.db_config,
+                      tmpdir,
+                      logger,
+                      mocked_statsd,
+                      OperatorDataParams(
+                          content='date,imei,imsi,msisdn\n'
+                                  '20161019,01376803870943,123456789012345,123456789012345',
+                          extract=False,
+                          perform_unclean_checks=False,
+                          perform_region_checks=False,
+                          perform_home_network_check=False,
+                          perform_historic_checks=False,
+                          operator='operator1'
+                      )) as new_imp:
+        expect_success(new_imp, 6, db_conn, logger)
+
+    with db_conn.cursor() as cursor:
+        cursor.execute("""SELECT imei_norm, operator_id, first_seen
+                            FROM network_imeis_per_mno
+                           WHERE virt_imei_shard = calc_virt_imei_shard(imei_norm)
+                        ORDER BY imei_norm, operator_id""")
+        res = [tuple(x) for x in cursor.fetchall()]
+
+    assert res == [('01376803870943', 'operator1', datetime.date(2016, 10, 19)),
+                   ('01376803870943', 'operator2', datetime.date(2016, 10, 26)),
+                   ('64220498727231', 'operator1', datetime.date(2016, 11, 20)),
+                   ('64220498727231', 'operator2', datetime.date(2016, 10, 25))]
+
+
+@pytest.mark.parametrize('operator_data_importer',
+                         [OperatorDataParams(
+                             content='date,imei,imsi,msisdn\n'
+                                     '20161122,01376803870943,123456789012345,123456789012345\n'
+                                     '20161121,01376803870943,123456789012345,223456789012345\n'
+                                     '20161120,64220498727231,123456789012345,223456789012345',
+                             extract=False,
+                             perform_unclean_checks=False,
+                             perform_region_checks=False,
+                             perform_home_network_check=False,
+                             operator='operator1'
+                         )],
+                         indirect=True)
+def test_monthly_network_imei_imsis(operator_data_importer, mocked_config, logger, mocked_statsd, db_conn,
+                                    metadata_db_conn, tmpdir):
+    """Verify that the per-operator IMEI-IMSI pairs seen each month are maintained by the importer."""
+    expect_success(operator_data_importer, 3, db_conn, logger)
+
+    with get_importer(OperatorDataImporter,
+                      db_conn,
+                      metadata_db_conn,
+                      mocked_config.db_config,
+                      tmpdir,
+                      logger,
+                      mocked_statsd,
+                      OperatorDataParams(
+                          content='date,imei,imsi,msisdn\n'
+                                  '20161123,01376803870943,123456789012345,123456789012345\n'
+                                  '20161123,64220498727231,123456789012345,223456789012345',
+                          extract=False,
+                          perform_unclean_checks=False,
+                          perform_region_checks=False,
+                          perform_home_network_check=False,
+                          operator='operator2'
+                      )) as new_imp:
+        expect_success(new_imp, 5, db_conn, logger)
+
+    with db_conn.cursor() as cursor:
+        cursor.execute("""SELECT operator_id, imei_norm, imsi, date_bitmask
+                            FROM monthly_network_imei_imsis
+                           WHERE triplet_year = 2016
+                             AND triplet_month = 11
+                             AND pair_hash = hash_triplet(imei_norm, imsi, NULL)
+                        ORDER BY operator_id, imei_norm""")
+        res = [tuple(x) for x in cursor.fetchall()]
+
+    # The two triplets seen with IMEI 01376803870943 on operator1 collapse into a single IMEI-IMSI pair
+    assert res == [('operator1', '01376803870943', '123456789012345', (1 << 20) | (1 << 21)),
+                   ('operator1', '64220498727231', '123456789012345', 1 << 19),
+                   ('operator2', '01376803870943', '123456789012345', 1 << 22),
+                   ('operator2', '64220498727231', '123456789012345', 1 << 22)]
+
+
+@pytest.mark.parametrize('operator_data_importer',
+                         [OperatorDataParams(
+                             content='date,imei,imsi,msisdn\n'
+                                     '20161122,01376803870943,123456789012345,123456789012345\n'
+                                     '20161121,01376803870943,123456789012345,223456789012345\n'
+                                     '20161120,01376803870944,123456789012345,223456789012345\n'
+                                     '20161120,64220498727231,123456789012345,223456789012345',
+                             extract=False,
+                             perform_unclean_checks=False,
+                             perform_region_checks=False,
+                             perform_home_network_check=False,
+                             operator='operator1'
+                         )],
+                         indirect=True)
+def test_monthly_per_mno_tac_hll_sketches(operator_data_importer, mocked_config, logger, mocked_statsd, db_conn,
+                                          metadata_db_conn, tmpdir):
+    """Verify that the per-operator TAC IMEI sketches used by the top models reports are maintained by the importer."""
+    expect_success(operator_data_importer, 4, db_conn, logger)
+
+    with get_importer(OperatorDataImporter,
+                      db_conn,
+                      metadata_db_conn,
+                      mocked_config.db_config,
+                      tmpdir,
+                      logger,
+                      mocked_statsd,
+                      OperatorDataParams(
+                          content='date,imei,imsi,msisdn\n'
+                                  '20161123,01376803870943,123456789012345,123456789012345\n'
+                                  '20161123,01376803870945,123456789012345,123456789012345',
+                          extract=False,
+                          perform_unclean_checks=False,
+                          perform_region_checks=False,
+                          perform_home_network_check=False,
+                          operator='operator1'
+                      )) as new_imp:
+        expect_success(new_imp, 5, db_conn, logger)
+
+    with db_conn.cursor() as cursor:
+        cursor.execute("""SELECT operator_id, tac, hll_cardinality(imei_hll)::BIGINT AS imei_count
+                            FROM monthly_per_mno_tac_hll_sketches
+                           WHERE triplet_year = 2016
+                             AND triplet_month = 11
+                        ORDER BY operator_id, tac""")
+        res = [tuple(x) for x in cursor.fetchall()]
+
+    # The IMEI seen again in the second import is only counted once when the sketches are merged
+    assert res == [('operator1', '01376803', 3), ('operator1', '64220498', 1)]
+
+
 @pytest.mark.parametrize('operator_data_importer',
                          [OperatorDataParams(
                              filename='operator1_null_3_20160701_20160730.csv',
@@ -1594,3 +1850,66 @@ def test_disable_auto_analyze_check(mocked_config, logger, mocked_statsd, db_con
                            obj={'APP_CONFIG': mocked_config})
     assert result.exit_code == 0
     assert 'Skipping auto analyze of associated historic tables...' in logger_stream_contents(logger)
+
+
+def test_operator_manifest_import(db_conn, metadata_db_conn, mocked_config, tmpdir, logger, mocked_statsd,
+                                  postgres):
+    """Test Depot ID not known yet.
+
+    Verify that dirbs-import operator_manifest concurrently imports every file listed in the manifest, recording
+    each one as a separate operator import job and the list of jobs in the manifest job metadata.
+    """
+    here = path.abspath(path.dirname(__file__))
+    valid_csv_operator_data_file = path.join(here, 'unittest_data/operator', 'operator1_20160701_20160731.csv')
+    manifest_lines = ['operator_id,input_file']
+    for operator_id in ['operator1', 'operator2']:
+        csv_file_name = '{0}_20160701_20160731.csv'.format(operator_id)
+        zip_file_name = '{0}_20160701_20160731.zip'.format(operator_id)
+        with zipfile.ZipFile(str(tmpdir.join(zip_file_name)), 'w') as zfile:
+            zfile.write(valid_csv_operator_data_file, csv_file_name)
+        # Relative paths are resolved relative to the manifest file
+        manifest_lines.append('{0},{1}'.format(operator_id, zip_file_name))
+    manifest_file = tmpdir.join('manifest.csv')
+    manifest_file.write('\n'.join(manifest_lines) + '\n')
+
+    runner = CliRunner()
+    result = runner.invoke(dirbs_import_cli, ['operator_manifest', '--disable-rat-import', '--disable-region-check',
+                                              '--disable-home-check', str(manifest_file)],
+                           obj={'APP_CONFIG': mocked_config})
+    assert result.exit_code == 0
+
+    with db_conn.cursor() as cursor:
+        cursor.execute('SELECT COUNT(*) FROM network_imeis')
+        assert cursor.fetchone().count == 16
+        cursor.execute("""SELECT operator_id, COUNT(*)
+                            FROM monthly_network_triplets_per_mno
+                        GROUP BY operator_id
+                        ORDER BY operator_id""")
+        res = cursor.fetchall()
+        assert [r.operator_id for r in res] == ['operator1', 'operator2']
+        assert res[0].count == res[1].count
+
+    import_runs = metadata.query_for_command_runs(metadata_db_conn, 'dirbs-import', subcommand='operator',
+                                                  successful_only=True)
+    assert len(import_runs) == 2
+    manifest_run = metadata.query_for_command_runs(metadata_db_conn, 'dirbs-import',
+                                                   subcommand='operator_manifest', successful_only=True)[0]
+    assert manifest_run.extra_metadata['failed_operator_ids'] == []
+    assert {e['run_id'] for e in manifest_run.extra_metadata['manifest']} == {r.run_id for r in import_runs}
+
+    # Importing the same operator twice in one manifest is rejected up front
+    manifest_file.write('operator_id,input_file\noperator1,operator1_20160701_20160731.zip\n'
+                        'operator1,operator1_20160701_20160731.zip\n')
+    result = runner.invoke(dirbs_import_cli, ['operator_manifest', '--disable-rat-import', str(manifest_file)],
+                           obj={'APP_CONFIG': mocked_config})
+    assert result.exit_code != 0
+
+
+@pytest.mark.parametrize('max_db_connections, num_files, expected_budget',
+                         [(16, 10, (4, 4)), (16, 2, (2, 6)), (4, 3, (1, 1)), (1, 3, (1, 1))])
+def test_operator_manifest_connection_budget(max_db_connections, num_files, expected_budget):
+    """Verify that concurrent manifest imports and their shared workers are kept within max_db_connections."""
+    max_concurrent_files, max_worker_connections = _manifest_connection_budget(max_db_connections, num_files)
+    assert (max_concurrent_files, max_worker_connections) == expected_budget
+    if max_db_connections >= 4:
+        assert 2 * max_concurrent_files + 2 * max_worker_connections <= max_db_connections
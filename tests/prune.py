@@ -35,10 +35,13 @@ import datetime
 
 import pytest
 from click.testing import CliRunner
+from psycopg2 import sql
 
 from dirbs.cli.prune import cli as dirbs_prune_cli
 from dirbs.cli.classify import cli as dirbs_classify_cli
+from dirbs.cli.listgen import cli as dirbs_listgen_cli
 from dirbs.importer.gsma_data_importer import GSMADataImporter
+from dirbs.metadata import query_for_command_runs
 from _fixtures import *  # noqa: F403, F401
 from _helpers import get_importer, expect_success, from_cond_dict_list_to_cond_list
 from _importer_params import OperatorDataParams, StolenListParams, GSMADataParams
@@ -71,6 +74,17 @@ def test_persistent_network_imeis(postgres, db_conn, tmpdir, logger, operator_da
         result_list_before_prune = [(res.imei_norm, res.first_seen.strftime('%Y%m%d'))
                                     for res in cur.fetchall()]
 
+        # Verify the partition inventory maintained by the importer matches the actual partition sizes
+        cur.execute('SELECT table_name, num_rows FROM partition_inventory')
+        inventory = cur.fetchall()
+        assert len(inventory) == 2
+        for res in inventory:
+            cur.execute(sql.SQL('SELECT COUNT(*) FROM {0}').format(sql.Identifier(res.table_name)))
+            assert cur.fetchone()[0] == res.num_rows
+
+        cur.execute('SELECT COUNT(*) FROM network_msisdns')
+        assert cur.fetchone()[0] > 0
+
     runner = CliRunner()
     result = runner.invoke(dirbs_prune_cli, ['triplets'], obj={'APP_CONFIG': mocked_config})
     assert result.exit_code == 0
@@ -91,6 +105,14 @@ def test_persistent_network_imeis(postgres, db_conn, tmpdir, logger, operator_da
 
         assert result_list_before_prune == result_list_after_prune
 
+        # Pruned partitions should have been removed from the partition inventory
+        cur.execute('SELECT COUNT(*) FROM partition_inventory')
+        assert cur.fetchone()[0] == 0
+
+        # MSISDN reverse index entries last seen before the retention window are pruned too
+        cur.execute('SELECT COUNT(*) FROM network_msisdns')
+        assert cur.fetchone()[0] == 0
+
 
 @pytest.mark.parametrize('operator_data_importer',
                          [OperatorDataParams(
@@ -113,9 +135,12 @@ def test_persistent_network_imeis(postgres, db_conn, tmpdir, logger, operator_da
 @pytest.mark.parametrize('stolen_list_importer',
                          [StolenListParams(filename='testData1-sample_stolen_list-anonymized.csv')],
                          indirect=True)
+@pytest.mark.parametrize('prune_rewrite_threshold, expected_prune_mode',
+                         [(1.0, 'in_place'), (0.0, 'rewrite')])
 def test_prune_classification_state(db_conn, metadata_db_conn, tmpdir, logger, mocked_config,
                                     operator_data_importer, stolen_list_importer, monkeypatch,
-                                    gsma_tac_db_importer, postgres, mocked_statsd):
+                                    gsma_tac_db_importer, postgres, mocked_statsd,
+                                    prune_rewrite_threshold, expected_prune_mode):
     """Test Depot ID not known yet.
 
     A regulator/partner should be able to run a CLI command to prune classification_state table.
@@ -281,12 +306,17 @@ def test_prune_classification_state(db_conn, metadata_db_conn, tmpdir, logger, m
                            }]
 
         monkeypatch.setattr(mocked_config, 'conditions', from_cond_dict_list_to_cond_list(cond_dict_list))
+        monkeypatch.setattr(mocked_config.retention_config, 'prune_rewrite_threshold', prune_rewrite_threshold)
         with db_conn.cursor() as cur:
             result = runner.invoke(dirbs_prune_cli, ['--curr-date', '20170913',
                                                      'classification_state'],
                                    obj={'APP_CONFIG': mocked_config})
 
             assert result.exit_code == 0
+            extra_metadata = query_for_command_runs(metadata_db_conn, 'dirbs-prune',
+                                                    subcommand='classification_state')[0].extra_metadata
+            assert extra_metadata['prune_mode'] == expected_prune_mode
+            assert extra_metadata['rows_pruned'] == 23
             # ITEMS REMOVED
             # [('17272317272723', 'local_stolen', None), ('12909602872723', 'local_stolen', None),
             # ('12875502572723', 'local_stolen', None), ('12875507272312', 'local_stolen', None),
@@ -406,3 +436,58 @@ def test_prune_blacklist(db_conn, metadata_db_conn, tmpdir, logger, mocked_confi
         assert len(res_list) == 29
         for x in res_list:
             assert x.end_date is not None
+
+
+@pytest.mark.parametrize('operator_data_importer',
+                         [OperatorDataParams(
+                             content='date,imei,imsi,msisdn\n'
+                                     '20110101,88888888622222,123456789012345,123456789012345\n'
+                                     '20110101,21111111111111,125456789012345,123456789012345',
+                             extract=False,
+                             perform_unclean_checks=False,
+                             perform_region_checks=False,
+                             perform_home_network_check=False,
+                             operator='operator1'
+                         )],
+                         indirect=True)
+@pytest.mark.parametrize('stolen_list_importer',
+                         [StolenListParams(filename='testData1-sample_stolen_list-anonymized.csv')],
+                         indirect=True)
+def test_prune_lists_rebuilds_snapshots(db_conn, metadata_db_conn, tmpdir, logger, mocked_config,
+                                        operator_data_importer, stolen_list_importer, postgres):
+    """Verify that IMEIs still on the lists are re-added to the list history by listgen after pruning the lists."""
+    operator_data_importer.import_data()
+    stolen_list_importer.import_data()
+    db_conn.commit()
+
+    runner = CliRunner()
+    result = runner.invoke(dirbs_classify_cli, ['--no-safety-check', '--curr-date', '20170713'],
+                           obj={'APP_CONFIG': mocked_config})
+    assert result.exit_code == 0
+
+    def _run_listgen(sub_dir):
+        result = runner.invoke(dirbs_listgen_cli, ['--curr-date', '20170713', '--disable-sanity-checks',
+                                                   str(tmpdir.mkdir(sub_dir))],
+                               obj={'APP_CONFIG': mocked_config})
+        assert result.exit_code == 0
+
+    def _current_blacklist_imeis():
+        with db_conn.cursor() as cursor:
+            cursor.execute("""SELECT imei_norm
+                                FROM blacklist
+                               WHERE end_run_id IS NULL
+                                 AND delta_reason != 'unblocked'""")
+            return {x.imei_norm for x in cursor}
+
+    _run_listgen('listgen_before')
+    blacklisted_imeis = _current_blacklist_imeis()
+    assert len(blacklisted_imeis) > 0
+
+    # Pruning with a current date far in the future drops the whole list history
+    result = runner.invoke(dirbs_prune_cli, ['--curr-date', '20990101', 'lists'], obj={'APP_CONFIG': mocked_config})
+    assert result.exit_code == 0
+    assert _current_blacklist_imeis() == set()
+
+    # The IMEIs are still blacklisted, so the next listgen run adds them back to the list history
+    _run_listgen('listgen_after')
+    assert _current_blacklist_imeis() == blacklisted_imeis
@@ -42,12 +42,17 @@ from glob import glob
 import fnmatch
 
 import pytest
+import numpy as np
 from click.testing import CliRunner
 
 from dirbs import __version__, report_schema_version
 from dirbs.cli.report import cli as dirbs_report_cli
 from dirbs.cli.classify import cli as dirbs_classify_cli
 from dirbs.importer.operator_data_importer import OperatorDataImporter
+from dirbs.reports import CountryReport, ReportData
+from dirbs.reports import csv_reports
+from dirbs.reports.csv_reports import _segments_have_consecutive_numbers, _segments_are_arithmetic_series
+from dirbs.config.region import OperatorConfig
 from _helpers import get_importer, expect_success, find_subdirectory_in_dir, \
     invoke_cli_classify_with_conditions_helper, from_cond_dict_list_to_cond_list, import_data
 from _fixtures import *  # noqa: F403, F401
@@ -2223,6 +2228,98 @@ def test_blacklist_stolen_violation_report(postgres, db_conn, metadata_db_conn,
     assert rows == [['imei_norm', 'last_seen', 'reporting_date'], ['21111106045110', '20161105', '20161103']]
 
 
+@pytest.mark.parametrize('operator_data_importer',
+                         [OperatorDataParams(
+                             content='date,imei,imsi,msisdn\n'
+                                     '20161105,111111013136460,111018001111111,223338000000\n'
+                                     '20161105,211111060451101,111018001111111,223338000000\n'
+                                     '20161105,211111060451100,111015111111111,223355000000\n'
+                                     '20161105,311111060451100,111015111111111,223355000000\n'
+                                     '20161105,411111060451100,111015111111111,223355000000\n'
+                                     '20161105,511111013659809,111015111111111,223614000000',
+                             operator='operator1',
+                             cc=['22'],
+                             mcc_mnc_pairs=[{'mcc': '111', 'mnc': '01'}],
+                             perform_leading_zero_check=False,
+                             extract=False)],
+                         indirect=True)
+@pytest.mark.parametrize('stolen_list_importer',
+                         [StolenListParams(content='IMEI,reporting_date,status\n'
+                                                   '111111013136460,20161104,\n'
+                                                   '211111060451111,20161103,\n'
+                                                   '211111060451100,20161103,')],
+                         indirect=True)
+def test_stolen_violation_report_parallel_shards(postgres, db_conn, metadata_db_conn, operator_data_importer,
+                                                 stolen_list_importer, tmpdir, mocked_config, logger, monkeypatch):
+    """Verify that the stolen violations report is the same when the IMEI shard ranges are queried in parallel.
+
+    Verify also that the per-shard part files are removed once they have been concatenated.
+    """
+    expect_success(operator_data_importer, 6, db_conn, logger)
+    stolen_list_importer.import_data()
+    monkeypatch.setattr(mocked_config.report_config, 'blacklist_violations_grace_period_days', 1)
+    db_conn.commit()
+
+    runner = CliRunner()
+    output_dir = str(tmpdir)
+    result = runner.invoke(dirbs_report_cli, ['stolen_violations', '--max-db-connections', '4', output_dir],
+                           obj={'APP_CONFIG': mocked_config})
+    assert result.exit_code == 0
+
+    fn = find_subdirectory_in_dir('report__stolen_violations*', output_dir)
+    dir_path = os.path.join(output_dir, fn)
+    assert not [x for x in os.listdir(dir_path) if '.part_' in x]
+    with open(os.path.join(dir_path, 'stolen_violations_operator1.csv'), 'r') as input_file:
+        rows = list(csv.reader(input_file))
+    assert rows == [['imei_norm', 'last_seen', 'reporting_date'], ['21111106045110', '20161105', '20161103']]
+    with open(os.path.join(dir_path, 'stolen_violations_operator2.csv'), 'r') as input_file:
+        rows = list(csv.reader(input_file))
+    assert rows == [['imei_norm', 'last_seen', 'reporting_date']]
+
+
+@pytest.mark.parametrize('operator_data_importer',
+                         [OperatorDataParams(
+                             content='date,imei,imsi,msisdn\n'
+                                     '20161105,111111013136460,111018001111111,223338000000\n'
+                                     '20161105,211111060451100,111015111111111,223355000000',
+                             operator='operator1',
+                             cc=['22'],
+                             mcc_mnc_pairs=[{'mcc': '111', 'mnc': '01'}],
+                             perform_leading_zero_check=False,
+                             extract=False)],
+                         indirect=True)
+@pytest.mark.parametrize('stolen_list_importer',
+                         [StolenListParams(content='IMEI,reporting_date,status\n'
+                                                   '211111060451100,20161103,')],
+                         indirect=True)
+def test_stolen_violation_report_shard_failure(postgres, db_conn, metadata_db_conn, operator_data_importer,
+                                               stolen_list_importer, tmpdir, mocked_config, logger, monkeypatch):
+    """Verify that the per-shard part files are removed when one of the shard jobs fails."""
+    expect_success(operator_data_importer, 2, db_conn, logger)
+    stolen_list_importer.import_data()
+    monkeypatch.setattr(mocked_config.report_config, 'blacklist_violations_grace_period_days', 1)
+    db_conn.commit()
+
+    write_report_shard = csv_reports._write_report_shard
+
+    def failing_write_report_shard(db_config, *, virt_imei_range_start, **kwargs):
+        part_filename_map = write_report_shard(db_config, virt_imei_range_start=virt_imei_range_start, **kwargs)
+        if virt_imei_range_start > 0:
+            raise RuntimeError('Shard job failed')
+        return part_filename_map
+
+    monkeypatch.setattr(csv_reports, '_write_report_shard', failing_write_report_shard)
+    runner = CliRunner()
+    output_dir = str(tmpdir)
+    result = runner.invoke(dirbs_report_cli, ['stolen_violations', '--max-db-connections', '4', output_dir],
+                           obj={'APP_CONFIG': mocked_config})
+    assert result.exit_code != 0
+
+    for dir_path, dirnames, filenames in os.walk(output_dir):
+        assert not [x for x in dirnames if '_parts_' in x]
+        assert not [x for x in filenames if '.part_' in x]
+
+
 @pytest.mark.parametrize('operator_data_importer, classification_data',
                          [(OperatorDataParams(
                              content='date,imei,imsi,msisdn\n'
@@ -3049,6 +3146,79 @@ def test_association_list_violations(per_test_postgres, mocked_config, logger, m
     assert all([x in rows for x in expected_list])
 
 
+@pytest.mark.parametrize('subscribers_list_importer',
+                         [SubscribersListParams(content='uid,imsi\n'
+                                                        'uid-01-sub,11105678901234\n'
+                                                        'uid-02-sub,11106678901235')],
+                         indirect=True)
+@pytest.mark.parametrize('device_association_list_importer',
+                         [DeviceAssociationListParams(content='uid,imei\n'
+                                                              'uid-01-sub,12345678901228\n'
+                                                              'uid-02-sub,12345678901229')],
+                         indirect=True)
+@pytest.mark.parametrize('operator_data_importer',
+                         [OperatorDataParams(
+                             content='date,imei,imsi,msisdn\n'
+                                     '20190221,12345678901228,11105678901234,1\n'
+                                     '20190121,12345678901229,11106678901235,1\n'
+                                     '20190222,12345678901230,11107678901236,1\n'
+                                     '20190212,12345678901231,11107678901237,1\n'
+                                     '20190212,12345678901232,11108678901238,1\n'
+                                     '20190212,12345678901233,11109678901239,1',
+                             extract=False,
+                             perform_unclean_checks=False,
+                             perform_leading_zero_check=False,
+                             perform_region_checks=False,
+                             perform_home_network_check=False,
+                             operator='operator1'
+                         )],
+                         indirect=True)
+def test_combined_reports(per_test_postgres, mocked_config, logger, monkeypatch, tmpdir, db_conn,
+                          subscribers_list_importer, operator_data_importer, device_association_list_importer):
+    """Verify that the combined subcommand writes the same reports as the individual subcommands."""
+    operator_data_importer.import_data()
+    subscribers_list_importer.import_data()
+    device_association_list_importer.import_data()
+
+    runner = CliRunner()
+    output_dir = str(tmpdir)
+    # The month and year are required for the association list violations
+    result = runner.invoke(dirbs_report_cli,
+                           ['combined', '--reports', 'association_list_violations,unregistered_subscribers',
+                            output_dir],
+                           obj={'APP_CONFIG': mocked_config})
+    assert result.exit_code != 0
+
+    result = runner.invoke(dirbs_report_cli,
+                           ['combined', '--reports', 'association_list_violations,unregistered_subscribers',
+                            '--month', '02', '--year', '2019', output_dir],
+                           obj={'APP_CONFIG': mocked_config})
+    assert result.exit_code == 0
+
+    fn = find_subdirectory_in_dir('report__combined*', output_dir)
+    dir_path = os.path.join(output_dir, fn)
+    with open('{0}/association_violations_operator1.csv'.format(dir_path), 'r') as fn:
+        rows = list(csv.reader(fn))
+    assert len(rows) == 5
+    expected_list = [['imei', 'imsi', 'msisdn', 'first_seen', 'last_seen'],
+                     ['12345678901232', '11108678901238', '1', '2019-02-12', '2019-02-12'],
+                     ['12345678901230', '11107678901236', '1', '2019-02-22', '2019-02-22'],
+                     ['12345678901233', '11109678901239', '1', '2019-02-12', '2019-02-12'],
+                     ['12345678901231', '11107678901237', '1', '2019-02-12', '2019-02-12']]
+    assert all([x in rows for x in expected_list])
+
+    with open('{0}/unregistered_subscribers_operator1.csv'.format(dir_path), 'r') as fn:
+        rows = list(csv.reader(fn))
+    assert len(rows) == 5
+    expected_list = [['imsi', 'first_seen', 'last_seen'],
+                     ['11107678901236', '20190222', '20190222'],
+                     ['11107678901237', '20190212', '20190212'],
+                     ['11108678901238', '20190212', '20190212'],
+                     ['11109678901239', '20190212', '20190212']]
+    assert all([x in rows for x in expected_list])
+    assert 'blacklist_violations_operator1.csv' not in os.listdir(dir_path)
+
+
 @pytest.mark.parametrize('operator_data_importer',
                          [OperatorDataParams(
                              filename='transient_msisdn_operator1_20201201_20201231.csv',
@@ -3085,3 +3255,98 @@ def test_transient_msisdns(per_test_postgres, mocked_config, logger, monkeypatch
     expected_res = [['msisdn'],
                     ['2210011111111']]
     assert all([x in rows for x in expected_res])
+
+
+@pytest.mark.parametrize('operator_data_importer',
+                         [OperatorDataParams(
+                             filename='testData1-operator-operator1-anonymized_20161101_20161130.csv',
+                             operator='operator1',
+                             perform_unclean_checks=False,
+                             extract=False)],
+                         indirect=True)
+def test_report_data_historic_periods(postgres, db_conn, operator_data_importer, tmpdir, logger, mocked_config):
+    """Verify that ReportData resolves the latest data_id for each historic period and serves every operator."""
+    import_data(operator_data_importer, 'operator_data', 17, db_conn, logger)
+    output_dir = str(tmpdir)
+    runner = CliRunner()
+    # Generate report data twice for 10/2016 (data_ids 1 and 2) and once for 11/2016 (data_id 3)
+    for month in ['10', '10', '11']:
+        result = runner.invoke(dirbs_report_cli,
+                               ['standard', '--disable-retention-check', '--disable-data-check', '--force-refresh',
+                                month, '2016', output_dir], obj={'APP_CONFIG': mocked_config})
+        assert result.exit_code == 0
+
+    report_data = ReportData(db_conn, 3, 11, 2016)
+    assert report_data.historic_data_ids == [None, None, None, None, 2]
+    for op_id in [op.id for op in mocked_config.region_config.operators] + [OperatorConfig.COUNTRY_OPERATOR_NAME]:
+        assert len(report_data.rows('report_monthly_stats', op_id)) == 1
+        historic_rows = report_data.historic_rows('report_monthly_stats', op_id)
+        assert [len(x) for x in historic_rows] == [0, 0, 0, 0, 1]
+        assert historic_rows[-1][0].data_id == 2
+
+    # A report built from shared report data should match one that loads its own
+    country_name = mocked_config.region_config.name
+    shared = CountryReport(db_conn, 3, mocked_config, 11, 2016, country_name, report_data=report_data)
+    standalone = CountryReport(db_conn, 3, mocked_config, 11, 2016, country_name)
+    assert shared.gen_report_data() == standalone.gen_report_data()
+
+
+def test_transient_msisdns_segment_tests():
+    """Verify that the transient MSISDN tests are evaluated correctly for each segment of an array."""
+    # Segments: [1, 3, 5], [7], [4, 4], [10, 9, 8], [2, 5, 6]
+    values = np.array([1, 3, 5, 7, 4, 4, 10, 9, 8, 2, 5, 6], dtype=np.int64)
+    segment_starts = np.array([0, 3, 4, 6, 9], dtype=np.int64)
+    assert list(_segments_are_arithmetic_series(values, segment_starts)) == [True, True, True, True, False]
+    assert list(_segments_have_consecutive_numbers(values, segment_starts)) == [False, True, False, True, False]
+
+
+@pytest.mark.parametrize('operator_data_importer',
+                         [OperatorDataParams(
+                             filename='testData1-operator-operator1-anonymized_20161101_20161130.csv',
+                             operator='operator1',
+                             perform_unclean_checks=False,
+                             extract=False)],
+                         indirect=True)
+def test_standard_report_partial_refresh(postgres, db_conn, metadata_db_conn, operator_data_importer, logger,
+                                         tmpdir, mocked_config):
+    """Verify that a partial refresh only recalculates the report data whose inputs changed."""
+    import_data(operator_data_importer, 'operator_data', 17, db_conn, logger)
+    db_conn.commit()
+    runner = CliRunner()
+    output_dir = str(tmpdir)
+
+    def _run_standard_report(*args):
+        result = runner.invoke(dirbs_report_cli,
+                               ['standard', '--disable-retention-check', '--disable-data-check', '--force-refresh',
+                                *args, '11', '2016', output_dir], obj={'APP_CONFIG': mocked_config})
+        assert result.exit_code == 0
+        return query_for_command_runs(metadata_db_conn, 'dirbs-report', subcommand='standard')[0] \
+            .extra_metadata['data_id']
+
+    # The first refresh records the inputs the data was calculated from
+    data_id = _run_standard_report()
+    with db_conn.cursor() as cursor:
+        cursor.execute('SELECT refresh_inputs FROM report_data_metadata WHERE data_id = %s', [data_id])
+        refresh_inputs = cursor.fetchone().refresh_inputs
+    assert set(refresh_inputs) == {'operator_imports', 'gsma_import', 'classification'}
+    assert set(refresh_inputs['operator_imports']) == {op.id for op in mocked_config.region_config.operators}
+
+    # Nothing has changed since, so the existing data is re-used
+    assert _run_standard_report('--partial-refresh') == data_id
+
+    # A classification run only changes the compliance data, so everything else is copied
+    result = runner.invoke(dirbs_classify_cli, ['--no-safety-check'], obj={'APP_CONFIG': mocked_config})
+    assert result.exit_code == 0
+    new_data_id = _run_standard_report('--partial-refresh')
+    assert new_data_id != data_id
+
+    with db_conn.cursor() as cursor:
+        for tbl_name, cols in [('report_daily_stats', 'operator_id, data_date, num_triplets, num_imeis'),
+                               ('report_monthly_top_models_imei', 'operator_id, rank_pos, model, num_imeis'),
+                               ('report_monthly_imei_imsi_overloading', 'operator_id, seen_with_imsis, num_imeis'),
+                               ('report_monthly_stats', 'operator_id, num_records, num_triplets, num_gross_adds')]:
+            rows = []
+            for x in [data_id, new_data_id]:
+                cursor.execute('SELECT {0} FROM {1} WHERE data_id = %s ORDER BY 1, 2, 3'.format(cols, tbl_name), [x])
+                rows.append(cursor.fetchall())
+            assert rows[0] == rows[1]
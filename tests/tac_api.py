@@ -32,10 +32,14 @@ POSSIBILITY OF SUCH DAMAGE.
 """
 
 import json
+from os import path
+import zipfile
 
+from click.testing import CliRunner
 from flask import url_for
 import pytest
 
+from dirbs.cli.importer import cli as dirbs_import_cli
 from _fixtures import *  # noqa: F403, F401
 from _importer_params import GSMADataParams
 
@@ -281,6 +285,39 @@ def test_batch_tacs(flask_app, gsma_tac_db_importer, api_version):
         assert b"Bad \'tacs\':\'[\'Min 1 and Max 1000 TACs are allowed\']\' argument format" in rv.data
 
 
+def test_gsma_tac_dictionary_reloaded_after_import(flask_app, db_conn, mocked_config, tmpdir, api_version):
+    """Test Depot not available yet.
+
+    Verify that the in-process GSMA TAC dictionary used by the TAC API picks up the data of a newly completed
+    gsma_tac import.
+    """
+    if api_version == 'v1':
+        tac_url = url_for('{0}.tac_api'.format(api_version), tac='01234401')
+    else:  # api version 2
+        tac_url = url_for('{0}.tac_get_api'.format(api_version), tac='01234401')
+
+    rv = flask_app.get(tac_url)
+    assert rv.status_code == 200
+    assert json.loads(rv.data.decode('utf-8'))['gsma'] is None
+
+    here = path.abspath(path.dirname(__file__))
+    gsma_data_file_name = 'sample_gsma_import_list_anonymized.txt'
+    gsma_data_file = path.join(here, 'unittest_data/gsma', gsma_data_file_name)
+    zip_file_path = str(tmpdir.join('sample_gsma_import_list_anonymized.zip'))
+    with zipfile.ZipFile(zip_file_path, 'w') as zf:
+        zf.write(gsma_data_file, gsma_data_file_name)
+
+    runner = CliRunner()
+    result = runner.invoke(dirbs_import_cli, ['gsma_tac', zip_file_path], obj={'APP_CONFIG': mocked_config})
+    assert result.exit_code == 0
+
+    rv = flask_app.get(tac_url)
+    assert rv.status_code == 200
+    data = json.loads(rv.data.decode('utf-8'))
+    assert data['tac'] == '01234401'
+    assert data['gsma'] is not None
+
+
 def test_method_put_not_allowed(flask_app, api_version):
     """Test Depot ID 96554/2.
 